@@ -230,17 +230,11 @@ async def get_tier_features():
     - Feature description
     """
     try:
-        import asyncpg
         import os
+        from database.pool_manager import pg_connect
 
         # Create database connection
-        conn = await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
+        conn = await pg_connect()
 
         try:
             # Query tier features
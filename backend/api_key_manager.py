@@ -10,7 +10,11 @@ Date: October 28, 2025
 
 import os
 import asyncio
+import hashlib
+import hmac
 import secrets
+import time
+from collections import OrderedDict
 import bcrypt
 import jwt
 from typing import Dict, List, Optional, Tuple
@@ -20,6 +24,17 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Verified-key cache: how long a successful bcrypt verification is trusted
+# before the key is re-checked against the database (also bounds how long a
+# revocation made in ANOTHER worker process takes to apply here).
+API_KEY_CACHE_TTL = int(os.getenv("API_KEY_CACHE_TTL", "60"))
+# How long a failed verification is remembered, so a client hammering with a
+# bad key can't make us burn bcrypt CPU on every request.
+API_KEY_NEGATIVE_CACHE_TTL = int(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", "30"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+# Minimum interval between last_used writes for the same key
+LAST_USED_WRITE_INTERVAL = 60
+
 class APIKeyManager:
     """
     Manages API keys for external application authentication.
@@ -38,6 +53,13 @@ class APIKeyManager:
         self.jwt_algorithm = "HS256"
         self.default_expiry_days = 90  # API keys expire after 90 days
 
+        # Verified-key cache keyed by HMAC-SHA256(token) under a per-process
+        # secret, so plaintext keys are never held in memory as dict keys.
+        # digest -> (expires_at_monotonic, user_info or None for a known-bad key)
+        self._cache_secret = secrets.token_bytes(32)
+        self._verified_cache: "OrderedDict[str, Tuple[float, Optional[Dict]]]" = OrderedDict()
+        self._last_used_written: Dict[str, float] = {}
+
     def _generate_secret(self) -> str:
         """Generate a secure random secret for JWT signing"""
         return secrets.token_urlsafe(64)
@@ -91,6 +113,54 @@ class APIKeyManager:
         """Hash API key with bcrypt"""
         return bcrypt.hashpw(api_key.encode(), bcrypt.gensalt()).decode()
 
+    def _cache_digest(self, api_key: str) -> str:
+        """Fast keyed hash of a presented token (cache key)"""
+        return hmac.new(self._cache_secret, api_key.encode(), hashlib.sha256).hexdigest()
+
+    def _cache_get(self, digest: str) -> Tuple[bool, Optional[Dict]]:
+        """Return (hit, user_info); user_info None on a hit means known-invalid"""
+        entry = self._verified_cache.get(digest)
+        if entry is None:
+            return False, None
+        expires_at, user_info = entry
+        if expires_at <= time.monotonic():
+            self._verified_cache.pop(digest, None)
+            return False, None
+        self._verified_cache.move_to_end(digest)
+        return True, user_info
+
+    def _cache_put(self, digest: str, user_info: Optional[Dict], ttl: float):
+        if ttl <= 0:
+            return
+        self._verified_cache[digest] = (time.monotonic() + ttl, user_info)
+        self._verified_cache.move_to_end(digest)
+        while len(self._verified_cache) > API_KEY_CACHE_SIZE:
+            self._verified_cache.popitem(last=False)
+
+    def invalidate_key_cache(self, key_id: Optional[str] = None, user_id: Optional[str] = None):
+        """Drop cached verifications for a revoked key or for all of a user's keys"""
+        for digest, (_, info) in list(self._verified_cache.items()):
+            if info is None:
+                continue
+            if (key_id and info['key_id'] == key_id) or (user_id and info['user_id'] == user_id):
+                del self._verified_cache[digest]
+
+    async def _touch_last_used(self, key_id: str):
+        """Record key usage, at most once per LAST_USED_WRITE_INTERVAL per key"""
+        now = time.monotonic()
+        if now - self._last_used_written.get(key_id, 0.0) < LAST_USED_WRITE_INTERVAL:
+            return
+        self._last_used_written[key_id] = now
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.execute("""
+                    UPDATE user_api_keys
+                    SET last_used = NOW()
+                    WHERE id = $1
+                """, key_id)
+        except Exception as e:
+            logger.warning(f"Failed to update last_used for API key {key_id}: {e}")
+
     def _verify_key(self, api_key: str, key_hash: str) -> bool:
         """Verify API key against stored hash"""
         try:
@@ -118,9 +188,9 @@ class APIKeyManager:
         Returns:
             Dict with 'api_key' (show once), 'key_id', 'key_prefix', 'expires_at'
         """
-        # Generate key
+        # Generate key (bcrypt off the event loop)
         api_key, prefix = self._generate_api_key()
-        key_hash = self._hash_key(api_key)
+        key_hash = await asyncio.to_thread(self._hash_key, api_key)
 
         # Calculate expiration
         expires_in_days = expires_in_days or self.default_expiry_days
@@ -168,6 +238,14 @@ class APIKeyManager:
         if not api_key or not api_key.startswith("uc_"):
             return None
 
+        digest = self._cache_digest(api_key)
+        hit, cached = self._cache_get(digest)
+        if hit:
+            if cached is None:
+                return None
+            await self._touch_last_used(cached['key_id'])
+            return dict(cached)
+
         # Get prefix for faster lookup
         prefix = api_key[:7]
 
@@ -181,24 +259,27 @@ class APIKeyManager:
                   AND (expires_at IS NULL OR expires_at > NOW())
             """, prefix)
 
-            # Try to match hash (bcrypt is slow, so we limit candidates by prefix)
-            for key_record in keys:
-                if self._verify_key(api_key, key_record['key_hash']):
-                    # Update last_used
-                    await conn.execute("""
-                        UPDATE user_api_keys
-                        SET last_used = NOW()
-                        WHERE id = $1
-                    """, key_record['id'])
+        # Try to match hash (bcrypt is slow, so we limit candidates by prefix
+        # and run it in a worker thread instead of on the event loop)
+        for key_record in keys:
+            if await asyncio.to_thread(self._verify_key, api_key, key_record['key_hash']):
+                user_info = {
+                    "user_id": key_record['user_id'],
+                    "permissions": key_record['permissions'],
+                    "key_id": str(key_record['id'])
+                }
 
-                    logger.debug(f"API key validated for user {key_record['user_id']}")
+                # Never trust the cache past the key's own expiry
+                ttl = API_KEY_CACHE_TTL
+                if key_record['expires_at']:
+                    ttl = min(ttl, (key_record['expires_at'] - datetime.utcnow()).total_seconds())
+                self._cache_put(digest, user_info, ttl)
 
-                    return {
-                        "user_id": key_record['user_id'],
-                        "permissions": key_record['permissions'],
-                        "key_id": str(key_record['id'])
-                    }
+                await self._touch_last_used(user_info['key_id'])
+                logger.debug(f"API key validated for user {key_record['user_id']}")
+                return dict(user_info)
 
+        self._cache_put(digest, None, API_KEY_NEGATIVE_CACHE_TTL)
         logger.warning(f"Invalid API key attempt: {prefix}...")
         return None
 
@@ -263,6 +344,7 @@ class APIKeyManager:
             """, key_id, user_id)
 
             if result == "UPDATE 1":
+                self.invalidate_key_cache(key_id=str(key_id))
                 logger.info(f"Revoked API key {key_id} for user {user_id}")
                 return True
             return False
@@ -285,6 +367,7 @@ class APIKeyManager:
             """, user_id)
 
             count = int(result.split()[-1])
+            self.invalidate_key_cache(user_id=user_id)
             logger.info(f"Revoked {count} API keys for user {user_id}")
             return count
 
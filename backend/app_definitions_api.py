@@ -10,6 +10,7 @@ from typing import List, Optional, Union
 from datetime import datetime
 
 import asyncpg
+from database.pool_manager import pg_connect
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from pydantic import BaseModel, Field
 
@@ -157,13 +158,7 @@ class AppReorderRequest(BaseModel):
 
 async def get_db_connection():
     """Create database connection."""
-    return await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db")
-    )
+    return await pg_connect()
 
 
 def normalize_app_row(row) -> dict:
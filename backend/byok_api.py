@@ -12,6 +12,7 @@ from datetime import datetime
 import logging
 
 from key_encryption import get_encryption
+from model_listing import invalidate_user_overlay
 from tier_middleware import require_tier
 
 logger = logging.getLogger(__name__)
@@ -476,6 +477,7 @@ async def add_key(key_data: APIKeyAdd, request: Request):
                         metadata = EXCLUDED.metadata,
                         updated_at = NOW()
                 """, user_id, key_data.provider, encrypted_key, json.dumps(metadata))
+            invalidate_user_overlay(user_id)
 
             logger.info(f"Added BYOK key for {user_email} (user_id: {user_id}): {key_data.provider}")
 
@@ -527,6 +529,8 @@ async def delete_key(provider: str, request: Request):
 
         if not success:
             raise HTTPException(status_code=500, detail="Failed to remove API key")
+        if user.get("id"):
+            invalidate_user_overlay(user["id"])
 
         logger.info(f"Removed BYOK key for {user_email}: {provider}")
 
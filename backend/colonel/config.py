@@ -9,17 +9,11 @@ from typing import Optional
 
 import asyncpg
 
+from database.pool_manager import get_budget_pool
 from colonel.models import ColonelConfig, ColonelPersonality
 
 logger = logging.getLogger("colonel.config")
 
-# Database connection settings (same as rest of ops-center)
-DB_HOST = os.getenv("POSTGRES_HOST", "unicorn-postgresql")
-DB_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
-DB_USER = os.getenv("POSTGRES_USER", "unicorn")
-DB_PASS = os.getenv("POSTGRES_PASSWORD", "unicorn")
-DB_NAME = os.getenv("POSTGRES_DB", "unicorn_db")
-
 # LLM settings
 LITELLM_URL = os.getenv(
     "COLONEL_LLM_URL",
@@ -35,21 +29,9 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 SESSION_TTL = int(os.getenv("COLONEL_SESSION_TTL", "86400"))  # 24 hours
 
 
-_db_pool: Optional[asyncpg.Pool] = None
-
-
 async def get_db_pool() -> asyncpg.Pool:
-    """Get or create the database connection pool."""
-    global _db_pool
-    if _db_pool is None or _db_pool._closed:
-        _db_pool = await asyncpg.create_pool(
-            host=DB_HOST, port=DB_PORT,
-            user=DB_USER, password=DB_PASS,
-            database=DB_NAME,
-            min_size=1, max_size=5,
-            command_timeout=10,
-        )
-    return _db_pool
+    """Get the shared database connection pool (same as rest of ops-center)."""
+    return get_budget_pool("request")
 
 
 async def get_colonel_config(colonel_id: str = "default") -> ColonelConfig:
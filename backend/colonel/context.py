@@ -0,0 +1,117 @@
+"""
+Context window management for Colonel chat sessions.
+
+Each ChatMessage caches its own token count (with the name of the tokenizer
+that produced it), so a message is tokenized once rather than on every turn.
+The window sent to the LLM is tracked by the session's `context_start` index
+and slides incrementally: each turn it extends backwards while older history
+still fits, and drops the oldest messages from the front only when over
+budget.
+
+The window only ever moves by whole groups -- a user/assistant message
+together with the tool results that follow it -- so an assistant tool call
+is never separated from its tool results.
+"""
+
+import json
+from typing import List, Optional
+
+from colonel.models import ChatMessage
+from colonel.tokenizer import Tokenizer, get_tokenizer
+
+# We target 80% of the context window to leave headroom for the LLM response
+# and any tokenization variance.
+CONTEXT_BUDGET_RATIO = 0.80
+
+# Role, separators and other per-message framing
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_tokens(msg: ChatMessage, tokenizer: Tokenizer) -> int:
+    """Token count for *msg*, computed once per tokenizer and cached on it."""
+    if msg.token_count is not None and msg.token_counter == tokenizer.name:
+        return msg.token_count
+    tokens = tokenizer.count(msg.content or "")
+    if msg.tool_calls:
+        tokens += tokenizer.count(json.dumps(msg.tool_calls))
+    if msg.name:
+        tokens += tokenizer.count(msg.name)
+    tokens += _MESSAGE_OVERHEAD_TOKENS
+    msg.token_count = tokens
+    msg.token_counter = tokenizer.name
+    return tokens
+
+
+def context_budget(system_prompt: str, context_window: int, tokenizer: Tokenizer) -> int:
+    """Tokens available for history: 80% of the window minus the system prompt."""
+    total_budget = int(context_window * CONTEXT_BUDGET_RATIO)
+    return max(total_budget - tokenizer.count(system_prompt), 512)  # floor at 512 tokens
+
+
+def _group_end(messages: List[ChatMessage], start: int) -> int:
+    """Index just past the group beginning at *start*."""
+    end = start + 1
+    while end < len(messages) and messages[end].role == "tool":
+        end += 1
+    return end
+
+
+def _previous_group_start(messages: List[ChatMessage], start: int) -> Optional[int]:
+    """Start of the group before *start*, or None if only orphaned tool results remain."""
+    prev = start - 1
+    while prev > 0 and messages[prev].role == "tool":
+        prev -= 1
+    if messages[prev].role == "tool":
+        return None
+    return prev
+
+
+def prune_context(
+    messages: List[ChatMessage],
+    system_prompt: str,
+    context_window: int,
+    model: Optional[str] = None,
+    start: int = 0,
+) -> List[ChatMessage]:
+    """Return the most recent whole groups of *messages* that fit the budget.
+
+    *start* is where the previous turn's window began (the session's
+    `context_start`). If everything fits, the original list is returned
+    unchanged. The last group is always kept, even if it alone exceeds the
+    budget.
+    """
+    if not messages:
+        return messages
+
+    tokenizer = get_tokenizer(model)
+    budget = context_budget(system_prompt, context_window, tokenizer)
+
+    n = len(messages)
+    if not 0 <= start < n:
+        start = 0
+    # A window never begins with tool results whose tool call was dropped
+    while start < n - 1 and messages[start].role == "tool":
+        start += 1
+
+    total = sum(message_tokens(m, tokenizer) for m in messages[start:])
+
+    # Extend backwards while older history fits again
+    while start > 0 and total <= budget:
+        prev = _previous_group_start(messages, start)
+        if prev is None:
+            break
+        cost = sum(message_tokens(m, tokenizer) for m in messages[prev:start])
+        if total + cost > budget:
+            break
+        total += cost
+        start = prev
+
+    # Shrink from the front while over budget, keeping the last group
+    while total > budget:
+        end = _group_end(messages, start)
+        if end >= n:
+            break
+        total -= sum(message_tokens(m, tokenizer) for m in messages[start:end])
+        start = end
+
+    return messages[start:] if start else messages
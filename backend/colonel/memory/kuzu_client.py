@@ -5,16 +5,36 @@ Stores entity relationships: Server → runs → Containers, Services, etc.
 Kuzu is embedded (no external server), installs via `pip install kuzu`.
 
 Graph is stored at /app/data/colonel_graph/ and auto-populates from Docker.
+
+Per-message context lookups match the words of the message against an
+in-memory index of container names (rebuilt whenever the graph is
+populated), then fetch every matched container in one batched query. The
+lookup runs in a worker thread via `aquery_context` so it never blocks the
+event loop, and results are cached until the index changes.
 """
 
+import asyncio
 import logging
 import os
-from typing import Optional, List, Dict, Any
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
 
 logger = logging.getLogger("colonel.memory.kuzu")
 
 KUZU_DB_PATH = os.getenv("COLONEL_GRAPH_PATH", "/app/data/colonel_graph")
 
+# Words shorter than this are not matched against container names
+_MIN_TERM_LENGTH = 4
+# Containers matched per term, and overall per message
+_MATCHES_PER_TERM = 5
+_MAX_MATCHES = 50
+_CONTEXT_CACHE_SIZE = 256
+
+_OVERVIEW_KEYWORDS = ("container", "docker", "service", "running")
+_TERM_RE = re.compile(r"[\w.\-]+")
+
 
 class ColonelGraphClient:
     """Embedded Kuzu graph database for Colonel entity relationships."""
@@ -23,6 +43,12 @@ class ColonelGraphClient:
         self._db = None
         self._conn = None
         self._available = False
+        # Kuzu connections are not safe for concurrent use across threads
+        self._lock = threading.Lock()
+        self._container_names: Tuple[str, ...] = ()
+        self._context_cache: "OrderedDict[Tuple, List[str]]" = OrderedDict()
+        # Separate from _lock so cache hits don't wait behind a graph query
+        self._cache_lock = threading.Lock()
         self._initialize()
 
     def _initialize(self):
@@ -79,6 +105,7 @@ class ColonelGraphClient:
             )
 
             self._available = True
+            self._refresh_name_index()
             logger.info(f"Kuzu graph initialized at {KUZU_DB_PATH}")
         except Exception as e:
             logger.warning(f"Failed to initialize Kuzu: {e}")
@@ -87,6 +114,43 @@ class ColonelGraphClient:
     def available(self) -> bool:
         return self._available
 
+    def _fetch_all(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[list]:
+        with self._lock:
+            result = self._conn.execute(query, params) if params else self._conn.execute(query)
+            rows = []
+            while result.has_next():
+                rows.append(result.get_next())
+        return rows
+
+    def _refresh_name_index(self):
+        """Reload the in-memory container name index from the graph."""
+        try:
+            rows = self._fetch_all("MATCH (c:Container) RETURN c.name")
+        except Exception as e:
+            logger.warning(f"Failed to build graph name index: {e}")
+            return
+        self._container_names = tuple(sorted({r[0].lower() for r in rows if r[0]}))
+        with self._cache_lock:
+            self._context_cache.clear()
+
+    def match_names(self, query_text: str) -> List[str]:
+        """Container names containing any word (4+ chars) of *query_text*."""
+        names = self._container_names
+        if not names:
+            return []
+        matched: Dict[str, None] = {}
+        seen_terms = set()
+        for term in _TERM_RE.findall(query_text.lower()):
+            term = term.strip(".-")
+            if len(term) < _MIN_TERM_LENGTH or term in seen_terms:
+                continue
+            seen_terms.add(term)
+            hits = [n for n in names if term in n][:_MATCHES_PER_TERM]
+            matched.update(dict.fromkeys(hits))
+            if len(matched) >= _MAX_MATCHES:
+                break
+        return list(matched)[:_MAX_MATCHES]
+
     def populate_from_docker(self):
         """Auto-populate graph with current Docker containers."""
         if not self._available:
@@ -98,77 +162,98 @@ class ColonelGraphClient:
 
             client = docker.from_env()
 
-            # Upsert server node
-            hostname = platform.node()
-            self._conn.execute(
-                "MERGE (s:Server {name: $name}) SET s.hostname = $hostname, s.os = $os",
-                {"name": hostname, "hostname": hostname, "os": f"{platform.system()} {platform.release()}"},
-            )
-
-            # Upsert container nodes
-            for c in client.containers.list():
-                image = c.image.tags[0] if c.image.tags else c.image.short_id
-                self._conn.execute(
-                    "MERGE (c:Container {name: $name}) SET c.image = $image, c.status = $status",
-                    {"name": c.name, "image": image, "status": c.status},
-                )
-                # Create RUNS_ON relationship
+            with self._lock:
+                # Upsert server node
+                hostname = platform.node()
                 self._conn.execute(
-                    "MATCH (c:Container {name: $cname}), (s:Server {name: $sname}) "
-                    "MERGE (c)-[:RUNS_ON]->(s)",
-                    {"cname": c.name, "sname": hostname},
+                    "MERGE (s:Server {name: $name}) SET s.hostname = $hostname, s.os = $os",
+                    {"name": hostname, "hostname": hostname, "os": f"{platform.system()} {platform.release()}"},
                 )
 
-            logger.info(f"Graph populated with {len(client.containers.list())} containers on {hostname}")
+                # Upsert container nodes
+                containers = client.containers.list()
+                for c in containers:
+                    image = c.image.tags[0] if c.image.tags else c.image.short_id
+                    self._conn.execute(
+                        "MERGE (c:Container {name: $name}) SET c.image = $image, c.status = $status",
+                        {"name": c.name, "image": image, "status": c.status},
+                    )
+                    # Create RUNS_ON relationship
+                    self._conn.execute(
+                        "MATCH (c:Container {name: $cname}), (s:Server {name: $sname}) "
+                        "MERGE (c)-[:RUNS_ON]->(s)",
+                        {"cname": c.name, "sname": hostname},
+                    )
+
+            logger.info(f"Graph populated with {len(containers)} containers on {hostname}")
         except Exception as e:
             logger.warning(f"Failed to populate graph from Docker: {e}")
+        self._refresh_name_index()
 
     def query_context(self, query_text: str) -> List[str]:
         """
         Find relevant graph context for a user query.
         Returns a list of context strings to inject into the system prompt.
+
+        Blocking; async callers should use `aquery_context`.
         """
         if not self._available:
             return []
 
-        context = []
         text_lower = query_text.lower()
+        want_overview = any(kw in text_lower for kw in _OVERVIEW_KEYWORDS)
+        names = self.match_names(query_text)
+        if not want_overview and not names:
+            return []
+
+        cache_key = (want_overview, tuple(names))
+        with self._cache_lock:
+            cached = self._context_cache.get(cache_key)
+            if cached is not None:
+                self._context_cache.move_to_end(cache_key)
+                return list(cached)
 
+        context = []
         try:
             # If asking about containers
-            if any(kw in text_lower for kw in ["container", "docker", "service", "running"]):
-                result = self._conn.execute(
+            if want_overview:
+                rows = self._fetch_all(
                     "MATCH (c:Container)-[:RUNS_ON]->(s:Server) "
                     "RETURN c.name, c.image, c.status, s.name LIMIT 20"
                 )
-                rows = []
-                while result.has_next():
-                    rows.append(result.get_next())
                 if rows:
                     ctx = "Known containers: " + ", ".join(
                         f"{r[0]} ({r[1]}, {r[2]})" for r in rows
                     )
                     context.append(ctx)
 
-            # If asking about a specific container/service by name
-            for word in query_text.split():
-                if len(word) > 3:
-                    result = self._conn.execute(
-                        "MATCH (c:Container) WHERE c.name CONTAINS $term "
-                        "RETURN c.name, c.image, c.status LIMIT 5",
-                        {"term": word.lower()},
-                    )
-                    rows = []
-                    while result.has_next():
-                        rows.append(result.get_next())
-                    for r in rows:
-                        context.append(f"Container '{r[0]}' runs image {r[1]}, status: {r[2]}")
+            # If asking about specific containers/services by name
+            if names:
+                rows = self._fetch_all(
+                    "MATCH (c:Container) WHERE lower(c.name) IN $names "
+                    "RETURN c.name, c.image, c.status",
+                    {"names": names},
+                )
+                for r in rows:
+                    context.append(f"Container '{r[0]}' runs image {r[1]}, status: {r[2]}")
 
         except Exception as e:
             logger.debug(f"Graph query error: {e}")
+            return list(dict.fromkeys(context))
 
         # Deduplicate
-        return list(dict.fromkeys(context))
+        context = list(dict.fromkeys(context))
+        with self._cache_lock:
+            self._context_cache[cache_key] = context
+            if len(self._context_cache) > _CONTEXT_CACHE_SIZE:
+                self._context_cache.popitem(last=False)
+        return list(context)
+
+    async def aquery_context(self, query_text: str) -> List[str]:
+        """`query_context` run in a worker thread, off the event loop."""
+        if not self._available:
+            return []
+        return await asyncio.to_thread(self.query_context, query_text)
 
     def add_entity(self, entity_type: str, properties: Dict[str, Any]):
         """Add or update an entity in the graph."""
@@ -177,20 +262,24 @@ class ColonelGraphClient:
 
         try:
             if entity_type == "container":
-                self._conn.execute(
-                    "MERGE (c:Container {name: $name}) SET c.image = $image, c.status = $status",
-                    properties,
-                )
+                with self._lock:
+                    self._conn.execute(
+                        "MERGE (c:Container {name: $name}) SET c.image = $image, c.status = $status",
+                        properties,
+                    )
+                self._refresh_name_index()
             elif entity_type == "service":
-                self._conn.execute(
-                    "MERGE (s:Service {name: $name}) SET s.url = $url, s.port = $port",
-                    properties,
-                )
+                with self._lock:
+                    self._conn.execute(
+                        "MERGE (s:Service {name: $name}) SET s.url = $url, s.port = $port",
+                        properties,
+                    )
             elif entity_type == "user":
-                self._conn.execute(
-                    "MERGE (u:User {id: $id}) SET u.email = $email, u.role = $role",
-                    properties,
-                )
+                with self._lock:
+                    self._conn.execute(
+                        "MERGE (u:User {id: $id}) SET u.email = $email, u.role = $role",
+                        properties,
+                    )
         except Exception as e:
             logger.warning(f"Failed to add entity: {e}")
 
@@ -202,9 +291,9 @@ class ColonelGraphClient:
         stats = {"available": True}
         for table in ["Server", "Container", "Service", "User"]:
             try:
-                result = self._conn.execute(f"MATCH (n:{table}) RETURN count(n)")
-                if result.has_next():
-                    stats[table.lower() + "_count"] = result.get_next()[0]
+                rows = self._fetch_all(f"MATCH (n:{table}) RETURN count(n)")
+                if rows:
+                    stats[table.lower() + "_count"] = rows[0][0]
             except Exception:
                 stats[table.lower() + "_count"] = 0
 
@@ -18,6 +18,9 @@ import redis.asyncio as aioredis
 
 from colonel.config import REDIS_HOST, REDIS_PORT, SESSION_TTL
 from colonel import persistence
+from colonel.memory.session_index import (
+    build_summary, index_session, list_user_sessions, unindex_session,
+)
 
 logger = logging.getLogger("colonel.memory.session")
 
@@ -54,11 +57,14 @@ class ColonelSessionManager:
             # Re-hydrate into Redis so subsequent reads are fast
             try:
                 pg_data["updated_at"] = pg_data.get("updated_at") or datetime.utcnow().isoformat()
-                await r.set(
+                pipe = r.pipeline()
+                pipe.set(
                     f"{SESSION_PREFIX}{session_id}",
                     json.dumps(pg_data, default=str),
                     ex=SESSION_TTL,
                 )
+                index_session(pipe, build_summary(pg_data))
+                await pipe.execute()
                 logger.info(f"Re-hydrated session {session_id} from PostgreSQL into Redis")
             except Exception as e:
                 logger.warning(f"Failed to re-hydrate session {session_id} into Redis: {e}")
@@ -71,21 +77,23 @@ class ColonelSessionManager:
         # 1. Write to Redis (primary, blocking)
         r = await self._get_redis()
         session_data["updated_at"] = datetime.utcnow().isoformat()
-        await r.set(
+        pipe = r.pipeline()
+        pipe.set(
             f"{SESSION_PREFIX}{session_id}",
             json.dumps(session_data, default=str),
             ex=SESSION_TTL,
         )
+        if session_data.get("user_id"):
+            index_session(pipe, build_summary({**session_data, "id": session_id}))
+        await pipe.execute()
 
-        # 2. Write to PostgreSQL (secondary, fire-and-forget)
-        asyncio.create_task(
-            self._persist_to_pg(session_id, session_data)
-        )
+        # 2. Write to PostgreSQL (secondary, fire-and-forget, coalesced)
+        self._persist_to_pg(session_id, session_data)
 
-    async def _persist_to_pg(self, session_id: str, session_data: Dict[str, Any]):
-        """Background task: persist session to PostgreSQL. Never raises."""
+    def _persist_to_pg(self, session_id: str, session_data: Dict[str, Any]):
+        """Queue a coalesced, append-only persist to PostgreSQL. Never raises."""
         try:
-            await persistence.save_conversation(
+            persistence.schedule_save(
                 session_id=session_id,
                 user_id=session_data.get("user_id", "unknown"),
                 title=session_data.get("title"),
@@ -104,6 +112,7 @@ class ColonelSessionManager:
         """Delete a session from both Redis and PostgreSQL."""
         # Delete from Redis
         r = await self._get_redis()
+        await unindex_session(r, session_id)
         deleted = await r.delete(f"{SESSION_PREFIX}{session_id}")
 
         # Also delete from PostgreSQL (fire-and-forget)
@@ -129,36 +138,11 @@ class ColonelSessionManager:
         The combined list is deduplicated by session id and sorted by
         most recent update.
         """
-        # Gather Redis sessions
+        # Gather Redis sessions (per-user index, no keyspace scan)
         r = await self._get_redis()
-        redis_sessions: Dict[str, Dict[str, Any]] = {}
-
-        async for key in r.scan_iter(match=f"{SESSION_PREFIX}*", count=100):
-            try:
-                data = await r.get(key)
-                if data:
-                    session = json.loads(data)
-                    if session.get("user_id") == user_id:
-                        msg_count = len(session.get("messages", []))
-                        # Derive title from first user message
-                        title = session.get("title", "")
-                        if not title:
-                            for m in session.get("messages", []):
-                                if m.get("role") == "user":
-                                    content = m.get("content", "")
-                                    title = content[:60] + ("..." if len(content) > 60 else "")
-                                    break
-                        sid = session.get("id", key.replace(SESSION_PREFIX, ""))
-                        redis_sessions[sid] = {
-                            "id": sid,
-                            "title": title or "New Session",
-                            "created_at": session.get("created_at"),
-                            "updated_at": session.get("updated_at"),
-                            "message_count": msg_count,
-                        }
-            except Exception as e:
-                logger.warning(f"Error reading session {key}: {e}")
-                continue
+        redis_sessions: Dict[str, Dict[str, Any]] = {
+            s["id"]: s for s in await list_user_sessions(r, user_id)
+        }
 
         # Gather PostgreSQL sessions (includes expired Redis sessions)
         pg_sessions = await persistence.list_conversations(user_id, limit=100)
@@ -0,0 +1,177 @@
+"""
+Per-user index of Colonel chat sessions in Redis.
+
+Listing a user's sessions used to SCAN every ``colonel:session:*`` key and
+GET + JSON-decode each full transcript just to filter by user_id and count
+messages. Instead, every save maintains:
+
+  colonel:user_sessions:<user_id>      ZSET  session_id -> updated_at (epoch)
+  colonel:session_summary:<session_id> HASH  id, user_id, title, created_at,
+                                             updated_at, message_count
+
+so a listing is one ZREVRANGE plus one pipelined HGETALL round trip. Both
+keys carry the session TTL and are refreshed on every save, so they expire
+together with the session they describe; index members whose summary has
+expired are pruned lazily when listed.
+
+Sessions written before the index existed are picked up by a one-time
+backfill (a single SCAN, guarded by a marker key) on the first listing.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from colonel.config import SESSION_TTL
+
+logger = logging.getLogger("colonel.memory.session_index")
+
+SESSION_PREFIX = "colonel:session:"
+USER_INDEX_PREFIX = "colonel:user_sessions:"
+SUMMARY_PREFIX = "colonel:session_summary:"
+BACKFILL_MARKER = "colonel:session_index:built"
+
+# Set once this process has confirmed the backfill ran
+_backfilled = False
+
+
+def _score(updated_at: Optional[str]) -> float:
+    """Sort score for an ISO timestamp (stored naive UTC)."""
+    if not updated_at:
+        return 0.0
+    try:
+        ts = datetime.fromisoformat(updated_at)
+    except (TypeError, ValueError):
+        return 0.0
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def derive_title(messages: List[Any]) -> str:
+    """Derive a session title from the first user message."""
+    for m in messages:
+        if isinstance(m, dict):
+            role = m.get("role")
+            content = m.get("content", "")
+        else:
+            role = getattr(m, "role", None)
+            content = getattr(m, "content", "")
+        if role == "user" and content:
+            return content[:60] + ("..." if len(content) > 60 else "")
+    return "New Session"
+
+
+def build_summary(session: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compact listing entry for a session. `messages` may hold dicts or
+    ChatMessage models; only its length and first user message are used.
+    """
+    messages = session.get("messages") or []
+    return {
+        "id": session["id"],
+        "user_id": session.get("user_id") or "",
+        "title": session.get("title") or derive_title(messages),
+        "created_at": session.get("created_at") or "",
+        "updated_at": session.get("updated_at") or "",
+        "message_count": len(messages),
+    }
+
+
+def index_session(pipe, summary: Dict[str, Any]):
+    """
+    Queue the index updates for one saved session on a Redis pipeline, so
+    they ride along with the session write itself.
+    """
+    session_id = summary["id"]
+    user_key = f"{USER_INDEX_PREFIX}{summary['user_id']}"
+    summary_key = f"{SUMMARY_PREFIX}{session_id}"
+    pipe.hset(summary_key, mapping={k: str(v) for k, v in summary.items()})
+    pipe.expire(summary_key, SESSION_TTL)
+    pipe.zadd(user_key, {session_id: _score(summary.get("updated_at"))})
+    pipe.expire(user_key, SESSION_TTL)
+
+
+async def unindex_session(r, session_id: str, user_id: Optional[str] = None):
+    """Remove a deleted session from its owner's index."""
+    summary_key = f"{SUMMARY_PREFIX}{session_id}"
+    if user_id is None:
+        user_id = await r.hget(summary_key, "user_id")
+    pipe = r.pipeline()
+    pipe.delete(summary_key)
+    if user_id:
+        pipe.zrem(f"{USER_INDEX_PREFIX}{user_id}", session_id)
+    await pipe.execute()
+
+
+async def _ensure_backfilled(r):
+    """Index sessions saved before the index existed (once per deployment)."""
+    global _backfilled
+    if _backfilled:
+        return
+    if await r.exists(BACKFILL_MARKER):
+        _backfilled = True
+        return
+
+    indexed = 0
+    async for key in r.scan_iter(match=f"{SESSION_PREFIX}*", count=100):
+        try:
+            data = await r.get(key)
+            if not data:
+                continue
+            session = json.loads(data)
+            session.setdefault("id", key[len(SESSION_PREFIX):])
+            if not session.get("user_id"):
+                continue
+            pipe = r.pipeline()
+            index_session(pipe, build_summary(session))
+            await pipe.execute()
+            indexed += 1
+        except Exception as e:
+            logger.warning(f"Error indexing session {key}: {e}")
+
+    await r.set(BACKFILL_MARKER, datetime.utcnow().isoformat())
+    _backfilled = True
+    logger.info(f"Colonel session index backfilled with {indexed} sessions")
+
+
+async def list_user_sessions(r, user_id: str) -> List[Dict[str, Any]]:
+    """
+    List a user's live sessions, most recently updated first.
+
+    Returns dicts with id, title, created_at, updated_at, message_count.
+    """
+    await _ensure_backfilled(r)
+
+    user_key = f"{USER_INDEX_PREFIX}{user_id}"
+    session_ids = await r.zrevrange(user_key, 0, -1)
+    if not session_ids:
+        return []
+
+    pipe = r.pipeline()
+    for sid in session_ids:
+        pipe.hgetall(f"{SUMMARY_PREFIX}{sid}")
+    summaries = await pipe.execute()
+
+    sessions = []
+    expired = []
+    for sid, summary in zip(session_ids, summaries):
+        if not summary:
+            expired.append(sid)
+            continue
+        sessions.append({
+            "id": sid,
+            "title": summary.get("title") or "New Session",
+            "created_at": summary.get("created_at") or None,
+            "updated_at": summary.get("updated_at") or None,
+            "message_count": int(summary.get("message_count") or 0),
+        })
+
+    if expired:
+        try:
+            await r.zrem(user_key, *expired)
+        except Exception as e:
+            logger.debug(f"Failed to prune expired session index entries: {e}")
+
+    return sessions
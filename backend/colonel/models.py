@@ -92,6 +92,8 @@ class ChatMessage(BaseModel):
     tool_call_id: Optional[str] = None
     tool_calls: Optional[List[Dict[str, Any]]] = None
     name: Optional[str] = None  # for tool messages
+    token_count: Optional[int] = None  # cached by the context pruner
+    token_counter: Optional[str] = None  # tokenizer that produced token_count
 
 
 class ColonelSession(BaseModel):
@@ -103,6 +105,7 @@ class ColonelSession(BaseModel):
     created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
     updated_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
     title: Optional[str] = None
+    context_start: int = 0  # first message sent to the LLM on the last turn
 
 
 # ─── Colonel Configuration ─────────────────────────────────────────────────
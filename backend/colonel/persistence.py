@@ -8,8 +8,10 @@ All operations degrade gracefully -- if PostgreSQL is unavailable the
 caller gets None / empty results and a log warning, never an exception.
 """
 
+import asyncio
 import json
 import logging
+import os
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -17,10 +19,25 @@ from colonel.config import get_db_pool
 
 logger = logging.getLogger("colonel.persistence")
 
+# Saves of one session arriving within this window are written once
+SAVE_COALESCE_SECONDS = float(os.getenv("COLONEL_PERSIST_COALESCE_SECONDS", "0.5"))
+
+# session_id -> latest save_conversation kwargs not yet written
+_pending_saves: Dict[str, Dict[str, Any]] = {}
+# session_id -> write-behind task
+_writers: Dict[str, asyncio.Task] = {}
+
 
 # ─── Public API ───────────────────────────────────────────────────────────────
 
 
+def _message_dict(msg: Any) -> Dict[str, Any]:
+    """Accept plain dicts or ChatMessage models."""
+    if hasattr(msg, "model_dump"):
+        return msg.model_dump(mode="json")
+    return msg
+
+
 async def save_conversation(
     session_id: str,
     user_id: str,
@@ -30,10 +47,16 @@ async def save_conversation(
     colonel_name: str = "The Colonel",
 ) -> bool:
     """
-    Upsert a conversation and its messages into PostgreSQL.
+    Upsert a conversation and append its new messages to PostgreSQL.
+
+    Transcripts only grow, so only messages past the last persisted
+    message_index are inserted -- a save costs O(new messages), not a
+    rewrite of the whole history. A transcript shorter than what is stored
+    is truncated to match. The conversation row upsert locks that row, so
+    concurrent saves of one session serialize instead of double-inserting.
 
     This is designed to be called fire-and-forget via asyncio.create_task()
-    so it never blocks the chat flow.
+    (or coalesced via schedule_save()) so it never blocks the chat flow.
 
     Returns True on success, False on failure.
     """
@@ -65,17 +88,33 @@ async def save_conversation(
                 )
                 conversation_id = row["id"]
 
-                # Delete existing messages and re-insert (simplest upsert
-                # strategy for an ordered list that may have grown).
-                await conn.execute(
-                    "DELETE FROM colonel_messages WHERE conversation_id = $1",
+                last_index = await conn.fetchval(
+                    """
+                    SELECT COALESCE(MAX(message_index), -1)
+                    FROM colonel_messages
+                    WHERE conversation_id = $1
+                    """,
                     conversation_id,
                 )
+                next_index = last_index + 1
 
-                if messages:
+                if len(messages) < next_index:
+                    await conn.execute(
+                        """
+                        DELETE FROM colonel_messages
+                        WHERE conversation_id = $1 AND message_index >= $2
+                        """,
+                        conversation_id,
+                        len(messages),
+                    )
+                    next_index = len(messages)
+
+                new_messages = messages[next_index:]
+                if new_messages:
                     # Build batch insert values
                     records = []
-                    for idx, msg in enumerate(messages):
+                    for idx, msg in enumerate(new_messages, start=next_index):
+                        msg = _message_dict(msg)
                         msg_metadata = {}
                         if msg.get("tool_call_id"):
                             msg_metadata["tool_call_id"] = msg["tool_call_id"]
@@ -91,7 +130,7 @@ async def save_conversation(
                         records.append((
                             conversation_id,
                             msg.get("role", "user"),
-                            msg.get("content", ""),
+                            msg.get("content") or "",
                             idx,
                             json.dumps(msg_metadata, default=str),
                         ))
@@ -107,7 +146,7 @@ async def save_conversation(
 
         logger.debug(
             f"Persisted conversation {session_id}: "
-            f"{len(messages)} messages"
+            f"{len(messages)} messages ({len(messages) - next_index} new)"
         )
         return True
 
@@ -116,6 +155,59 @@ async def save_conversation(
         return False
 
 
+def schedule_save(
+    session_id: str,
+    user_id: str,
+    title: Optional[str],
+    messages: List[Dict[str, Any]],
+    metadata: Optional[Dict[str, Any]] = None,
+    colonel_name: str = "The Colonel",
+):
+    """
+    Coalesced, fire-and-forget save_conversation().
+
+    Bursts of saves for one session (a tool-call loop saves after every
+    round) collapse into a single write of the latest state, at most one
+    write in flight per session. Since saves are append-only the latest
+    snapshot carries everything the skipped ones would have written, and a
+    failed write is picked up by the next save. `messages` may be the live
+    session list; it is read when the write runs.
+    """
+    _pending_saves[session_id] = {
+        "user_id": user_id,
+        "title": title,
+        "messages": messages,
+        "metadata": metadata,
+        "colonel_name": colonel_name,
+    }
+    writer = _writers.get(session_id)
+    if writer is None or writer.done():
+        _writers[session_id] = asyncio.get_running_loop().create_task(
+            _write_behind(session_id)
+        )
+
+
+async def _write_behind(session_id: str):
+    """Write the latest pending snapshot of a session until none is left."""
+    try:
+        while session_id in _pending_saves:
+            if SAVE_COALESCE_SECONDS > 0:
+                await asyncio.sleep(SAVE_COALESCE_SECONDS)
+            kwargs = _pending_saves.pop(session_id, None)
+            if kwargs is not None:
+                await save_conversation(session_id, **kwargs)
+    finally:
+        if _writers.get(session_id) is asyncio.current_task():
+            del _writers[session_id]
+
+
+async def flush_pending_saves():
+    """Wait for all coalesced saves to be written (shutdown hook)."""
+    writers = [w for w in _writers.values() if not w.done()]
+    if writers:
+        await asyncio.gather(*writers, return_exceptions=True)
+
+
 async def load_conversation(session_id: str) -> Optional[Dict[str, Any]]:
     """
     Load a conversation and its messages from PostgreSQL.
@@ -243,6 +335,8 @@ async def delete_conversation(session_id: str) -> bool:
 
     Returns True if a row was deleted, False otherwise.
     """
+    # Don't let a queued save resurrect the conversation
+    _pending_saves.pop(session_id, None)
     try:
         pool = await get_db_pool()
         async with pool.acquire() as conn:
@@ -0,0 +1,135 @@
+"""
+Token counting for Colonel context management.
+
+Tokenizers are resolved per model family. OpenAI-family models use their own
+tiktoken encoding; other families use cl100k_base as the closest general
+approximation. tiktoken is optional -- without it every family falls back to
+the conservative 4-chars-per-token heuristic.
+
+Each tokenizer has a stable `name` so per-message counts cached on the
+session can be reused until the model family changes.
+
+Register a family-specific tokenizer with:
+    register_tokenizer("mistral", lambda model: MyTokenizer())
+"""
+
+import logging
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("colonel.tokenizer")
+
+# Rough heuristic: 1 token ~= 4 characters.
+_CHARS_PER_TOKEN = 4
+
+# OpenAI models tokenized with o200k_base; everything else uses cl100k_base
+_O200K_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4", "chatgpt-4o")
+
+# Bare model-name prefixes -> family, for ids without a provider prefix
+_FAMILY_PREFIXES = {
+    "gpt-": "openai",
+    "o1": "openai",
+    "o3": "openai",
+    "o4": "openai",
+    "chatgpt": "openai",
+    "claude": "anthropic",
+    "gemini": "google",
+    "llama": "meta-llama",
+    "qwen": "qwen",
+    "mistral": "mistralai",
+}
+
+
+class Tokenizer:
+    """Counts tokens in text."""
+
+    name = "base"
+
+    def count(self, text: str) -> int:
+        raise NotImplementedError
+
+
+class HeuristicTokenizer(Tokenizer):
+    """Character-ratio estimate; conservative for English text."""
+
+    def __init__(self, chars_per_token: int = _CHARS_PER_TOKEN):
+        self.chars_per_token = chars_per_token
+        self.name = f"heuristic:{chars_per_token}"
+
+    def count(self, text: str) -> int:
+        return max(len(text) // self.chars_per_token, 1) if text else 0
+
+
+class TiktokenTokenizer(Tokenizer):
+    """BPE token count via tiktoken."""
+
+    def __init__(self, encoding):
+        self._encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=None)
+def _tiktoken_tokenizer(encoding_name: str) -> Optional[Tokenizer]:
+    try:
+        import tiktoken
+    except ImportError:
+        logger.info("tiktoken not installed — using heuristic token counts. Install with: pip install tiktoken")
+        return None
+    try:
+        return TiktokenTokenizer(tiktoken.get_encoding(encoding_name))
+    except Exception as e:
+        logger.warning(f"tiktoken encoding {encoding_name} unavailable: {e}")
+        return None
+
+
+def _openai_tokenizer(model: str) -> Optional[Tokenizer]:
+    bare = model.rsplit("/", 1)[-1]
+    encoding = "o200k_base" if bare.startswith(_O200K_PREFIXES) else "cl100k_base"
+    return _tiktoken_tokenizer(encoding)
+
+
+def _default_tokenizer(model: str) -> Optional[Tokenizer]:
+    return _tiktoken_tokenizer("cl100k_base")
+
+
+_FAMILY_TOKENIZERS: Dict[str, Callable[[str], Optional[Tokenizer]]] = {
+    "openai": _openai_tokenizer,
+}
+
+
+def register_tokenizer(family: str, factory: Callable[[str], Optional[Tokenizer]]):
+    """Use `factory(model)` to build tokenizers for a model family."""
+    _FAMILY_TOKENIZERS[family] = factory
+    get_tokenizer.cache_clear()
+
+
+def model_family(model: Optional[str]) -> str:
+    """Model family for ids like 'openai/gpt-4o', 'openrouter/anthropic/claude-x' or 'gpt-4o'."""
+    if not model:
+        return "default"
+    parts = model.lower().split("/")
+    if parts[0] == "openrouter" and len(parts) > 2:
+        parts = parts[1:]
+    if len(parts) > 1:
+        return parts[0]
+    for prefix, family in _FAMILY_PREFIXES.items():
+        if parts[0].startswith(prefix):
+            return family
+    return "default"
+
+
+@lru_cache(maxsize=256)
+def get_tokenizer(model: Optional[str] = None) -> Tokenizer:
+    """Tokenizer for *model*, falling back to the 4-chars heuristic."""
+    factory = _FAMILY_TOKENIZERS.get(model_family(model), _default_tokenizer)
+    try:
+        tokenizer = factory(model or "")
+    except Exception as e:
+        logger.warning(f"Tokenizer for {model} failed to load: {e}")
+        tokenizer = None
+    return tokenizer or HeuristicTokenizer()
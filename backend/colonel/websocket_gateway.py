@@ -15,9 +15,11 @@ Memory integration:
 Context pruning:
   - Before sending messages to the LLM, the conversation history is pruned
     so it fits within 80% of the configured context_window (in tokens).
-  - The system prompt is accounted for in the budget.
-  - Older user/assistant pairs are removed first; the system prompt and the
-    most recent messages are always preserved.
+  - Token counts come from the model family's tokenizer and are cached on
+    each message; the system prompt is accounted for in the budget.
+  - The window slides incrementally from the session's context_start and
+    moves by whole user/assistant + tool-result groups, so tool calls are
+    never separated from their results (see colonel/context.py).
 """
 
 import asyncio
@@ -39,40 +41,13 @@ from colonel.models import (
     WSConfirmFrame, WSPingFrame, WSPongFrame,
 )
 from colonel.config import get_colonel_config, LITELLM_URL, REDIS_HOST, REDIS_PORT, SESSION_TTL
+from colonel.context import CONTEXT_BUDGET_RATIO, prune_context
+from colonel.memory.session_index import build_summary, index_session, list_user_sessions
 from colonel.safety import is_write_capable_model
 from colonel.system_prompt import build_system_prompt
 
 logger = logging.getLogger("colonel.ws")
 
-# ─── Token Estimation Helpers ────────────────────────────────────────────────
-
-# Rough heuristic: 1 token ~= 4 characters.  This is intentionally
-# conservative so we stay under the real limit even if the ratio varies.
-_CHARS_PER_TOKEN = 4
-
-# We target 80% of the context window to leave headroom for the LLM response
-# and any tokenization variance.
-_CONTEXT_BUDGET_RATIO = 0.80
-
-
-def _estimate_tokens(text: str) -> int:
-    """Estimate the number of tokens in *text* using the 4-chars heuristic."""
-    return max(len(text) // _CHARS_PER_TOKEN, 1) if text else 0
-
-
-def _estimate_message_tokens(msg: ChatMessage) -> int:
-    """Estimate tokens for a single ChatMessage, including tool metadata."""
-    tokens = _estimate_tokens(msg.content or "")
-    if msg.tool_calls:
-        # Rough estimate for serialised tool_calls JSON
-        tokens += _estimate_tokens(json.dumps(msg.tool_calls))
-    if msg.name:
-        tokens += _estimate_tokens(msg.name)
-    # Per-message overhead (role, separators)
-    tokens += 4
-    return tokens
-
-
 class ColonelGateway:
     """Manages WebSocket connections for The Colonel."""
 
@@ -138,22 +113,33 @@ class ColonelGateway:
         """Save a chat session to Redis with TTL, and persist to PostgreSQL."""
         r = await self._get_redis()
         session.updated_at = __import__("datetime").datetime.utcnow().isoformat()
-        await r.set(
+        pipe = r.pipeline()
+        pipe.set(
             f"colonel:session:{session.id}",
             session.model_dump_json(),
             ex=SESSION_TTL,
         )
-        # Fire-and-forget persist to PostgreSQL for durability
+        index_session(pipe, build_summary({
+            "id": session.id,
+            "user_id": session.user_id,
+            "title": session.title,
+            "created_at": session.created_at,
+            "updated_at": session.updated_at,
+            "messages": session.messages,
+        }))
+        await pipe.execute()
+        # Fire-and-forget persist to PostgreSQL for durability. Coalesced per
+        # session and append-only, so a tool-call loop's burst of saves becomes
+        # one INSERT of the new messages.
         try:
             from colonel import persistence
-            session_dict = json.loads(session.model_dump_json())
-            asyncio.create_task(persistence.save_conversation(
+            persistence.schedule_save(
                 session_id=session.id,
                 user_id=session.user_id,
                 title=session.title,
-                messages=session_dict.get("messages", []),
+                messages=session.messages,
                 colonel_name=session.colonel_id,
-            ))
+            )
         except Exception as e:
             logger.debug(f"PostgreSQL persist skipped: {e}")
 
@@ -164,28 +150,9 @@ class ColonelGateway:
         return session
 
     async def list_sessions(self, user_id: str) -> List[Dict[str, Any]]:
-        """List all sessions for a user."""
+        """List all sessions for a user (one read of the per-user index)."""
         r = await self._get_redis()
-        keys = []
-        async for key in r.scan_iter(match="colonel:session:*", count=100):
-            keys.append(key)
-
-        sessions = []
-        for key in keys:
-            data = await r.get(key)
-            if data:
-                s = json.loads(data)
-                if s.get("user_id") == user_id:
-                    sessions.append({
-                        "id": s["id"],
-                        "title": s.get("title") or _derive_title(s.get("messages", [])),
-                        "created_at": s.get("created_at"),
-                        "updated_at": s.get("updated_at"),
-                        "message_count": len(s.get("messages", [])),
-                    })
-
-        sessions.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-        return sessions
+        return await list_user_sessions(r, user_id)
 
     # ─── Authentication ─────────────────────────────────────────────────
 
@@ -356,7 +323,7 @@ class ColonelGateway:
         if self.graph_client and self.graph_client.available:
             try:
                 last_msg = session.messages[-1].content if session.messages else ""
-                ctx_items = self.graph_client.query_context(last_msg)
+                ctx_items = await self.graph_client.aquery_context(last_msg)
                 if ctx_items:
                     graph_context = "\n".join(ctx_items)
             except Exception as e:
@@ -392,19 +359,22 @@ class ColonelGateway:
         # ── Context Pruning ──────────────────────────────────────────────
         # Keep conversation within 80% of the configured context window.
         # Budget = (context_window * 0.80) - system_prompt_tokens.
-        # We remove the oldest user/assistant pairs first, always keeping
-        # the most recent messages and any trailing tool exchanges.
-        context_messages = _prune_context(
+        # The window slides from where the last turn's began, dropping the
+        # oldest whole groups so tool exchanges are never split.
+        context_messages = prune_context(
             session.messages,
             system_prompt,
             config.context_window,
+            model=config.model,
+            start=session.context_start,
         )
+        session.context_start = len(session.messages) - len(context_messages)
         if len(context_messages) < len(session.messages):
             removed = len(session.messages) - len(context_messages)
             logger.info(
                 f"Context pruning: kept {len(context_messages)}/{len(session.messages)} "
                 f"messages (removed {removed} oldest) to fit within "
-                f"{int(config.context_window * _CONTEXT_BUDGET_RATIO)} token budget"
+                f"{int(config.context_window * CONTEXT_BUDGET_RATIO)} token budget"
             )
 
         llm_messages = [{"role": "system", "content": system_prompt}]
@@ -708,81 +678,5 @@ class ColonelGateway:
         return (full_content, tool_calls if tool_calls else None)
 
 
-# ─── Helpers ────────────────────────────────────────────────────────────
-
-def _derive_title(messages: List[Dict]) -> str:
-    """Derive a session title from the first user message."""
-    for m in messages:
-        if isinstance(m, dict):
-            role = m.get("role")
-            content = m.get("content", "")
-        else:
-            role = getattr(m, "role", None)
-            content = getattr(m, "content", "")
-        if role == "user" and content:
-            return content[:60] + ("..." if len(content) > 60 else "")
-    return "New Session"
-
-
-def _prune_context(
-    messages: List[ChatMessage],
-    system_prompt: str,
-    context_window: int,
-) -> List[ChatMessage]:
-    """Return the subset of *messages* that fits within the token budget.
-
-    Strategy:
-      1. Compute the budget = (context_window * 80%) - system_prompt_tokens.
-      2. Always keep the most recent messages.  Walk backwards from the end,
-         accumulating tokens until the budget is exhausted.
-      3. Never split a tool-call exchange: if an assistant message with
-         tool_calls is included, all following tool-result messages (up to
-         the next user/assistant) are included too.
-
-    If all messages already fit, the original list is returned unchanged.
-    """
-    if not messages:
-        return messages
-
-    # Budget in estimated tokens, minus what the system prompt will consume.
-    total_budget = int(context_window * _CONTEXT_BUDGET_RATIO)
-    system_tokens = _estimate_tokens(system_prompt)
-    message_budget = max(total_budget - system_tokens, 512)  # floor at 512 tokens
-
-    # Fast path: everything fits.
-    total_tokens = sum(_estimate_message_tokens(m) for m in messages)
-    if total_tokens <= message_budget:
-        return messages
-
-    # Walk backwards, accumulating tokens.
-    selected_indices: List[int] = []
-    running_tokens = 0
-
-    i = len(messages) - 1
-    while i >= 0:
-        msg = messages[i]
-        msg_tokens = _estimate_message_tokens(msg)
-
-        # If adding this message would exceed the budget and we already
-        # have at least the latest user message, stop.
-        if selected_indices and (running_tokens + msg_tokens) > message_budget:
-            break
-
-        selected_indices.append(i)
-        running_tokens += msg_tokens
-
-        # If this is a tool message, we must also include the preceding
-        # assistant message that initiated the tool call (keep the exchange
-        # together).  Walk back to include the full tool-call group.
-        if msg.role == "tool" and i > 0:
-            # Already handled by the main loop — just continue backwards.
-            pass
-
-        i -= 1
-
-    selected_indices.reverse()
-    return [messages[idx] for idx in selected_indices]
-
-
 # Singleton instance
 colonel_gateway = ColonelGateway()
@@ -10,6 +10,7 @@ Date: October 23, 2025
 """
 
 import asyncpg
+from database.pool_manager import get_budget_pool
 import secrets
 import string
 import logging
@@ -72,15 +73,7 @@ class CouponManager:
             return
 
         try:
-            self.db_pool = await asyncpg.create_pool(
-                host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-                port=int(os.getenv("POSTGRES_PORT", 5432)),
-                user=os.getenv("POSTGRES_USER", "unicorn"),
-                password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-                database=os.getenv("POSTGRES_DB", "unicorn_db"),
-                min_size=5,
-                max_size=20
-            )
+            self.db_pool = get_budget_pool("request")
             logger.info("CouponManager database pool initialized")
         except Exception as e:
             logger.error(f"Failed to initialize database pool: {e}")
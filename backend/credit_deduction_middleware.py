@@ -40,6 +40,7 @@ if '/app' not in sys.path:
 
 from org_credit_integration import get_org_credit_integration
 from litellm_credit_system import CreditSystem
+from request_context import get_request_context, resolve_request_context, set_request_context
 
 logger = logging.getLogger(__name__)
 
@@ -200,146 +201,15 @@ class CreditDeductionMiddleware(BaseHTTPMiddleware):
         return False
 
     async def _get_user_from_session(self, request: Request) -> Optional[dict]:
-        """Extract user data from session cookie OR service key OR API key + X-User-ID header"""
-        try:
-            # Check for service key pattern (for bolt.diy, presenton, brigade, etc.)
-            x_user_id = request.headers.get('X-User-ID')
-            auth_header = request.headers.get('Authorization', '')
-
-            # Check for user API key (uc_<hex>) - for remote API access
-            if auth_header.startswith('Bearer uc_'):
-                token = auth_header[7:]  # Remove "Bearer "
-                try:
-                    from api_key_manager import get_api_key_manager
-                    manager = get_api_key_manager()
-                    user_info = await manager.validate_api_key(token)
-
-                    if user_info:
-                        uid = user_info['user_id']
-                        # Resolve the key OWNER's REAL tier — do NOT blanket-exempt
-                        # direct-API callers (that = we eat the cost). The owner's
-                        # actual tier decides exempt-vs-metered: internal/founder
-                        # owners (e.g. admin@example.com → vip_founder) stay
-                        # exempt naturally; a real paid customer gets billed.
-                        # get_user_tier already fails safe to "free" (exempt), so a
-                        # lookup error never wrongly charges (fail-open).
-                        try:
-                            owner_tier = await self.credit_system.get_user_tier(uid)
-                        except Exception as tier_exc:
-                            logger.warning(
-                                f"uc_ key tier lookup failed for {uid}; exempting (fail-open): {tier_exc}"
-                            )
-                            owner_tier = "free"
-                        logger.info(f"API key authenticated user: {uid} (tier={owner_tier})")
-                        return {
-                            "user_id": uid,
-                            "subscription_tier": owner_tier,
-                        }
-                    else:
-                        logger.warning(f"Invalid API key in credit middleware")
-                        return None
-                except Exception as e:
-                    logger.error(f"API key validation error in middleware: {e}")
-                    return None
-
-            if auth_header.startswith('Bearer sk-'):
-                # Service key authentication - extract service name
-                token = auth_header[7:]  # Remove "Bearer "
-
-                # Known service keys mapping
-                service_keys = {
-                    'sk-bolt-diy-service-key-2025': 'bolt-diy-service',
-                    'sk-presenton-service-key-2025': 'presenton-service',
-                    'sk-brigade-service-key-2025': 'brigade-service',
-                    'sk-centerdeep-service-key-REDACTED': 'centerdeep-service',
-                    'sk-partnerpulse-service-key-2025': 'partnerpulse-service',
-                    'sk-open-webui-service-key-2026': 'open-webui-service',
-                    'sk-colonel-service-key-2026': 'colonel-service',
-                    'sk-majiks-service-key-2025': 'majiks-service'
-                }
-
-                # Map service names to organization UUIDs (matches litellm_api.py)
-                service_org_ids = {
-                    'bolt-diy-service': '3766e9ee-7cc1-472f-92ae-afec687f0d74',
-                    'presenton-service': '13587747-66e6-43df-b21d-4411c7373465',
-                    'brigade-service': 'e9b40f6b-b683-4bcf-b462-9fd526cfbb37',
-                    'centerdeep-service': '91d3b68e-e4c4-457e-80ce-de6997243c34',
-                    'partnerpulse-service': '8f5bf9a9-2e7c-4465-93d8-97f18bdac098',
-                    'open-webui-service': 'f47ac10b-58cc-4372-a567-0e02b2c3d479',
-                    'colonel-service': 'e9b40f6b-b683-4bcf-b462-9fd526cfbb37',
-                    'majiks-service': 'a1b2c3d4-e5f6-7890-abcd-ef1234567890'
-                }
-
-                # Internal services exempt from billing
-                # All platform-internal service accounts run on the org's own
-                # 'internal' tier when called without an X-User-ID context;
-                # user-context calls (X-User-ID set) bill the user's tier.
-                internal_services = {
-                    'colonel-service',
-                    'brigade-service',
-                    'majiks-service',
-                    'centerdeep-service',
-                    'open-webui-service',
-                    'bolt-diy-service',
-                    'presenton-service',
-                    'partnerpulse-service',
-                }
-
-                service_name = service_keys.get(token)
-                if service_name:
-                    tier = "internal" if service_name in internal_services else "professional"
-                    if x_user_id:
-                        # Service key with user context - return user data.
-                        # _app carries the calling UC app so the per-(app,model)
-                        # included-vs-metered policy can apply (see dispatch).
-                        logger.info(f"Service key request with user context: {x_user_id}")
-                        return {
-                            "user_id": x_user_id,
-                            "subscription_tier": tier,
-                            "_app": service_name,
-                        }
-                    else:
-                        # Service key without user context - use org-prefixed ID for billing
-                        service_org_id = service_org_ids.get(service_name)
-                        if service_org_id:
-                            org_prefixed_id = f"org_{service_org_id}"
-                            logger.info(f"Service key request using org credits: {org_prefixed_id}")
-                            return {
-                                "user_id": org_prefixed_id,
-                                "subscription_tier": tier,
-                                "is_service_account": True,
-                                "_app": service_name,
-                            }
-                        else:
-                            logger.error(f"Service org ID not configured for: {service_name}")
-                            return None
-                else:
-                    # Unknown service key - let endpoint handle authentication
-                    logger.warning(f"Unknown service key in credit middleware: {token[:20]}...")
-                    return None
-
-            # Otherwise, try to get user from session cookie
-            from redis_session import RedisSessionManager
-
-            session_token = request.cookies.get("session_token")
-            if not session_token:
-                return None
-
-            redis_host = os.getenv("REDIS_HOST", "unicorn-redis")
-            redis_port = int(os.getenv("REDIS_PORT", "6379"))
-
-            sessions = RedisSessionManager(host=redis_host, port=redis_port, password=os.getenv("REDIS_PASSWORD"))
-            user_data = sessions.get(session_token)
-
-            if not user_data:
-                return None
-
-            # Ensure user_id field exists (Keycloak compatibility)
-            if "user_id" not in user_data:
-                user_data["user_id"] = user_data.get("sub") or user_data.get("id", "unknown")
-
-            return user_data
+        """
+        Extract user data from session cookie OR service key OR API key + X-User-ID header.
 
+        Reads the shared RequestContext (resolved once per request, see
+        request_context.py) instead of re-resolving the caller here.
+        """
+        try:
+            ctx = await resolve_request_context(request, self.credit_system)
+            return ctx.as_user()
         except Exception as e:
             logger.error(f"Error extracting user from session: {e}")
             return None
@@ -662,17 +532,9 @@ class CreditDeductionMiddleware(BaseHTTPMiddleware):
         user_id = user.get("user_id")
         user_tier = user.get("subscription_tier", "trial")
 
-        # Try to get model from request body (for BYOK check)
-        model = None
-        try:
-            if request.method == "POST":
-                body = await request.body()
-                body_data = json.loads(body.decode())
-                model = body_data.get("model")
-                # Re-set body for downstream processing
-                request._body = body
-        except:
-            pass
+        # Model from the already-parsed request body (for BYOK check)
+        ctx = get_request_context(request)
+        model = ctx.model if ctx is not None else None
 
         # Check if billing is disabled globally or user is in credit-exempt tier
         # Configurable via BILLING_ENABLED and CREDIT_EXEMPT_TIERS env vars
@@ -717,6 +579,9 @@ class CreditDeductionMiddleware(BaseHTTPMiddleware):
 
         # Check if BYOK enabled for this user/model
         is_byok, byok_provider = await self._check_byok_enabled(user_id, model)
+        if ctx is not None:
+            ctx = ctx.with_updates(byok=is_byok, byok_provider=byok_provider)
+            set_request_context(request, ctx)
 
         if is_byok:
             # BYOK enabled - skip credit deduction, just pass through
@@ -743,6 +608,13 @@ class CreditDeductionMiddleware(BaseHTTPMiddleware):
             request_state=getattr(request, 'state', None) if hasattr(request, 'state') else None
         )
 
+        if org_id and ctx is not None:
+            # Share the resolved org with the endpoint: get_user_org_id honours
+            # request.state.active_org_id, so the handler skips its own lookup.
+            set_request_context(request, ctx.with_updates(org_id=str(org_id)))
+            if not getattr(request.state, "active_org_id", None):
+                request.state.active_org_id = org_id
+
         if not has_credits:
             # Insufficient credits - return 402
             logger.warning(f"Insufficient credits for user {user_id}: {message}")
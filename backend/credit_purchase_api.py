@@ -20,6 +20,7 @@ import logging
 import os
 import stripe
 import asyncpg
+from database.pool_manager import get_budget_pool
 
 # Import credit system components
 from credit_system import credit_manager, CreditError
@@ -41,17 +42,8 @@ email_service = EmailNotificationService()
 
 # Database connection
 async def get_db_connection():
-    """Get database connection"""
-    pool = await asyncpg.create_pool(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", 5432)),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db"),
-        min_size=2,
-        max_size=10
-    )
-    return pool
+    """Get the shared database connection pool (close() is a no-op)"""
+    return get_budget_pool("request")
 
 
 # ============================================================================
@@ -8,25 +8,18 @@ Created: 2025-11-26
 """
 
 import asyncpg
-import os
+from database.pool_manager import pg_connect
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Database configuration
-DB_HOST = os.getenv("POSTGRES_HOST", "unicorn-postgresql")
-DB_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
-DB_USER = os.getenv("POSTGRES_USER", "unicorn")
-DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "unicorn")
-DB_NAME = os.getenv("POSTGRES_DB", "unicorn_db")
-
 
 async def get_db_connection() -> asyncpg.Connection:
     """
-    Get an async PostgreSQL database connection.
+    Get a PostgreSQL connection from the shared pool.
 
     Returns:
-        asyncpg.Connection: Database connection
+        asyncpg.Connection: Pooled database connection (close() releases it)
 
     Raises:
         Exception: If connection fails
@@ -40,13 +33,7 @@ async def get_db_connection() -> asyncpg.Connection:
             await conn.close()
     """
     try:
-        conn = await asyncpg.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
+        conn = await pg_connect()
         return conn
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
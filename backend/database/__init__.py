@@ -8,10 +8,13 @@ This package contains:
 """
 
 from .connection import get_db_pool, get_db_connection, close_db_pool
+from .pool_manager import get_budget_pool, get_pool_manager, pg_connect
 
 # Optional: Import models only if SQLAlchemy is available
 try:
     from .models import Base, metadata
-    __all__ = ['Base', 'metadata', 'get_db_pool', 'get_db_connection', 'close_db_pool']
+    __all__ = ['Base', 'metadata', 'get_db_pool', 'get_db_connection', 'close_db_pool',
+               'get_budget_pool', 'get_pool_manager', 'pg_connect']
 except ImportError:
-    __all__ = ['get_db_pool', 'get_db_connection', 'close_db_pool']
+    __all__ = ['get_db_pool', 'get_db_connection', 'close_db_pool',
+               'get_budget_pool', 'get_pool_manager', 'pg_connect']
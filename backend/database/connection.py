@@ -8,26 +8,24 @@ Author: Integration Testing & Deployment Lead
 Date: October 23, 2025
 """
 
-import os
 import logging
-import asyncpg
-from typing import Optional
 
-logger = logging.getLogger(__name__)
+from .pool_manager import BudgetPool, get_budget_pool, get_pool_manager
 
-# Singleton connection pool
-_db_pool: Optional[asyncpg.Pool] = None
+logger = logging.getLogger(__name__)
 
 
-async def get_db_pool() -> asyncpg.Pool:
+async def get_db_pool(budget: str = "request") -> BudgetPool:
     """
-    Get or create database connection pool.
+    Get the shared database connection pool.
 
-    Returns a singleton connection pool that's shared across all API modules.
-    The pool is created on first call and reused on subsequent calls.
+    Returns a pool-shaped handle over the process-wide pool managed by
+    database.pool_manager, bound to one connection budget ("request",
+    "background" or "analytics"). The underlying pool is created on first
+    call and reused on subsequent calls.
 
     Returns:
-        asyncpg.Pool: Database connection pool
+        BudgetPool: asyncpg.Pool-compatible handle
 
     Raises:
         RuntimeError: If database connection fails
@@ -43,36 +41,13 @@ async def get_db_pool() -> asyncpg.Pool:
                 result = await conn.fetchrow("SELECT * FROM users WHERE id = $1", user_id)
         ```
     """
-    global _db_pool
-
-    if _db_pool is None:
-        # Build database URL from environment variables
-        db_host = os.getenv("POSTGRES_HOST", "unicorn-postgresql")
-        db_port = os.getenv("POSTGRES_PORT", "5432")
-        db_user = os.getenv("POSTGRES_USER", "unicorn")
-        db_password = os.getenv("POSTGRES_PASSWORD", "unicorn")
-        db_name = os.getenv("POSTGRES_DB", "unicorn_db")
-
-        # Allow override via DATABASE_URL if explicitly set
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            database_url = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-
-        try:
-            logger.info("Creating database connection pool...")
-            _db_pool = await asyncpg.create_pool(
-                database_url,
-                min_size=2,
-                max_size=10,
-                command_timeout=30,
-                timeout=10
-            )
-            logger.info("Database connection pool created successfully")
-        except Exception as e:
-            logger.error(f"Failed to create database pool: {e}")
-            raise RuntimeError(f"Database connection failed: {e}")
-
-    return _db_pool
+    try:
+        await get_pool_manager().start()
+    except Exception as e:
+        logger.error(f"Failed to create database pool: {e}")
+        raise RuntimeError(f"Database connection failed: {e}")
+
+    return get_budget_pool(budget)
 
 
 async def close_db_pool():
@@ -91,13 +66,7 @@ async def close_db_pool():
             await close_db_pool()
         ```
     """
-    global _db_pool
-
-    if _db_pool is not None:
-        logger.info("Closing database connection pool...")
-        await _db_pool.close()
-        _db_pool = None
-        logger.info("Database connection pool closed")
+    await get_pool_manager().close()
 
 
 async def get_db_connection():
@@ -0,0 +1,537 @@
+"""
+Unified Postgres pool manager.
+
+About 40 modules used to open their own `asyncpg.connect()` per request or
+create a private `create_pool`. They ran alongside server.py's pool and
+database.connection.get_db_pool, so Postgres hit max_connections while most
+of those connections sat idle.
+
+There is now one physical asyncpg pool per database, split into named
+sub-budgets so one subsystem cannot starve another:
+
+    request      API request handlers (default 16 connections)
+    background   schedulers, queues, flushers (default 6)
+    analytics    reporting / history queries (default 4)
+
+The pool's max size is the sum of the budgets. A caller first waits for a
+slot in its budget, then for a pooled connection.
+
+- Prepared statements are cached per pooled connection
+  (DB_STATEMENT_CACHE_SIZE), so they survive across requests instead of
+  dying with a one-off connection.
+- Every query's duration is recorded in a histogram by SQL verb (asyncpg
+  query loggers).
+- Acquire wait time and budget saturation are tracked per budget.
+  `get_pool_manager().stats()` reports them, and so do the
+  ops_center_db_* Prometheus metrics when prometheus_client is installed.
+
+Usage:
+    # Drop-in for asyncpg.connect(): close() hands the connection back
+    conn = await pg_connect()
+    try:
+        row = await conn.fetchrow("SELECT ...")
+    finally:
+        await conn.close()
+
+    # Pool-shaped handle for code that expects an asyncpg.Pool
+    pool = get_budget_pool("background")
+    async with pool.acquire() as conn:
+        ...
+
+Configuration (environment):
+    DB_POOL_BUDGETS              e.g. "request=16,background=6,analytics=4"
+    DB_POOL_MIN_SIZE             connections kept open (default 2)
+    DB_POOL_ACQUIRE_TIMEOUT      seconds to wait for a connection (default 30)
+    DB_STATEMENT_CACHE_SIZE      prepared statements cached per connection (default 256)
+    DB_COMMAND_TIMEOUT           default statement timeout in seconds (default 60)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGETS = "request=16,background=6,analytics=4"
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "30"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+
+# Upper bounds (seconds) of the query / wait time histogram buckets
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+    _QUERY_SECONDS = Histogram(
+        'ops_center_db_query_seconds',
+        'Postgres query duration by SQL verb',
+        ['target', 'verb'],
+        buckets=HISTOGRAM_BUCKETS
+    )
+    _WAIT_SECONDS = Histogram(
+        'ops_center_db_pool_wait_seconds',
+        'Time spent waiting for a pooled Postgres connection',
+        ['target', 'budget'],
+        buckets=HISTOGRAM_BUCKETS
+    )
+    _IN_USE = Gauge(
+        'ops_center_db_pool_in_use',
+        'Pooled Postgres connections checked out',
+        ['target', 'budget']
+    )
+    _SATURATED = Counter(
+        'ops_center_db_pool_saturated_total',
+        'Connection requests that found their budget fully in use',
+        ['target', 'budget']
+    )
+except Exception:  # not installed, or already registered on reload
+    _QUERY_SECONDS = None
+    _WAIT_SECONDS = None
+    _IN_USE = None
+    _SATURATED = None
+
+
+def parse_budgets(raw: str) -> Dict[str, int]:
+    """Parse "name=size,..." into a budget map, ignoring invalid entries."""
+    budgets = {}
+    for item in raw.split(","):
+        name, _, size = item.strip().partition("=")
+        if not name or not size:
+            continue
+        try:
+            budgets[name.strip()] = max(1, int(size))
+        except ValueError:
+            logger.warning(f"Ignoring invalid DB_POOL_BUDGETS entry: {item}")
+    return budgets
+
+
+def default_connect_kwargs() -> Dict[str, Any]:
+    """
+    Connection settings for the main application database.
+
+    An explicit DATABASE_URL wins (as it always did for the per-module pools
+    this replaced); POSTGRES_* are the fallback.
+    """
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        # asyncpg only understands plain postgres schemes, not SQLAlchemy's
+        return {"dsn": database_url.replace("postgresql+asyncpg://", "postgresql://", 1)}
+    return {
+        "host": os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
+        "port": int(os.getenv("POSTGRES_PORT", "5432")),
+        "user": os.getenv("POSTGRES_USER", "unicorn"),
+        "password": os.getenv("POSTGRES_PASSWORD", "unicorn"),
+        "database": os.getenv("POSTGRES_DB", "unicorn_db"),
+    }
+
+
+def sql_verb(query: str) -> str:
+    """First keyword of a statement (SELECT, INSERT, ...), for low-cardinality labels."""
+    for line in query.lstrip().splitlines():
+        line = line.strip()
+        if line and not line.startswith("--"):
+            return line.split(None, 1)[0].upper()[:16]
+    return "OTHER"
+
+
+class TimingHistogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = len(HISTOGRAM_BUCKETS)
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in HISTOGRAM_BUCKETS] + ["le_inf"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 2),
+            "avg_ms": round(self.total * 1000 / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class _Budget:
+    """Slot accounting for one named sub-budget"""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.slots = asyncio.Semaphore(size)
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.saturated = 0
+        self.wait = TimingHistogram()
+
+
+class PgPoolManager:
+    """One asyncpg pool per database, shared through named budgets"""
+
+    def __init__(
+        self,
+        name: str = "main",
+        connect_kwargs: Optional[Dict[str, Any]] = None,
+        budgets: Optional[Dict[str, int]] = None,
+        min_size: int = DB_POOL_MIN_SIZE,
+    ):
+        self.name = name
+        self.connect_kwargs = connect_kwargs if connect_kwargs is not None else default_connect_kwargs()
+        self.budgets = {
+            budget_name: _Budget(budget_name, size)
+            for budget_name, size in (budgets or parse_budgets(os.getenv("DB_POOL_BUDGETS", DEFAULT_BUDGETS))).items()
+        }
+        self.default_budget = "request" if "request" in self.budgets else next(iter(self.budgets))
+        self.max_size = sum(b.size for b in self.budgets.values())
+        self.min_size = min(min_size, self.max_size)
+        self.queries: Dict[str, TimingHistogram] = {}
+        self._pool: Optional[asyncpg.Pool] = None
+        self._start_lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def pool(self) -> Optional[asyncpg.Pool]:
+        return self._pool
+
+    def _bind_loop(self) -> None:
+        """
+        Tie the pool (and the budget semaphores) to the running event loop.
+
+        asyncpg pools and asyncio primitives only work on the loop that
+        created them. If the manager was first used on another loop (e.g. a
+        throwaway loop at import time), rebuild everything for this one.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            logger.warning(f"Postgres pool '{self.name}' was created on another event loop; rebuilding it")
+            stale, self._pool = self._pool, None
+            if stale is not None:
+                try:
+                    stale.terminate()
+                except Exception:
+                    pass
+            for b in self.budgets.values():
+                b.slots = asyncio.Semaphore(b.size)
+                b.in_use = 0
+                b.waiting = 0
+            self._start_lock = asyncio.Lock()
+        self._loop = loop
+
+    async def start(self) -> asyncpg.Pool:
+        """Create the physical pool on first use."""
+        self._bind_loop()
+        if self._pool is not None:
+            return self._pool
+        async with self._start_lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(
+                    **self.connect_kwargs,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                    command_timeout=DB_COMMAND_TIMEOUT,
+                    init=self._init_connection,
+                )
+                logger.info(
+                    f"Postgres pool '{self.name}' created (max {self.max_size}: "
+                    + ", ".join(f"{b.name}={b.size}" for b in self.budgets.values()) + ")"
+                )
+        return self._pool
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+            logger.info(f"Postgres pool '{self.name}' closed")
+
+    async def _init_connection(self, conn: asyncpg.Connection) -> None:
+        if hasattr(conn, "add_query_logger"):
+            conn.add_query_logger(self._record_query)
+
+    def _record_query(self, record) -> None:
+        verb = sql_verb(record.query or "")
+        histogram = self.queries.get(verb)
+        if histogram is None:
+            histogram = self.queries[verb] = TimingHistogram()
+        histogram.observe(record.elapsed)
+        if _QUERY_SECONDS is not None:
+            _QUERY_SECONDS.labels(self.name, verb).observe(record.elapsed)
+
+    def _budget(self, budget: Optional[str]) -> _Budget:
+        return self.budgets.get(budget or self.default_budget) or self.budgets[self.default_budget]
+
+    async def acquire(self, budget: Optional[str] = None, timeout: Optional[float] = None) -> asyncpg.Connection:
+        """Check out a connection against a budget; pair with release()."""
+        self._bind_loop()
+        b = self._budget(budget)
+        timeout = DB_POOL_ACQUIRE_TIMEOUT if timeout is None else timeout
+        started = time.perf_counter()
+
+        if b.slots.locked():
+            b.saturated += 1
+            if _SATURATED is not None:
+                _SATURATED.labels(self.name, b.name).inc()
+        b.waiting += 1
+        try:
+            await asyncio.wait_for(b.slots.acquire(), timeout)
+        finally:
+            b.waiting -= 1
+
+        try:
+            pool = await self.start()
+            conn = await pool.acquire(timeout=max(0.1, timeout - (time.perf_counter() - started)))
+        except BaseException:
+            b.slots.release()
+            raise
+
+        waited = time.perf_counter() - started
+        b.wait.observe(waited)
+        b.acquired += 1
+        b.in_use += 1
+        if _WAIT_SECONDS is not None:
+            _WAIT_SECONDS.labels(self.name, b.name).observe(waited)
+            _IN_USE.labels(self.name, b.name).set(b.in_use)
+        return conn
+
+    async def release(self, conn: asyncpg.Connection, budget: Optional[str] = None) -> None:
+        b = self._budget(budget)
+        try:
+            if self._pool is not None:
+                await self._pool.release(conn)
+        finally:
+            b.in_use -= 1
+            b.slots.release()
+            if _IN_USE is not None:
+                _IN_USE.labels(self.name, b.name).set(b.in_use)
+
+    def budget(self, name: str) -> "BudgetPool":
+        """Pool-shaped handle bound to one budget."""
+        return BudgetPool(self, name)
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self._pool
+        return {
+            "target": self.name,
+            "pool": {
+                "size": pool.get_size() if pool else 0,
+                "idle": pool.get_idle_size() if pool else 0,
+                "max": self.max_size,
+            },
+            "budgets": {
+                b.name: {
+                    "limit": b.size,
+                    "in_use": b.in_use,
+                    "waiting": b.waiting,
+                    "acquired": b.acquired,
+                    "saturated": b.saturated,
+                    "wait": b.wait.snapshot(),
+                }
+                for b in self.budgets.values()
+            },
+            "queries": {verb: h.snapshot() for verb, h in sorted(self.queries.items())},
+        }
+
+
+class _AcquireContext:
+    """Result of BudgetPool.acquire(): usable with `async with` or `await`"""
+
+    def __init__(self, pool: "BudgetPool", timeout: Optional[float]):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    def __await__(self):
+        return self._pool._manager.acquire(self._pool.name, self._timeout).__await__()
+
+    async def __aenter__(self):
+        self._conn = await self._pool._manager.acquire(self._pool.name, self._timeout)
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        conn, self._conn = self._conn, None
+        await self._pool._manager.release(conn, self._pool.name)
+
+
+class BudgetPool:
+    """
+    asyncpg.Pool-compatible facade over one budget of a PgPoolManager.
+
+    Supports acquire()/release() and the fetch/execute shortcuts. close() is
+    a no-op: the shared pool is owned by the manager, so modules that used to
+    close their private pool can keep doing so.
+    """
+
+    def __init__(self, manager: PgPoolManager, name: str):
+        self._manager = manager
+        self.name = name
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _AcquireContext:
+        return _AcquireContext(self, timeout)
+
+    async def release(self, conn, *, timeout: Optional[float] = None) -> None:
+        await self._manager.release(conn, self.name)
+
+    async def execute(self, query: str, *args, timeout: Optional[float] = None):
+        async with self.acquire() as conn:
+            return await conn.execute(query, *args, timeout=timeout)
+
+    async def executemany(self, command: str, args, *, timeout: Optional[float] = None):
+        async with self.acquire() as conn:
+            return await conn.executemany(command, args, timeout=timeout)
+
+    async def fetch(self, query: str, *args, timeout: Optional[float] = None, record_class=None):
+        async with self.acquire() as conn:
+            return await conn.fetch(query, *args, timeout=timeout, record_class=record_class)
+
+    async def fetchrow(self, query: str, *args, timeout: Optional[float] = None, record_class=None):
+        async with self.acquire() as conn:
+            return await conn.fetchrow(query, *args, timeout=timeout, record_class=record_class)
+
+    async def fetchval(self, query: str, *args, column: int = 0, timeout: Optional[float] = None):
+        async with self.acquire() as conn:
+            return await conn.fetchval(query, *args, column=column, timeout=timeout)
+
+    def get_size(self) -> int:
+        return self._manager.pool.get_size() if self._manager.pool else 0
+
+    def get_idle_size(self) -> int:
+        return self._manager.pool.get_idle_size() if self._manager.pool else 0
+
+    def get_max_size(self) -> int:
+        return self._manager.max_size
+
+    def get_min_size(self) -> int:
+        return self._manager.min_size
+
+    async def close(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        pass
+
+
+class PooledConnection:
+    """
+    A checked-out pooled connection that behaves like asyncpg.connect()'s result.
+
+    Attribute access is forwarded to the underlying connection; close() (or
+    leaving an `async with` block) returns it to the pool instead of
+    disconnecting.
+    """
+
+    def __init__(self, manager: PgPoolManager, budget: str, conn):
+        self._manager = manager
+        self._budget = budget
+        self._conn = conn
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+
+    def __del__(self):
+        # Leak guard: a caller that dropped the connection without close()
+        # (e.g. an exception before it) must not keep the budget slot forever
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            return
+        self._conn = None
+        manager, budget, loop = self._manager, self._budget, self.__dict__.get("_loop")
+        logger.warning(f"Pooled Postgres connection ({manager.name}/{budget}) was never closed; releasing it")
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(lambda: loop.create_task(manager.release(conn, budget)))
+        except RuntimeError:
+            pass
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise asyncpg.InterfaceError("connection has been released back to the pool")
+        return getattr(conn, name)
+
+    def is_closed(self) -> bool:
+        return self._conn is None
+
+    async def close(self, *, timeout: Optional[float] = None) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            await self._manager.release(conn, self._budget)
+
+    def terminate(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.terminate()
+            asyncio.ensure_future(self._manager.release(conn, self._budget))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# Managers by target database name
+_managers: Dict[str, PgPoolManager] = {}
+
+
+def get_pool_manager(
+    target: str = "main",
+    connect_kwargs: Optional[Dict[str, Any]] = None,
+    budgets: Optional[Dict[str, int]] = None,
+) -> PgPoolManager:
+    """
+    Get the pool manager for a database.
+
+    "main" is the application database (POSTGRES_* env). Other targets, such
+    as Keycloak's database, are registered by their first caller with
+    connect_kwargs and their own (small) budgets.
+    """
+    manager = _managers.get(target)
+    if manager is None:
+        manager = _managers[target] = PgPoolManager(target, connect_kwargs, budgets)
+    return manager
+
+
+def get_budget_pool(budget: str = "request", target: str = "main") -> BudgetPool:
+    """Pool-shaped handle for one budget of the main (or a registered) database"""
+    return get_pool_manager(target).budget(budget)
+
+
+async def pg_connect(budget: str = "request", target: str = "main", timeout: Optional[float] = None) -> PooledConnection:
+    """Pooled replacement for asyncpg.connect(); close() releases the connection."""
+    manager = get_pool_manager(target)
+    conn = await manager.acquire(budget, timeout)
+    return PooledConnection(manager, budget, conn)
+
+
+async def close_all_pools() -> None:
+    """Close every managed pool (application shutdown)."""
+    for manager in list(_managers.values()):
+        try:
+            await manager.close()
+        except Exception as e:
+            logger.warning(f"Error closing Postgres pool '{manager.name}': {e}")
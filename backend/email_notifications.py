@@ -31,6 +31,7 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from jinja2 import Template
 import asyncpg
+from database.pool_manager import get_budget_pool
 from email_service import email_service
 from keycloak_integration import get_user_by_id
 from audit_logger import audit_logger
@@ -65,15 +66,7 @@ class EmailNotificationService:
             return
 
         try:
-            self.db_pool = await asyncpg.create_pool(
-                host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-                port=int(os.getenv("POSTGRES_PORT", 5432)),
-                user=os.getenv("POSTGRES_USER", "unicorn"),
-                password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-                database=os.getenv("POSTGRES_DB", "unicorn_db"),
-                min_size=2,
-                max_size=10
-            )
+            self.db_pool = get_budget_pool("background")
             logger.info("EmailNotificationService initialized")
         except Exception as e:
             logger.error(f"Failed to initialize EmailNotificationService: {e}")
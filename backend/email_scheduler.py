@@ -24,6 +24,7 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 import asyncpg
+from database.pool_manager import get_budget_pool
 import os
 
 from email_notifications import email_notification_service
@@ -58,15 +59,7 @@ class EmailScheduler:
 
         try:
             # Initialize database connection
-            self.db_pool = await asyncpg.create_pool(
-                host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-                port=int(os.getenv("POSTGRES_PORT", 5432)),
-                user=os.getenv("POSTGRES_USER", "unicorn"),
-                password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-                database=os.getenv("POSTGRES_DB", "unicorn_db"),
-                min_size=2,
-                max_size=10
-            )
+            self.db_pool = get_budget_pool("background")
 
             # Initialize services
             await email_notification_service.initialize()
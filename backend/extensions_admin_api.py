@@ -8,6 +8,7 @@ Requires admin role verification through Keycloak session.
 
 import os
 import asyncpg
+from database.pool_manager import pg_connect
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel, Field, validator
@@ -26,13 +27,7 @@ router = APIRouter(prefix="/api/v1/admin/extensions", tags=["extensions-admin"])
 
 async def get_db_connection():
     """Create asyncpg connection to PostgreSQL database"""
-    return await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db")
-    )
+    return await pg_connect()
 
 # ============================================================================
 # AUTHENTICATION & AUTHORIZATION
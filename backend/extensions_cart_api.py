@@ -12,7 +12,7 @@ Endpoints:
 """
 
 import os
-import asyncpg
+from database.pool_manager import pg_connect
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from pydantic import BaseModel, Field
@@ -32,13 +32,7 @@ router = APIRouter(prefix="/api/v1/cart", tags=["extensions-cart"])
 async def get_db_connection():
     """Get asyncpg database connection"""
     try:
-        return await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
+        return await pg_connect()
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         raise HTTPException(status_code=503, detail="Database connection failed")
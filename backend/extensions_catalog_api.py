@@ -9,6 +9,7 @@ from datetime import datetime
 from decimal import Decimal
 
 import asyncpg
+from database.pool_manager import pg_connect
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
@@ -48,13 +49,7 @@ class CategoryResponse(BaseModel):
 
 async def get_db_connection():
     """Create database connection."""
-    return await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db")
-    )
+    return await pg_connect()
 
 
 # =============================================================================
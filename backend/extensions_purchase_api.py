@@ -4,7 +4,7 @@ Phase 1: Purchase and checkout endpoints with Stripe integration
 """
 
 import os
-import asyncpg
+from database.pool_manager import pg_connect
 import stripe
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, HTTPException, Request, Header, Depends
@@ -23,19 +23,9 @@ stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_...")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_...")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY", "pk_test_...")
 
-# Database connection configuration
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-    "port": int(os.getenv("POSTGRES_PORT", "5432")),
-    "user": os.getenv("POSTGRES_USER", "unicorn"),
-    "password": os.getenv("POSTGRES_PASSWORD", "unicorn"),
-    "database": os.getenv("POSTGRES_DB", "unicorn_db")
-}
-
-
 async def get_db_connection():
-    """Create database connection"""
-    return await asyncpg.connect(**DB_CONFIG)
+    """Get a pooled database connection (close() returns it to the pool)"""
+    return await pg_connect()
 
 
 async def get_current_user(request: Request) -> str:
@@ -655,8 +645,10 @@ async def purchase_health_check():
     """Health check for purchase API"""
     try:
         conn = await get_db_connection()
-        await conn.execute("SELECT 1")
-        await conn.close()
+        try:
+            await conn.execute("SELECT 1")
+        finally:
+            await conn.close()
 
         return {
             "status": "healthy",
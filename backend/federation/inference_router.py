@@ -18,6 +18,7 @@ import httpx
 
 from federation.node_registry import NodeRegistry
 from federation.resilience import get_circuit_breaker, get_routing_audit_log
+from upstream_clients import get_upstream_client, upstream_timeout
 
 logger = logging.getLogger(__name__)
 
@@ -388,13 +389,14 @@ class InferenceRouter:
 
         start_time = time.monotonic()
         try:
-            async with httpx.AsyncClient(timeout=self._http_timeout) as client:
-                if method.upper() == "GET":
-                    response = await client.get(url, headers=request_headers)
-                else:
-                    response = await client.post(
-                        url, json=request_data, headers=request_headers
-                    )
+            client = get_upstream_client(url)
+            timeout = upstream_timeout(url, self._http_timeout)
+            if method.upper() == "GET":
+                response = await client.get(url, headers=request_headers, timeout=timeout)
+            else:
+                response = await client.post(
+                    url, json=request_data, headers=request_headers, timeout=timeout
+                )
 
             latency_ms = (time.monotonic() - start_time) * 1000
             self._record_latency(node_id, latency_ms)
@@ -496,15 +498,16 @@ class InferenceRouter:
 
         start_time = time.monotonic()
         try:
-            async with httpx.AsyncClient(timeout=self._http_timeout) as client:
-                async with client.stream(
-                    "POST", url, json=request_data, headers=request_headers
-                ) as response:
-                    if response.status_code >= 500:
-                        circuit_breaker.record_failure(node_id)
-                    async for chunk in response.aiter_bytes():
-                        if chunk:
-                            yield chunk
+            client = get_upstream_client(url)
+            async with client.stream(
+                "POST", url, json=request_data, headers=request_headers,
+                timeout=upstream_timeout(url, self._http_timeout),
+            ) as response:
+                if response.status_code >= 500:
+                    circuit_breaker.record_failure(node_id)
+                async for chunk in response.aiter_bytes():
+                    if chunk:
+                        yield chunk
             latency_ms = (time.monotonic() - start_time) * 1000
             self._record_latency(node_id, latency_ms)
             circuit_breaker.record_success(node_id)
@@ -7,18 +7,12 @@ checking the platform_settings database first before falling back to environment
 
 import os
 import asyncpg
+from database.pool_manager import default_connect_kwargs, pg_connect
 from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Database connection parameters
-DB_HOST = os.getenv("POSTGRES_HOST", "unicorn-postgresql")
-DB_PORT = os.getenv("POSTGRES_PORT", "5432")
-DB_USER = os.getenv("POSTGRES_USER", "unicorn")
-DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "unicorn")
-DB_NAME = os.getenv("POSTGRES_DB", "unicorn_db")
-
 # Cache for credentials (to avoid DB queries on every request)
 _credential_cache = {}
 
@@ -34,23 +28,36 @@ async def get_credential_from_db(key: str) -> Optional[str]:
         Credential value if found, None otherwise
     """
     try:
-        # Connect to database
-        conn = await asyncpg.connect(
-            host=DB_HOST,
-            port=int(DB_PORT),
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
-
-        # Query platform_settings table
-        result = await conn.fetchval(
-            "SELECT value FROM platform_settings WHERE key = $1",
-            key
-        )
-
-        await conn.close()
-        return result
+        # Borrow a pooled connection; always hand it back
+        async with await pg_connect() as conn:
+            # Query platform_settings table
+            return await conn.fetchval(
+                "SELECT value FROM platform_settings WHERE key = $1",
+                key
+            )
+
+    except Exception as e:
+        logger.warning(f"Failed to get credential '{key}' from database: {e}")
+        return None
+
+
+async def _get_credential_unpooled(key: str) -> Optional[str]:
+    """
+    One-off lookup over a plain connection, for the synchronous path.
+
+    get_credential() runs at import time on a throwaway event loop; the
+    shared pool must not be created there, or it stays bound to a loop that
+    is closed before uvicorn starts.
+    """
+    try:
+        conn = await asyncpg.connect(**default_connect_kwargs(), timeout=5)
+        try:
+            return await conn.fetchval(
+                "SELECT value FROM platform_settings WHERE key = $1",
+                key
+            )
+        finally:
+            await conn.close()
 
     except Exception as e:
         logger.warning(f"Failed to get credential '{key}' from database: {e}")
@@ -102,7 +109,7 @@ def get_credential(key: str, default: str = "") -> str:
             value = os.getenv(key, "").strip()
         else:
             # Run async function synchronously
-            value = loop.run_until_complete(get_credential_from_db(key))
+            value = loop.run_until_complete(_get_credential_unpooled(key))
 
     except Exception as e:
         logger.warning(f"Error fetching '{key}' from database: {e}")
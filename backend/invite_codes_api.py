@@ -12,6 +12,7 @@ from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
 import logging
 import asyncpg
+from database.pool_manager import pg_connect
 import secrets
 import string
 
@@ -101,13 +102,7 @@ async def get_db_connection():
     """Get PostgreSQL database connection"""
     import os
     try:
-        conn = await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", 5432)),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
+        conn = await pg_connect()
         yield conn
     finally:
         if conn:
@@ -21,6 +21,9 @@ KEYCLOAK_CLIENT_SECRET = os.getenv("KEYCLOAK_CLIENT_SECRET", "")
 KEYCLOAK_ADMIN_USERNAME = os.getenv("KEYCLOAK_ADMIN_USER") or os.getenv("KEYCLOAK_ADMIN_USERNAME") or "admin"
 KEYCLOAK_ADMIN_PASSWORD = os.getenv("KEYCLOAK_ADMIN_PASSWORD", "")
 
+# Page size for admin list endpoints (Keycloak's `first`/`max` paging)
+KEYCLOAK_PAGE_SIZE = 500
+
 # Token cache
 _admin_token_cache = {
     "token": None,
@@ -82,6 +85,25 @@ KEYCLOAK_DB_PORT = int(os.getenv("KEYCLOAK_DB_PORT") or "5432")
 KEYCLOAK_DB_NAME = os.getenv("KEYCLOAK_DB_NAME") or "keycloak"
 KEYCLOAK_DB_USER = os.getenv("KEYCLOAK_DB_USER") or "keycloak"
 KEYCLOAK_DB_PASSWORD = os.getenv("KEYCLOAK_DB_PASSWORD") or "keycloak_secure_password_2025"
+KEYCLOAK_DB_POOL_SIZE = int(os.getenv("KEYCLOAK_DB_POOL_SIZE") or "3")
+
+
+async def keycloak_db_connect():
+    """Pooled read-only connection to Keycloak's database; close() releases it."""
+    from database.pool_manager import get_pool_manager, pg_connect
+
+    get_pool_manager(
+        "keycloak",
+        connect_kwargs={
+            "host": KEYCLOAK_DB_HOST,
+            "port": KEYCLOAK_DB_PORT,
+            "user": KEYCLOAK_DB_USER,
+            "password": KEYCLOAK_DB_PASSWORD,
+            "database": KEYCLOAK_DB_NAME,
+        },
+        budgets={"request": KEYCLOAK_DB_POOL_SIZE},
+    )
+    return await pg_connect(target="keycloak")
 
 
 async def get_all_users_from_db() -> List[Dict[str, Any]]:
@@ -92,15 +114,7 @@ async def get_all_users_from_db() -> List[Dict[str, Any]]:
     firstName, lastName, enabled, emailVerified, createdTimestamp, attributes,
     realmRoles) so existing callers work unchanged. Read-only fallback only.
     """
-    import asyncpg
-
-    conn = await asyncpg.connect(
-        host=KEYCLOAK_DB_HOST,
-        port=KEYCLOAK_DB_PORT,
-        user=KEYCLOAK_DB_USER,
-        password=KEYCLOAK_DB_PASSWORD,
-        database=KEYCLOAK_DB_NAME,
-    )
+    conn = await keycloak_db_connect()
     try:
         user_rows = await conn.fetch(
             """
@@ -164,32 +178,50 @@ async def get_all_users_from_db() -> List[Dict[str, Any]]:
         await conn.close()
 
 
+async def fetch_admin_pages(
+    client: httpx.AsyncClient,
+    token: str,
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    GET every page of a realm admin list endpoint (e.g. "/users").
+
+    Raises httpx.HTTPStatusError on a non-2xx page.
+    """
+    results: List[Dict[str, Any]] = []
+    first = 0
+    while True:
+        response = await client.get(
+            f"{KEYCLOAK_URL}/admin/realms/{KEYCLOAK_REALM}{path}",
+            headers={"Authorization": f"Bearer {token}"},
+            params={**(params or {}), "first": first, "max": KEYCLOAK_PAGE_SIZE},
+            timeout=30.0
+        )
+        response.raise_for_status()
+        page = response.json()
+        results.extend(page)
+        if len(page) < KEYCLOAK_PAGE_SIZE:
+            return results
+        first += KEYCLOAK_PAGE_SIZE
+
+
 async def get_all_users() -> List[Dict[str, Any]]:
     """
     Fetch all users from Keycloak.
 
-    Primary path: the Keycloak admin REST API. If that is unavailable on this
-    node (e.g. admin credentials not provisioned) it falls back to a read-only
-    query against Keycloak's PostgreSQL database so the admin UI still shows
-    real users.
+    Primary path: the Keycloak admin REST API, paged so realms beyond one page
+    are not truncated. If that is unavailable on this node (e.g. admin
+    credentials not provisioned) it falls back to a read-only query against
+    Keycloak's PostgreSQL database so the admin UI still shows real users.
     """
     try:
         token = await get_admin_token()
 
         async with httpx.AsyncClient(verify=False) as client:
-            response = await client.get(
-                f"{KEYCLOAK_URL}/admin/realms/{KEYCLOAK_REALM}/users",
-                headers={"Authorization": f"Bearer {token}"},
-                params={"max": 1000},
-                timeout=10.0
-            )
-
-            if response.status_code == 200:
-                users = response.json()
-                logger.info(f"Successfully fetched {len(users)} users from Keycloak")
-                return users
-            else:
-                logger.error(f"Failed to fetch users: {response.status_code} - {response.text}")
+            users = await fetch_admin_pages(client, token, "/users")
+            logger.info(f"Successfully fetched {len(users)} users from Keycloak")
+            return users
 
     except Exception as e:
         logger.error(f"Error fetching users from Keycloak REST API: {e}")
@@ -237,15 +269,7 @@ async def get_realm_session_config_from_db() -> Optional[Dict[str, Any]]:
     Returns a dict using the Keycloak admin-API camelCase keys so callers that
     expect the REST shape work unchanged.
     """
-    import asyncpg
-
-    conn = await asyncpg.connect(
-        host=KEYCLOAK_DB_HOST,
-        port=KEYCLOAK_DB_PORT,
-        user=KEYCLOAK_DB_USER,
-        password=KEYCLOAK_DB_PASSWORD,
-        database=KEYCLOAK_DB_NAME,
-    )
+    conn = await keycloak_db_connect()
     try:
         row = await conn.fetchrow(
             """
@@ -402,6 +426,8 @@ async def update_user_attributes(email: str, attributes: Dict[str, List[str]]) -
 
             if response.status_code == 204:  # Keycloak returns 204 No Content on success
                 logger.info(f"Successfully updated attributes for user: {email}")
+                await _invalidate_tier_cache(attributes, email, user.get("email"))
+                _directory().apply_attributes(user_id, updated_attrs)
                 return True
             else:
                 logger.error(f"Failed to update user attributes: {response.status_code} - {response.text}")
@@ -412,6 +438,22 @@ async def update_user_attributes(email: str, attributes: Dict[str, List[str]]) -
         return False
 
 
+def _directory():
+    from user_directory import get_user_directory  # lazy: user_directory imports this module
+    return get_user_directory()
+
+
+async def _invalidate_tier_cache(attributes: Dict[str, List[str]], *emails: Optional[str]):
+    """Push-invalidate cached tier info after a subscription attribute change"""
+    from tier_quota_cache import COUNTER_ATTRIBUTES, get_tier_quota_cache
+
+    if set(attributes) <= COUNTER_ATTRIBUTES:
+        return  # counter write-back - tier info unchanged
+    cache = get_tier_quota_cache()
+    for email in {e for e in emails if e}:
+        await cache.invalidate(email)
+
+
 async def create_user(email: str, username: str, first_name: str = "", last_name: str = "",
                      attributes: Dict[str, List[str]] = None, email_verified: bool = True) -> Optional[str]:
     """
@@ -447,6 +489,8 @@ async def create_user(email: str, username: str, first_name: str = "", last_name
                 location = response.headers.get("Location", "")
                 user_id = location.split("/")[-1] if location else None
                 logger.info(f"Successfully created user: {email} (ID: {user_id})")
+                if user_id:
+                    _directory().mark_changed(user_id)
                 return user_id
             else:
                 logger.error(f"Failed to create user: {response.status_code} - {response.text}")
@@ -480,6 +524,7 @@ async def delete_user(email: str) -> bool:
 
             if response.status_code == 204:
                 logger.info(f"Successfully deleted user: {email}")
+                _directory().remove(user_id)
                 return True
             else:
                 logger.error(f"Failed to delete user: {response.status_code} - {response.text}")
@@ -638,6 +683,9 @@ async def reset_usage(email: str) -> bool:
     Reset user's API usage counter to 0.
     Useful for testing or manual resets.
     """
+    from tier_quota_cache import get_tier_quota_cache
+
+    await get_tier_quota_cache().reset_usage(email)
     today = datetime.utcnow().date().isoformat()
     return await update_user_attributes(email, {
         "api_calls_used": ["0"],
@@ -16,11 +16,7 @@ from keycloak_integration import (
     KEYCLOAK_REALM,
     get_all_users,
     get_realm_session_config_from_db,
-    KEYCLOAK_DB_HOST,
-    KEYCLOAK_DB_PORT,
-    KEYCLOAK_DB_NAME,
-    KEYCLOAK_DB_USER,
-    KEYCLOAK_DB_PASSWORD,
+    keycloak_db_connect,
 )
 
 # Admin-role dependency for sensitive endpoints (credentials, etc.)
@@ -116,16 +112,8 @@ async def get_user_count_by_provider(provider_alias: str) -> int:
     the configured realm. federated_identity has one row per (provider, user)
     link, so counting rows for an alias gives the number of users using that IdP.
     """
-    import asyncpg
-
     try:
-        conn = await asyncpg.connect(
-            host=KEYCLOAK_DB_HOST,
-            port=KEYCLOAK_DB_PORT,
-            user=KEYCLOAK_DB_USER,
-            password=KEYCLOAK_DB_PASSWORD,
-            database=KEYCLOAK_DB_NAME,
-        )
+        conn = await keycloak_db_connect()
         try:
             row = await conn.fetchrow(
                 """
@@ -0,0 +1,529 @@
+"""
+Lago Metering Queue - batched, durable usage-event delivery to Lago
+
+CreditSystem.debit_credits used to send one `POST /api/v1/events` per LLM
+debit on the request path, each through a brand-new httpx.AsyncClient (TCP +
+TLS handshake every time). That put a full Lago round trip on every chat
+completion and made request latency track Lago's.
+
+This module takes Lago off the hot path:
+
+- The debit stages its usage event in the `lago_usage_outbox` table INSIDE the
+  debit transaction (a transactional outbox: the event exists iff the debit
+  committed), resolving the org in the same statement - no second pool acquire.
+- After commit the event is handed to an in-process queue. A background worker
+  drains it into `POST /api/v1/events/batch` calls (up to 100 events each) over
+  ONE pooled keep-alive client, then deletes the delivered outbox rows.
+- A replay loop re-sends any outbox rows that were never delivered (Lago down,
+  worker crashed, process restarted) with exponential backoff. Rows are claimed
+  with FOR UPDATE SKIP LOCKED so several uvicorn workers can share the outbox.
+
+Lago dedupes on transaction_id, so a replayed duplicate is harmless. A row
+that still fails after LAGO_METERING_MAX_ATTEMPTS replays is parked with
+status 'failed' (dead letter) instead of being retried forever, and a batch
+Lago rejects outright is re-sent event by event so one malformed event cannot
+hold back the rest of the queue. Nothing is staged while LAGO_API_KEY is unset.
+
+Configuration (env):
+    LAGO_METERING_BATCH_SIZE      max events per batch call (default 100, Lago's cap)
+    LAGO_METERING_FLUSH_SECONDS   max time an event waits for a batch to fill (default 1.0)
+    LAGO_METERING_REPLAY_SECONDS  outbox replay interval (default 30)
+    LAGO_METERING_QUEUE_MAX       in-memory queue bound (default 10000)
+    LAGO_METERING_MAX_ATTEMPTS    replays before a row is dead-lettered (default 10)
+"""
+
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Lago rejects batch payloads above 100 events
+LAGO_MAX_BATCH = 100
+
+# Grace period before a freshly staged outbox row becomes eligible for replay,
+# so the replay loop doesn't race the live worker for the same event.
+STAGE_GRACE_SECONDS = 60
+
+# Cap for the exponential replay backoff
+MAX_BACKOFF_SECONDS = 3600
+
+# Statuses Lago returns when the request itself was fine but the payload was
+# not; anything else (auth, throttling, 5xx, network) affects every event alike.
+RETRYABLE_CLIENT_ERRORS = (401, 403, 408, 429)
+
+OUTBOX_DDL = """
+CREATE TABLE IF NOT EXISTS lago_usage_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    transaction_id VARCHAR(255) NOT NULL,
+    org_id VARCHAR(255) NOT NULL,
+    event JSONB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+ALTER TABLE lago_usage_outbox
+    ADD COLUMN IF NOT EXISTS status VARCHAR(16) NOT NULL DEFAULT 'pending';
+CREATE INDEX IF NOT EXISTS idx_lago_usage_outbox_next_attempt
+    ON lago_usage_outbox(next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_lago_usage_outbox_failed
+    ON lago_usage_outbox(status) WHERE status = 'failed';
+"""
+
+
+def build_usage_event(
+    user_id: str,
+    transaction_id: str,
+    amount: float,
+    metadata: Dict[str, Any],
+    event_code: str = "api_call",
+) -> Dict[str, Any]:
+    """
+    Build the org-agnostic part of a Lago usage event for an LLM debit.
+
+    The org (external_customer_id) is attached at delivery time, because it may
+    only be resolved by the outbox staging statement.
+    """
+    properties = {
+        "endpoint": metadata.get('endpoint', '/api/v1/llm/chat/completions'),
+        "user_id": user_id,
+        "tokens": metadata.get('tokens_used', 0),
+        "cost": float(amount),  # Cost in credits
+    }
+    if metadata.get('model'):
+        properties["model"] = metadata.get('model')
+    if metadata.get('provider'):
+        properties["provider"] = metadata.get('provider')
+
+    return {
+        "transaction_id": str(transaction_id),
+        "code": event_code,
+        "timestamp": int(datetime.utcnow().timestamp()),
+        "properties": properties,
+    }
+
+
+def _with_org(org_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the customer identity to a staged event (Lago wire format)."""
+    properties = dict(event.get("properties") or {})
+    properties["org_id"] = org_id
+    return {**event, "external_customer_id": org_id, "properties": properties}
+
+
+class LagoMeteringQueue:
+    """In-process batching queue for Lago usage events, backed by a Postgres outbox"""
+
+    def __init__(
+        self,
+        db_pool=None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        replay_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+    ):
+        self.db_pool = db_pool
+        self.batch_size = min(
+            batch_size or int(os.getenv("LAGO_METERING_BATCH_SIZE", str(LAGO_MAX_BATCH))),
+            LAGO_MAX_BATCH,
+        )
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else float(os.getenv("LAGO_METERING_FLUSH_SECONDS", "1.0"))
+        )
+        self.replay_interval = (
+            replay_interval if replay_interval is not None
+            else float(os.getenv("LAGO_METERING_REPLAY_SECONDS", "30"))
+        )
+        self.max_attempts = max_attempts or int(os.getenv("LAGO_METERING_MAX_ATTEMPTS", "10"))
+        self._queue: asyncio.Queue = asyncio.Queue(
+            maxsize=max_queue or int(os.getenv("LAGO_METERING_QUEUE_MAX", "10000"))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._replay_task: Optional[asyncio.Task] = None
+        self._outbox_available = db_pool is not None
+        self.stats = {
+            "enqueued": 0, "delivered": 0, "failed": 0, "dropped": 0,
+            "replayed": 0, "dead_lettered": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def ensure_table(self) -> None:
+        """Create the outbox table if needed (idempotent)."""
+        if not self.db_pool:
+            self._outbox_available = False
+            return
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.execute(OUTBOX_DDL)
+            self._outbox_available = True
+        except Exception as e:
+            self._outbox_available = False
+            logger.warning(f"lago_usage_outbox unavailable, metering is in-memory only: {e}")
+
+    async def start(self) -> None:
+        """Start the delivery worker and the outbox replay loop."""
+        await self.ensure_table()
+        self._ensure_worker()
+        if self._outbox_available and self.replay_interval > 0:
+            if self._replay_task is None or self._replay_task.done():
+                self._replay_task = asyncio.create_task(self._replay_loop())
+        logger.info(
+            f"Lago metering queue started (batch={self.batch_size}, "
+            f"flush={self.flush_interval}s, replay={self.replay_interval}s)"
+        )
+
+    def _ensure_worker(self) -> None:
+        """Lazily start the delivery worker (idempotent)."""
+        if self._worker_task is not None and not self._worker_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No running loop (e.g. unit context) - events stay queued / in the outbox.
+            self._worker_task = None
+            return
+        self._worker_task = loop.create_task(self._worker())
+
+    async def stop(self) -> None:
+        """Drain what is queued, stop background tasks and close the HTTP pool."""
+        for task in (self._worker_task, self._replay_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._worker_task = None
+        self._replay_task = None
+
+        # Best-effort final drain; anything that fails stays in the outbox.
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for i in range(0, len(pending), self.batch_size):
+            await self._deliver(pending[i:i + self.batch_size])
+
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        logger.info("Lago metering queue stopped")
+
+    # ------------------------------------------------------------------
+    # Producer side (request path)
+    # ------------------------------------------------------------------
+
+    async def stage(
+        self,
+        conn,
+        user_id: str,
+        org_id: Optional[str],
+        event: Dict[str, Any],
+    ) -> Optional[Tuple[Optional[int], str]]:
+        """
+        Stage an event in the outbox on the caller's (open) transaction.
+
+        When org_id is not known the org is resolved from organization_members
+        in the same statement. Runs under a savepoint so a missing outbox table
+        can never abort the surrounding debit transaction.
+
+        Returns:
+            (outbox_id, org_id) to pass to enqueue() after commit, or None when
+            the user has no org or Lago is not configured (nothing to meter).
+        """
+        from lago_integration import LAGO_API_KEY
+        if not LAGO_API_KEY:
+            # Rows staged now could never be delivered and would only pile up
+            return None
+
+        if self._outbox_available:
+            try:
+                async with conn.transaction():
+                    row = await conn.fetchrow(
+                        """
+                        INSERT INTO lago_usage_outbox (transaction_id, org_id, event, next_attempt_at)
+                        SELECT $1, r.org_id, $3::jsonb, NOW() + make_interval(secs => $5)
+                        FROM (
+                            SELECT COALESCE(
+                                $2::text,
+                                (SELECT org_id::text FROM organization_members WHERE user_id = $4 LIMIT 1)
+                            ) AS org_id
+                        ) r
+                        WHERE r.org_id IS NOT NULL
+                        RETURNING id, org_id
+                        """,
+                        event["transaction_id"],
+                        org_id,
+                        json.dumps(event),
+                        user_id,
+                        float(STAGE_GRACE_SECONDS),
+                    )
+                return (row['id'], row['org_id']) if row else None
+            except Exception as e:
+                if getattr(e, "sqlstate", None) == "42P01":  # undefined_table
+                    self._outbox_available = False
+                logger.warning(f"Lago outbox staging failed, falling back to in-memory metering: {e}")
+
+        if org_id:
+            return None, org_id
+        try:
+            async with conn.transaction():
+                org_id = await conn.fetchval(
+                    "SELECT org_id::text FROM organization_members WHERE user_id = $1 LIMIT 1",
+                    user_id
+                )
+        except Exception as e:
+            logger.warning(f"Org lookup for Lago metering failed: {e}")
+            return None
+        return (None, org_id) if org_id else None
+
+    def enqueue(self, org_id: str, event: Dict[str, Any], outbox_id: Optional[int] = None) -> bool:
+        """
+        Hand a committed usage event to the delivery worker. Never blocks.
+
+        Returns:
+            False if the in-memory queue is full (the outbox row, if any, is
+            still replayed later).
+        """
+        try:
+            self._queue.put_nowait((outbox_id, org_id, event))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            fate = "left for outbox replay" if outbox_id is not None else "dropped"
+            logger.warning(f"Lago metering queue full, event {event.get('transaction_id')} {fate}")
+            return False
+        self.stats["enqueued"] += 1
+        self._ensure_worker()
+        return True
+
+    # ------------------------------------------------------------------
+    # Consumer side (background)
+    # ------------------------------------------------------------------
+
+    async def _worker(self) -> None:
+        """Collect events into batches (size- or time-bounded) and deliver them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                # Never let the worker die; undelivered rows remain in the outbox.
+                logger.error(f"Lago metering worker error: {e}")
+
+    async def _replay_loop(self) -> None:
+        """Periodically re-send outbox rows that were never delivered."""
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            from lago_integration import LAGO_API_KEY
+            if not LAGO_API_KEY:
+                continue  # don't burn replay attempts while Lago is unconfigured
+            try:
+                while True:
+                    claimed = await self._claim_due()
+                    if not claimed:
+                        break
+                    self.stats["replayed"] += len(claimed)
+                    await self._deliver(claimed)
+                    if len(claimed) < self.batch_size:
+                        break
+            except Exception as e:
+                logger.error(f"Lago outbox replay error: {e}")
+
+    async def _claim_due(self) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """
+        Claim a batch of due outbox rows by pushing their next attempt out.
+
+        Due rows that already used up max_attempts are dead-lettered (status
+        'failed') first; they stay in the table for inspection but are never
+        claimed again.
+        """
+        async with self.db_pool.acquire() as conn:
+            dead = await conn.fetchval(
+                """
+                WITH dead AS (
+                    UPDATE lago_usage_outbox
+                    SET status = 'failed'
+                    WHERE status = 'pending'
+                      AND attempts >= $1
+                      AND next_attempt_at <= NOW()
+                    RETURNING id
+                )
+                SELECT COUNT(*) FROM dead
+                """,
+                self.max_attempts,
+            )
+            if dead:
+                self.stats["dead_lettered"] += dead
+                logger.error(
+                    f"Dead-lettered {dead} Lago usage event(s) after {self.max_attempts} "
+                    f"failed attempts (lago_usage_outbox.status = 'failed')"
+                )
+            rows = await conn.fetch(
+                """
+                UPDATE lago_usage_outbox
+                SET attempts = attempts + 1,
+                    next_attempt_at = NOW() + make_interval(
+                        secs => LEAST($2::float, 30 * POWER(2, LEAST(attempts, 20)))
+                    )
+                WHERE id IN (
+                    SELECT id FROM lago_usage_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= NOW()
+                    ORDER BY id
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, org_id, event
+                """,
+                self.batch_size,
+                float(MAX_BACKOFF_SECONDS),
+            )
+        return [
+            (row['id'], row['org_id'],
+             json.loads(row['event']) if isinstance(row['event'], str) else row['event'])
+            for row in rows
+        ]
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled keep-alive client for Lago (created on first use)."""
+        if self._client is None:
+            from lago_integration import API_TIMEOUT, LAGO_API_URL
+            self._client = httpx.AsyncClient(
+                base_url=LAGO_API_URL,
+                timeout=API_TIMEOUT,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+            )
+        return self._client
+
+    async def _post(self, batch: List[Tuple[Optional[int], str, Dict[str, Any]]]) -> Tuple[Optional[str], bool]:
+        """
+        POST one batch to Lago.
+
+        Returns:
+            (error, rejected): error is None on success; rejected is True when
+            Lago refused the payload itself (a 4xx other than auth/throttling).
+        """
+        from lago_integration import LAGO_API_KEY
+        if not LAGO_API_KEY:
+            return "LAGO_API_KEY not configured", False
+        try:
+            response = await self._get_client().post(
+                "/api/v1/events/batch",
+                headers={
+                    "Authorization": f"Bearer {LAGO_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                json={"events": [_with_org(org_id, event) for _, org_id, event in batch]},
+            )
+        except httpx.RequestError as e:
+            return f"network error: {e}", False
+        if response.status_code in (200, 201):
+            return None, False
+        rejected = (
+            400 <= response.status_code < 500
+            and response.status_code not in RETRYABLE_CLIENT_ERRORS
+        )
+        return f"{response.status_code} - {response.text[:200]}", rejected
+
+    async def _deliver(self, batch: List[Tuple[Optional[int], str, Dict[str, Any]]]) -> bool:
+        """
+        Send one batch to Lago and settle its outbox rows.
+
+        When Lago rejects a multi-event batch the events are re-sent one by one,
+        so only the offending rows stay behind for replay/dead-lettering.
+        """
+        if not batch:
+            return True
+
+        error, rejected = await self._post(batch)
+        if error is not None and rejected and len(batch) > 1:
+            logger.warning(
+                f"Lago rejected a batch of {len(batch)} events ({error}), retrying individually"
+            )
+            results = [await self._deliver([item]) for item in batch]
+            return all(results)
+
+        outbox_ids = [outbox_id for outbox_id, _, _ in batch if outbox_id is not None]
+        if error is None:
+            self.stats["delivered"] += len(batch)
+            logger.debug(f"Delivered {len(batch)} Lago usage events")
+            await self._settle(outbox_ids, None)
+            return True
+
+        self.stats["failed"] += len(batch)
+        lost = len(batch) - len(outbox_ids)
+        logger.warning(
+            f"Lago batch delivery failed ({error}): {len(outbox_ids)} event(s) kept for replay"
+            + (f", {lost} in-memory event(s) lost" if lost else "")
+        )
+        await self._settle(outbox_ids, error)
+        return False
+
+    async def _settle(self, outbox_ids: List[int], error: Optional[str]) -> None:
+        """Delete delivered outbox rows, or record the failure for replay backoff."""
+        if not outbox_ids or not self.db_pool:
+            return
+        try:
+            async with self.db_pool.acquire() as conn:
+                if error is None:
+                    await conn.execute(
+                        "DELETE FROM lago_usage_outbox WHERE id = ANY($1::bigint[])",
+                        outbox_ids
+                    )
+                else:
+                    await conn.execute(
+                        "UPDATE lago_usage_outbox SET last_error = $2 WHERE id = ANY($1::bigint[])",
+                        outbox_ids, error[:500]
+                    )
+        except Exception as e:
+            logger.warning(f"Failed to settle Lago outbox rows (will replay): {e}")
+
+
+# Singleton instance
+_lago_metering_queue: Optional[LagoMeteringQueue] = None
+
+
+def get_lago_metering_queue() -> LagoMeteringQueue:
+    """
+    Get singleton instance of LagoMeteringQueue
+
+    Returns:
+        LagoMeteringQueue instance
+    """
+    global _lago_metering_queue
+    if _lago_metering_queue is None:
+        _lago_metering_queue = LagoMeteringQueue()
+    return _lago_metering_queue
+
+
+async def init_lago_metering(db_pool) -> LagoMeteringQueue:
+    """Bind the singleton queue to the application pool and start it (startup hook)."""
+    queue = get_lago_metering_queue()
+    queue.db_pool = db_pool
+    await queue.start()
+    return queue
+
+
+async def shutdown_lago_metering() -> None:
+    """Stop the singleton queue, flushing what it can (shutdown hook)."""
+    if _lago_metering_queue is not None:
+        await _lago_metering_queue.stop()
@@ -20,7 +20,7 @@ import json
 import time
 import httpx
 
-from fastapi import APIRouter, HTTPException, Header, Request, Depends, Query
+from fastapi import APIRouter, HTTPException, Header, Request, Response, Depends, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from auth_dependencies import require_authenticated_user  # per-user gate for account-facing endpoints under the m2m-allowlisted /api/v1/llm prefix
@@ -36,6 +36,15 @@ from get_credential import get_credential
 
 # Import organizational credit integration
 from org_credit_integration import get_org_credit_integration
+from request_context import SERVICE_KEYS, SERVICE_ORG_IDS, get_request_context
+from llm_route_table import get_route_table, invalidate_route_table
+from response_cache import (
+    LLM_RESPONSE_CACHE_CHARGE, cache_key, get_response_cache, is_deterministic, wants_bypass,
+)
+from sse_relay import SSEUsageScanner, relay_sse, sse_error_frame
+from upstream_clients import get_upstream_client, upstream_timeout
+from pricing_snapshot import get_pricing_snapshot
+from model_listing import get_model_listing, get_user_overlay, invalidate_user_overlay, listing_etag
 
 logger = logging.getLogger(__name__)
 
@@ -506,6 +515,7 @@ class SystemKeyManager:
                         WHERE id = $3
                     """, encrypted, source, provider_id)
                     logger.info(f"Updated system key for provider {provider_id}")
+            invalidate_route_table()
         except Exception as e:
             logger.error(f"Failed to set system key: {e}")
             raise HTTPException(status_code=500, detail="Failed to store system key")
@@ -562,6 +572,7 @@ class SystemKeyManager:
                     WHERE id = $1
                 """, provider_id)
                 logger.info(f"Deleted system key for provider {provider_id}")
+            invalidate_route_table()
         except Exception as e:
             logger.error(f"Failed to delete system key: {e}")
             raise HTTPException(status_code=500, detail="Failed to delete system key")
@@ -713,6 +724,11 @@ async def get_user_id(
             logger.warning("No Authorization header and no valid session")
             raise HTTPException(status_code=401, detail="Authentication required (Authorization header or session cookie)")
 
+    # Service and uc_ keys were already resolved once for this request
+    ctx = get_request_context(request)
+    if ctx is not None and ctx.auth_method in ("service_key", "api_key"):
+        return ctx.user_id
+
     # Authorization header provided - use existing token-based auth
     if not authorization.startswith('Bearer '):
         logger.warning(f"Invalid auth format: {authorization[:20]}...")
@@ -725,33 +741,8 @@ async def get_user_id(
     # Check for service key (format: sk-<service>-service-key-<year>)
     if token.startswith('sk-'):
         logger.info(f"🔑 Token starts with 'sk-', checking service keys...")
-        # Service keys are pre-configured trusted keys for internal services
-        service_keys = {
-            'sk-bolt-diy-service-key-2025': 'bolt-diy-service',
-            'sk-presenton-service-key-2025': 'presenton-service',
-            'sk-brigade-service-key-2025': 'brigade-service',
-            'sk-centerdeep-service-key-REDACTED': 'centerdeep-service',
-            'sk-partnerpulse-service-key-2025': 'partnerpulse-service',
-            'sk-open-webui-service-key-2026': 'open-webui-service',
-            'sk-colonel-service-key-2026': 'colonel-service',
-            'sk-majiks-service-key-2025': 'majiks-service'
-        }
-
-        # FIX P0: Map service names to actual UUIDs from database (not strings)
-        # These are the actual organization UUIDs for service accounts
-        service_org_ids = {
-            'bolt-diy-service': '3766e9ee-7cc1-472f-92ae-afec687f0d74',      # UUID for bolt-diy-service org
-            'presenton-service': '13587747-66e6-43df-b21d-4411c7373465',     # UUID for presenton-service org
-            'brigade-service': 'e9b40f6b-b683-4bcf-b462-9fd526cfbb37',       # UUID for brigade-service org
-            'centerdeep-service': '91d3b68e-e4c4-457e-80ce-de6997243c34',    # UUID for centerdeep-service org
-            'partnerpulse-service': '8f5bf9a9-2e7c-4465-93d8-97f18bdac098',  # UUID for partnerpulse-service org
-            'open-webui-service': 'f47ac10b-58cc-4372-a567-0e02b2c3d479',    # UUID for open-webui-service org
-            'colonel-service': 'e9b40f6b-b683-4bcf-b462-9fd526cfbb37',       # Colonel uses brigade org for billing
-            'majiks-service': 'a1b2c3d4-e5f6-7890-abcd-ef1234567890'        # Majiks Studio service org
-        }
-
-        if token in service_keys:
-            service_name = service_keys[token]
+        if token in SERVICE_KEYS:
+            service_name = SERVICE_KEYS[token]
 
             # Check for X-User-ID header (service proxying on behalf of user)
             x_user_id = request.headers.get('X-User-ID')
@@ -761,7 +752,7 @@ async def get_user_id(
                 return x_user_id
             else:
                 # No user context - use service organization account for billing
-                service_org_id = service_org_ids.get(service_name)
+                service_org_id = SERVICE_ORG_IDS.get(service_name)
                 if service_org_id:
                     # Prefix with 'org_' so credit system recognizes this as an organization
                     org_prefixed_id = f"org_{service_org_id}"
@@ -843,6 +834,7 @@ def get_user_role(user_id: str) -> str:
 @router.post("/chat/completions")
 async def chat_completions(
     request: ChatCompletionRequest,
+    http_request: Request,
     user_id: str = Depends(get_user_id),
     credit_system: CreditSystem = Depends(get_credit_system),
     byok_manager: BYOKManager = Depends(get_byok_manager),
@@ -861,14 +853,21 @@ async def chat_completions(
         + X-Cost-Incurred: Credits deducted
         + X-Credits-Remaining: Updated balance
     """
+    credit_hold_id = None  # Service org pre-authorization, settled on debit
+    hold_settled = False  # Debited against the hold, or handed to the stream generator
     try:
         # Determine power level
         power_level = x_power_level or request.power_level
         if power_level not in POWER_LEVELS:
             power_level = "balanced"
 
-        # Get user tier for cost calculation
-        user_tier = await credit_system.get_user_tier(user_id)
+        # Get user tier for cost calculation (already looked up for uc_ keys
+        # by the request context resolver)
+        ctx = get_request_context(http_request)
+        if ctx is not None and ctx.user_id == user_id and ctx.billing_tier:
+            user_tier = ctx.billing_tier
+        else:
+            user_tier = await credit_system.get_user_tier(user_id)
 
         # Get power level config
         power_config = POWER_LEVELS[power_level]
@@ -912,12 +911,13 @@ async def chat_completions(
         # Check credits BEFORE making request (skip if using BYOK or credit-exempt tier)
         org_id = None  # Will be set if using org billing
         if not using_byok and not is_credit_exempt(user_tier):
-            # Try organizational billing first
+            # Try organizational billing first (http_request.state carries the
+            # org CreditDeductionMiddleware already resolved)
             org_integration = get_org_credit_integration()
             has_org_credits, org_id, message = await org_integration.has_sufficient_org_credits(
                 user_id=user_id,
                 credits_needed=estimated_cost,
-                request_state=getattr(request, 'state', None) if hasattr(request, 'state') else None
+                request_state=http_request.state
             )
 
             if org_id:
@@ -929,14 +929,17 @@ async def chat_completions(
                     )
                 logger.info(f"User {user_id} using org billing (org: {org_id})")
             else:
-                # Fallback to individual credits (backward compatibility)
-                current_balance = await credit_system.get_user_credits(user_id)
+                # Service keys reserve the estimate (no pool row lock); everyone
+                # else falls back to individual credits (backward compatibility)
+                credit_hold_id = await credit_system.hold_credits(user_id, estimated_cost)
+                if credit_hold_id is None:
+                    current_balance = await credit_system.get_user_credits(user_id)
 
-                if current_balance < estimated_cost:
-                    raise HTTPException(
-                        status_code=402,  # Payment Required
-                        detail=f"Insufficient credits. Balance: {current_balance:.6f}, Estimated cost: {estimated_cost:.6f}"
-                    )
+                    if current_balance < estimated_cost:
+                        raise HTTPException(
+                            status_code=402,  # Payment Required
+                            detail=f"Insufficient credits. Balance: {current_balance:.6f}, Estimated cost: {estimated_cost:.6f}"
+                        )
 
                 # Check monthly cap
                 within_cap = await credit_system.check_monthly_cap(user_id, estimated_cost)
@@ -966,7 +969,8 @@ async def chat_completions(
         proxy_request = {
             "messages": serialized_messages,
             "max_tokens": request.max_tokens or power_config["max_tokens"],
-            "temperature": request.temperature or power_config["temperature"],
+            # An explicit temperature=0 must reach the provider (deterministic requests)
+            "temperature": request.temperature if request.temperature is not None else power_config["temperature"],
             "stream": request.stream,
             "user": user_id,  # For usage tracking
             "metadata": {
@@ -1107,155 +1111,68 @@ async def chat_completions(
             # Using system key (charge credits)
             logger.info(f"Using system provider for {user_id}")
 
-            # Get provider info from database for direct API call
-            async with credit_system.db_pool.acquire() as conn:
-                # FIRST: Check if requested model has a specific provider mapping
-                model_name = request.model or "Qwen3-30B-Q4_K_M"
-                provider = await conn.fetchrow("""
-                    SELECT p.id, p.name, p.type, p.api_key_encrypted, p.api_base_url, p.config
-                    FROM llm_models m
-                    JOIN llm_providers p ON m.provider_id = p.id
-                    WHERE m.name = $1 AND m.enabled = true AND p.enabled = true
-                """, model_name)
-
-                if provider:
-                    logger.info(f"Found model-specific provider for '{model_name}': {provider['name']}")
-                else:
-                    # FALLBACK: Get highest priority provider (for unknown models)
-                    logger.info(f"No specific provider for '{model_name}', using highest priority")
-                    provider = await conn.fetchrow("""
-                        SELECT id, name, type, api_key_encrypted, api_base_url, config
-                        FROM llm_providers
-                        WHERE enabled = true AND type IN ('openai_compatible', 'openrouter', 'local')
-                        ORDER BY priority DESC
-                        LIMIT 1
-                    """)
-
-                if not provider:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="No LLM providers configured. Please configure OpenRouter in Platform Settings."
+            # Resolve the provider from the in-memory routing table: a
+            # model-specific mapping, else the highest priority provider
+            route_table = get_route_table()
+            model_name = request.model or "Qwen3-30B-Q4_K_M"
+            route = await route_table.resolve(credit_system.db_pool, model_name, BYOK_ENCRYPTION_KEY)
+            is_local_provider = route.is_local
+
+            # --- Per-tier local-pricing gate (inert unless LOCAL_PRICING_ENABLED) ---
+            # Runs only for LOCAL providers. resolve_local_pricing decides:
+            #   metered  -> keep model, price local at local_rate_per_1k;
+            #   overflow -> re-resolve provider for a PAID model (bills as cloud);
+            #   deny     -> 429; otherwise serve free (today's behavior).
+            # Fail-open: any error serves the request unchanged.
+            if is_local_provider:
+                try:
+                    from local_pricing import resolve_local_pricing, OVERFLOW, DENY
+                    _dec = await resolve_local_pricing(
+                        org_id, model_name, estimated_tokens,
+                        tier_code=user_tier, is_local=True,
                     )
-
-                # Get provider config (handle both dict and JSON string)
-                provider_db_config = provider['config'] or {}
-                if isinstance(provider_db_config, str):
-                    import json
-                    provider_db_config = json.loads(provider_db_config)
-
-                # Use api_base_url from database if available, otherwise check config, fallback to openrouter
-                base_url = provider.get('api_base_url') or provider_db_config.get('base_url', 'https://openrouter.ai/api/v1')
-                provider_name = provider['name']
-
-                # Check if this is a local provider that doesn't need API key
-                is_local_provider = provider['type'] in ('openai_compatible', 'local') and (
-                    provider.get('api_base_url', '').startswith('http://') or
-                    'localhost' in provider.get('api_base_url', '') or
-                    'unicorn-' in provider.get('api_base_url', '')
-                )
-
-                # --- Per-tier local-pricing gate (inert unless LOCAL_PRICING_ENABLED) ---
-                # Runs only for LOCAL providers. resolve_local_pricing decides:
-                #   metered  -> keep model, price local at local_rate_per_1k;
-                #   overflow -> re-resolve provider for a PAID model (bills as cloud);
-                #   deny     -> 429; otherwise serve free (today's behavior).
-                # Fail-open: any error serves the request unchanged.
-                if is_local_provider:
-                    try:
-                        from local_pricing import resolve_local_pricing, OVERFLOW, DENY
-                        _dec = await resolve_local_pricing(
-                            org_id, model_name, estimated_tokens,
-                            tier_code=user_tier, is_local=True,
+                    if _dec["decision"] == DENY:
+                        raise HTTPException(
+                            status_code=429,
+                            detail="Local AI usage limit reached for your plan. Upgrade or wait for the monthly reset.",
                         )
-                        if _dec["decision"] == DENY:
-                            raise HTTPException(
-                                status_code=429,
-                                detail="Local AI usage limit reached for your plan. Upgrade or wait for the monthly reset.",
-                            )
-                        if _dec["decision"] == OVERFLOW and _dec.get("model"):
-                            overflow_model = _dec["model"]
-                            logger.info(f"[local_pricing] org={org_id} local quota exceeded -> overflow to '{overflow_model}'")
-                            ov = await conn.fetchrow("""
-                                SELECT p.id, p.name, p.type, p.api_key_encrypted, p.api_base_url, p.config
-                                FROM llm_models m JOIN llm_providers p ON m.provider_id = p.id
-                                WHERE m.name = $1 AND m.enabled = true AND p.enabled = true
-                            """, overflow_model)
-                            if ov:
-                                provider = ov
-                                model_name = overflow_model
-                                request.model = overflow_model
-                                proxy_request["model"] = normalize_model_id(overflow_model)
-                                provider_db_config = provider['config'] or {}
-                                if isinstance(provider_db_config, str):
-                                    import json as _json
-                                    provider_db_config = _json.loads(provider_db_config)
-                                base_url = provider.get('api_base_url') or provider_db_config.get('base_url', 'https://openrouter.ai/api/v1')
-                                provider_name = provider['name']
-                                # Re-derive locality for the overflow provider (almost always cloud).
-                                is_local_provider = provider['type'] in ('openai_compatible', 'local') and (
-                                    provider.get('api_base_url', '').startswith('http://') or
-                                    'localhost' in provider.get('api_base_url', '') or
-                                    'unicorn-' in provider.get('api_base_url', '')
-                                )
-                            else:
-                                logger.warning(f"[local_pricing] overflow model '{overflow_model}' not found; serving local")
-                        elif _dec.get("meter") and _dec.get("local_rate_per_1k") is not None:
-                            local_rate_per_1k = _dec["local_rate_per_1k"]
-                        # Record served tokens against the monthly local quota only when
-                        # the served provider is (still) local.
-                        record_local_usage = bool(org_id) and is_local_provider
-                    except HTTPException:
-                        raise
-                    except Exception as _gate_err:
-                        logger.warning(f"[local_pricing] gate error (fail-open, serving unchanged): {_gate_err}")
-
-                # Get system API key (prefer database over environment) - skip for local providers
-                api_key = None
-                if not is_local_provider:
-                    try:
-                        # Try to use SystemKeyManager if encryption key is available
-                        system_key_manager = SystemKeyManager(credit_system.db_pool, BYOK_ENCRYPTION_KEY)
-                        api_key = await system_key_manager.get_system_key(provider['id'])
-                    except Exception as e:
-                        logger.warning(f"SystemKeyManager failed: {e}, falling back to direct decryption")
-                        api_key = None
-                    if not api_key:
-                        # Fallback: Try to decrypt the key directly
-                        encrypted_key = provider['api_key_encrypted']
-                        if not encrypted_key:
-                            raise HTTPException(
-                                status_code=503,
-                                detail="No API key configured for system provider. Please configure in Platform Settings."
-                            )
+                    if _dec["decision"] == OVERFLOW and _dec.get("model"):
+                        overflow_model = _dec["model"]
+                        logger.info(f"[local_pricing] org={org_id} local quota exceeded -> overflow to '{overflow_model}'")
+                        ov = await route_table.lookup(credit_system.db_pool, overflow_model, BYOK_ENCRYPTION_KEY)
+                        if ov:
+                            route = ov
+                            model_name = overflow_model
+                            request.model = overflow_model
+                            proxy_request["model"] = normalize_model_id(overflow_model)
+                            # Re-derive locality for the overflow provider (almost always cloud).
+                            is_local_provider = route.is_local
+                        else:
+                            logger.warning(f"[local_pricing] overflow model '{overflow_model}' not found; serving local")
+                    elif _dec.get("meter") and _dec.get("local_rate_per_1k") is not None:
+                        local_rate_per_1k = _dec["local_rate_per_1k"]
+                    # Record served tokens against the monthly local quota only when
+                    # the served provider is (still) local.
+                    record_local_usage = bool(org_id) and is_local_provider
+                except HTTPException:
+                    raise
+                except Exception as _gate_err:
+                    logger.warning(f"[local_pricing] gate error (fail-open, serving unchanged): {_gate_err}")
+
+            base_url = route.base_url
+            provider_name = route.provider_name
+
+            # System API key was resolved (database > environment) when the
+            # route was built - local providers need none
+            if not is_local_provider and not route.api_key:
+                raise HTTPException(
+                    status_code=503,
+                    detail="No API key configured for system provider. Please configure in Platform Settings."
+                )
 
-                        try:
-                            # Try to decrypt if it looks like Fernet encrypted data
-                            if encrypted_key.startswith('gAAAAA'):
-                                from cryptography.fernet import Fernet
-                                cipher = Fernet(BYOK_ENCRYPTION_KEY.encode() if isinstance(BYOK_ENCRYPTION_KEY, str) else BYOK_ENCRYPTION_KEY)
-                                api_key = cipher.decrypt(encrypted_key.encode()).decode()
-                                logger.info("Successfully decrypted system API key from database")
-                            else:
-                                # Assume it's plain text
-                                api_key = encrypted_key
-                                logger.info("Using plain text API key from database")
-                        except Exception as e:
-                            logger.error(f"Failed to decrypt API key, trying as plain text: {e}")
-                            api_key = encrypted_key
-
-            # Build headers (skip auth for local providers)
+            headers = route.headers
             if is_local_provider:
-                headers = {
-                    "Content-Type": "application/json"
-                }
                 logger.info(f"Using local provider: {provider_name} at {base_url} (no API key required)")
-            else:
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://unicorncommander.ai",  # Required by OpenRouter
-                    "X-Title": "UC-1 Pro Ops Center"  # Required by OpenRouter
-                }
 
         # Call provider API directly
         # Handle streaming vs non-streaming requests differently
@@ -1265,84 +1182,42 @@ async def chat_completions(
 
             async def stream_generator():
                 """
-                Generator that forwards SSE events from OpenRouter to client.
+                Relay SSE events from the provider to the client.
 
-                CRITICAL: Each yield must be followed by await asyncio.sleep(0) to force
-                FastAPI to send buffered chunks immediately. Without this, clients receive
-                zero bytes until stream completes.
+                Upstream bytes are forwarded untouched; SSEUsageScanner picks
+                the model and the final usage object out of the byte stream
+                for billing (see sse_relay).
                 """
-                import asyncio  # Import here for sleep(0) flush
-                total_tokens = 0
-                provider_used = request.model or "unknown"
-                chunks_received = 0
+                scanner = SSEUsageScanner()
+                settled = False
 
                 # Send an initial comment to keep connection alive and force headers
-                yield ": ping\n\n"
-                await asyncio.sleep(0)
+                yield b": ping\n\n"
 
                 try:
-                    async with httpx.AsyncClient(timeout=120.0) as client:
-                        async with client.stream(
-                            'POST',
-                            f"{base_url}/chat/completions",
-                            json=proxy_request,
-                            headers=headers
-                        ) as response:
-                            if response.status_code != 200:
-                                error_text = await response.aread()
-                                logger.error(f"OpenRouter streaming error: {error_text.decode()}")
-                                error_data = {
-                                    "error": {
-                                        "message": f"LLM provider error: {error_text.decode()}",
-                                        "type": "api_error",
-                                        "code": response.status_code
-                                    }
-                                }
-                                yield f"data: {json.dumps(error_data)}\n\n"
-                                await asyncio.sleep(0)  # Force flush
-                                return
-
-                            # Stream SSE events from provider
-                            async for line in response.aiter_lines():
-                                if not line:
-                                    continue
-
-                                if line.startswith('data: '):
-                                    data_str = line[6:]  # Remove 'data: ' prefix
-
-                                    # Check for completion marker
-                                    if data_str.strip() == '[DONE]':
-                                        logger.info(f"Streaming complete: {chunks_received} chunks, ~{total_tokens} tokens")
-                                        yield f"data: [DONE]\n\n"
-                                        await asyncio.sleep(0)  # Force flush
-                                        break
-
-                                    # Parse and forward chunk
-                                    try:
-                                        chunk = json.loads(data_str)
-                                        chunks_received += 1
-
-                                        # Extract usage tokens from final chunk (if present)
-                                        if 'usage' in chunk:
-                                            usage = chunk['usage']
-                                            total_tokens = usage.get('total_tokens', 0)
-                                            logger.info(f"Received usage data: {total_tokens} tokens")
-
-                                        # Extract model info if present
-                                        if 'model' in chunk and chunk['model']:
-                                            provider_used = chunk['model']
-
-                                        # Forward chunk to client
-                                        yield f"data: {data_str}\n\n"
-
-                                        # CRITICAL FIX: Force flush by yielding to event loop
-                                        # This ensures FastAPI sends buffered data immediately
-                                        # Without this, chunks are buffered and client receives nothing
-                                        await asyncio.sleep(0)
-
-                                    except json.JSONDecodeError as e:
-                                        logger.warning(f"Failed to parse SSE chunk: {e}, data: {data_str[:100]}")
-                                        continue
+                    client = get_upstream_client(base_url)
+                    async with client.stream(
+                        'POST',
+                        f"{base_url}/chat/completions",
+                        json=proxy_request,
+                        headers=headers,
+                        timeout=upstream_timeout(base_url, 120.0)
+                    ) as response:
+                        if response.status_code != 200:
+                            error_text = (await response.aread()).decode(errors="replace")
+                            logger.error(f"OpenRouter streaming error: {error_text}")
+                            yield sse_error_frame(
+                                f"LLM provider error: {error_text}", "api_error", response.status_code
+                            )
+                            return
+
+                        # Stream SSE events from provider
+                        async for data in relay_sse(response.aiter_bytes(), scanner):
+                            yield data
+
+                    total_tokens = scanner.total_tokens
+                    provider_used = scanner.model or request.model or "unknown"
+                    logger.info(f"Streaming complete: {scanner.frames} frames, ~{total_tokens} tokens")
 
                     # After streaming completes, deduct credits
                     if not using_byok and (user_tier != 'free' or total_tokens > 0):
@@ -1389,8 +1264,10 @@ async def chat_completions(
                                     'task_type': request.task_type,
                                     'cost': actual_cost,
                                     'streaming': True
-                                }
+                                },
+                                hold_id=credit_hold_id
                             )
+                            settled = True
                             logger.info(f"Deducted {actual_cost:.6f} credits from user {user_id} for streaming request")
 
                         # Count local tokens toward the org's monthly quota (mode-2 free_quota_overflow).
@@ -1422,13 +1299,15 @@ async def chat_completions(
 
                 except Exception as stream_error:
                     logger.error(f"Streaming error: {stream_error}", exc_info=True)
-                    error_data = {
-                        "error": {
-                            "message": f"Streaming error: {str(stream_error)}",
-                            "type": "internal_error"
-                        }
-                    }
-                    yield f"data: {json.dumps(error_data)}\n\n"
+                    yield sse_error_frame(f"Streaming error: {str(stream_error)}", "internal_error")
+                finally:
+                    # Provider error, stream failure, unbilled free request or
+                    # client disconnect: give the reserved credits back
+                    if credit_hold_id and not settled:
+                        await credit_system.release_hold(user_id, credit_hold_id)
+
+            # The generator settles or releases the hold from here on
+            hold_settled = True
 
             # Return streaming response with aggressive anti-buffering headers
             return StreamingResponse(
@@ -1446,11 +1325,31 @@ async def chat_completions(
 
         else:
             # NON-STREAMING PATH: Return complete JSON response
-            async with httpx.AsyncClient(timeout=120.0) as client:
+            # Deterministic requests may be replayed from the opt-in response
+            # cache (scoped per org/user, see response_cache)
+            response_data = None
+            cache_status = None
+            response_cache = get_response_cache()
+            if (
+                response_cache is not None
+                and not using_byok
+                and is_deterministic(proxy_request)
+                and not wants_bypass(http_request.headers)
+            ):
+                cache_status = "miss"
+                response_cache_key = cache_key(org_id or user_id, proxy_request, provider_name, base_url)
+                response_data = response_cache.get(response_cache_key)
+                if response_data is not None:
+                    cache_status = "hit"
+                    logger.info(f"Response cache hit for {user_id} (model: {request.model})")
+
+            if response_data is None:
+                client = get_upstream_client(base_url)
                 response = await client.post(
                     f"{base_url}/chat/completions",
                     json=proxy_request,
-                    headers=headers
+                    headers=headers,
+                    timeout=upstream_timeout(base_url, 120.0)
                 )
 
                 if response.status_code != 200:
@@ -1477,6 +1376,9 @@ async def chat_completions(
                         detail=f"Invalid response from LLM provider: {str(json_error)}"
                     )
 
+                if cache_status == "miss" and response_data.get('choices'):
+                    response_cache.put(response_cache_key, response_data)
+
         # Extract usage information (non-streaming only)
         usage = response_data.get('usage', {})
         tokens_used = usage.get('total_tokens', estimated_tokens)
@@ -1491,6 +1393,9 @@ async def chat_completions(
             is_local=is_local_provider,
             local_rate_per_1k=local_rate_per_1k
         )
+        if cache_status == "hit":
+            # Replayed responses are billed at a discount of the original cost
+            actual_cost = round(actual_cost * LLM_RESPONSE_CACHE_CHARGE, 6)
 
         # Debit credits (skip if using BYOK - user pays provider directly)
         if using_byok:
@@ -1499,7 +1404,7 @@ async def chat_completions(
                 # Get org balance for display
                 _, _, new_balance = await get_org_credit_integration().get_user_org_credits(
                     user_id=user_id,
-                    request_state=getattr(request, 'state', None) if hasattr(request, 'state') else None
+                    request_state=http_request.state
                 )
                 new_balance = new_balance / 1000.0 if new_balance else 0.0  # Convert milicredits to credits
             else:
@@ -1549,14 +1454,16 @@ async def chat_completions(
                         'power_level': power_level,
                         'task_type': request.task_type,
                         'cost': actual_cost
-                    }
+                    },
+                    hold_id=credit_hold_id
                 )
+                hold_settled = True
         else:
             # Free tier with free model
             if org_id:
                 _, _, new_balance = await get_org_credit_integration().get_user_org_credits(
                     user_id=user_id,
-                    request_state=getattr(request, 'state', None) if hasattr(request, 'state') else None
+                    request_state=http_request.state
                 )
                 new_balance = new_balance / 1000.0 if new_balance else 0.0
             else:
@@ -1603,6 +1510,7 @@ async def chat_completions(
             'user_tier': user_tier,
             'using_byok': using_byok,
             'byok_provider': detected_provider if using_byok else None,
+            'response_cache': cache_status,
             # This handler is the authoritative debit point (org/individual
             # deduction + Lago metering already happened above). The credit
             # middleware MUST NOT debit again — it keys off this flag.
@@ -1616,6 +1524,12 @@ async def chat_completions(
     except Exception as e:
         logger.error(f"Chat completion error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        # Any path that didn't debit against the hold (cap exceeded, upstream
+        # error, federation, free request) releases it instead of waiting
+        # out ORG_CREDIT_HOLD_TTL
+        if credit_hold_id and not hold_settled:
+            await credit_system.release_hold(user_id, credit_hold_id)
 
 
 # ============================================================================
@@ -2693,53 +2607,14 @@ def get_model_pricing(model_id: str, model_info: dict, tier_markup: float) -> di
     Returns:
         Dict with: credits_per_1k_input, credits_per_1k_output, tier_markup, display
     """
-    try:
-        logger.info(f"[PRICING DEBUG] Calculating for {model_id}, markup: {tier_markup}%")
-
-        # Get base costs from OpenRouter pricing data (already per-token)
-        pricing_data = model_info.get('pricing', {})
-        logger.info(f"[PRICING DEBUG] pricing_data: {pricing_data}")
-
-        # Base cost is per-token, we want per-1K tokens
-        base_input_cost = float(pricing_data.get('prompt', 0)) * 1000
-        base_output_cost = float(pricing_data.get('completion', 0)) * 1000
-
-        # If no pricing data, check model_info for pre-calculated values
-        if base_input_cost == 0 and base_output_cost == 0:
-            base_input_cost = float(model_info.get('cost_per_1m_input', 0)) / 1000  # Convert 1M to 1K
-            base_output_cost = float(model_info.get('cost_per_1m_output', 0)) / 1000
-            logger.info(f"[PRICING DEBUG] Using cost_per_1m: input={base_input_cost}, output={base_output_cost}")
-
-        # Apply tier markup: final_cost = base_cost * (1 + markup/100)
-        markup_multiplier = 1 + (tier_markup / 100)
-        final_input_cost = base_input_cost * markup_multiplier
-        final_output_cost = base_output_cost * markup_multiplier
-
-        # Convert to credits (1 credit = $0.001)
-        credits_per_1k_input = final_input_cost * 1000  # Convert dollars to credits
-        credits_per_1k_output = final_output_cost * 1000
-
-        result = {
-            'credits_per_1k_input': round(credits_per_1k_input, 4),
-            'credits_per_1k_output': round(credits_per_1k_output, 4),
-            'tier_markup': tier_markup,
-            'display': f"{round(credits_per_1k_input, 2)}/{round(credits_per_1k_output, 2)} credits per 1K tokens"
-        }
-        logger.info(f"[PRICING DEBUG] Result: {result}")
-        return result
-
-    except (ValueError, TypeError, KeyError) as e:
-        logger.warning(f"Failed to calculate pricing for {model_id}: {e}")
-        return {
-            'credits_per_1k_input': 0,
-            'credits_per_1k_output': 0,
-            'tier_markup': tier_markup,
-            'display': 'Pricing unavailable'
-        }
+    key = (model_info.get('provider') or '', model_id)
+    return get_pricing_snapshot().price_catalog([(*key, model_info)], tier_markup)[key]
 
 
 @router.get("/models/categorized")
 async def list_models_categorized(
+    http_request: Request,
+    response: Response,
     user_id: str = Depends(get_user_id),
     byok_manager: BYOKManager = Depends(get_byok_manager),
     credit_system: CreditSystem = Depends(get_credit_system)
@@ -2747,8 +2622,9 @@ async def list_models_categorized(
     """
     List models categorized by access method (BYOK vs Platform)
 
-    Dynamically fetches models from LiteLLM proxy and categorizes them based on
-    user's BYOK providers (OpenRouter, HuggingFace, etc.)
+    Serves the shared LiteLLM/OpenRouter listing snapshot (see model_listing)
+    and categorizes it based on user's BYOK providers (OpenRouter, HuggingFace,
+    etc.). Responses carry an ETag; a matching If-None-Match returns 304.
 
     Returns:
         {
@@ -2758,162 +2634,31 @@ async def list_models_categorized(
         }
     """
     try:
-        # Get user's tier and tier markup percentage
-        user_tier = await credit_system.get_user_tier(user_id)
-
-        # Fetch tier markup from database
-        tier_markup = 0.0
-        try:
-            async with credit_system.db_pool.acquire() as conn:
-                tier_result = await conn.fetchrow(
-                    "SELECT llm_markup_percentage FROM subscription_tiers WHERE tier_code = $1",
-                    user_tier
-                )
-                if tier_result:
-                    tier_markup = float(tier_result['llm_markup_percentage'] or 0)
-                    logger.info(f"User {user_id} tier {user_tier} has markup {tier_markup}%")
-        except Exception as e:
-            logger.warning(f"Failed to fetch tier markup for {user_tier}: {e}")
-            tier_markup = 0.0
-
-        # Get user's BYOK providers
-        byok_providers_list = await byok_manager.list_user_providers(user_id)
-        byok_provider_names = {p['provider'].lower() for p in byok_providers_list if p.get('enabled')}
-
-        # Fetch models from LiteLLM proxy
-        import httpx
-        litellm_url = os.getenv("LITELLM_PROXY_URL", "http://uchub-litellm:4000")
-        litellm_key = os.getenv("LITELLM_MASTER_KEY", "sk-REDACTED_LITELLM_MASTER_KEY")
-
-        # Get OpenRouter API key for pricing data
-        openrouter_key = os.getenv("OPENROUTER_API_KEY", "")
-
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            # Fetch base model list from LiteLLM
-            response = await client.get(
-                f"{litellm_url}/v1/models",
-                headers={"Authorization": f"Bearer {litellm_key}"}
-            )
-            response.raise_for_status()
-            models_data = response.json()
-
-            # Fetch detailed model info from OpenRouter (pricing, context, descriptions)
-            openrouter_models = {}
-            try:
-                or_response = await client.get(
-                    "https://openrouter.ai/api/v1/models",
-                    headers={"Authorization": f"Bearer {openrouter_key}"},  # FIXED: Use correct OpenRouter key
-                    timeout=10.0
-                )
-                if or_response.status_code == 200:
-                    or_data = or_response.json()
-                    for model in or_data.get('data', []):
-                        model_id = model.get('id', '')
-                        openrouter_models[model_id] = {
-                            'context_length': model.get('context_length', 0),
-                            'pricing': model.get('pricing', {}),
-                            'description': model.get('description', ''),
-                            'architecture': model.get('architecture', {}),
-                            'top_provider': model.get('top_provider', {}),
-                        }
-                    logger.info(f"Fetched metadata for {len(openrouter_models)} OpenRouter models")
-            except Exception as e:
-                logger.warning(f"Failed to fetch OpenRouter model metadata: {e}")
-
-        # Process models
-        all_models = models_data.get('data', [])
+        # Shared base catalog (refreshed in the background) + per-user overlay
+        listing = await get_model_listing().get()
+        user_tier, byok_provider_names = await get_user_overlay(user_id, credit_system, byok_manager)
 
-        # Group models by provider
-        provider_models = {}
-        for model in all_models:
-            model_id = model.get('id', '')
+        # Tier markup from the in-memory pricing snapshot
+        snapshot = get_pricing_snapshot(credit_system.db_pool)
+        tier_markup = snapshot.tier_markup_pct(user_tier, default=0.0)
 
-            # Skip wildcard entries
-            if '/*' in model_id or model_id == '*/*':
-                continue
-
-            # Determine provider from model ID
-            provider = None
-            if model_id.startswith('gpt-') or model_id.startswith('o1-'):
-                provider = 'openai'
-            elif model_id.startswith('claude-'):
-                provider = 'anthropic'
-            elif model_id.startswith('gemini-'):
-                provider = 'google'
-            elif model_id.startswith('llama-'):
-                provider = 'meta'
-            elif model_id.startswith('mistral-') or model_id.startswith('mixtral-'):
-                provider = 'mistral'
-            elif model_id.startswith('deepseek-'):
-                provider = 'deepseek'
-            elif '/' in model_id:
-                # Format like "openrouter/anthropic/claude-3.5-sonnet"
-                parts = model_id.split('/')
-                if len(parts) >= 2:
-                    provider = parts[0].lower()
-            else:
-                provider = 'other'
-
-            if provider not in provider_models:
-                provider_models[provider] = []
-
-            # Build model info with metadata
-            model_info = {
-                'id': model_id,
-                'object': 'model',
-                'name': model_id,
-                'display_name': model_id.replace('/', ' / '),
-                'created': model.get('created', 0)
-            }
-
-            # Add OpenRouter metadata if available
-            if model_id in openrouter_models:
-                or_meta = openrouter_models[model_id]
-                model_info['context_length'] = or_meta.get('context_length', 0)
-                model_info['description'] = or_meta.get('description', '')
-
-                # Add pricing info (convert from per-token to per-1M-tokens)
-                pricing = or_meta.get('pricing', {})
-                if pricing:
-                    try:
-                        # OpenRouter returns price per token (e.g., "0.000003")
-                        # Convert to price per 1M tokens
-                        prompt_price = float(pricing.get('prompt', '0'))
-                        completion_price = float(pricing.get('completion', '0'))
-
-                        model_info['cost_per_1m_input'] = prompt_price * 1_000_000
-                        model_info['cost_per_1m_output'] = completion_price * 1_000_000
-
-                        # Keep raw pricing for reference
-                        model_info['pricing'] = {
-                            'prompt': pricing.get('prompt', '0'),
-                            'completion': pricing.get('completion', '0'),
-                            'request': pricing.get('request', '0'),
-                            'image': pricing.get('image', '0')
-                        }
-                    except (ValueError, TypeError):
-                        logger.warning(f"Failed to parse pricing for {model_id}")
-                        model_info['cost_per_1m_input'] = 0
-                        model_info['cost_per_1m_output'] = 0
-
-                # Add architecture info (modality, instruct type)
-                arch = or_meta.get('architecture', {})
-                if arch:
-                    model_info['architecture'] = {
-                        'modality': arch.get('modality', 'text'),
-                        'tokenizer': arch.get('tokenizer', ''),
-                        'instruct_type': arch.get('instruct_type', '')
-                    }
+        # Federated local models: published by a trusted peer (e.g. bigboy's
+        # GPUs) and served through this node's LLM API.
+        try:
+            from federation_llm_bridge import federated_models
+            federated = await federated_models()
+        except Exception as fed_err:
+            logger.debug(f"Federated model categorization skipped: {fed_err}")
+            federated = {}
 
-            # Add tier-based pricing for platform models
-            if model_info.get('pricing') or model_info.get('cost_per_1m_input'):
-                tier_pricing = get_model_pricing(model_id, model_info, tier_markup)
-                model_info['tier_pricing'] = tier_pricing
-                logger.info(f"[PRICING DEBUG] Model {model_id} has tier_pricing: {tier_pricing}")
-            else:
-                logger.info(f"[PRICING DEBUG] Model {model_id} missing pricing data: pricing={model_info.get('pricing')}, cost_per_1m_input={model_info.get('cost_per_1m_input')}")
+        etag = listing_etag(listing, tier_markup, byok_provider_names, federated)
+        if etag in http_request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
 
-            provider_models[provider].append(model_info)
+        # Tier pricing is computed once per markup and shared by the whole tier
+        provider_models = listing.priced(snapshot, tier_markup)
 
         # Categorize by BYOK vs Platform
         byok_models = []
@@ -2960,38 +2705,33 @@ async def list_models_categorized(
                 provider_info['source'] = 'platform'
                 platform_models.append(provider_info)
 
-        # Federated local models: published by a trusted peer (e.g. bigboy's
-        # GPUs) and served through this node's LLM API. They are platform
-        # models (metered on the org's per-org gateway key), grouped on their
-        # own so the UI can show "local / sovereign" provenance.
-        try:
-            from federation_llm_bridge import federated_models
-            listed_ids = {
-                m['id']
-                for grp in (byok_models + platform_models)
-                for m in grp['models']
-            }
-            fed_by_node = {}
-            for model_id, node_id in (await federated_models()).items():
-                if model_id and model_id not in listed_ids:
-                    fed_by_node.setdefault(node_id, []).append({
-                        'id': model_id, 'object': 'model', 'name': model_id,
-                        'display_name': model_id,
-                        'federated_node': node_id,
-                    })
-            for node_id, models_list in fed_by_node.items():
-                platform_models.append({
-                    'provider': f'Federation · {node_id}',
-                    'provider_type': 'federation',
-                    'models': models_list,
-                    'count': len(models_list),
-                    'tier_markup': tier_markup,
-                    'note': f'Local model served via federation from {node_id}',
-                    'source': 'federation',
+        # Federated models are platform models (metered on the org's per-org
+        # gateway key), grouped on their own so the UI can show
+        # "local / sovereign" provenance.
+        listed_ids = {
+            m['id']
+            for grp in (byok_models + platform_models)
+            for m in grp['models']
+        }
+        fed_by_node = {}
+        for model_id, node_id in federated.items():
+            if model_id and model_id not in listed_ids:
+                fed_by_node.setdefault(node_id, []).append({
+                    'id': model_id, 'object': 'model', 'name': model_id,
+                    'display_name': model_id,
                     'federated_node': node_id,
                 })
-        except Exception as fed_err:
-            logger.debug(f"Federated model categorization skipped: {fed_err}")
+        for node_id, models_list in fed_by_node.items():
+            platform_models.append({
+                'provider': f'Federation · {node_id}',
+                'provider_type': 'federation',
+                'models': models_list,
+                'count': len(models_list),
+                'tier_markup': tier_markup,
+                'note': f'Local model served via federation from {node_id}',
+                'source': 'federation',
+                'federated_node': node_id,
+            })
 
         # Build summary
         total_byok = sum(p['count'] for p in byok_models)
@@ -3005,7 +2745,7 @@ async def list_models_categorized(
                 'byok_count': total_byok,
                 'platform_count': total_platform,
                 'has_byok_keys': len(byok_provider_names) > 0,
-                'byok_providers': list(byok_provider_names)
+                'byok_providers': sorted(byok_provider_names)
             }
         }
 
@@ -3093,6 +2833,7 @@ async def add_byok_key(
             api_key=request.api_key,
             metadata=request.metadata
         )
+        invalidate_user_overlay(user_id)
 
         logger.info(f"User {user_id} added/updated BYOK key for {request.provider}")
 
@@ -3135,6 +2876,7 @@ async def delete_byok_key(
     """Delete user's API key for a provider"""
     try:
         deleted = await byok_manager.delete_user_api_key(user_id, provider)
+        invalidate_user_overlay(user_id)
 
         if not deleted:
             raise HTTPException(status_code=404, detail="Provider key not found")
@@ -3170,6 +2912,7 @@ async def toggle_byok_key(
     """
     try:
         updated = await byok_manager.toggle_provider(user_id, provider, request.enabled)
+        invalidate_user_overlay(user_id)
 
         if not updated:
             raise HTTPException(
@@ -3937,6 +3680,7 @@ async def bulk_update_models(
                 """, model_id, provider_id, enabled)
                 updated_count += 1
 
+        invalidate_route_table()
         logger.info(f"Admin {user_id} bulk updated {updated_count} models to enabled={enabled}")
 
         return {
@@ -3993,6 +3737,7 @@ async def toggle_model_status(
                     WHERE name = $2
                 """, new_status, model_id)
 
+                invalidate_route_table()
                 logger.info(f"Admin {user_id} set model {model_id} to {'enabled' if new_status else 'disabled'}")
 
                 return {
@@ -4021,6 +3766,7 @@ async def toggle_model_status(
                     VALUES ($1, $2, $2, TRUE, NOW(), NOW())
                 """, provider['id'], model_id)
 
+                invalidate_route_table()
                 logger.info(f"Admin {user_id} enabled new model {model_id}")
 
                 return {
@@ -23,6 +23,10 @@ import asyncpg
 import redis.asyncio as aioredis
 from fastapi import HTTPException
 
+from lago_metering import LagoMeteringQueue, build_usage_event, get_lago_metering_queue
+from org_credit_holds import OrgCreditHolds, OrgCreditMirrorUnavailable, get_org_credit_holds
+from pricing_snapshot import get_pricing_snapshot
+
 logger = logging.getLogger(__name__)
 
 
@@ -118,10 +122,23 @@ TIER_MARKUP = {
 class CreditSystem:
     """Core credit management system for LLM usage"""
 
-    def __init__(self, db_pool: asyncpg.Pool, redis_client: aioredis.Redis):
+    def __init__(
+        self,
+        db_pool: asyncpg.Pool,
+        redis_client: aioredis.Redis,
+        metering: Optional[LagoMeteringQueue] = None,
+        holds: Optional[OrgCreditHolds] = None,
+        background_pool: Optional[asyncpg.Pool] = None
+    ):
         self.db_pool = db_pool
+        # Fire-and-forget side work (notifications) must not drain the request budget
+        self.background_pool = background_pool or db_pool
         self.redis = redis_client
         self.cache_ttl = 60  # 60 seconds cache
+        # Lago usage events are batched off the request path (see lago_metering)
+        self.metering = metering or get_lago_metering_queue()
+        # Service org debits use holds + a ledger instead of a pool row lock
+        self.holds = holds or get_org_credit_holds()
 
     async def get_user_credits(self, user_id: str) -> float:
         """
@@ -202,11 +219,50 @@ class CreditSystem:
             logger.error(f"Error getting user credits: {e}")
             raise HTTPException(status_code=500, detail="Failed to retrieve credit balance")
 
+    async def hold_credits(self, user_id: str, amount: float) -> Optional[str]:
+        """
+        Pre-authorize an estimated amount for a service organization
+
+        Only service org IDs ('org_' prefix) are held; the hold is settled by
+        passing its ID to debit_credits and lapses on its own otherwise.
+
+        Args:
+            user_id: User identifier or organization ID
+            amount: Estimated cost to reserve (credits)
+
+        Returns:
+            Hold ID, or None when holds don't apply (regular user, holds
+            disabled or mirror unavailable) - callers then check the balance
+            themselves
+
+        Raises:
+            HTTPException: 402 if the pool can't cover the estimate
+        """
+        if not (user_id and user_id.startswith('org_')) or not self.holds.enabled:
+            return None
+        try:
+            hold_id, available = await self.holds.hold(user_id[4:], amount)
+        except OrgCreditMirrorUnavailable as e:
+            logger.warning(f"Credit hold unavailable for {user_id}, using balance check: {e}")
+            return None
+        if hold_id is None:
+            raise HTTPException(
+                status_code=402,  # Payment Required
+                detail=f"Insufficient service credits for {user_id}. Balance: {available:.2f}, Required: {amount:.2f}"
+            )
+        return hold_id
+
+    async def release_hold(self, user_id: str, hold_id: Optional[str]) -> None:
+        """Give back a hold whose request never completed"""
+        if hold_id and user_id and user_id.startswith('org_'):
+            await self.holds.release(user_id[4:], hold_id)
+
     async def debit_credits(
         self,
         user_id: str,
         amount: float,
-        metadata: Dict
+        metadata: Dict,
+        hold_id: Optional[str] = None
     ) -> Tuple[float, str]:
         """
         Debit credits from user or service organization account
@@ -218,6 +274,7 @@ class CreditSystem:
             user_id: User identifier or organization ID
             amount: Amount to debit (positive number, in credits)
             metadata: Transaction metadata (provider, model, tokens, etc.)
+            hold_id: Hold from hold_credits to settle (service orgs only)
 
         Returns:
             Tuple of (new_balance, transaction_id)
@@ -225,12 +282,40 @@ class CreditSystem:
         Raises:
             HTTPException: If insufficient credits
         """
+        # Service orgs settle against the Redis mirror; the pool row is only
+        # touched by the ledger flusher (see org_credit_holds).
+        settled_balance = None
+        if user_id and user_id.startswith('org_') and self.holds.enabled:
+            try:
+                settled, available = await self.holds.settle(user_id[4:], amount, hold_id)
+            except OrgCreditMirrorUnavailable as e:
+                logger.warning(f"Credit mirror unavailable for {user_id}, using locked debit: {e}")
+            else:
+                if not settled:
+                    raise HTTPException(
+                        status_code=402,  # Payment Required
+                        detail=f"Insufficient service credits for {user_id}. Balance: {available:.2f}, Required: {amount:.2f}"
+                    )
+                settled_balance = available
+
         try:
             async with self.db_pool.acquire() as conn:
                 # Start transaction
                 async with conn.transaction():
                     # Check if this is a service organization ID
-                    if user_id and user_id.startswith('org_'):
+                    if settled_balance is not None:
+                        # Service organization billing, already settled in the
+                        # mirror: append to the ledger (no pool row lock)
+                        org_uuid = user_id[4:]
+                        current_balance = settled_balance + amount
+                        ledger_id = await self.holds.record(conn, org_uuid, amount, hold_id, metadata)
+                        new_balance = settled_balance
+                        await self._log_service_usage(conn, user_id, org_uuid, amount, metadata)
+                        transaction_id = f"svc_{user_id}_{ledger_id}"
+
+                        logger.info(f"✅ Service org {user_id} debited {amount} credits. New balance: {new_balance:.2f}")
+
+                    elif user_id and user_id.startswith('org_'):
                         # Service organization billing - strip 'org_' prefix for UUID lookup
                         org_uuid = user_id[4:]  # Remove 'org_' prefix to get raw UUID
                         result = await conn.fetchrow(
@@ -272,27 +357,7 @@ class CreditSystem:
                         )
                         new_balance = current_balance - amount
 
-                        # Log service usage for analytics (optional - table may not exist)
-                        try:
-                            service_name = metadata.get('service_name', user_id.replace('org_', '').replace('_service', ''))
-                            await conn.execute(
-                                """
-                                INSERT INTO service_usage_log (
-                                    service_org_id, service_name, endpoint,
-                                    credits_used, model_used, user_id, request_metadata
-                                )
-                                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                                """,
-                                org_uuid,
-                                service_name,
-                                metadata.get('endpoint', '/api/v1/llm/chat/completions'),
-                                amount,
-                                metadata.get('model', 'unknown'),
-                                metadata.get('proxied_user_id'),  # NULL if service-initiated
-                                json.dumps(metadata)
-                            )
-                        except Exception as log_error:
-                            logger.debug(f"Service usage log not recorded (table may not exist): {log_error}")
+                        await self._log_service_usage(conn, user_id, org_uuid, amount, metadata)
 
                         # Create placeholder transaction ID for service
                         transaction_id = f"svc_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
@@ -359,59 +424,29 @@ class CreditSystem:
                             json.dumps(metadata)
                         )
 
+                    # Stage the Lago usage event in the outbox on this same
+                    # transaction (resolves the org in-statement, no second acquire).
+                    lago_staged = None
+                    lago_event = None
+                    try:
+                        lago_event = build_usage_event(user_id, transaction_id, amount, metadata)
+                        lago_staged = await self.metering.stage(
+                            conn, user_id, metadata.get('org_id'), lago_event
+                        )
+                    except Exception as e:
+                        logger.warning(f"Failed to stage Lago event (non-blocking): {e}")
+
             # Invalidate cache
             await self.redis.delete(f"credits:balance:{user_id}")
 
-            # NEW: Send metering event to Lago (non-blocking)
-            try:
-                from lago_integration import record_api_call
-
-                # Get user's org_id from metadata or database
-                org_id = metadata.get('org_id')
-
-                if not org_id:
-                    # Query database to get org_id for user
-                    async with self.db_pool.acquire() as conn_org:
-                        org_result = await conn_org.fetchrow(
-                            """
-                            SELECT org_id
-                            FROM organization_members
-                            WHERE user_id = $1
-                            LIMIT 1
-                            """,
-                            user_id
-                        )
-                        if org_result:
-                            org_id = str(org_result['org_id'])
-
-                if org_id:
-                    # Build properties with cost information
-                    properties = {
-                        "endpoint": metadata.get('endpoint', '/api/v1/llm/chat/completions'),
-                        "user_id": user_id,
-                        "tokens": metadata.get('tokens_used', 0),
-                        "cost": float(amount),  # Cost in credits
-                    }
-                    if metadata.get('model'):
-                        properties["model"] = metadata.get('model')
-                    if metadata.get('provider'):
-                        properties["provider"] = metadata.get('provider')
-
-                    # Send usage event to Lago using record_usage (more flexible than record_api_call)
-                    from lago_integration import record_usage
-                    await record_usage(
-                        org_id=org_id,
-                        event_code="api_call",
-                        transaction_id=str(transaction_id),
-                        properties=properties
-                    )
-                    logger.info(f"✓ Sent Lago metering event for org {org_id}: {amount} credits, {metadata.get('tokens_used', 0)} tokens, model: {metadata.get('model', 'unknown')}")
-                else:
-                    logger.warning(f"No org_id found for user {user_id}, skipping Lago event")
-
-            except Exception as e:
-                # Non-blocking: Don't fail credit deduction if Lago is down
-                logger.warning(f"Failed to record Lago event (non-blocking): {e}")
+            # Hand the committed event to the background batcher (non-blocking):
+            # Lago delivery happens off the request path, undelivered events are
+            # replayed from the outbox.
+            if lago_staged:
+                outbox_id, org_id = lago_staged
+                self.metering.enqueue(org_id, lago_event, outbox_id)
+            elif lago_event is not None:
+                logger.debug(f"No org_id found for user {user_id}, skipping Lago event")
 
             # ------------------------------------------------------------------
             # APPEND-ONLY HOOK (T7): low-credit email notification.
@@ -428,7 +463,7 @@ class CreditSystem:
                             user_id=user_id,
                             previous_balance=float(current_balance),
                             new_balance=float(new_balance),
-                            db_pool=self.db_pool,
+                            db_pool=self.background_pool,
                         )
                     )
             except Exception as notify_exc:
@@ -438,11 +473,46 @@ class CreditSystem:
             return new_balance, str(transaction_id)
 
         except HTTPException:
+            if settled_balance is not None:
+                await self.holds.refund(user_id[4:], amount)
             raise
         except Exception as e:
+            if settled_balance is not None:
+                await self.holds.refund(user_id[4:], amount)
             logger.error(f"Error debiting credits: {e}")
             raise HTTPException(status_code=500, detail="Failed to debit credits")
 
+    async def _log_service_usage(
+        self,
+        conn,
+        user_id: str,
+        org_uuid: str,
+        amount: float,
+        metadata: Dict
+    ) -> None:
+        """Log service usage for analytics (optional - table may not exist)"""
+        try:
+            service_name = metadata.get('service_name', user_id.replace('org_', '').replace('_service', ''))
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    INSERT INTO service_usage_log (
+                        service_org_id, service_name, endpoint,
+                        credits_used, model_used, user_id, request_metadata
+                    )
+                    VALUES ($1, $2, $3, $4, $5, $6, $7)
+                    """,
+                    org_uuid,
+                    service_name,
+                    metadata.get('endpoint', '/api/v1/llm/chat/completions'),
+                    amount,
+                    metadata.get('model', 'unknown'),
+                    metadata.get('proxied_user_id'),  # NULL if service-initiated
+                    json.dumps(metadata)
+                )
+        except Exception as log_error:
+            logger.debug(f"Service usage log not recorded (table may not exist): {log_error}")
+
     async def credit_credits(
         self,
         user_id: str,
@@ -567,7 +637,11 @@ class CreditSystem:
         local_rate_per_1k: Optional[float] = None,
     ) -> float:
         """
-        Calculate cost for LLM request - NOW ASYNC WITH DB LOOKUP
+        Calculate cost for LLM request from the in-memory pricing snapshot
+
+        Kept async for existing callers; no I/O happens here. Tier markups
+        come from subscription_tiers via pricing_snapshot (refreshed in the
+        background), falling back to TIER_MARKUP for unknown tiers.
 
         Args:
             tokens_used: Total tokens (prompt + completion)
@@ -587,52 +661,18 @@ class CreditSystem:
             Cost in credits (float)
         """
         try:
+            snapshot = get_pricing_snapshot(self.db_pool)
+
             # Get base cost from model pricing
             if is_local:
                 # Authoritative: local is free by default, or the metered local rate.
                 base_cost_per_1k = (
-                    local_rate_per_1k if local_rate_per_1k is not None else PRICING["local"]
+                    local_rate_per_1k if local_rate_per_1k is not None else snapshot.provider_pricing["local"]
                 )
-            elif model in MODEL_PRICING:
-                base_cost_per_1k = MODEL_PRICING[model]
             else:
-                # Extract provider from model name
-                provider = self._extract_provider(model)
-                base_cost_per_1k = PRICING.get(provider, PRICING["default"])
+                base_cost_per_1k = snapshot.base_rate_per_1k(model, self._extract_provider(model))
 
-            # Calculate base cost
-            base_cost = (tokens_used / 1000) * base_cost_per_1k
-
-            # Apply power level multiplier
-            power_config = POWER_LEVELS.get(power_level, POWER_LEVELS["balanced"])
-            cost_with_power = base_cost * power_config["cost_multiplier"]
-
-            # FETCH TIER MARKUP FROM DATABASE instead of hardcoded
-            tier_markup_pct = 0.0
-            try:
-                async with self.db_pool.acquire() as conn:
-                    result = await conn.fetchrow(
-                        "SELECT llm_markup_percentage FROM subscription_tiers WHERE tier_code = $1",
-                        user_tier
-                    )
-                    if result:
-                        tier_markup_pct = float(result['llm_markup_percentage'])
-                        logger.info(f"Tier {user_tier} markup from DB: {tier_markup_pct}%")
-                    else:
-                        logger.warning(f"No tier found for '{user_tier}' in database, using fallback")
-                        # Fallback to hardcoded values only if DB lookup fails
-                        tier_markup_pct = TIER_MARKUP.get(user_tier, 0) * 100
-            except Exception as db_err:
-                logger.error(f"Failed to fetch tier markup from database: {db_err}, using fallback")
-                # Fallback to hardcoded values
-                tier_markup_pct = TIER_MARKUP.get(user_tier, 0) * 100
-
-            # Apply tier markup
-            tier_multiplier = 1 + (tier_markup_pct / 100)
-            final_cost = cost_with_power * tier_multiplier
-
-            # Round to 6 decimal places
-            return round(final_cost, 6)
+            return snapshot.cost(tokens_used, base_cost_per_1k, power_level, user_tier)
 
         except Exception as e:
             logger.error(f"Error calculating cost: {e}")
@@ -29,6 +29,8 @@ import psycopg2
 from psycopg2.extras import RealDictCursor, Json
 import redis
 
+from llm_route_table import invalidate_route_table
+
 logger = logging.getLogger(__name__)
 
 # Router
@@ -423,6 +425,7 @@ async def create_provider(provider: ProviderCreate):
 
         result = cursor.fetchone()
         conn.commit()
+        invalidate_route_table()
 
         # Test provider connection
         provider_id = str(result['id'])
@@ -512,6 +515,7 @@ async def update_provider(provider_id: str, update: ProviderUpdate):
             raise HTTPException(status_code=404, detail="Provider not found")
 
         conn.commit()
+        invalidate_route_table()
 
         return {
             "id": str(result['id']),
@@ -555,6 +559,7 @@ async def delete_provider(provider_id: str):
             raise HTTPException(status_code=404, detail="Provider not found")
 
         conn.commit()
+        invalidate_route_table()
 
         return {"message": "Provider deleted successfully", "id": provider_id}
 
@@ -754,6 +759,7 @@ async def create_model(model: ModelCreate):
 
         result = cursor.fetchone()
         conn.commit()
+        invalidate_route_table()
 
         return {
             "id": str(result['id']),
@@ -0,0 +1,246 @@
+"""
+In-memory LLM provider routing table for system-key chat completions.
+
+Resolving a provider used to cost every system-key request an
+llm_models JOIN llm_providers query, a priority fallback query, a JSON decode
+of provider.config and a Fernet decryption of the provider key. The table
+below resolves all of that once per refresh:
+
+    model name -> ProviderRoute(provider, base URL, locality, key, headers)
+
+plus the highest-priority fallback route for models without a mapping.
+
+The table is rebuilt lazily on the next lookup after:
+  - `invalidate_route_table()`, called by the provider/model admin endpoints
+  - LLM_ROUTE_TABLE_TTL seconds (default 30), which bounds staleness for
+    writes made by other workers or directly in the database
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+ROUTE_TABLE_TTL = float(os.getenv("LLM_ROUTE_TABLE_TTL", "30"))
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Provider types that may be served without an API key
+LOCAL_PROVIDER_TYPES = ("openai_compatible", "local")
+
+_MODEL_ROUTES_QUERY = """
+    SELECT m.name AS model_name, p.id, p.name, p.type, p.api_key_encrypted,
+           p.api_base_url, p.config
+    FROM llm_models m
+    JOIN llm_providers p ON m.provider_id = p.id
+    WHERE m.enabled = true AND p.enabled = true
+    ORDER BY p.priority DESC
+"""
+
+_FALLBACK_ROUTE_QUERY = """
+    SELECT id, name, type, api_key_encrypted, api_base_url, config
+    FROM llm_providers
+    WHERE enabled = true AND type IN ('openai_compatible', 'openrouter', 'local')
+    ORDER BY priority DESC
+    LIMIT 1
+"""
+
+
+@dataclass(frozen=True)
+class ProviderRoute:
+    """A resolved upstream for system-key requests"""
+    provider_id: str
+    provider_name: str
+    provider_type: str
+    base_url: str
+    is_local: bool
+    api_key: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Request headers for this upstream (a fresh dict per call)"""
+        if self.is_local:
+            return {"Content-Type": "application/json"}
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://unicorncommander.ai",  # Required by OpenRouter
+            "X-Title": "UC-1 Pro Ops Center"  # Required by OpenRouter
+        }
+
+
+def _provider_config(row) -> Dict[str, Any]:
+    """provider.config may be a dict or a JSON string"""
+    config = row['config'] or {}
+    if isinstance(config, str):
+        try:
+            config = json.loads(config)
+        except ValueError:
+            logger.warning(f"Invalid config JSON for provider {row['name']}")
+            config = {}
+    return config
+
+
+def _is_local(row) -> bool:
+    api_base_url = row['api_base_url'] or ''
+    return row['type'] in LOCAL_PROVIDER_TYPES and (
+        api_base_url.startswith('http://') or
+        'localhost' in api_base_url or
+        'unicorn-' in api_base_url
+    )
+
+
+def _cipher(encryption_key: Optional[str]):
+    if not encryption_key:
+        return None
+    try:
+        from cryptography.fernet import Fernet
+        return Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
+    except Exception as e:
+        logger.warning(f"Invalid BYOK_ENCRYPTION_KEY, provider keys used as stored: {e}")
+        return None
+
+
+def _system_key(row, cipher) -> Optional[str]:
+    """
+    Provider key with the same precedence as SystemKeyManager.get_system_key
+    plus the direct-decryption fallback: decrypted DB key, then the
+    <NAME>_API_KEY environment variable, then the stored value as plain text.
+    """
+    encrypted = row['api_key_encrypted']
+    if cipher is not None:
+        if encrypted:
+            try:
+                return cipher.decrypt(encrypted.encode()).decode()
+            except Exception as e:
+                logger.error(f"Failed to decrypt system key for {row['name']}: {e}")
+        env_key = os.getenv(f"{row['name'].upper().replace('-', '_')}_API_KEY")
+        if env_key:
+            return env_key
+    return encrypted or None
+
+
+def build_route(row, cipher) -> ProviderRoute:
+    """Resolve one llm_providers row into a route"""
+    is_local = _is_local(row)
+    return ProviderRoute(
+        provider_id=str(row['id']),
+        provider_name=row['name'],
+        provider_type=row['type'],
+        base_url=row['api_base_url'] or _provider_config(row).get('base_url', DEFAULT_BASE_URL),
+        is_local=is_local,
+        api_key=None if is_local else _system_key(row, cipher),
+    )
+
+
+class RouteTable:
+    """Model name -> ProviderRoute, rebuilt on invalidation or TTL"""
+
+    def __init__(self, ttl: float = ROUTE_TABLE_TTL):
+        self.ttl = ttl
+        self._routes: Dict[str, ProviderRoute] = {}
+        self._fallback: Optional[ProviderRoute] = None
+        self._built_at = 0.0
+        self._version = 0
+        self._built_version = -1
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Rebuild on the next lookup"""
+        self._version += 1
+
+    def _fresh(self) -> bool:
+        return (
+            self._built_version == self._version
+            and time.monotonic() - self._built_at < self.ttl
+        )
+
+    async def _rebuild(self, db_pool, encryption_key: Optional[str]):
+        version = self._version
+        cipher = _cipher(encryption_key)
+        async with db_pool.acquire() as conn:
+            rows = await conn.fetch(_MODEL_ROUTES_QUERY)
+            fallback_row = await conn.fetchrow(_FALLBACK_ROUTE_QUERY)
+
+        # One route (and one decryption) per provider
+        by_provider: Dict[str, ProviderRoute] = {}
+
+        def route_for(row) -> ProviderRoute:
+            key = str(row['id'])
+            if key not in by_provider:
+                by_provider[key] = build_route(row, cipher)
+            return by_provider[key]
+
+        routes: Dict[str, ProviderRoute] = {}
+        for row in rows:
+            # Highest priority provider wins when a model name is mapped twice
+            routes.setdefault(row['model_name'], route_for(row))
+
+        self._routes = routes
+        self._fallback = route_for(fallback_row) if fallback_row else None
+        self._built_at = time.monotonic()
+        self._built_version = version
+        logger.info(f"LLM route table rebuilt: {len(routes)} models, {len(by_provider)} providers")
+
+    async def _ensure_fresh(self, db_pool, encryption_key: Optional[str]):
+        if self._fresh():
+            return
+        async with self._lock:
+            if self._fresh():
+                return
+            try:
+                await self._rebuild(db_pool, encryption_key)
+            except Exception as e:
+                if self._built_version < 0:
+                    raise
+                # Keep serving the last good table; retry after another TTL
+                logger.warning(f"LLM route table rebuild failed, serving previous table: {e}")
+                self._built_at = time.monotonic()
+                self._built_version = self._version
+
+    async def lookup(self, db_pool, model_name: str, encryption_key: Optional[str] = None) -> Optional[ProviderRoute]:
+        """Route for a model with an explicit provider mapping, if any"""
+        await self._ensure_fresh(db_pool, encryption_key)
+        return self._routes.get(model_name)
+
+    async def resolve(self, db_pool, model_name: str, encryption_key: Optional[str] = None) -> ProviderRoute:
+        """
+        Route for a model, falling back to the highest priority provider.
+
+        Raises:
+            HTTPException 503: no provider is configured
+        """
+        route = await self.lookup(db_pool, model_name, encryption_key)
+        if route:
+            logger.debug(f"Found model-specific provider for '{model_name}': {route.provider_name}")
+            return route
+        if self._fallback:
+            logger.info(f"No specific provider for '{model_name}', using highest priority")
+            return self._fallback
+        raise HTTPException(
+            status_code=503,
+            detail="No LLM providers configured. Please configure OpenRouter in Platform Settings."
+        )
+
+
+_route_table: Optional[RouteTable] = None
+
+
+def get_route_table() -> RouteTable:
+    """Get the process-wide routing table"""
+    global _route_table
+    if _route_table is None:
+        _route_table = RouteTable()
+    return _route_table
+
+
+def invalidate_route_table():
+    """Call after any write to llm_providers or llm_models"""
+    get_route_table().invalidate()
@@ -0,0 +1,784 @@
+"""
+Ingested container log store for the advanced log search.
+
+advanced_log_search used to run a blocking `docker logs --tail` subprocess
+per service on every search. It turned every line into a dict, ran one
+full-list pass per filter, then sorted and sliced the result. Searching
+across ~30 services held a worker for tens of seconds, and every page
+repeated the work.
+
+Logs are now ingested ahead of time and searched from disk:
+
+- LogIngestor discovers running containers and keeps one async
+  `docker logs --follow --timestamps` tail per container. Lines are batched
+  and appended to the store off the event loop. A restarted tail resumes
+  from the last stored timestamp; a new container starts with the last
+  LOG_INGEST_BACKFILL_LINES lines.
+- LogSegmentStore writes each service's lines to rolling JSONL segments
+  (<root>/<service>/<id>.jsonl). A segment rolls at LOG_SEGMENT_BYTES or
+  after LOG_SEGMENT_SECONDS. Every segment keeps an index entry with its
+  time range and per-severity counts, saved as a sidecar .idx.json once
+  sealed. Segments past LOG_STORE_RETENTION_HOURS, or beyond
+  LOG_STORE_MAX_BYTES in total, are dropped oldest first.
+- search() runs the filters as a single pass:
+  - The service, time and severity indexes pick candidate segments.
+  - Each service's segments are read newest first.
+  - A raw-line substring check skips JSON decoding for lines that can't
+    match the text query.
+  - Services are merged by timestamp. The pass stops once the page is full.
+- Pages continue by keyset cursor (timestamp, service, sequence), so
+  appends during paging don't shift results. Offsets still work.
+
+Environment:
+- LOG_INGEST_ENABLED: tail container logs in the background (default false;
+  without it log search reads `docker logs` per request)
+- LOG_STORE_DIR: segment directory (default /app/data/log_store)
+- LOG_SEGMENT_BYTES / LOG_SEGMENT_SECONDS: roll thresholds (1 MiB / 3600)
+- LOG_STORE_RETENTION_HOURS / LOG_STORE_MAX_BYTES: retention (72h / 1 GiB)
+- LOG_INGEST_DISCOVERY_SECONDS: container discovery interval (default 30)
+- LOG_INGEST_BACKFILL_LINES: lines read from a newly seen container (default 5000)
+"""
+
+import asyncio
+import base64
+import functools
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOG_INGEST_ENABLED = os.getenv("LOG_INGEST_ENABLED", "false").lower() == "true"
+LOG_STORE_DIR = os.getenv("LOG_STORE_DIR", "/app/data/log_store")
+LOG_SEGMENT_BYTES = int(os.getenv("LOG_SEGMENT_BYTES", str(1024 * 1024)))
+LOG_SEGMENT_SECONDS = int(os.getenv("LOG_SEGMENT_SECONDS", "3600"))
+LOG_STORE_RETENTION_HOURS = float(os.getenv("LOG_STORE_RETENTION_HOURS", "72"))
+LOG_STORE_MAX_BYTES = int(os.getenv("LOG_STORE_MAX_BYTES", str(1024 ** 3)))
+LOG_INGEST_DISCOVERY_SECONDS = float(os.getenv("LOG_INGEST_DISCOVERY_SECONDS", "30"))
+LOG_INGEST_BACKFILL_LINES = int(os.getenv("LOG_INGEST_BACKFILL_LINES", "5000"))
+LOG_INGEST_FLUSH_SECONDS = 0.5
+LOG_LINE_LIMIT = 1024 * 1024
+
+SEVERITIES = ("ERROR", "WARN", "INFO", "DEBUG")
+SEVERITY_ALIASES = {"WARNING": "WARN", "CRITICAL": "ERROR"}
+NS_PER_SECOND = 1_000_000_000
+
+# (timestamp ns, service, per-service sequence): unique and strictly
+# decreasing along each service's newest-first stream
+SortKey = Tuple[int, str, int]
+
+_SERVICE_DIR_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+# ============================================================================
+# Line parsing
+# ============================================================================
+
+def classify_severity(message: str) -> str:
+    """Severity from keywords in the message."""
+    message_upper = message.upper()
+    if "ERROR" in message_upper or "CRITICAL" in message_upper:
+        return "ERROR"
+    if "WARN" in message_upper:
+        return "WARN"
+    if "DEBUG" in message_upper:
+        return "DEBUG"
+    return "INFO"
+
+
+def parse_timestamp_ns(value: str) -> Optional[int]:
+    """RFC 3339 timestamp (nanosecond precision kept) to epoch ns; None if unparseable."""
+    value = value.strip()
+    if not value:
+        return None
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    # Split off the fraction, which fromisoformat can't take at nanosecond precision
+    fraction = 0
+    match = re.match(r"^([^.]+)\.(\d+)(.*)$", value)
+    if match:
+        digits = match.group(2)[:9]
+        fraction = int(digits.ljust(9, "0"))
+        value = match.group(1) + match.group(3)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp()) * NS_PER_SECOND + fraction
+
+
+def format_timestamp(ns: int) -> str:
+    seconds, fraction = divmod(ns, NS_PER_SECOND)
+    moment = datetime.fromtimestamp(seconds, tz=timezone.utc)
+    return moment.replace(microsecond=fraction // 1000).isoformat()
+
+
+def parse_log_line(line: str) -> Tuple[int, str, str]:
+    """`docker logs --timestamps` line to (epoch ns, display timestamp, message)."""
+    parts = line.split(maxsplit=1)
+    if len(parts) == 2:
+        ns = parse_timestamp_ns(parts[0])
+        if ns is not None:
+            return ns, format_timestamp(ns), parts[1]
+    ns = time.time_ns()
+    return ns, format_timestamp(ns), line
+
+
+def day_bound_ns(value: Optional[str], end: bool = False) -> Optional[int]:
+    """YYYY-MM-DD (UTC) to epoch ns; `end` bounds are exclusive and cover the whole day."""
+    if not value:
+        return None
+    day = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    if end:
+        day += timedelta(days=1)
+    return int(day.timestamp()) * NS_PER_SECOND
+
+
+@functools.lru_cache(maxsize=128)
+def compile_pattern(pattern: str) -> "re.Pattern":
+    return re.compile(pattern)
+
+
+def encode_cursor(key: SortKey) -> str:
+    raw = f"{key[0]}:{key[2]}:{key[1]}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ns, seq, service = raw.split(":", 2)
+        return (int(ns), service, int(seq))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# ============================================================================
+# Filters
+# ============================================================================
+
+class LogQuery:
+    """Search filters, normalized and compiled once per search."""
+
+    def __init__(
+        self,
+        query: Optional[str] = None,
+        severity: Optional[List[str]] = None,
+        services: Optional[List[str]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        regex: Optional[str] = None,
+    ):
+        self.text = query.lower() if query else None
+        self.severities: Optional[Set[str]] = (
+            {SEVERITY_ALIASES.get(s.upper(), s.upper()) for s in severity} if severity else None
+        )
+        self.services: Optional[Set[str]] = set(services) if services else None
+        self.start_ns = day_bound_ns(start_date)
+        self.end_ns = day_bound_ns(end_date, end=True)
+        self.pattern = compile_pattern(regex) if regex else None
+        # Substring test on the raw JSON line. Only safe when JSON encoding
+        # leaves the query's characters unchanged.
+        self.raw_text = (
+            self.text
+            if self.text and self.text.isprintable() and '"' not in self.text and "\\" not in self.text
+            else None
+        )
+
+    @classmethod
+    def from_request(cls, request) -> "LogQuery":
+        return cls(
+            query=request.query,
+            severity=request.severity,
+            services=request.services,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            regex=request.regex,
+        )
+
+    @property
+    def index_only(self) -> bool:
+        """True when segment severity counts alone give the exact match count."""
+        return not (self.text or self.pattern or self.start_ns is not None or self.end_ns is not None)
+
+    def matches(self, log: Dict[str, Any]) -> bool:
+        """Single-pass check of one log dict (timestamp/severity/service/message)."""
+        message = log["message"]
+        if self.text and self.text not in message.lower() and self.text not in log["service"].lower():
+            return False
+        if self.severities is not None and log["severity"] not in self.severities:
+            return False
+        if self.services is not None and log["service"] not in self.services:
+            return False
+        if self.start_ns is not None or self.end_ns is not None:
+            ns = parse_timestamp_ns(log.get("timestamp") or "")
+            # Logs with invalid timestamps are kept
+            if ns is not None:
+                if self.start_ns is not None and ns < self.start_ns:
+                    return False
+                if self.end_ns is not None and ns >= self.end_ns:
+                    return False
+        if self.pattern is not None and not self.pattern.search(message):
+            return False
+        return True
+
+
+# ============================================================================
+# Segment store
+# ============================================================================
+
+class Segment:
+    """Index entry for one JSONL segment file."""
+
+    def __init__(self, service: str, seg_id: int, path: Path):
+        self.service = service
+        self.seg_id = seg_id
+        self.path = path
+        self.size = 0
+        self.count = 0
+        self.min_t: Optional[int] = None
+        self.max_t: Optional[int] = None
+        self.last_seq = 0
+        self.severity_counts: Dict[str, int] = {}
+        self.created_at = time.time()
+        self.sealed = False
+
+    def add(self, t: int, seq: int, severity: str, nbytes: int) -> None:
+        if self.min_t is None:
+            self.min_t = t
+        self.max_t = t
+        self.last_seq = seq
+        self.count += 1
+        self.size += nbytes
+        self.severity_counts[severity] = self.severity_counts.get(severity, 0) + 1
+
+    def snapshot(self) -> "Segment":
+        copy = Segment(self.service, self.seg_id, self.path)
+        copy.__dict__.update(self.__dict__)
+        copy.severity_counts = dict(self.severity_counts)
+        return copy
+
+    @property
+    def index_path(self) -> Path:
+        return self.path.with_suffix(".idx.json")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "count": self.count,
+            "min_t": self.min_t,
+            "max_t": self.max_t,
+            "last_seq": self.last_seq,
+            "severity_counts": self.severity_counts,
+            "created_at": self.created_at,
+        }
+
+    @classmethod
+    def load(cls, service: str, seg_id: int, path: Path) -> "Segment":
+        """Read the sidecar index, or rebuild it from the file (unsealed segment)."""
+        segment = cls(service, seg_id, path)
+        if segment.index_path.exists():
+            segment.__dict__.update(json.loads(segment.index_path.read_text()))
+            segment.sealed = True
+            return segment
+
+        data = path.read_bytes()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            # Torn write from a crash: drop the partial last line
+            with open(path, "r+b") as f:
+                f.truncate(end)
+            data = data[:end]
+        segment.created_at = path.stat().st_mtime
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            segment.add(record["t"], record["n"], record["sev"], len(line) + 1)
+        segment.size = end
+        return segment
+
+
+class LogSegmentStore:
+    """Rolling per-service JSONL segments with a time and severity index."""
+
+    def __init__(
+        self,
+        root: str = LOG_STORE_DIR,
+        segment_bytes: int = LOG_SEGMENT_BYTES,
+        segment_seconds: int = LOG_SEGMENT_SECONDS,
+        retention_hours: float = LOG_STORE_RETENTION_HOURS,
+        max_bytes: int = LOG_STORE_MAX_BYTES,
+    ):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.retention_hours = retention_hours
+        self.max_bytes = max_bytes
+        self._segments: Dict[str, List[Segment]] = {}
+        self._dirs: Dict[str, Path] = {}
+        self._handles: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._opened = False
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def open(self) -> None:
+        """Load the segment index from disk (blocking; run off the event loop)."""
+        with self._lock:
+            if self._opened:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            for service_dir in sorted(p for p in self.root.iterdir() if p.is_dir()):
+                service_file = service_dir / "SERVICE"
+                service = service_file.read_text().strip() if service_file.exists() else service_dir.name
+                segments = []
+                for path in sorted(service_dir.glob("*.jsonl")):
+                    try:
+                        segments.append(Segment.load(service, int(path.stem), path))
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Skipping unreadable log segment {path}: {e}")
+                self._dirs[service] = service_dir
+                self._segments[service] = segments
+            self._opened = True
+            self._enforce_retention()
+
+    def close(self) -> None:
+        with self._lock:
+            for handle in self._handles.values():
+                handle.close()
+            self._handles.clear()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def last_timestamp(self, service: str) -> Optional[int]:
+        with self._lock:
+            return self._last_t_locked(service)
+
+    def append(self, service: str, entries: List[Tuple[int, str, str]]) -> int:
+        """Append (epoch ns, display timestamp, message) entries; returns lines written."""
+        if not entries:
+            return 0
+        with self._lock:
+            last_t = self._last_t_locked(service) or 0
+            seq = self._last_seq_locked(service)
+            segment = self._active_segment(service)
+            lines = []
+            rolled = False
+            for ns, timestamp, message in entries:
+                # stdout/stderr interleave slightly out of order; the sort
+                # key stays monotonic per service, the display time is kept
+                last_t = max(ns, last_t)
+                seq += 1
+                severity = classify_severity(message)
+                line = json.dumps(
+                    {"t": last_t, "n": seq, "ts": timestamp, "sev": severity, "msg": message},
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                ) + "\n"
+                lines.append(line)
+                segment.add(last_t, seq, severity, len(line.encode("utf-8")))
+
+                if segment.size >= self.segment_bytes or time.time() - segment.created_at >= self.segment_seconds:
+                    self._write(service, lines)
+                    lines = []
+                    self._seal(service, segment)
+                    segment = self._active_segment(service)
+                    rolled = True
+
+            self._write(service, lines)
+            if rolled:
+                self._enforce_retention()
+            return len(entries)
+
+    def _write(self, service: str, lines: List[str]) -> None:
+        if lines:
+            handle = self._handles[service]
+            handle.write("".join(lines))
+            handle.flush()
+
+    def _last_t_locked(self, service: str) -> Optional[int]:
+        for segment in reversed(self._segments.get(service, [])):
+            if segment.max_t is not None:
+                return segment.max_t
+        return None
+
+    def _last_seq_locked(self, service: str) -> int:
+        for segment in reversed(self._segments.get(service, [])):
+            if segment.last_seq:
+                return segment.last_seq
+        return 0
+
+    def _active_segment(self, service: str) -> Segment:
+        segments = self._segments.setdefault(service, [])
+        if segments and not segments[-1].sealed:
+            segment = segments[-1]
+        else:
+            service_dir = self._dirs.get(service)
+            if service_dir is None:
+                service_dir = self.root / (_SERVICE_DIR_RE.sub("_", service) or "_")
+                service_dir.mkdir(parents=True, exist_ok=True)
+                (service_dir / "SERVICE").write_text(service)
+                self._dirs[service] = service_dir
+            seg_id = segments[-1].seg_id + 1 if segments else 1
+            segment = Segment(service, seg_id, service_dir / f"{seg_id:012d}.jsonl")
+            segments.append(segment)
+        if service not in self._handles:
+            self._handles[service] = open(segment.path, "a", encoding="utf-8")
+        return segment
+
+    def _seal(self, service: str, segment: Segment) -> None:
+        handle = self._handles.pop(service, None)
+        if handle is not None:
+            handle.close()
+        segment.index_path.write_text(json.dumps(segment.to_dict()))
+        segment.sealed = True
+
+    def _enforce_retention(self) -> None:
+        sealed = [s for segments in self._segments.values() for s in segments if s.sealed]
+        sealed.sort(key=lambda s: s.max_t or 0)
+        cutoff = time.time_ns() - int(self.retention_hours * 3600 * NS_PER_SECOND)
+        total = sum(s.size for segments in self._segments.values() for s in segments)
+        for segment in sealed:
+            if (segment.max_t or 0) >= cutoff and total <= self.max_bytes:
+                break
+            self._segments[segment.service].remove(segment)
+            total -= segment.size
+            for path in (segment.path, segment.index_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def services(self) -> List[str]:
+        with self._lock:
+            return sorted(s for s, segments in self._segments.items() if segments)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            segments = [s for group in self._segments.values() for s in group]
+        counts = {severity: 0 for severity in SEVERITIES}
+        for segment in segments:
+            for severity, count in segment.severity_counts.items():
+                counts[severity] = counts.get(severity, 0) + count
+        return {
+            "services": len(self.services()),
+            "segments": len(segments),
+            "lines": sum(s.count for s in segments),
+            "bytes": sum(s.size for s in segments),
+            "severity_counts": counts,
+        }
+
+    def search(
+        self,
+        query: LogQuery,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[SortKey] = None,
+    ) -> Dict[str, Any]:
+        """
+        Newest-first matches, stopping as soon as the page is full.
+
+        `total` is exact when the index alone can count the matches (no text,
+        regex or date filter and no cursor). Otherwise it counts the matches
+        seen so far, plus one when more exist, and `total_is_estimate` is set.
+        """
+        with self._lock:
+            plan = {
+                service: [s.snapshot() for s in segments if s.count]
+                for service, segments in self._segments.items()
+                if query.services is None or service in query.services
+            }
+
+        streams = [
+            self._service_stream(service, segments, query, cursor)
+            for service, segments in plan.items()
+        ]
+        merged = heapq.merge(*streams, key=lambda item: item[0], reverse=True)
+
+        logs = []
+        last_key = None
+        has_more = False
+        matched = 0
+        for key, log in merged:
+            matched += 1
+            if matched <= offset:
+                continue
+            if len(logs) == limit:
+                has_more = True
+                break
+            logs.append(log)
+            last_key = key
+
+        total_is_estimate = not (query.index_only and cursor is None)
+        if not total_is_estimate:
+            total = sum(
+                count
+                for segments in plan.values()
+                for segment in segments
+                for severity, count in segment.severity_counts.items()
+                if query.severities is None or severity in query.severities
+            )
+        else:
+            total = offset + len(logs) + (1 if has_more else 0)
+
+        return {
+            "logs": logs,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(last_key) if has_more and last_key else None,
+        }
+
+    def _service_stream(
+        self,
+        service: str,
+        segments: List[Segment],
+        query: LogQuery,
+        cursor: Optional[SortKey],
+    ) -> Iterator[Tuple[SortKey, Dict[str, Any]]]:
+        text_in_service = bool(query.text) and query.text in service.lower()
+        check_text = bool(query.text) and not text_in_service
+        raw_text = query.raw_text if check_text else None
+
+        for segment in reversed(segments):
+            if query.start_ns is not None and segment.max_t < query.start_ns:
+                return
+            if query.end_ns is not None and segment.min_t >= query.end_ns:
+                continue
+            if cursor is not None and segment.min_t > cursor[0]:
+                continue
+            if query.severities is not None and not any(
+                segment.severity_counts.get(severity) for severity in query.severities
+            ):
+                continue
+
+            for line in reversed(self._read_lines(segment)):
+                if raw_text is not None and raw_text not in line.lower():
+                    continue
+                record = json.loads(line)
+                t = record["t"]
+                if query.start_ns is not None and t < query.start_ns:
+                    return
+                key = (t, service, record["n"])
+                if cursor is not None and key >= cursor:
+                    continue
+                if query.end_ns is not None and t >= query.end_ns:
+                    continue
+                if query.severities is not None and record["sev"] not in query.severities:
+                    continue
+                message = record["msg"]
+                if check_text and query.text not in message.lower():
+                    continue
+                if query.pattern is not None and not query.pattern.search(message):
+                    continue
+                yield key, {
+                    "timestamp": record["ts"],
+                    "severity": record["sev"],
+                    "service": service,
+                    "message": message,
+                    "metadata": {},
+                }
+
+    @staticmethod
+    def _read_lines(segment: Segment) -> List[str]:
+        # Only up to the indexed size: the active segment may be mid-append
+        try:
+            with open(segment.path, "rb") as f:
+                data = f.read(segment.size)
+        except FileNotFoundError:
+            return []  # dropped by retention after the snapshot
+        return data.decode("utf-8", errors="replace").splitlines()
+
+
+# ============================================================================
+# Ingestion
+# ============================================================================
+
+async def list_container_names() -> List[str]:
+    process = await asyncio.create_subprocess_exec(
+        "docker", "ps", "--format", "{{.Names}}",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=10)
+    if process.returncode != 0:
+        raise RuntimeError(f"docker ps failed: {stderr.decode(errors='replace').strip()}")
+    return [name.strip() for name in stdout.decode().splitlines() if name.strip()]
+
+
+class LogIngestor:
+    """Keeps one async `docker logs --follow` tail per running container."""
+
+    def __init__(
+        self,
+        store: LogSegmentStore,
+        discovery_seconds: float = LOG_INGEST_DISCOVERY_SECONDS,
+        backfill_lines: int = LOG_INGEST_BACKFILL_LINES,
+        flush_seconds: float = LOG_INGEST_FLUSH_SECONDS,
+    ):
+        self.store = store
+        self.discovery_seconds = discovery_seconds
+        self.backfill_lines = backfill_lines
+        self.flush_seconds = flush_seconds
+        self.lines_ingested = 0
+        self._tailers: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        await asyncio.to_thread(self.store.open)
+        self._task = asyncio.create_task(self._discover_loop())
+
+    async def stop(self) -> None:
+        tasks = list(self._tailers.values())
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tailers.clear()
+        self._task = None
+        await asyncio.to_thread(self.store.close)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "tailing": sorted(self._tailers),
+            "lines_ingested": self.lines_ingested,
+        }
+
+    async def _discover_loop(self) -> None:
+        while True:
+            try:
+                self.sync_tailers(await list_container_names())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Log ingestion container discovery failed: {e}")
+            await asyncio.sleep(self.discovery_seconds)
+
+    def sync_tailers(self, names: List[str]) -> None:
+        current = set(names)
+        for name in list(self._tailers):
+            if name not in current:
+                self._tailers.pop(name).cancel()
+        for name in current:
+            task = self._tailers.get(name)
+            if task is None or task.done():
+                self._tailers[name] = asyncio.create_task(self._tail(name))
+
+    async def _tail(self, name: str) -> None:
+        backoff = 1.0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._tail_once(name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Log tail for {name} failed: {e}")
+            # A tail that ran for a while earns a quick reconnect
+            backoff = 1.0 if time.monotonic() - started > 60 else min(backoff * 2, 60.0)
+            await asyncio.sleep(backoff)
+
+    async def _tail_once(self, name: str) -> None:
+        resume_after = await asyncio.to_thread(self.store.last_timestamp, name)
+        args = ["logs", "--follow", "--timestamps"]
+        if resume_after is None:
+            args += ["--tail", str(self.backfill_lines)]
+        else:
+            # --since is inclusive; already-stored lines are filtered below
+            seconds, fraction = divmod(resume_after, NS_PER_SECOND)
+            args += ["--since", f"{seconds}.{fraction:09d}"]
+        process = await asyncio.create_subprocess_exec(
+            "docker", *args, name,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=LOG_LINE_LIMIT,
+        )
+
+        pending: List[Tuple[int, str, str]] = []
+
+        async def pump(stream: asyncio.StreamReader) -> None:
+            while True:
+                try:
+                    raw = await stream.readline()
+                except ValueError:
+                    # Line over LOG_LINE_LIMIT: drop it, keep the stream
+                    continue
+                if not raw:
+                    return
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                if not line.strip():
+                    continue
+                entry = parse_log_line(line)
+                if resume_after is not None and entry[0] <= resume_after:
+                    continue
+                pending.append(entry)
+
+        pumps = [asyncio.create_task(pump(process.stdout)), asyncio.create_task(pump(process.stderr))]
+        try:
+            while True:
+                done = all(p.done() for p in pumps)
+                if pending:
+                    batch = pending[:]
+                    del pending[:len(batch)]
+                    batch.sort(key=lambda entry: entry[0])
+                    self.lines_ingested += await asyncio.to_thread(self.store.append, name, batch)
+                if done:
+                    break
+                await asyncio.wait(pumps, timeout=self.flush_seconds)
+        finally:
+            for p in pumps:
+                p.cancel()
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+
+
+_log_store: Optional[LogSegmentStore] = None
+_log_ingestor: Optional[LogIngestor] = None
+
+
+def get_log_store() -> LogSegmentStore:
+    """Get the process-wide log segment store"""
+    global _log_store
+    if _log_store is None:
+        _log_store = LogSegmentStore()
+    return _log_store
+
+
+def get_log_ingestor() -> LogIngestor:
+    """Get the process-wide log ingestor"""
+    global _log_ingestor
+    if _log_ingestor is None:
+        _log_ingestor = LogIngestor(get_log_store())
+    return _log_ingestor
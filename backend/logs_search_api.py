@@ -2,22 +2,30 @@
 
 This module provides comprehensive log search capabilities with:
 - Multi-filter support (severity, service, date range, regex)
-- Efficient pagination
+- Keyset-cursor and offset pagination
 - Redis caching for performance
-- Docker log aggregation
+- Docker log aggregation (ingested into log_store, searched from disk)
 - Real-time rate limiting
 """
 
 import re
 import json
 import asyncio
-import subprocess
-from datetime import datetime, timedelta
+import hashlib
+from datetime import datetime
 from typing import Dict, List, Optional, Any
 from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel, Field, validator
 import redis.asyncio as aioredis
 from log_manager import log_manager, LogFilter, LogEntry
+from log_store import (
+    LogQuery,
+    classify_severity,
+    decode_cursor,
+    get_log_ingestor,
+    get_log_store,
+    parse_log_line,
+)
 
 router = APIRouter(prefix="/api/v1/logs", tags=["logs"])
 
@@ -34,6 +42,7 @@ class AdvancedLogSearchRequest(BaseModel):
     regex: Optional[str] = Field(None, description="Regex pattern for message matching")
     limit: int = Field(100, ge=1, le=10000, description="Maximum results (1-10000)")
     offset: int = Field(0, ge=0, description="Pagination offset")
+    cursor: Optional[str] = Field(None, description="next_cursor from the previous page")
 
     @validator('severity')
     def validate_severity(cls, v):
@@ -68,10 +77,13 @@ class LogSearchResponse(BaseModel):
     """Log search response with pagination"""
     logs: List[Dict[str, Any]]
     total: int
+    total_is_estimate: bool = False  # True when `total` is a lower bound, not a full count
     offset: int
     limit: int
     query_time_ms: float
     cache_hit: bool = False
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 class ServiceInfo(BaseModel):
@@ -102,15 +114,19 @@ async def get_docker_services() -> List[ServiceInfo]:
     """Get list of running Docker services"""
     services = []
     try:
-        result = subprocess.run(
-            ["docker", "ps", "--format", "json"],
-            capture_output=True,
-            text=True,
-            timeout=5
+        process = await asyncio.create_subprocess_exec(
+            "docker", "ps", "--format", "json",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=5)
+        except asyncio.TimeoutError:
+            process.kill()
+            raise
 
-        if result.returncode == 0 and result.stdout:
-            for line in result.stdout.strip().split('\n'):
+        if process.returncode == 0 and stdout:
+            for line in stdout.decode(errors="replace").strip().split('\n'):
                 try:
                     container = json.loads(line)
                     services.append(ServiceInfo(
@@ -121,7 +137,7 @@ async def get_docker_services() -> List[ServiceInfo]:
                     ))
                 except json.JSONDecodeError:
                     continue
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=503, detail="Docker API timeout")
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Docker API error: {str(e)}")
@@ -134,8 +150,8 @@ async def fetch_docker_logs(
     limit: int,
     since: Optional[str] = None
 ) -> List[Dict[str, Any]]:
-    """Fetch logs from a Docker container"""
-    cmd = ["docker", "logs", "--tail", str(limit * 2), "--timestamps"]
+    """Fetch logs from a Docker container (used when log ingestion isn't running)"""
+    cmd = ["logs", "--tail", str(limit * 2), "--timestamps"]
 
     if since:
         cmd.extend(["--since", since])
@@ -143,53 +159,34 @@ async def fetch_docker_logs(
     cmd.append(container_name)
 
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=10
+        process = await asyncio.create_subprocess_exec(
+            "docker", *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=10)
+        except asyncio.TimeoutError:
+            process.kill()
+            return []
 
         logs = []
-        for line in result.stdout.splitlines() + result.stderr.splitlines():
-            if not line.strip():
-                continue
-
-            # Parse timestamp and message
-            parts = line.split(maxsplit=1)
-            if len(parts) == 2:
-                timestamp_str, message = parts
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                except ValueError:
-                    timestamp = datetime.now()
-                    message = line
-            else:
-                timestamp = datetime.now()
-                message = line
-
-            # Determine severity level
-            severity = "INFO"
-            message_upper = message.upper()
-            if "ERROR" in message_upper or "CRITICAL" in message_upper:
-                severity = "ERROR"
-            elif "WARN" in message_upper:
-                severity = "WARN"
-            elif "DEBUG" in message_upper:
-                severity = "DEBUG"
-
-            logs.append({
-                "timestamp": timestamp.isoformat(),
-                "severity": severity,
-                "service": container_name,
-                "message": message,
-                "metadata": {}
-            })
+        for raw in (stdout, stderr):
+            for line in raw.decode(errors="replace").splitlines():
+                if not line.strip():
+                    continue
+
+                _, timestamp, message = parse_log_line(line)
+                logs.append({
+                    "timestamp": timestamp,
+                    "severity": classify_severity(message),
+                    "service": container_name,
+                    "message": message,
+                    "metadata": {}
+                })
 
         return logs
 
-    except subprocess.TimeoutExpired:
-        return []
     except Exception as e:
         print(f"Error fetching logs from {container_name}: {e}")
         return []
@@ -199,65 +196,9 @@ def apply_filters(
     logs: List[Dict[str, Any]],
     request: AdvancedLogSearchRequest
 ) -> List[Dict[str, Any]]:
-    """Apply all filters to log entries"""
-    filtered = logs
-
-    # Text search filter
-    if request.query:
-        query_lower = request.query.lower()
-        filtered = [
-            log for log in filtered
-            if query_lower in log['message'].lower() or
-               query_lower in log['service'].lower()
-        ]
-
-    # Severity filter
-    if request.severity:
-        filtered = [
-            log for log in filtered
-            if log['severity'] in request.severity
-        ]
-
-    # Service filter
-    if request.services:
-        filtered = [
-            log for log in filtered
-            if log['service'] in request.services
-        ]
-
-    # Date range filter
-    if request.start_date or request.end_date:
-        start_dt = datetime.strptime(request.start_date, '%Y-%m-%d') if request.start_date else None
-        end_dt = datetime.strptime(request.end_date, '%Y-%m-%d') + timedelta(days=1) if request.end_date else None
-
-        filtered_by_date = []
-        for log in filtered:
-            try:
-                log_dt = datetime.fromisoformat(log['timestamp'].replace('Z', '+00:00'))
-                if start_dt and log_dt < start_dt:
-                    continue
-                if end_dt and log_dt >= end_dt:
-                    continue
-                filtered_by_date.append(log)
-            except (ValueError, KeyError):
-                # Include logs with invalid timestamps
-                filtered_by_date.append(log)
-
-        filtered = filtered_by_date
-
-    # Regex filter
-    if request.regex:
-        try:
-            pattern = re.compile(request.regex)
-            filtered = [
-                log for log in filtered
-                if pattern.search(log['message'])
-            ]
-        except re.error:
-            # Invalid regex - skip filter
-            pass
-
-    return filtered
+    """Apply all filters to log entries in a single pass"""
+    log_query = LogQuery.from_request(request)
+    return [log for log in logs if log_query.matches(log)]
 
 
 def generate_cache_key(request: AdvancedLogSearchRequest) -> str:
@@ -271,10 +212,50 @@ def generate_cache_key(request: AdvancedLogSearchRequest) -> str:
         f"end:{request.end_date or ''}",
         f"regex:{request.regex or ''}",
         f"limit:{request.limit}",
-        f"offset:{request.offset}"
+        f"offset:{request.offset}",
+        f"cursor:{request.cursor or ''}"
     ]
     key_str = "|".join(key_parts)
-    return f"logs:search:{hash(key_str)}"
+    # Stable across workers and restarts (the builtin hash() is salted per process)
+    return f"logs:search:{hashlib.sha256(key_str.encode()).hexdigest()[:32]}"
+
+
+async def search_docker_logs(request: AdvancedLogSearchRequest) -> Dict[str, Any]:
+    """Fallback search straight from `docker logs` when log ingestion isn't running"""
+    services = await get_docker_services()
+
+    # Filter services if specified
+    if request.services:
+        services = [s for s in services if s.name in request.services]
+
+    since_str = request.start_date if request.start_date else None
+    semaphore = asyncio.Semaphore(8)
+
+    async def fetch(service: ServiceInfo) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await fetch_docker_logs(
+                service.name,
+                request.limit * 10,  # Fetch extra to ensure enough after filtering
+                since=since_str
+            )
+
+    results = await asyncio.gather(*[fetch(service) for service in services])
+    log_query = LogQuery.from_request(request)
+    filtered_logs = [log for logs in results for log in logs if log_query.matches(log)]
+
+    # Sort by timestamp (newest first)
+    filtered_logs.sort(key=lambda x: x['timestamp'], reverse=True)
+
+    total = len(filtered_logs)
+    end = request.offset + request.limit
+    return {
+        "logs": filtered_logs[request.offset:end],
+        "total": total,
+        # A service that filled its fetch window may have older matches
+        "total_is_estimate": any(len(logs) >= request.limit * 10 for logs in results),
+        "has_more": total > end,
+        "next_cursor": None
+    }
 
 
 @router.post("/search/advanced", response_model=LogSearchResponse)
@@ -288,13 +269,16 @@ async def advanced_log_search(request: AdvancedLogSearchRequest):
     - Service name filtering
     - Date range filtering
     - Regex pattern matching
-    - Pagination support
+    - Offset or cursor pagination (pass next_cursor back as `cursor`)
     - Redis caching (5-minute TTL)
 
     Performance:
-    - Handles 100K+ log lines efficiently
+    - Searches the ingested log store (see log_store) and stops as soon as
+      the page is full; `total` is exact when the index can count the
+      matches, otherwise it counts matches seen so far plus one if more exist
+      and `total_is_estimate` is true
+    - Falls back to reading `docker logs` directly when ingestion is off
     - Cached queries return in <10ms
-    - Uncached queries complete in <2 seconds
     """
     start_time = datetime.now()
 
@@ -316,48 +300,37 @@ async def advanced_log_search(request: AdvancedLogSearchRequest):
         except Exception as e:
             print(f"Cache read error: {e}")
 
-    # Fetch all logs from Docker containers
-    all_logs = []
-
-    # Get Docker services
-    services = await get_docker_services()
-
-    # Filter services if specified
-    if request.services:
-        services = [s for s in services if s.name in request.services]
-
-    # Fetch logs from each service
-    since_str = request.start_date if request.start_date else None
-
-    for service in services:
-        service_logs = await fetch_docker_logs(
-            service.name,
-            request.limit * 10,  # Fetch extra to ensure enough after filtering
-            since=since_str
+    ingestor = get_log_ingestor()
+    if ingestor.running:
+        try:
+            cursor = decode_cursor(request.cursor) if request.cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Segment reads and the filter pass run off the event loop
+        page = await asyncio.to_thread(
+            get_log_store().search,
+            LogQuery.from_request(request),
+            request.limit,
+            request.offset,
+            cursor
         )
-        all_logs.extend(service_logs)
-
-    # Apply all filters
-    filtered_logs = apply_filters(all_logs, request)
-
-    # Sort by timestamp (newest first)
-    filtered_logs.sort(key=lambda x: x['timestamp'], reverse=True)
-
-    # Apply pagination
-    total = len(filtered_logs)
-    paginated_logs = filtered_logs[request.offset:request.offset + request.limit]
+    else:
+        page = await search_docker_logs(request)
 
     # Calculate query time
     query_time = (datetime.now() - start_time).total_seconds() * 1000
 
     # Build response
     response = LogSearchResponse(
-        logs=paginated_logs,
-        total=total,
+        logs=page["logs"],
+        total=page["total"],
+        total_is_estimate=page["total_is_estimate"],
         offset=request.offset,
         limit=request.limit,
         query_time_ms=round(query_time, 2),
-        cache_hit=False
+        cache_hit=False,
+        has_more=page["has_more"],
+        next_cursor=page["next_cursor"]
     )
 
     # Cache the result (5-minute TTL)
@@ -397,12 +370,6 @@ async def get_log_stats():
     """
     services = await get_docker_services()
 
-    # Fetch recent logs for statistics
-    all_logs = []
-    for service in services[:10]:  # Sample first 10 services
-        logs = await fetch_docker_logs(service.name, 100)
-        all_logs.extend(logs)
-
     # Count by severity
     severity_counts = {
         "ERROR": 0,
@@ -411,10 +378,24 @@ async def get_log_stats():
         "DEBUG": 0
     }
 
-    for log in all_logs:
-        severity = log.get('severity', 'INFO')
-        if severity in severity_counts:
-            severity_counts[severity] += 1
+    if get_log_ingestor().running:
+        # Straight from the segment index: every ingested line, no sampling
+        summary = await asyncio.to_thread(get_log_store().summary)
+        for severity in severity_counts:
+            severity_counts[severity] = summary["severity_counts"].get(severity, 0)
+        sample_size = summary["lines"]
+    else:
+        # Fetch recent logs for statistics
+        results = await asyncio.gather(*[
+            fetch_docker_logs(service.name, 100)
+            for service in services[:10]  # Sample first 10 services
+        ])
+        all_logs = [log for logs in results for log in logs]
+        for log in all_logs:
+            severity = log.get('severity', 'INFO')
+            if severity in severity_counts:
+                severity_counts[severity] += 1
+        sample_size = len(all_logs)
 
     # Count by service status
     status_counts = {}
@@ -426,7 +407,7 @@ async def get_log_stats():
         "total_services": len(services),
         "severity_distribution": severity_counts,
         "service_status": status_counts,
-        "sample_size": len(all_logs)
+        "sample_size": sample_size
     }
 
 
@@ -2,7 +2,8 @@
 Metrics Collector
 
 Background service that collects system metrics every 5 seconds and stores
-them in Redis for historical data retrieval.
+them in Redis for historical data retrieval (see metrics_timeseries for the
+storage layout).
 """
 
 import asyncio
@@ -11,10 +12,11 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import psutil
 import docker
-import redis
-import json
+import redis.asyncio as aioredis
 import logging
 
+from metrics_timeseries import MetricsRing, MetricsTimeSeries
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,9 +26,9 @@ class MetricsCollector:
 
     Features:
     - Collects metrics every 5 seconds
-    - Stores in Redis with 24-hour TTL
-    - Automatic cleanup of old data
-    - Graceful handling of Redis failures
+    - Stores in per-family Redis sorted sets with 24-hour retention
+    - 1m/5m/1h rollups for longer history ranges
+    - Graceful handling of Redis failures (in-memory ring buffer)
     """
 
     def __init__(
@@ -52,28 +54,34 @@ class MetricsCollector:
         self.running = False
         self.redis_connected = False
 
-        # In-memory fallback if Redis unavailable
-        self.memory_storage: List[Dict] = []
-        self.max_memory_items = 1000
-
-        # Initialize Redis connection
+        self.redis_address = f"{redis_host}:{redis_port}"
+        self.latest: Optional[Dict] = None
+
+        # In-memory fallback if Redis unavailable: one retention window of samples
+        self.memory_storage = MetricsRing(self.retention_seconds // max(1, collection_interval))
+
+        # Redis connection is verified in start()
+        self.redis = aioredis.Redis(
+            host=redis_host,
+            port=redis_port,
+            db=redis_db,
+            password=os.getenv("REDIS_PASSWORD", None),
+            decode_responses=True,
+            socket_timeout=5,
+            socket_connect_timeout=5
+        )
+        self.series = MetricsTimeSeries(self.redis, collection_interval, self.retention_seconds)
+
+    async def connect(self) -> bool:
+        """Check the Redis connection; falls back to in-memory storage on failure."""
         try:
-            self.redis = redis.Redis(
-                host=redis_host,
-                port=redis_port,
-                db=redis_db,
-                password=os.getenv("REDIS_PASSWORD", None),
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5
-            )
-            self.redis.ping()
+            await self.redis.ping()
             self.redis_connected = True
-            logger.info(f"✓ Metrics collector connected to Redis at {redis_host}:{redis_port}")
+            logger.info(f"✓ Metrics collector connected to Redis at {self.redis_address}")
         except Exception as e:
             logger.warning(f"⚠ Redis connection failed: {e}. Using in-memory storage.")
-            self.redis = None
             self.redis_connected = False
+        return self.redis_connected
 
     async def start(self):
         """
@@ -87,6 +95,7 @@ class MetricsCollector:
 
         self.running = True
         logger.info(f"Starting metrics collector (interval: {self.collection_interval}s)")
+        await self.connect()
 
         collection_count = 0
         error_count = 0
@@ -277,18 +286,13 @@ class MetricsCollector:
         Args:
             metrics: Metrics dictionary to store
         """
-        timestamp = metrics.get("timestamp_unix", int(datetime.utcnow().timestamp()))
-        key = f"metrics:{timestamp}"
+        metrics.setdefault("timestamp_unix", int(datetime.utcnow().timestamp()))
+        self.latest = metrics
 
         # Try Redis first
-        if self.redis_connected and self.redis:
+        if self.redis_connected:
             try:
-                # Store with TTL
-                self.redis.setex(
-                    key,
-                    self.retention_seconds,
-                    json.dumps(metrics)
-                )
+                await self.series.append(metrics)
                 return
             except Exception as e:
                 logger.warning(f"Redis storage failed: {e}. Falling back to memory.")
@@ -297,10 +301,6 @@ class MetricsCollector:
         # Fallback to memory storage
         self.memory_storage.append(metrics)
 
-        # Cleanup old entries
-        if len(self.memory_storage) > self.max_memory_items:
-            self.memory_storage = self.memory_storage[-self.max_memory_items:]
-
     async def get_historical_metrics(
         self,
         start_time: datetime,
@@ -316,10 +316,10 @@ class MetricsCollector:
             max_points: Maximum number of data points to return
 
         Returns:
-            List of metrics dictionaries
+            List of metrics dictionaries, oldest first
         """
         # Try Redis first
-        if self.redis_connected and self.redis:
+        if self.redis_connected:
             try:
                 return await self._get_from_redis(start_time, end_time, max_points)
             except Exception as e:
@@ -334,24 +334,8 @@ class MetricsCollector:
         end_time: datetime,
         max_points: int
     ) -> List[Dict]:
-        """Retrieve metrics from Redis."""
-        start_ts = int(start_time.timestamp())
-        end_ts = int(end_time.timestamp())
-
-        metrics = []
-
-        # Scan for keys in range
-        for ts in range(start_ts, end_ts, self.collection_interval):
-            key = f"metrics:{ts}"
-            data = self.redis.get(key)
-            if data:
-                metrics.append(json.loads(data))
-
-            # Limit results
-            if len(metrics) >= max_points:
-                break
-
-        return metrics
+        """Retrieve metrics from Redis with one range read per metric family."""
+        return await self.series.range(start_time.timestamp(), end_time.timestamp(), max_points)
 
     def _get_from_memory(
         self,
@@ -360,22 +344,7 @@ class MetricsCollector:
         max_points: int
     ) -> List[Dict]:
         """Retrieve metrics from memory storage."""
-        start_ts = start_time.timestamp()
-        end_ts = end_time.timestamp()
-
-        # Filter by time range
-        filtered = [
-            m for m in self.memory_storage
-            if start_ts <= m.get("timestamp_unix", 0) <= end_ts
-        ]
-
-        # Limit to max_points
-        if len(filtered) > max_points:
-            # Sample evenly
-            step = len(filtered) // max_points
-            filtered = filtered[::step][:max_points]
-
-        return filtered
+        return self.memory_storage.range(start_time.timestamp(), end_time.timestamp(), max_points)
 
     async def get_latest_metrics(self) -> Optional[Dict]:
         """
@@ -384,26 +353,20 @@ class MetricsCollector:
         Returns:
             Latest metrics dictionary or None
         """
-        # Try memory first (fastest)
-        if self.memory_storage:
-            return self.memory_storage[-1]
+        # Collected by this process (fastest)
+        if self.latest is not None:
+            return self.latest
 
         # Try Redis
-        if self.redis_connected and self.redis:
+        if self.redis_connected:
             try:
-                # Get keys from last minute
-                now = int(datetime.utcnow().timestamp())
-                for offset in range(0, 60, self.collection_interval):
-                    key = f"metrics:{now - offset}"
-                    data = self.redis.get(key)
-                    if data:
-                        return json.loads(data)
+                return await self.series.latest()
             except Exception:
                 pass
 
-        return None
+        return self.memory_storage.latest()
 
-    def get_storage_stats(self) -> Dict:
+    async def get_storage_stats(self) -> Dict:
         """
         Get statistics about metrics storage.
 
@@ -418,11 +381,9 @@ class MetricsCollector:
             "retention_hours": self.retention_seconds / 3600
         }
 
-        if self.redis_connected and self.redis:
+        if self.redis_connected:
             try:
-                # Count keys in Redis
-                keys = self.redis.keys("metrics:*")
-                stats["redis_items"] = len(keys)
+                stats["redis_items"] = await self.series.count()
             except Exception:
                 stats["redis_items"] = 0
 
@@ -0,0 +1,308 @@
+"""
+Time-series storage for MetricsCollector history.
+
+The collector used to write each sample to its own `metrics:{unix_ts}` key.
+History queries then walked every 5-second slot in the range with a
+synchronous GET: about 17k blocking round trips for 24 hours, and any sample
+whose timestamp was not exactly on a slot boundary was skipped.
+
+Redis layout (DB 1):
+    metrics:ts:{family}           raw samples, one sorted set per metric family
+                                  (cpu, memory, disk, network, gpu, docker),
+                                  score = unix timestamp
+    metrics:ts:{family}:{res}     rollups at 1m / 5m / 1h resolution
+
+Each member is the compact JSON `[timestamp, family_data]`. A history query is
+one pipelined ZRANGEBYSCORE per family. It reads the coarsest resolution that
+still gives at least `max_points` points, then downsamples evenly.
+
+Rollups are computed incrementally. Every sample is folded into a running
+mean for the open bucket, and when a bucket closes its mean is appended to
+the rollup sets. Numeric leaves are averaged, equal-length lists element-wise,
+and everything else keeps the latest value.
+
+When Redis is unavailable, samples go to MetricsRing: a fixed-size ring
+buffer with one `array('d')` column per numeric field.
+"""
+
+import json
+import logging
+import math
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "metrics:ts"
+FAMILIES = ("cpu", "memory", "disk", "network", "gpu", "docker")
+
+# (name, bucket seconds, retention seconds)
+ROLLUPS = (
+    ("1m", 60, 7 * 86400),
+    ("5m", 300, 30 * 86400),
+    ("1h", 3600, 90 * 86400),
+)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def blend(mean: Any, value: Any, n: int) -> Any:
+    """Fold the n-th sample into a running mean of nested metrics."""
+    if n <= 1 or mean is None:
+        return value
+    if _is_number(mean) and _is_number(value):
+        return mean + (value - mean) / n
+    if isinstance(mean, dict) and isinstance(value, dict):
+        return {k: blend(mean.get(k), v, n) if k in mean else v for k, v in value.items()}
+    if isinstance(mean, list) and isinstance(value, list) and len(mean) == len(value):
+        return [blend(m, v, n) for m, v in zip(mean, value)]
+    return value
+
+
+def _rounded(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rounded(v) for v in value]
+    return value
+
+
+def sample_at(ts: int, families: Dict[str, Any]) -> Dict[str, Any]:
+    """A metrics sample in the collector's shape."""
+    return {"timestamp": datetime.utcfromtimestamp(ts).isoformat(), "timestamp_unix": ts, **families}
+
+
+def downsample(points: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    """Evenly spaced subset of at most max_points, always keeping the first and last."""
+    n = len(points)
+    if n <= max_points or max_points <= 0:
+        return points if max_points > 0 else []
+    if max_points == 1:
+        return [points[-1]]
+    return [points[round(i * (n - 1) / (max_points - 1))] for i in range(max_points)]
+
+
+class _Rollup:
+    """Running mean of the samples in one open bucket"""
+
+    __slots__ = ("bucket", "count", "mean")
+
+    def __init__(self):
+        self.bucket: Optional[int] = None
+        self.count = 0
+        self.mean: Dict[str, Any] = {}
+
+
+class MetricsTimeSeries:
+    """Per-family sorted-set store with incremental multi-resolution rollups"""
+
+    def __init__(self, redis_client, interval: int = 5, retention_seconds: int = 86400, prefix: str = KEY_PREFIX):
+        """
+        Args:
+            redis_client: redis.asyncio client (decode_responses=True)
+            interval: Seconds between raw samples
+            retention_seconds: How long raw samples are kept
+            prefix: Key prefix for all series
+        """
+        self.redis = redis_client
+        self.interval = interval
+        self.retention_seconds = retention_seconds
+        self.prefix = prefix
+        self._rollups = {name: _Rollup() for name, _, _ in ROLLUPS}
+
+    def key(self, family: str, resolution: Optional[str] = None) -> str:
+        return f"{self.prefix}:{family}" if resolution is None else f"{self.prefix}:{family}:{resolution}"
+
+    async def append(self, sample: Dict[str, Any]) -> None:
+        """Store one raw sample and fold it into the open rollup buckets."""
+        ts = int(sample["timestamp_unix"])
+        families = {f: sample[f] for f in FAMILIES if f in sample}
+
+        pipe = self.redis.pipeline(transaction=False)
+        self._add(pipe, None, ts, families, self.retention_seconds)
+
+        for name, seconds, retention in ROLLUPS:
+            rollup = self._rollups[name]
+            bucket = ts - ts % seconds
+            if rollup.bucket is not None and bucket != rollup.bucket and rollup.count:
+                self._add(pipe, name, rollup.bucket, _rounded(rollup.mean), retention)
+                rollup.count = 0
+                rollup.mean = {}
+            rollup.bucket = bucket
+            rollup.count += 1
+            rollup.mean = blend(rollup.mean, families, rollup.count)
+
+        await pipe.execute()
+
+    def _add(self, pipe, resolution: Optional[str], ts: int, families: Dict[str, Any], retention: int) -> None:
+        for family, data in families.items():
+            key = self.key(family, resolution)
+            pipe.zadd(key, {json.dumps([ts, data], separators=(",", ":")): ts})
+            pipe.zremrangebyscore(key, "-inf", f"({ts - retention}")
+
+    def resolution_for(self, start_ts: float, end_ts: float, max_points: int, now: float) -> Tuple[Optional[str], int]:
+        """
+        Pick the coarsest resolution that still yields >= max_points points.
+
+        Resolutions whose retention does not reach back to start_ts are
+        skipped. Returns (resolution name, or None for raw; step seconds).
+        """
+        span = max(0.0, end_ts - start_ts)
+        levels = [(None, self.interval, self.retention_seconds)] + list(ROLLUPS)
+        covering = [lvl for lvl in levels if start_ts >= now - lvl[2] - lvl[1]] or [levels[-1]]
+        choice = covering[0]
+        for level in covering:
+            if span / level[1] >= max_points:
+                choice = level
+        return choice[0], choice[1]
+
+    async def range(self, start_ts: float, end_ts: float, max_points: int = 200, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Samples in [start_ts, end_ts], oldest first, at most max_points."""
+        now = datetime.utcnow().timestamp() if now is None else now
+        resolution, _ = self.resolution_for(start_ts, end_ts, max_points, now)
+        points = await self._read(resolution, start_ts, end_ts)
+        if not points and resolution is not None:
+            # Rollups not populated yet (e.g. shortly after deployment)
+            points = await self._read(None, start_ts, end_ts)
+        return downsample(points, max_points)
+
+    async def latest(self) -> Optional[Dict[str, Any]]:
+        """Most recent raw sample."""
+        pipe = self.redis.pipeline(transaction=False)
+        for family in FAMILIES:
+            pipe.zrange(self.key(family), -1, -1)
+        points = self._merge(await pipe.execute())
+        return points[-1] if points else None
+
+    async def _read(self, resolution: Optional[str], start_ts: float, end_ts: float) -> List[Dict[str, Any]]:
+        pipe = self.redis.pipeline(transaction=False)
+        for family in FAMILIES:
+            pipe.zrangebyscore(self.key(family, resolution), start_ts, end_ts)
+        return self._merge(await pipe.execute())
+
+    @staticmethod
+    def _merge(per_family: List[List[str]]) -> List[Dict[str, Any]]:
+        by_ts: Dict[int, Dict[str, Any]] = {}
+        for family, members in zip(FAMILIES, per_family):
+            for member in members:
+                ts, data = json.loads(member)
+                by_ts.setdefault(ts, {})[family] = data
+        return [sample_at(ts, by_ts[ts]) for ts in sorted(by_ts)]
+
+    async def count(self) -> int:
+        """Number of raw samples currently stored."""
+        return await self.redis.zcard(self.key("cpu"))
+
+
+# ============================================================================
+# In-memory fallback
+# ============================================================================
+
+_BOOL, _INT, _FLOAT = 0, 1, 2
+
+
+def _flatten(value: Any, path: Tuple = (), out: Optional[Dict[Tuple, Any]] = None) -> Dict[Tuple, Any]:
+    out = {} if out is None else out
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(v, path + (k,), out)
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            _flatten(v, path + (i,), out)
+    elif isinstance(value, (int, float)):
+        out[path] = value
+    return out
+
+
+def _unflatten(leaves: Dict[Tuple, Any]) -> Dict[str, Any]:
+    root: Dict[Any, Any] = {}
+    for path, value in leaves.items():
+        node = root
+        for part in path[:-1]:
+            node = node.setdefault(part, {})
+        node[path[-1]] = value
+
+    def listify(node):
+        if not isinstance(node, dict):
+            return node
+        if node and all(isinstance(k, int) for k in node):
+            return [listify(node[i]) for i in sorted(node)]
+        return {k: listify(v) for k, v in node.items()}
+
+    return listify(root)
+
+
+class MetricsRing:
+    """
+    Fixed-size ring buffer of metrics samples with numeric columns.
+
+    Each numeric leaf (e.g. cpu.percent, cpu.per_cpu.3) gets its own
+    preallocated `array('d')` column. A field that first appears later is
+    NaN for older rows and omitted when they are read back.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.timestamps = array("d", [math.nan]) * self.capacity
+        self.columns: Dict[Tuple, array] = {}
+        self.kinds: Dict[Tuple, int] = {}
+        self.head = 0   # physical index of the oldest row
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, sample: Dict[str, Any]) -> None:
+        slot = (self.head + self.size) % self.capacity
+        if self.size == self.capacity:
+            self.head = (self.head + 1) % self.capacity
+        else:
+            self.size += 1
+
+        self.timestamps[slot] = float(sample.get("timestamp_unix", 0))
+        leaves = _flatten({f: sample[f] for f in FAMILIES if f in sample})
+        for path, value in leaves.items():
+            column = self.columns.get(path)
+            if column is None:
+                column = self.columns[path] = array("d", [math.nan]) * self.capacity
+                self.kinds[path] = _BOOL if isinstance(value, bool) else _INT if isinstance(value, int) else _FLOAT
+            column[slot] = float(value)
+        for path, column in self.columns.items():
+            if path not in leaves:
+                column[slot] = math.nan
+
+    def _row(self, logical: int) -> Dict[str, Any]:
+        slot = (self.head + logical) % self.capacity
+        leaves = {}
+        for path, column in self.columns.items():
+            value = column[slot]
+            if math.isnan(value):
+                continue
+            kind = self.kinds[path]
+            leaves[path] = bool(value) if kind == _BOOL else int(value) if kind == _INT else value
+        return sample_at(int(self.timestamps[slot]), _unflatten(leaves))
+
+    def _bisect(self, ts: float) -> int:
+        """First logical row whose timestamp is >= ts."""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[(self.head + mid) % self.capacity] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, start_ts: float, end_ts: float, max_points: int = 200) -> List[Dict[str, Any]]:
+        first = self._bisect(start_ts)
+        last = self._bisect(end_ts + 1e-9)
+        rows = list(range(first, last))
+        return [self._row(i) for i in downsample(rows, max_points)]
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self._row(self.size - 1) if self.size else None
@@ -775,6 +775,28 @@ CREATE TABLE IF NOT EXISTS app_model_policy (
     UNIQUE (app, model)
 );
 
+-- ============================================================================
+-- lago_usage_outbox — transactional outbox for Lago usage events.
+-- CreditSystem.debit_credits stages one row per debit inside the debit
+-- transaction; lago_metering batches them to /api/v1/events/batch and deletes
+-- delivered rows. Pending rows still here are undelivered and get replayed;
+-- rows that used up their attempts are kept with status 'failed' (dead letter).
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS lago_usage_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    transaction_id VARCHAR(255) NOT NULL,
+    org_id VARCHAR(255) NOT NULL,
+    event JSONB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+ALTER TABLE lago_usage_outbox
+    ADD COLUMN IF NOT EXISTS status VARCHAR(16) NOT NULL DEFAULT 'pending';
+CREATE INDEX IF NOT EXISTS idx_lago_usage_outbox_next_attempt ON lago_usage_outbox(next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_lago_usage_outbox_failed ON lago_usage_outbox(status) WHERE status = 'failed';
+
 -- ============================================================================
 -- DONE
 -- ============================================================================
@@ -14,6 +14,7 @@ Author: Backend Developer
 Date: October 27, 2025
 """
 
+import asyncio
 import logging
 import os
 from typing import Dict, List, Optional, Any
@@ -28,6 +29,9 @@ from auth_dependencies import require_admin_user  # admin gate for the stats end
 from pydantic import BaseModel, Field
 from cryptography.fernet import Fernet
 
+from llm_route_table import invalidate_route_table
+from single_flight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
 # Router
@@ -472,51 +476,197 @@ async def get_provider_api_key(pool, provider_name: str) -> Optional[str]:
 # Caching Layer
 # ============================================================================
 
-# Cache for model catalog (5-minute TTL)
-_model_cache = {
-    'timestamp': 0,
-    'models': [],
-    'ttl': 300  # 5 minutes
+# Catalog refresh interval. Past it, requests keep getting the current
+# snapshot while ONE background task re-fetches every provider concurrently
+# (stale-while-revalidate) - nobody waits on OpenRouter/OpenAI/Google except
+# the very first request after startup.
+MODEL_CATALOG_TTL = int(os.getenv("MODEL_CATALOG_TTL", "300"))
+
+SORT_KEYS = {
+    'name': (lambda m: m['name'].lower(), False),
+    'price': (lambda m: m['pricing'].get('input', 0), False),
+    'context_length': (lambda m: m.get('context_length') or 0, True),
 }
 
 
-async def get_all_models_cached(pool, force_refresh: bool = False) -> List[Dict]:
+class CatalogIndex:
     """
-    Get all models from all providers with caching
+    Immutable, indexed view of one catalog snapshot
 
-    Cache TTL: 5 minutes
+    Built once per refresh: secondary indexes (provider, capability, enabled)
+    map to model positions, and every supported sort key has a presorted
+    order plus a rank table, so a filtered + sorted page never re-sorts the
+    full catalog.
     """
-    global _model_cache
 
-    now = time.time()
-    cache_valid = (now - _model_cache['timestamp']) < _model_cache['ttl']
+    def __init__(self, models: List[Dict]):
+        self.models = models
+        self.by_id = {m['id']: m for m in models}
+        self.by_provider: Dict[str, set] = {}
+        self.by_capability: Dict[str, set] = {}
+        self.by_enabled: Dict[bool, set] = {True: set(), False: set()}
+        self._search_text = []
+
+        for pos, model in enumerate(models):
+            self.by_provider.setdefault(model['provider'], set()).add(pos)
+            for capability in model.get('capabilities', []):
+                self.by_capability.setdefault(capability.lower(), set()).add(pos)
+            self.by_enabled[bool(model.get('enabled'))].add(pos)
+            self._search_text.append(
+                f"{model['name']}\n{model.get('description') or ''}".lower()
+            )
 
-    if cache_valid and not force_refresh and _model_cache['models']:
-        logger.info(f"Using cached models ({len(_model_cache['models'])} models)")
-        return _model_cache['models']
+        self.sorted_views: Dict[str, List[Dict]] = {}
+        self._ranks: Dict[str, List[int]] = {}
+        for sort, (key, reverse) in SORT_KEYS.items():
+            order = sorted(range(len(models)), key=lambda i: key(models[i]), reverse=reverse)
+            ranks = [0] * len(models)
+            for rank, pos in enumerate(order):
+                ranks[pos] = rank
+            self.sorted_views[sort] = [models[pos] for pos in order]
+            self._ranks[sort] = ranks
+
+        self.providers = sorted(self.by_provider)
+
+    def query(
+        self,
+        provider: Optional[str] = None,
+        search: Optional[str] = None,
+        capability: Optional[str] = None,
+        enabled: Optional[bool] = None,
+        sort: str = 'name',
+    ) -> List[Dict]:
+        """Filter through the indexes and return models in presorted order."""
+        if sort not in SORT_KEYS:
+            sort = 'name'
+
+        candidates = None
+        for index_hit in (
+            self.by_provider.get(provider.lower(), set()) if provider else None,
+            self.by_capability.get(capability.lower(), set()) if capability else None,
+            self.by_enabled[enabled] if enabled is not None else None,
+        ):
+            if index_hit is not None:
+                candidates = set(index_hit) if candidates is None else candidates & index_hit
 
-    # Fetch fresh data
+        if search:
+            needle = search.lower()
+            pool = range(len(self.models)) if candidates is None else candidates
+            candidates = {pos for pos in pool if needle in self._search_text[pos]}
+
+        if candidates is None:
+            return self.sorted_views[sort]
+        ranks = self._ranks[sort]
+        return [self.models[pos] for pos in sorted(candidates, key=ranks.__getitem__)]
+
+
+class ModelCatalog:
+    """Stale-while-revalidate holder for the indexed model catalog"""
+
+    def __init__(self, ttl: int = MODEL_CATALOG_TTL):
+        self.ttl = ttl
+        self.index: Optional[CatalogIndex] = None
+        self.refreshed_at = 0.0
+        self._flight = SingleFlight("Model catalog", logger, logging.ERROR)
+        # Toggles not yet guaranteed to be in a fetched snapshot: name -> (seq, enabled)
+        self._patches: Dict[str, tuple] = {}
+        self._patch_seq = 0
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self.refreshed_at >= self.ttl
+
+    async def get(self, pool, force_refresh: bool = False) -> CatalogIndex:
+        """Return the current index; only the first load (or a forced refresh) waits."""
+        if self.index is None or force_refresh:
+            return await self._refresh(pool)
+        if self.is_stale:
+            self._schedule_refresh(pool)
+        return self.index
+
+    def invalidate(self, pool=None) -> None:
+        """Mark the catalog stale and, given a pool, start revalidating now."""
+        self.refreshed_at = 0.0
+        if pool is not None and self.index is not None:
+            self._schedule_refresh(pool)
+
+    def set_enabled(self, model_name: str, enabled: bool) -> int:
+        """
+        Patch the enabled flag into the current snapshot right away.
+
+        Matches catalog entries the same way fetch_all_models merges database
+        rows (full id, or the id without its provider prefix), so a toggle is
+        visible before the background revalidation finishes.
+
+        Returns:
+            Number of catalog entries patched
+        """
+        self._patch_seq += 1
+        self._patches[model_name] = (self._patch_seq, enabled)
+        if self.index is None:
+            return 0
+        models, patched = self._apply_patches(self.index.models, {model_name: enabled})
+        if patched:
+            self.index = CatalogIndex(models)
+        return patched
+
+    @staticmethod
+    def _apply_patches(models: List[Dict], patches: Dict[str, bool]) -> tuple:
+        patched = 0
+        result = []
+        for model in models:
+            model_id = model['id']
+            for name in (model_id, model_id.split('/', 1)[-1]):
+                if name in patches and model.get('enabled') != patches[name]:
+                    model = {**model, 'enabled': patches[name]}
+                    patched += 1
+                    break
+            result.append(model)
+        return result, patched
+
+    def _schedule_refresh(self, pool) -> asyncio.Task:
+        seq = self._patch_seq
+        return self._flight.schedule(lambda: self._build(pool, seq))
+
+    async def _refresh(self, pool) -> CatalogIndex:
+        seq = self._patch_seq
+        return await self._flight.wait(lambda: self._build(pool, seq))
+
+    async def _build(self, pool, seq: int) -> CatalogIndex:
+        started = time.time()
+        models = await fetch_all_models(pool)
+        # A toggle made while this fetch was running may not be in its rows yet
+        newer = {name: enabled for name, (s, enabled) in self._patches.items() if s > seq}
+        self._patches = {name: p for name, p in self._patches.items() if p[0] > seq}
+        if newer:
+            models, _ = self._apply_patches(models, newer)
+        self.index = CatalogIndex(models)
+        self.refreshed_at = started
+        logger.info(f"Cached {len(models)} models from all providers ({time.time() - started:.2f}s)")
+        return self.index
+
+
+async def _fetch_with_key(pool, provider_name: str, fetch) -> List[Dict]:
+    """Fetch a provider's models only if an API key is configured."""
+    api_key = await get_provider_api_key(pool, provider_name)
+    return await fetch(api_key) if api_key else []
+
+
+async def fetch_all_models(pool) -> List[Dict]:
+    """Fetch every provider concurrently and merge database enabled/pricing state."""
     logger.info("Fetching fresh model catalog...")
-    models = []
-
-    # Always fetch OpenRouter (public API)
-    models.extend(await fetch_openrouter_models())
-
-    # Always fetch Anthropic (hardcoded)
-    models.extend(await fetch_anthropic_models())
-
-    # Fetch OpenAI if key configured
-    openai_key = await get_provider_api_key(pool, 'openai')
-    if openai_key:
-        models.extend(await fetch_openai_models(openai_key))
-
-    # Fetch Google if key configured
-    google_key = await get_provider_api_key(pool, 'google')
-    if google_key:
-        models.extend(await fetch_google_models(google_key))
+    (
+        openrouter_models, anthropic_models, openai_models, google_models, db_models
+    ) = await asyncio.gather(
+        fetch_openrouter_models(),  # public API
+        fetch_anthropic_models(),   # hardcoded
+        _fetch_with_key(pool, 'openai', fetch_openai_models),
+        _fetch_with_key(pool, 'google', fetch_google_models),
+        get_models_from_db(pool),
+    )
+    models = openrouter_models + anthropic_models + openai_models + google_models
 
     # Merge with database status (enabled/disabled)
-    db_models = await get_models_from_db(pool)
     db_models_dict = {m['name']: m for m in db_models}
 
     for model in models:
@@ -537,14 +687,27 @@ async def get_all_models_cached(pool, force_refresh: bool = False) -> List[Dict]
             # Not in DB yet - default to disabled
             model['enabled'] = False
 
-    # Update cache
-    _model_cache['timestamp'] = now
-    _model_cache['models'] = models
-
-    logger.info(f"Cached {len(models)} models from all providers")
     return models
 
 
+_model_catalog = ModelCatalog()
+
+
+def get_model_catalog() -> ModelCatalog:
+    """Get the process-wide model catalog"""
+    return _model_catalog
+
+
+async def get_all_models_cached(pool, force_refresh: bool = False) -> List[Dict]:
+    """
+    Get all models from all providers with caching
+
+    Stale-while-revalidate, refreshed every MODEL_CATALOG_TTL seconds.
+    """
+    index = await _model_catalog.get(pool, force_refresh=force_refresh)
+    return index.models
+
+
 # ============================================================================
 # Admin Session Authentication
 # ============================================================================
@@ -671,45 +834,20 @@ async def list_models(
     try:
         pool = await get_db_pool(request)
 
-        # Get all models (cached)
-        all_models = await get_all_models_cached(pool)
-
-        # Apply filters
-        filtered_models = all_models.copy()
-
-        if provider:
-            filtered_models = [m for m in filtered_models if m['provider'] == provider.lower()]
-
-        if search:
-            search_lower = search.lower()
-            filtered_models = [
-                m for m in filtered_models
-                if search_lower in m['name'].lower() or search_lower in m.get('description', '').lower()
-            ]
-
-        if capability:
-            filtered_models = [
-                m for m in filtered_models
-                if capability.lower() in [c.lower() for c in m.get('capabilities', [])]
-            ]
-
-        if enabled is not None:
-            filtered_models = [m for m in filtered_models if m['enabled'] == enabled]
-
-        # Sort
-        if sort == 'price':
-            filtered_models.sort(key=lambda m: m['pricing'].get('input', 0))
-        elif sort == 'context_length':
-            filtered_models.sort(key=lambda m: m.get('context_length', 0), reverse=True)
-        else:  # name
-            filtered_models.sort(key=lambda m: m['name'].lower())
+        # Indexed, presorted catalog (stale-while-revalidate)
+        catalog = await get_model_catalog().get(pool)
+        filtered_models = catalog.query(
+            provider=provider,
+            search=search,
+            capability=capability,
+            enabled=enabled,
+            sort=sort,
+        )
 
         # Pagination
         total = len(filtered_models)
         paginated_models = filtered_models[offset:offset + limit]
-
-        # Get unique providers
-        providers = list(set(m['provider'] for m in all_models))
+        providers = catalog.providers
 
         # Return OpenAI-compatible format
         return {
@@ -718,7 +856,7 @@ async def list_models(
             'total': total,
             'limit': limit,
             'offset': offset,
-            'providers': sorted(providers)
+            'providers': providers
         }
 
     except Exception as e:
@@ -746,15 +884,14 @@ async def get_model_details(
     try:
         pool = await get_db_pool(request)
 
-        # Get all models
-        all_models = await get_all_models_cached(pool)
+        catalog = await get_model_catalog().get(pool)
 
         # Find model
-        model = next((m for m in all_models if m['id'] == model_id), None)
+        model = catalog.by_id.get(model_id)
 
         if not model:
             # Try without provider prefix
-            model = next((m for m in all_models if m['id'].endswith(f"/{model_id}")), None)
+            model = next((m for m in catalog.models if m['id'].endswith(f"/{model_id}")), None)
 
         if not model:
             raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found")
@@ -844,9 +981,11 @@ async def toggle_model(
 
                 logger.info(f"Admin {admin.get('email')} created and {'enabled' if enabled else 'disabled'} model {model_id}")
 
-        # Clear cache to force refresh
-        global _model_cache
-        _model_cache['timestamp'] = 0
+        # Reflect the toggle immediately, then revalidate in the background
+        catalog = get_model_catalog()
+        catalog.set_enabled(model_name, enabled)
+        catalog.invalidate(pool)
+        invalidate_route_table()
 
         return {
             'success': True,
@@ -912,6 +1051,8 @@ async def list_providers(request: Request):
     try:
         pool = await get_db_pool(request)
 
+        catalog = await get_model_catalog().get(pool)
+
         providers = []
         for provider_key, config in PROVIDER_CONFIGS.items():
             # Check if API key is configured
@@ -919,9 +1060,9 @@ async def list_providers(request: Request):
             has_key = api_key is not None
 
             # Get model count for this provider
-            all_models = await get_all_models_cached(pool)
-            model_count = sum(1 for m in all_models if m['provider'] == provider_key)
-            enabled_count = sum(1 for m in all_models if m['provider'] == provider_key and m['enabled'])
+            provider_models = catalog.by_provider.get(provider_key, set())
+            model_count = len(provider_models)
+            enabled_count = len(provider_models & catalog.by_enabled[True])
 
             providers.append({
                 'name': provider_key,
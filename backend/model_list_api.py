@@ -649,19 +649,13 @@ async def get_default_models_for_app(
     curated model list based on the user's subscription tier.
     """
     from model_list_manager import get_model_list_manager
-    import asyncpg
+    from database.pool_manager import pg_connect
 
     try:
         manager = get_model_list_manager()
 
         # Get connection for custom query
-        conn = await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
+        conn = await pg_connect()
 
         try:
             # Find the default list for this app
@@ -19,6 +19,7 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 from decimal import Decimal
 import asyncpg
+from database.pool_manager import pg_connect
 import json
 
 # Configure logging
@@ -74,13 +75,7 @@ class ModelListManager:
         if self.pool:
             return await self.pool.acquire()
 
-        return await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
+        return await pg_connect()
 
     async def _release_connection(self, conn):
         """Release a database connection."""
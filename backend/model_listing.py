@@ -0,0 +1,292 @@
+"""
+Shared base catalog for the categorized model listing (/models/categorized).
+
+list_models_categorized used to call LiteLLM `/v1/models` and the OpenRouter
+model list live on every page load, then re-query the user's tier and BYOK
+providers. The model dropdown took seconds and fanned out to two external
+services per request.
+
+This module splits the listing into:
+
+- A process-wide base snapshot: LiteLLM models grouped by provider and
+  enriched with OpenRouter metadata. Both services are fetched concurrently
+  over the pooled upstream clients. After MODEL_LISTING_TTL seconds the
+  current snapshot keeps being served while one background task revalidates
+  it (stale-while-revalidate).
+- Tier pricing precomputed on the snapshot, once per tier markup, so every
+  user on the same tier shares the same priced groups.
+- A small per-user overlay: tier and enabled BYOK providers, cached for
+  MODEL_LISTING_OVERLAY_TTL seconds and dropped when the user's BYOK keys
+  change.
+
+listing_etag() hashes everything a response depends on, so an unchanged
+listing can be answered with 304 Not Modified.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from single_flight import SingleFlight
+from upstream_clients import get_upstream_client
+
+logger = logging.getLogger(__name__)
+
+MODEL_LISTING_TTL = int(os.getenv("MODEL_LISTING_TTL", "300"))
+MODEL_LISTING_OVERLAY_TTL = float(os.getenv("MODEL_LISTING_OVERLAY_TTL", "30"))
+MODEL_LISTING_OVERLAY_SIZE = 10000
+
+OPENROUTER_MODELS_URL = "https://openrouter.ai/api/v1/models"
+
+
+def provider_for_model(model_id: str) -> str:
+    """Determine the provider group from a LiteLLM model ID."""
+    if model_id.startswith('gpt-') or model_id.startswith('o1-'):
+        return 'openai'
+    if model_id.startswith('claude-'):
+        return 'anthropic'
+    if model_id.startswith('gemini-'):
+        return 'google'
+    if model_id.startswith('llama-'):
+        return 'meta'
+    if model_id.startswith('mistral-') or model_id.startswith('mixtral-'):
+        return 'mistral'
+    if model_id.startswith('deepseek-'):
+        return 'deepseek'
+    if '/' in model_id:
+        # Format like "openrouter/anthropic/claude-3.5-sonnet"
+        return model_id.split('/')[0].lower()
+    return 'other'
+
+
+def build_model_info(model: Dict[str, Any], or_meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build one listing entry, enriched with OpenRouter metadata when available."""
+    model_id = model.get('id', '')
+    model_info = {
+        'id': model_id,
+        'object': 'model',
+        'name': model_id,
+        'display_name': model_id.replace('/', ' / '),
+        'created': model.get('created', 0)
+    }
+    if not or_meta:
+        return model_info
+
+    model_info['context_length'] = or_meta.get('context_length', 0)
+    model_info['description'] = or_meta.get('description', '')
+
+    # Add pricing info (convert from per-token to per-1M-tokens)
+    pricing = or_meta.get('pricing', {})
+    if pricing:
+        try:
+            # OpenRouter returns price per token (e.g., "0.000003")
+            prompt_price = float(pricing.get('prompt', '0'))
+            completion_price = float(pricing.get('completion', '0'))
+
+            model_info['cost_per_1m_input'] = prompt_price * 1_000_000
+            model_info['cost_per_1m_output'] = completion_price * 1_000_000
+
+            # Keep raw pricing for reference
+            model_info['pricing'] = {
+                'prompt': pricing.get('prompt', '0'),
+                'completion': pricing.get('completion', '0'),
+                'request': pricing.get('request', '0'),
+                'image': pricing.get('image', '0')
+            }
+        except (ValueError, TypeError):
+            logger.warning(f"Failed to parse pricing for {model_id}")
+            model_info['cost_per_1m_input'] = 0
+            model_info['cost_per_1m_output'] = 0
+
+    # Add architecture info (modality, instruct type)
+    arch = or_meta.get('architecture', {})
+    if arch:
+        model_info['architecture'] = {
+            'modality': arch.get('modality', 'text'),
+            'tokenizer': arch.get('tokenizer', ''),
+            'instruct_type': arch.get('instruct_type', '')
+        }
+    return model_info
+
+
+class ModelListingSnapshot:
+    """One immutable base catalog plus its memoized per-tier pricing"""
+
+    def __init__(self, provider_models: Dict[str, List[Dict[str, Any]]]):
+        self.provider_models = provider_models
+        self.version = hashlib.sha256(
+            json.dumps(provider_models, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        # tier markup -> provider groups with tier_pricing
+        self._priced: Dict[float, Dict[str, List[Dict[str, Any]]]] = {}
+
+    def priced(self, pricing_snapshot, tier_markup: float) -> Dict[str, List[Dict[str, Any]]]:
+        """Provider groups with tier_pricing attached, computed once per markup."""
+        groups = self._priced.get(float(tier_markup))
+        if groups is not None:
+            return groups
+
+        tier_prices = pricing_snapshot.price_catalog(
+            (
+                (provider_key, model_info['id'], model_info)
+                for provider_key, models_list in self.provider_models.items()
+                for model_info in models_list
+                if model_info.get('pricing') or model_info.get('cost_per_1m_input')
+            ),
+            tier_markup
+        )
+        groups = {
+            provider_key: [
+                {**m, 'tier_pricing': tier_prices[(provider_key, m['id'])]}
+                if (provider_key, m['id']) in tier_prices else m
+                for m in models_list
+            ]
+            for provider_key, models_list in self.provider_models.items()
+        }
+        self._priced[float(tier_markup)] = groups
+        return groups
+
+
+async def fetch_listing_snapshot() -> ModelListingSnapshot:
+    """Fetch LiteLLM's model list and OpenRouter metadata concurrently."""
+    litellm_url = os.getenv("LITELLM_PROXY_URL", "http://uchub-litellm:4000")
+    litellm_key = os.getenv("LITELLM_MASTER_KEY", "sk-REDACTED_LITELLM_MASTER_KEY")
+    openrouter_key = os.getenv("OPENROUTER_API_KEY", "")
+
+    async def fetch_litellm():
+        response = await get_upstream_client(litellm_url).get(
+            f"{litellm_url}/v1/models",
+            headers={"Authorization": f"Bearer {litellm_key}"},
+            timeout=15.0
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_openrouter():
+        openrouter_models = {}
+        try:
+            response = await get_upstream_client(OPENROUTER_MODELS_URL).get(
+                OPENROUTER_MODELS_URL,
+                headers={"Authorization": f"Bearer {openrouter_key}"},
+                timeout=10.0
+            )
+            if response.status_code == 200:
+                for model in response.json().get('data', []):
+                    openrouter_models[model.get('id', '')] = {
+                        'context_length': model.get('context_length', 0),
+                        'pricing': model.get('pricing', {}),
+                        'description': model.get('description', ''),
+                        'architecture': model.get('architecture', {}),
+                        'top_provider': model.get('top_provider', {}),
+                    }
+                logger.info(f"Fetched metadata for {len(openrouter_models)} OpenRouter models")
+        except Exception as e:
+            logger.warning(f"Failed to fetch OpenRouter model metadata: {e}")
+        return openrouter_models
+
+    models_data, openrouter_models = await asyncio.gather(fetch_litellm(), fetch_openrouter())
+
+    provider_models: Dict[str, List[Dict[str, Any]]] = {}
+    for model in models_data.get('data', []):
+        model_id = model.get('id', '')
+        # Skip wildcard entries
+        if '/*' in model_id or model_id == '*/*':
+            continue
+        provider_models.setdefault(provider_for_model(model_id), []).append(
+            build_model_info(model, openrouter_models.get(model_id))
+        )
+    return ModelListingSnapshot(provider_models)
+
+
+class ModelListing:
+    """Stale-while-revalidate holder for the base listing snapshot"""
+
+    def __init__(self, ttl: int = MODEL_LISTING_TTL):
+        self.ttl = ttl
+        self.snapshot: Optional[ModelListingSnapshot] = None
+        self.refreshed_at = 0.0
+        self._flight = SingleFlight("Model listing", logger)
+
+    async def get(self) -> ModelListingSnapshot:
+        """Return the current snapshot; only the first load waits on upstream."""
+        if self.snapshot is None:
+            return await self._flight.wait(self._build)
+        if time.time() - self.refreshed_at >= self.ttl:
+            self._flight.schedule(self._build)
+        return self.snapshot
+
+    def invalidate(self) -> None:
+        self.refreshed_at = 0.0
+
+    async def _build(self) -> ModelListingSnapshot:
+        started = time.time()
+        snapshot = await fetch_listing_snapshot()
+        self.snapshot = snapshot
+        self.refreshed_at = started
+        return snapshot
+
+
+_model_listing = ModelListing()
+
+
+def get_model_listing() -> ModelListing:
+    """Get the process-wide categorized model listing"""
+    return _model_listing
+
+
+# ============================================================================
+# Per-user overlay (tier + BYOK providers)
+# ============================================================================
+
+# user_id -> (expires_at_monotonic, tier, enabled BYOK provider names)
+_user_overlays: "OrderedDict[str, Tuple[float, str, FrozenSet[str]]]" = OrderedDict()
+
+
+async def get_user_overlay(user_id: str, credit_system, byok_manager) -> Tuple[str, FrozenSet[str]]:
+    """Return (tier, enabled BYOK provider names) for a user, briefly cached."""
+    entry = _user_overlays.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        _user_overlays.move_to_end(user_id)
+        return entry[1], entry[2]
+
+    user_tier, byok_providers_list = await asyncio.gather(
+        credit_system.get_user_tier(user_id),
+        byok_manager.list_user_providers(user_id),
+    )
+    byok_provider_names = frozenset(
+        p['provider'].lower() for p in byok_providers_list if p.get('enabled')
+    )
+    _user_overlays[user_id] = (
+        time.monotonic() + MODEL_LISTING_OVERLAY_TTL, user_tier, byok_provider_names
+    )
+    _user_overlays.move_to_end(user_id)
+    while len(_user_overlays) > MODEL_LISTING_OVERLAY_SIZE:
+        _user_overlays.popitem(last=False)
+    return user_tier, byok_provider_names
+
+
+def invalidate_user_overlay(user_id: Optional[str] = None) -> None:
+    """Forget a user's cached tier/BYOK overlay (all users when None)."""
+    if user_id is None:
+        _user_overlays.clear()
+    else:
+        _user_overlays.pop(user_id, None)
+
+
+def listing_etag(
+    snapshot: ModelListingSnapshot,
+    tier_markup: float,
+    byok_provider_names: Iterable[str],
+    federated: Dict[str, str],
+) -> str:
+    """Weak ETag over everything a categorized listing response depends on."""
+    digest = hashlib.sha256(json.dumps(
+        [snapshot.version, tier_markup, sorted(byok_provider_names), sorted(federated.items())],
+        default=str,
+    ).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
@@ -12,6 +12,7 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 import asyncpg
+from database.pool_manager import get_budget_pool
 from cryptography.fernet import Fernet
 import base64
 from model_adapters import create_adapter, ServerAdapter, ModelInfo, ServerMetrics
@@ -66,20 +67,18 @@ class ModelServerManager:
     """Manages model servers and routing"""
 
     def __init__(self, db_url: str = None):
-        self.db_url = db_url or os.environ.get(
-            'DATABASE_URL',
-            f"postgresql://{os.environ.get('POSTGRES_USER', 'unicorn')}:"
-            f"{os.environ.get('POSTGRES_PASSWORD', 'password')}@"
-            f"{os.environ.get('POSTGRES_HOST', 'unicorn-postgresql')}:5432/"
-            f"{os.environ.get('POSTGRES_DB', 'unicorn_db')}"
-        )
+        # Explicit URL gets a private pool; otherwise use the shared one
+        self.db_url = db_url
         self.db_pool = None
         self.adapters: Dict[str, ServerAdapter] = {}
 
     async def initialize(self):
         """Initialize database connection pool and run migrations"""
         try:
-            self.db_pool = await asyncpg.create_pool(self.db_url, min_size=1, max_size=10)
+            if self.db_url:
+                self.db_pool = await asyncpg.create_pool(self.db_url, min_size=1, max_size=10)
+            else:
+                self.db_pool = get_budget_pool("background")
             await self._run_migrations()
             logger.info("Model server manager initialized")
         except Exception as e:
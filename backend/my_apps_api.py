@@ -14,6 +14,7 @@ from typing import Any, List, Optional
 from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 import asyncpg
+from database.pool_manager import pg_connect
 
 # Router configuration
 router = APIRouter(prefix="/api/v1/my-apps", tags=["my-apps"])
@@ -45,13 +46,7 @@ class AppResponse(BaseModel):
 
 async def get_db_connection():
     """Create database connection."""
-    return await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db")
-    )
+    return await pg_connect()
 
 
 # =============================================================================
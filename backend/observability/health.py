@@ -199,30 +199,30 @@ class HealthChecker:
                 async with self.db_pool.acquire() as conn:
                     await conn.fetchval("SELECT 1")
             else:
-                # Create temporary connection
-                db_host = os.getenv("POSTGRES_HOST", "unicorn-postgresql")
-                db_port = int(os.getenv("POSTGRES_PORT", "5432"))
-                db_user = os.getenv("POSTGRES_USER", "unicorn")
-                db_password = os.getenv("POSTGRES_PASSWORD", "unicorn")
-                db_name = os.getenv("POSTGRES_DB", "unicorn_db")
-
-                conn = await asyncpg.connect(
-                    host=db_host,
-                    port=db_port,
-                    user=db_user,
-                    password=db_password,
-                    database=db_name,
-                    timeout=5.0
-                )
-                await conn.fetchval("SELECT 1")
-                await conn.close()
+                # Borrow a connection from the shared pool
+                from database.pool_manager import pg_connect
+                async with await pg_connect(timeout=5.0) as conn:
+                    await conn.fetchval("SELECT 1")
 
             duration_ms = (time.time() - start_time) * 1000
 
+            from database.pool_manager import get_pool_manager
+            budgets = get_pool_manager().stats()["budgets"]
+
             return {
                 "status": "healthy",
                 "response_time_ms": round(duration_ms, 2),
-                "message": "Database connection successful"
+                "message": "Database connection successful",
+                "pool": {
+                    name: {
+                        "in_use": b["in_use"],
+                        "limit": b["limit"],
+                        "waiting": b["waiting"],
+                        "saturated": b["saturated"],
+                        "avg_wait_ms": b["wait"]["avg_ms"],
+                    }
+                    for name, b in budgets.items()
+                }
             }
 
         except Exception as e:
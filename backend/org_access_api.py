@@ -19,6 +19,7 @@ from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, HTTPException, Request, Response, Query
 from pydantic import BaseModel
 import asyncpg
+from database.pool_manager import pg_connect
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -92,13 +93,7 @@ class CurrentOrgResponse(BaseModel):
 
 async def get_db_connection():
     """Create database connection."""
-    return await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db")
-    )
+    return await pg_connect()
 
 
 # =============================================================================
@@ -11,6 +11,7 @@ from datetime import datetime
 import sys
 import os
 import asyncpg
+from database.pool_manager import pg_connect
 
 # Add parent directory to path to import from server.py
 if '/app' not in sys.path:
@@ -23,6 +24,7 @@ if '/app' not in sys.path:
 
 # Import Keycloak user lookup
 from keycloak_integration import get_user_by_id
+from org_credit_integration import invalidate_user_org
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/org", tags=["organizations"])
@@ -35,13 +37,7 @@ async def get_db_connection():
     Create a connection to the Postgres database that holds the real
     organizations / organization_members tables. Mirrors org_access_api.py.
     """
-    return await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db")
-    )
+    return await pg_connect()
 
 
 async def _get_org_row(conn, org_id: str) -> Optional[asyncpg.Record]:
@@ -521,6 +517,7 @@ async def create_organization(
                 org_row["id"],
                 user_id,
             )
+        invalidate_user_org(user_id)
 
         logger.info(f"Created organization {org_row['id']} ({org_data.name}) with owner {user_id}")
 
@@ -666,6 +663,7 @@ async def delete_organization(
         # Hard delete; membership/quota/invitation/settings/audit rows cascade
         # (organization_* tables declare ON DELETE CASCADE on org_id).
         await conn.execute("DELETE FROM organizations WHERE id::text = $1", org_id)
+        invalidate_user_org()
 
         logger.info(
             f"Org {org_id} ({org['name']}) DELETED by admin "
@@ -944,6 +942,7 @@ async def add_organization_member(
             member_data.user_id,
             member_data.role,
         )
+        invalidate_user_org(member_data.user_id)
 
         logger.info(f"Added user {member_data.user_id} to org {org_id} with role {member_data.role}")
 
@@ -1088,6 +1087,7 @@ async def remove_organization_member(
         # asyncpg returns e.g. "DELETE 1" — 0 rows means user not a member
         if result.endswith(" 0"):
             raise HTTPException(status_code=404, detail="User not found in organization")
+        invalidate_user_org(user_id)
 
         logger.info(f"Removed user {user_id} from org {org_id}")
 
@@ -38,6 +38,7 @@ async def get_db_connection():
 
 # Authentication dependencies (fix auth order issue)
 from auth_dependencies import require_authenticated_user, require_admin_user
+from org_credit_integration import invalidate_org_allocation
 
 # Rate limiting
 from slowapi import Limiter
@@ -679,6 +680,7 @@ async def allocate_credits_to_user(
             )
 
         logger.info(f"Allocated {allocation.allocated_credits} credits to user {allocation.user_id} in org {org_id}")
+        invalidate_org_allocation(org_id, allocation.user_id)
 
         # Get updated allocation
         alloc = await conn.fetchrow(
@@ -0,0 +1,437 @@
+"""
+Org Credit Holds - reservation-based debits for service organization pools
+
+Every LLM debit for a service key (`org_*` user IDs) used to run
+`SELECT ... FOR UPDATE OF ocp` on the org's single organization_credit_pools
+row and hold that lock for the whole debit transaction. All traffic from one
+high-volume app (Open WebUI, Brigade, ...) serialized on that one hot row.
+
+This module replaces the row lock with a hold/settle model:
+
+- A Redis hash per org mirrors the pool balance (`balance`) and the credits
+  currently reserved by in-flight requests (`held`). It is loaded from
+  `available_credits` on first use and reloaded after ORG_CREDIT_MIRROR_TTL so
+  top-ups made elsewhere are picked up.
+- Before the upstream call, hold() pre-authorizes the estimated cost with one
+  atomic Lua script (check `balance - held` and reserve). Holds lapse after
+  ORG_CREDIT_HOLD_TTL, so a request that dies mid-flight never leaks credits.
+- After the call, settle() atomically releases the hold and debits the actual
+  cost from the mirror. Without a hold it is an atomic check-and-debit.
+- The debit itself is recorded as an append-only row in
+  `organization_credit_ledger` (a plain INSERT - no lock on the pool row).
+  A background flusher coalesces unapplied ledger rows into ONE
+  `used_credits` update per org per batch, claiming rows with
+  FOR UPDATE SKIP LOCKED so several uvicorn workers can share the ledger.
+
+used_credits is BIGINT, so each coalesced batch is rounded once (the old
+per-debit path truncated every single debit with int()). The ledger keeps the
+exact amounts for audit.
+
+Configuration (env):
+    ORG_CREDIT_HOLD_TTL           seconds before an unsettled hold lapses (default 300)
+    ORG_CREDIT_MIRROR_TTL         seconds before the balance mirror is reloaded (default 300)
+    ORG_CREDIT_FLUSH_SECONDS      ledger -> pool flush interval (default 2.0)
+    ORG_CREDIT_FLUSH_BATCH        max ledger rows coalesced per statement (default 1000)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LEDGER_DDL = """
+CREATE TABLE IF NOT EXISTS organization_credit_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    org_id UUID NOT NULL,
+    amount NUMERIC(18, 6) NOT NULL,
+    entry_type VARCHAR(20) NOT NULL DEFAULT 'usage',
+    hold_id VARCHAR(64),
+    model VARCHAR(255),
+    metadata JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    applied_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_org_credit_ledger_unapplied
+    ON organization_credit_ledger(id) WHERE applied_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_org_credit_ledger_org_created
+    ON organization_credit_ledger(org_id, created_at);
+"""
+
+# Shared prelude: give back holds whose TTL has passed.
+# KEYS[1] = mirror hash, KEYS[2] = hold amounts hash, KEYS[3] = hold expiry zset
+_RELEASE_LAPSED_LUA = """
+local lapsed = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[3])
+for _, id in ipairs(lapsed) do
+    local held_amount = redis.call('HGET', KEYS[2], id)
+    if held_amount then
+        redis.call('HINCRBYFLOAT', KEYS[1], 'held', -tonumber(held_amount))
+        redis.call('HDEL', KEYS[2], id)
+    end
+    redis.call('ZREM', KEYS[3], id)
+end
+"""
+
+# ARGV: amount, hold_id, now, hold_expires_at, holds_key_ttl
+HOLD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {'missing', '0'}
+end
+""" + _RELEASE_LAPSED_LUA + """
+local balance = tonumber(redis.call('HGET', KEYS[1], 'balance') or '0')
+local held = tonumber(redis.call('HGET', KEYS[1], 'held') or '0')
+local amount = tonumber(ARGV[1])
+if balance - held < amount then
+    return {'insufficient', tostring(balance - held)}
+end
+redis.call('HINCRBYFLOAT', KEYS[1], 'held', amount)
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[1])
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+redis.call('EXPIRE', KEYS[3], ARGV[5])
+return {'held', tostring(balance - held - amount)}
+"""
+
+# ARGV: amount, hold_id ('' for none), now
+SETTLE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {'missing', '0'}
+end
+""" + _RELEASE_LAPSED_LUA + """
+local amount = tonumber(ARGV[1])
+local hold = false
+if ARGV[2] ~= '' then
+    hold = redis.call('HGET', KEYS[2], ARGV[2])
+end
+if hold then
+    redis.call('HINCRBYFLOAT', KEYS[1], 'held', -tonumber(hold))
+    redis.call('HDEL', KEYS[2], ARGV[2])
+    redis.call('ZREM', KEYS[3], ARGV[2])
+else
+    local balance = tonumber(redis.call('HGET', KEYS[1], 'balance') or '0')
+    local held = tonumber(redis.call('HGET', KEYS[1], 'held') or '0')
+    if balance - held < amount then
+        return {'insufficient', tostring(balance - held)}
+    end
+end
+local balance = tonumber(redis.call('HINCRBYFLOAT', KEYS[1], 'balance', -amount))
+local held = tonumber(redis.call('HGET', KEYS[1], 'held') or '0')
+return {'settled', tostring(balance - held)}
+"""
+
+# Seed the mirror; outstanding holds survive a reload.
+# ARGV: balance, mirror_ttl
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    local held = 0
+    for _, held_amount in ipairs(redis.call('HVALS', KEYS[2])) do
+        held = held + tonumber(held_amount)
+    end
+    redis.call('HSET', KEYS[1], 'balance', ARGV[1], 'held', tostring(held))
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+FLUSH_SQL = """
+WITH claimed AS (
+    UPDATE organization_credit_ledger
+    SET applied_at = NOW()
+    WHERE id IN (
+        SELECT id FROM organization_credit_ledger
+        WHERE applied_at IS NULL
+        ORDER BY id
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING org_id, amount
+), totals AS (
+    SELECT org_id, SUM(amount) AS total, COUNT(*) AS entries
+    FROM claimed
+    GROUP BY org_id
+), applied AS (
+    UPDATE organization_credit_pools p
+    SET used_credits = p.used_credits + ROUND(t.total)::bigint,
+        updated_at = NOW()
+    FROM totals t
+    WHERE p.org_id = t.org_id
+    RETURNING p.org_id
+)
+SELECT (SELECT COUNT(*) FROM claimed) AS claimed,
+       (SELECT COUNT(*) FROM applied) AS orgs
+"""
+
+
+class OrgCreditMirrorUnavailable(Exception):
+    """The org pool could not be mirrored (org missing or Redis/DB failure)."""
+
+
+class OrgCreditHolds:
+    """Redis-mirrored hold/settle engine with a coalescing Postgres ledger"""
+
+    def __init__(
+        self,
+        db_pool=None,
+        redis_client=None,
+        hold_ttl: Optional[int] = None,
+        mirror_ttl: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        flush_batch: Optional[int] = None,
+        flush_pool=None,
+    ):
+        self.db_pool = db_pool
+        # The ledger flusher runs off the request path; give it its own budget
+        self.flush_pool = flush_pool
+        self.redis = redis_client
+        self.hold_ttl = hold_ttl or int(os.getenv("ORG_CREDIT_HOLD_TTL", "300"))
+        self.mirror_ttl = mirror_ttl or int(os.getenv("ORG_CREDIT_MIRROR_TTL", "300"))
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else float(os.getenv("ORG_CREDIT_FLUSH_SECONDS", "2.0"))
+        )
+        self.flush_batch = flush_batch or int(os.getenv("ORG_CREDIT_FLUSH_BATCH", "1000"))
+        self.enabled = False
+        self._scripts: Dict[str, Any] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.stats = {"holds": 0, "rejected": 0, "settled": 0, "flushed": 0, "flushes": 0}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Create the ledger table and start the flusher. Stays disabled on failure."""
+        if not self.db_pool or self.redis is None:
+            self.enabled = False
+            return
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.execute(LEDGER_DDL)
+        except Exception as e:
+            self.enabled = False
+            logger.warning(f"organization_credit_ledger unavailable, org debits keep row locks: {e}")
+            return
+
+        self.enabled = True
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(
+            f"Org credit holds started (hold_ttl={self.hold_ttl}s, "
+            f"mirror_ttl={self.mirror_ttl}s, flush={self.flush_interval}s)"
+        )
+
+    async def stop(self) -> None:
+        """Stop the flusher and apply whatever is left in the ledger."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        if self.enabled:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Final org ledger flush failed (rows stay unapplied): {e}")
+        self.enabled = False
+        logger.info("Org credit holds stopped")
+
+    # ------------------------------------------------------------------
+    # Redis mirror
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _keys(org_uuid: str):
+        return [
+            f"credits:orgpool:{org_uuid}",
+            f"credits:orgpool:{org_uuid}:holds",
+            f"credits:orgpool:{org_uuid}:expiry",
+        ]
+
+    def _script(self, name: str, source: str):
+        script = self._scripts.get(name)
+        if script is None:
+            script = self._scripts[name] = self.redis.register_script(source)
+        return script
+
+    async def _load_mirror(self, org_uuid: str) -> None:
+        """Seed the mirror from organization_credit_pools (no row lock)."""
+        async with self.db_pool.acquire() as conn:
+            balance = await conn.fetchval(
+                "SELECT available_credits FROM organization_credit_pools WHERE org_id = $1",
+                org_uuid
+            )
+        if balance is None:
+            raise OrgCreditMirrorUnavailable(f"no credit pool for org {org_uuid}")
+        await self._script("load", LOAD_SCRIPT)(
+            keys=self._keys(org_uuid), args=[str(float(balance)), self.mirror_ttl]
+        )
+
+    async def _run(self, name: str, source: str, org_uuid: str, args) -> Tuple[str, float]:
+        """Run a mirror script, seeding the mirror once if it is not loaded."""
+        keys = self._keys(org_uuid)
+        try:
+            for attempt in range(2):
+                status, value = await self._script(name, source)(keys=keys, args=args)
+                status = status.decode() if isinstance(status, bytes) else status
+                if status != "missing":
+                    return status, float(value)
+                if attempt == 0:
+                    await self._load_mirror(org_uuid)
+        except OrgCreditMirrorUnavailable:
+            raise
+        except Exception as e:
+            raise OrgCreditMirrorUnavailable(str(e)) from e
+        raise OrgCreditMirrorUnavailable(f"credit mirror for org {org_uuid} did not load")
+
+    async def hold(self, org_uuid: str, amount: float) -> Tuple[Optional[str], float]:
+        """
+        Reserve an estimated amount against the org's mirrored balance.
+
+        Returns:
+            (hold_id, available_after) - hold_id is None when the pool can't
+            cover the amount.
+
+        Raises:
+            OrgCreditMirrorUnavailable: caller should fall back to the locked path
+        """
+        hold_id = uuid.uuid4().hex
+        now = time.time()
+        status, available = await self._run(
+            "hold", HOLD_SCRIPT, org_uuid,
+            [str(float(amount)), hold_id, now, now + self.hold_ttl,
+             self.hold_ttl + self.mirror_ttl],
+        )
+        if status != "held":
+            self.stats["rejected"] += 1
+            return None, available
+        self.stats["holds"] += 1
+        return hold_id, available
+
+    async def settle(
+        self,
+        org_uuid: str,
+        amount: float,
+        hold_id: Optional[str] = None,
+    ) -> Tuple[bool, float]:
+        """
+        Release a hold (if any) and debit the actual cost from the mirror.
+
+        A settle against a live hold always succeeds - the request was
+        pre-authorized. Without a hold the balance is checked atomically.
+
+        Returns:
+            (settled, available_after)
+        """
+        status, available = await self._run(
+            "settle", SETTLE_SCRIPT, org_uuid,
+            [str(float(amount)), hold_id or "", time.time()],
+        )
+        if status != "settled":
+            self.stats["rejected"] += 1
+            return False, available
+        self.stats["settled"] += 1
+        return True, available
+
+    async def release(self, org_uuid: str, hold_id: str) -> None:
+        """Give a hold back without debiting (request failed upstream)."""
+        try:
+            await self.settle(org_uuid, 0.0, hold_id)
+        except OrgCreditMirrorUnavailable as e:
+            logger.debug(f"Hold {hold_id} not released, it will lapse: {e}")
+
+    async def refund(self, org_uuid: str, amount: float) -> None:
+        """Put a settled amount back into the mirror (ledger write failed)."""
+        try:
+            await self.redis.hincrbyfloat(self._keys(org_uuid)[0], "balance", float(amount))
+        except Exception as e:
+            logger.warning(f"Failed to refund {amount} to org {org_uuid} mirror: {e}")
+
+    # ------------------------------------------------------------------
+    # Postgres ledger
+    # ------------------------------------------------------------------
+
+    async def record(
+        self,
+        conn,
+        org_uuid: str,
+        amount: float,
+        hold_id: Optional[str],
+        metadata: Dict[str, Any],
+    ) -> int:
+        """Append a usage row to the ledger on the caller's transaction."""
+        return await conn.fetchval(
+            """
+            INSERT INTO organization_credit_ledger (org_id, amount, hold_id, model, metadata)
+            VALUES ($1, $2, $3, $4, $5)
+            RETURNING id
+            """,
+            org_uuid,
+            amount,
+            hold_id,
+            metadata.get('model'),
+            json.dumps(metadata),
+        )
+
+    async def flush(self) -> int:
+        """Coalesce unapplied ledger rows into organization_credit_pools.used_credits."""
+        total = 0
+        pool = self.flush_pool or self.db_pool
+        while True:
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow(FLUSH_SQL, self.flush_batch)
+            claimed = int(row['claimed']) if row else 0
+            if claimed:
+                total += claimed
+                self.stats["flushed"] += claimed
+                self.stats["flushes"] += 1
+                logger.debug(f"Applied {claimed} org ledger rows across {row['orgs']} pool(s)")
+            if claimed < self.flush_batch:
+                return total
+
+    async def _flush_loop(self) -> None:
+        """Periodically apply the ledger; errors never stop the loop."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Org credit ledger flush error: {e}")
+
+
+# Singleton instance
+_org_credit_holds: Optional[OrgCreditHolds] = None
+
+
+def get_org_credit_holds() -> OrgCreditHolds:
+    """
+    Get singleton instance of OrgCreditHolds
+
+    Returns:
+        OrgCreditHolds instance (disabled until init_org_credit_holds runs)
+    """
+    global _org_credit_holds
+    if _org_credit_holds is None:
+        _org_credit_holds = OrgCreditHolds()
+    return _org_credit_holds
+
+
+async def init_org_credit_holds(db_pool, redis_client, flush_pool=None) -> OrgCreditHolds:
+    """Bind the singleton to the application pools/Redis and start it (startup hook)."""
+    holds = get_org_credit_holds()
+    holds.db_pool = db_pool
+    holds.flush_pool = flush_pool
+    holds.redis = redis_client
+    await holds.start()
+    return holds
+
+
+async def shutdown_org_credit_holds() -> None:
+    """Stop the flusher and apply pending ledger rows (shutdown hook)."""
+    if _org_credit_holds is not None:
+        await _org_credit_holds.stop()
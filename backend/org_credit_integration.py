@@ -5,17 +5,34 @@ This module provides integration between the LLM API and organizational billing
 It allows LLM credit charges to be deducted from organization credit pools instead of
 individual user balances.
 
+User->org resolution and the per-user allocation snapshot used by the
+pre-request balance check are cached in-process for a short TTL, so
+chat_completions does not query Postgres for them on every call. org_api,
+org_billing_api and user_management_api invalidate the caches when
+memberships or allocations change, and a debit drops the snapshot.
+
 Author: Integration Team
 Date: November 12, 2025
 """
 
 import logging
-from typing import Optional, Dict, Tuple
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Dict, Tuple
 import asyncpg
 import os
 
+from database.pool_manager import get_budget_pool
+
 logger = logging.getLogger(__name__)
 
+ORG_MEMBERSHIP_CACHE_TTL = float(os.getenv("ORG_MEMBERSHIP_CACHE_TTL", "60"))
+ORG_CREDIT_SNAPSHOT_TTL = float(os.getenv("ORG_CREDIT_SNAPSHOT_TTL", "5"))
+ORG_CACHE_MAX_ENTRIES = 10000
+
+_MISSING = object()
+
 
 class OrgCreditIntegration:
     """
@@ -27,23 +44,75 @@ class OrgCreditIntegration:
         Initialize integration
 
         Args:
-            db_pool: PostgreSQL connection pool (optional, will create if not provided)
+            db_pool: PostgreSQL connection pool (optional, defaults to the shared pool)
         """
-        self.db_pool = db_pool
-
-    async def _get_db_connection(self) -> asyncpg.Connection:
-        """Get database connection"""
-        if self.db_pool:
-            return await self.db_pool.acquire()
-
-        # Create one-off connection if no pool provided
-        return await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
+        self.db_pool = db_pool or get_budget_pool("request")
+        # user_id -> (expires_at_monotonic, org_id or None)
+        self._user_orgs: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        # (org_id, user_id) -> (expires_at_monotonic, allocation snapshot or None)
+        self._allocations: "OrderedDict[Tuple[str, str], Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+
+    @asynccontextmanager
+    async def _connection(self):
+        """Borrow a pooled connection"""
+        async with self.db_pool.acquire() as conn:
+            yield conn
+
+    @staticmethod
+    def _cache_get(cache: OrderedDict, key) -> Any:
+        entry = cache.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return _MISSING
+        cache.move_to_end(key)
+        return entry[1]
+
+    @staticmethod
+    def _cache_put(cache: OrderedDict, key, value, ttl: float) -> None:
+        cache[key] = (time.monotonic() + ttl, value)
+        cache.move_to_end(key)
+        while len(cache) > ORG_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+    def invalidate_user(self, user_id: Optional[str] = None) -> None:
+        """Forget cached org membership for a user (all users when None)"""
+        if user_id is None:
+            self._user_orgs.clear()
+        else:
+            self._user_orgs.pop(user_id, None)
+
+    def invalidate_allocation(self, org_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+        """Forget cached allocation snapshots matching org and/or user (all when both None)"""
+        if org_id is None and user_id is None:
+            self._allocations.clear()
+            return
+        stale = [
+            key for key in self._allocations
+            if (org_id is None or key[0] == str(org_id)) and (user_id is None or key[1] == user_id)
+        ]
+        for key in stale:
+            del self._allocations[key]
+
+    async def _get_allocation_snapshot(self, org_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """User's allocation in an org, cached for ORG_CREDIT_SNAPSHOT_TTL seconds"""
+        key = (str(org_id), user_id)
+        snapshot = self._cache_get(self._allocations, key)
+        if snapshot is not _MISSING:
+            return snapshot
+
+        async with self._connection() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT is_active, remaining_credits,
+                       (allocated_credits - used_credits) as remaining
+                FROM user_credit_allocations
+                WHERE org_id = $1 AND user_id = $2
+                """,
+                org_id,
+                user_id
+            )
+        snapshot = dict(row) if row else None
+        self._cache_put(self._allocations, key, snapshot, ORG_CREDIT_SNAPSHOT_TTL)
+        return snapshot
 
     async def get_user_org_id(self, user_id: str, request_state: Optional[Dict] = None) -> Optional[str]:
         """
@@ -69,44 +138,28 @@ class OrgCreditIntegration:
                     logger.info(f"Using active org from request state: {org_id}")
                     return org_id
 
-            # Option 2: From database (default org or first org)
-            conn = await self._get_db_connection()
-            try:
-                # Check for default organization first
-                org_id = await conn.fetchval(
-                    """
-                    SELECT org_id FROM organization_members
-                    WHERE user_id = $1 AND is_default = true
-                    LIMIT 1
-                    """,
-                    user_id
-                )
+            # Option 2: From cache or database (default org, else latest membership)
+            org_id = self._cache_get(self._user_orgs, user_id)
+            if org_id is not _MISSING:
+                return org_id
 
-                if org_id:
-                    logger.info(f"Using default org for user {user_id}: {org_id}")
-                    return org_id
-
-                # Get first organization user belongs to
+            async with self._connection() as conn:
                 org_id = await conn.fetchval(
                     """
                     SELECT org_id FROM organization_members
                     WHERE user_id = $1
-                    ORDER BY joined_at DESC
+                    ORDER BY (is_default IS TRUE) DESC, joined_at DESC
                     LIMIT 1
                     """,
                     user_id
                 )
+            self._cache_put(self._user_orgs, user_id, org_id, ORG_MEMBERSHIP_CACHE_TTL)
 
-                if org_id:
-                    logger.info(f"Using first org for user {user_id}: {org_id}")
-                    return org_id
-
+            if org_id:
+                logger.debug(f"Resolved org for user {user_id}: {org_id}")
+            else:
                 logger.warning(f"User {user_id} does not belong to any organization")
-                return None
-
-            finally:
-                if not self.db_pool:
-                    await conn.close()
+            return org_id
 
         except Exception as e:
             logger.error(f"Error getting user org ID: {e}", exc_info=True)
@@ -136,43 +189,22 @@ class OrgCreditIntegration:
             if not org_id:
                 return False, None, "User does not belong to any organization"
 
-            # Check if org has sufficient credits
-            conn = await self._get_db_connection()
-            try:
-                # Convert float credits to integer (credits are stored as bigint)
-                credits_needed_int = int(credits_needed * 1000)  # Convert to milicredits
-
-                has_credits = await conn.fetchval(
-                    "SELECT has_sufficient_credits($1, $2, $3)",
-                    org_id,
-                    user_id,
-                    credits_needed_int
-                )
-
-                if has_credits:
-                    return True, org_id, "Sufficient credits available"
-                else:
-                    # Get current allocation for better error message
-                    allocation = await conn.fetchrow(
-                        """
-                        SELECT allocated_credits, used_credits,
-                               (allocated_credits - used_credits) as remaining
-                        FROM user_credit_allocations
-                        WHERE org_id = $1 AND user_id = $2
-                        """,
-                        org_id,
-                        user_id
-                    )
-
-                    if allocation:
-                        remaining = allocation['remaining']
-                        return False, org_id, f"Insufficient credits. Available: {remaining/1000:.3f}, needed: {credits_needed:.3f}"
-                    else:
-                        return False, org_id, "No credit allocation found for user in organization"
-
-            finally:
-                if not self.db_pool:
-                    await conn.close()
+            # Check the user's allocation (same rule as has_sufficient_credits())
+            # against a short-lived snapshot; deduct_credits() enforces it again
+            credits_needed_int = int(credits_needed * 1000)  # Convert to milicredits
+            allocation = await self._get_allocation_snapshot(org_id, user_id)
+
+            if (
+                allocation
+                and allocation['is_active']
+                and allocation['remaining_credits'] is not None
+                and allocation['remaining_credits'] >= credits_needed_int
+            ):
+                return True, org_id, "Sufficient credits available"
+            if allocation:
+                remaining = allocation['remaining']
+                return False, org_id, f"Insufficient credits. Available: {remaining/1000:.3f}, needed: {credits_needed:.3f}"
+            return False, org_id, "No credit allocation found for user in organization"
 
         except Exception as e:
             logger.error(f"Error checking org credits: {e}", exc_info=True)
@@ -234,8 +266,7 @@ class OrgCreditIntegration:
             }
 
             # Deduct credits using stored function
-            conn = await self._get_db_connection()
-            try:
+            async with self._connection() as conn:
                 success = await conn.fetchval(
                     "SELECT deduct_credits($1, $2, $3, $4, $5, $6, $7)",
                     org_id,
@@ -264,15 +295,12 @@ class OrgCreditIntegration:
                         f"for user {user_id}. Remaining: {remaining/1000:.3f}"
                     )
 
+                    self.invalidate_allocation(org_id, user_id)
                     return True, org_id, remaining
                 else:
                     logger.error(f"Failed to deduct credits for user {user_id} in org {org_id}")
                     return False, org_id, None
 
-            finally:
-                if not self.db_pool:
-                    await conn.close()
-
         except Exception as e:
             logger.error(f"Error deducting org credits: {e}", exc_info=True)
             return False, org_id, None
@@ -298,8 +326,7 @@ class OrgCreditIntegration:
             if not org_id:
                 return None, None, None
 
-            conn = await self._get_db_connection()
-            try:
+            async with self._connection() as conn:
                 allocation = await conn.fetchrow(
                     """
                     SELECT allocated_credits, used_credits,
@@ -321,10 +348,6 @@ class OrgCreditIntegration:
                     # User has no allocation yet
                     return org_id, 0, 0
 
-            finally:
-                if not self.db_pool:
-                    await conn.close()
-
         except Exception as e:
             logger.error(f"Error getting user org credits: {e}", exc_info=True)
             return None, None, None
@@ -345,3 +368,23 @@ def get_org_credit_integration() -> OrgCreditIntegration:
     if _org_credit_integration is None:
         _org_credit_integration = OrgCreditIntegration()
     return _org_credit_integration
+
+
+def init_org_credit_integration(db_pool: asyncpg.Pool) -> OrgCreditIntegration:
+    """Wire the singleton to the shared application pool (called at startup)"""
+    integration = get_org_credit_integration()
+    integration.db_pool = db_pool
+    return integration
+
+
+def invalidate_user_org(user_id: Optional[str] = None) -> None:
+    """Drop cached org resolution and allocation snapshots after a membership change"""
+    if _org_credit_integration is not None:
+        _org_credit_integration.invalidate_user(user_id)
+        _org_credit_integration.invalidate_allocation(user_id=user_id)
+
+
+def invalidate_org_allocation(org_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+    """Drop cached allocation snapshots after credits are allocated or reset"""
+    if _org_credit_integration is not None:
+        _org_credit_integration.invalidate_allocation(org_id, user_id)
@@ -0,0 +1,205 @@
+"""
+Immutable LLM pricing snapshot.
+
+CreditSystem.calculate_cost used to query subscription_tiers for the tier
+markup on every call (chat_completions prices each request at least twice),
+and list_models_categorized repeated the same lookup. All pricing inputs --
+model and provider rates, power-level multipliers and tier markups -- now
+live in one frozen PricingSnapshot, so pricing is pure in-memory arithmetic.
+
+The snapshot is loaded at startup and replaced wholesale (a single reference
+swap, so readers never see a half-updated snapshot) when:
+  - an admin changes subscription tiers (`refresh_pricing_snapshot`)
+  - it is older than PRICING_SNAPSHOT_TTL seconds (default 300); the refresh
+    runs in the background while the current snapshot keeps serving, which
+    also picks up changes made by other workers
+
+Until the first load succeeds, tier markups fall back to the hardcoded
+TIER_MARKUP table, exactly as calculate_cost did when the DB lookup failed.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRICING_SNAPSHOT_TTL = float(os.getenv("PRICING_SNAPSHOT_TTL", "300"))
+# Seconds before retrying after a failed load
+_RETRY_SECONDS = 30.0
+
+
+def _frozen(mapping: Mapping) -> Mapping:
+    return MappingProxyType(dict(mapping))
+
+
+@dataclass(frozen=True)
+class PricingSnapshot:
+    """Everything needed to price LLM usage, without I/O"""
+    model_pricing: Mapping[str, float]
+    provider_pricing: Mapping[str, float]
+    power_multipliers: Mapping[str, float]
+    fallback_tier_markups: Mapping[str, float]  # fractions, e.g. 0.4 = 40%
+    tier_markups: Mapping[str, float] = field(default_factory=lambda: _frozen({}))  # percentages, from DB
+    loaded_at: float = 0.0
+
+    @classmethod
+    def from_defaults(cls, tier_markups: Optional[Mapping[str, float]] = None, loaded_at: float = 0.0) -> "PricingSnapshot":
+        """Snapshot over the rate tables in litellm_credit_system"""
+        from litellm_credit_system import MODEL_PRICING, POWER_LEVELS, PRICING, TIER_MARKUP
+        return cls(
+            model_pricing=_frozen(MODEL_PRICING),
+            provider_pricing=_frozen(PRICING),
+            power_multipliers=_frozen({k: v["cost_multiplier"] for k, v in POWER_LEVELS.items()}),
+            fallback_tier_markups=_frozen(TIER_MARKUP),
+            tier_markups=_frozen(tier_markups or {}),
+            loaded_at=loaded_at,
+        )
+
+    def tier_markup_pct(self, user_tier: str, default: Optional[float] = None) -> float:
+        """
+        Markup percentage for a tier. Tiers missing from subscription_tiers
+        use *default*, or the hardcoded TIER_MARKUP fallback when None.
+        """
+        if user_tier in self.tier_markups:
+            return self.tier_markups[user_tier]
+        if default is not None:
+            return default
+        return self.fallback_tier_markups.get(user_tier, 0) * 100
+
+    def base_rate_per_1k(self, model: str, provider: str) -> float:
+        if model in self.model_pricing:
+            return self.model_pricing[model]
+        return self.provider_pricing.get(provider, self.provider_pricing["default"])
+
+    def cost(
+        self,
+        tokens_used: int,
+        base_cost_per_1k: float,
+        power_level: str,
+        user_tier: str,
+    ) -> float:
+        """Credits for a request given its base rate (pure arithmetic)"""
+        base_cost = (tokens_used / 1000) * base_cost_per_1k
+        multiplier = self.power_multipliers.get(power_level, self.power_multipliers["balanced"])
+        tier_multiplier = 1 + (self.tier_markup_pct(user_tier) / 100)
+        return round(base_cost * multiplier * tier_multiplier, 6)
+
+    def price_catalog(
+        self,
+        models: Iterable[Tuple[str, str, Dict[str, Any]]],
+        tier_markup: float,
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Tier pricing for a whole model catalog at once.
+
+        `models` yields (provider, model_id, model_info) triples where
+        model_info carries OpenRouter per-token `pricing` and/or
+        `cost_per_1m_input/output`. Returns (provider, model_id) ->
+        {credits_per_1k_input, credits_per_1k_output, tier_markup, display},
+        matching litellm_api.get_model_pricing. Keyed by provider too, because
+        the same model id can be served by several providers at different rates.
+        """
+        markup_multiplier = 1 + (tier_markup / 100)
+        # per-token dollars -> credits per 1K tokens (1 credit = $0.001)
+        per_token_scale = 1000 * markup_multiplier * 1000
+        # per-1M-token dollars -> credits per 1K tokens
+        per_1m_scale = markup_multiplier
+
+        priced = {}
+        for provider, model_id, info in models:
+            key = (provider, model_id)
+            try:
+                pricing_data = info.get('pricing') or {}
+                input_rate = float(pricing_data.get('prompt', 0))
+                output_rate = float(pricing_data.get('completion', 0))
+                if input_rate == 0 and output_rate == 0:
+                    credits_in = float(info.get('cost_per_1m_input', 0)) * per_1m_scale
+                    credits_out = float(info.get('cost_per_1m_output', 0)) * per_1m_scale
+                else:
+                    credits_in = input_rate * per_token_scale
+                    credits_out = output_rate * per_token_scale
+            except (ValueError, TypeError):
+                logger.warning(f"Failed to calculate pricing for {provider}/{model_id}")
+                priced[key] = {
+                    'credits_per_1k_input': 0,
+                    'credits_per_1k_output': 0,
+                    'tier_markup': tier_markup,
+                    'display': 'Pricing unavailable'
+                }
+                continue
+            priced[key] = {
+                'credits_per_1k_input': round(credits_in, 4),
+                'credits_per_1k_output': round(credits_out, 4),
+                'tier_markup': tier_markup,
+                'display': f"{round(credits_in, 2)}/{round(credits_out, 2)} credits per 1K tokens"
+            }
+        return priced
+
+
+_snapshot: Optional[PricingSnapshot] = None
+_refresh_task: Optional[asyncio.Task] = None
+_db_pool = None
+
+
+def get_pricing_snapshot(db_pool=None) -> PricingSnapshot:
+    """
+    Current pricing snapshot. Never blocks: if the snapshot is stale (or was
+    never loaded) and a pool is known, a background refresh is started.
+    """
+    global _snapshot, _db_pool
+    if db_pool is not None and _db_pool is None:
+        _db_pool = db_pool
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = _snapshot = PricingSnapshot.from_defaults()
+    stale = not snapshot.loaded_at or time.monotonic() - snapshot.loaded_at > PRICING_SNAPSHOT_TTL
+    if stale and _db_pool is not None:
+        _schedule_refresh()
+    return snapshot
+
+
+def _schedule_refresh():
+    global _refresh_task
+    if _refresh_task is not None and not _refresh_task.done():
+        return
+    try:
+        _refresh_task = asyncio.get_running_loop().create_task(refresh_pricing_snapshot())
+    except RuntimeError:
+        pass  # no running loop (sync caller)
+
+
+async def _load_tier_markups(db_pool) -> List[Tuple[str, float]]:
+    async with db_pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT tier_code, llm_markup_percentage FROM subscription_tiers"
+        )
+    return [
+        (row['tier_code'], float(row['llm_markup_percentage']))
+        for row in rows
+        if row['llm_markup_percentage'] is not None
+    ]
+
+
+async def refresh_pricing_snapshot(db_pool=None) -> PricingSnapshot:
+    """Reload tier markups and atomically swap in a new snapshot"""
+    global _snapshot, _db_pool
+    if db_pool is not None:
+        _db_pool = db_pool
+    current = _snapshot or PricingSnapshot.from_defaults()
+    if _db_pool is None:
+        return current
+    try:
+        markups = await _load_tier_markups(_db_pool)
+    except Exception as e:
+        logger.error(f"Failed to load tier markups, keeping current pricing snapshot: {e}")
+        retry_at = time.monotonic() - PRICING_SNAPSHOT_TTL + _RETRY_SECONDS
+        _snapshot = PricingSnapshot.from_defaults(current.tier_markups, loaded_at=retry_at)
+        return _snapshot
+    _snapshot = PricingSnapshot.from_defaults(dict(markups), loaded_at=time.monotonic())
+    logger.info(f"Pricing snapshot loaded with {len(markups)} tier markups")
+    return _snapshot
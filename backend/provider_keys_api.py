@@ -32,6 +32,8 @@ from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel, Field
 from cryptography.fernet import Fernet
 
+from llm_route_table import invalidate_route_table
+
 logger = logging.getLogger(__name__)
 
 # Router
@@ -612,6 +614,8 @@ async def save_provider_key(
                 provider_id = str(row['id'])
                 logger.info(f"Admin {user_id} added new provider key: {provider_name}")
 
+        invalidate_route_table()
+
         return {
             'success': True,
             'provider_id': provider_id,
@@ -776,6 +780,7 @@ async def delete_provider_key(
                 WHERE id = $1
             """, provider_id)
 
+        invalidate_route_table()
         logger.info(f"Admin {user_id} deleted API key for provider: {provider['name']}")
 
         return {
@@ -2,7 +2,10 @@
 Rate Limiting Module for UC-1 Pro Ops-Center Backend
 
 This module provides Redis-based rate limiting with support for:
-- Multiple rate limit strategies (sliding window, token bucket)
+- Multiple rate limit strategies (sliding window, token bucket, GCRA), each
+  a single atomic Lua script round trip
+- In-process pre-check that rejects callers already known to be over their
+  limit without touching Redis
 - Different limits per endpoint category
 - IP + User ID based rate limiting
 - Admin bypass functionality
@@ -14,8 +17,11 @@ License: MIT
 """
 
 import os
+import re
 import time
+import uuid
 import logging
+from collections import OrderedDict
 from typing import Optional, Callable, Dict, Any, Tuple
 from functools import wraps
 from datetime import datetime, timedelta
@@ -71,9 +77,14 @@ class RateLimitConfig:
         # Key prefix
         self.key_prefix = os.environ.get("RATE_LIMIT_KEY_PREFIX", "ratelimit:")
 
-        # Strategy: sliding_window or token_bucket
+        # Strategy: sliding_window, token_bucket or gcra
         self.strategy = os.environ.get("RATE_LIMIT_STRATEGY", "sliding_window")
 
+        # In-process pre-check: remember Redis rejections until their
+        # retry_after so repeat offenders are turned away locally
+        self.local_precheck = os.environ.get("RATE_LIMIT_LOCAL_PRECHECK", "true").lower() == "true"
+        self.local_precheck_size = int(os.environ.get("RATE_LIMIT_LOCAL_PRECHECK_SIZE", "10000"))
+
     @staticmethod
     def _parse_limit(limit_str: str) -> Tuple[int, int]:
         """
@@ -104,15 +115,128 @@ class RateLimitConfig:
             return (100, 60)  # Default: 100/minute
 
 
+# Rate limit algorithms as Lua scripts: each check is one atomic round trip,
+# so concurrent requests can't both read the same state and overspend it.
+# Times are milliseconds; `now` comes from the caller like the Python
+# implementation it replaced. Every script returns {allowed, current, retry_ms}.
+
+# Sliding log: one ZSET member per ACCEPTED request (rejections aren't
+# recorded); the oldest member gives retry_after without a second round trip.
+SLIDING_WINDOW_SCRIPT = """
+local max_requests = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count < max_requests then
+    redis.call('ZADD', KEYS[1], now, ARGV[3] .. '-' .. ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], window + 1000)
+    return {1, count + 1, 0}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local retry = window
+if oldest[2] then
+    retry = tonumber(oldest[2]) + window - now
+end
+return {0, count, retry}
+"""
+
+# Token bucket: hash {tokens, last_refill}; `current` is the tokens left.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local rate = capacity / window
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last_refill')
+local tokens = tonumber(state[1]) or capacity
+local last_refill = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last_refill) * rate)
+if tokens >= 1 then
+    tokens = tokens - 1
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'last_refill', now)
+    redis.call('PEXPIRE', KEYS[1], window * 2)
+    return {1, math.floor(tokens), 0}
+end
+return {0, 0, math.ceil((1 - tokens) / rate)}
+"""
+
+# GCRA (generic cell rate algorithm): a single theoretical-arrival-time value
+# per key - O(1) state, same burst/refill behavior as a token bucket.
+GCRA_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local interval = window / limit
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if allow_at > now then
+    return {0, limit, math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {1, math.ceil((new_tat - now) / interval - 0.000001), 0}
+"""
+
+RATE_LIMIT_SCRIPTS = {
+    "sliding_window": SLIDING_WINDOW_SCRIPT,
+    "token_bucket": TOKEN_BUCKET_SCRIPT,
+    "gcra": GCRA_SCRIPT,
+}
+
+
+class LocalRateLimitCache:
+    """
+    In-process pre-check in front of Redis.
+
+    Remembers keys Redis has rejected until their retry_after elapses, so a
+    caller hammering past its limit is turned away without a Redis round trip.
+    Only ever rejects what Redis itself would (the key can't be allowed again
+    before retry_after), so it never rejects a caller that is under its limit.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._blocked: "OrderedDict[str, float]" = OrderedDict()
+
+    def retry_after(self, key: str) -> int:
+        """Seconds until the key may be retried, or 0 if not blocked locally"""
+        until = self._blocked.get(key)
+        if until is None:
+            return 0
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            del self._blocked[key]
+            return 0
+        return max(1, int(remaining + 0.999))
+
+    def block(self, key: str, seconds: int):
+        """Record a Redis rejection for `seconds`"""
+        self._blocked[key] = time.monotonic() + seconds
+        self._blocked.move_to_end(key)
+        while len(self._blocked) > self.max_size:
+            self._blocked.popitem(last=False)
+
+    def clear(self):
+        self._blocked.clear()
+
+
 class RateLimiter:
     """
-    Redis-based rate limiter with sliding window algorithm
+    Redis-based rate limiter (sliding window, token bucket or GCRA)
     """
 
     def __init__(self, config: RateLimitConfig):
         self.config = config
         self.redis_client: Optional[AsyncRedis] = None
         self._initialized = False
+        self._scripts: Dict[str, Any] = {}
+        self.local_cache: Optional[LocalRateLimitCache] = (
+            LocalRateLimitCache(config.local_precheck_size)
+            if getattr(config, "local_precheck", False) else None
+        )
 
         if not REDIS_AVAILABLE:
             logger.warning("Redis not available - rate limiting will be disabled")
@@ -132,6 +256,7 @@ class RateLimiter:
             )
             # Test connection
             await self.redis_client.ping()
+            self._scripts = {}
             self._initialized = True
             logger.info("Rate limiter initialized with Redis backend")
         except Exception as e:
@@ -145,11 +270,41 @@ class RateLimiter:
         if self.redis_client:
             await self.redis_client.close()
             self._initialized = False
+        self._scripts = {}
 
     def _get_key(self, identifier: str, category: str) -> str:
         """Generate Redis key for rate limit"""
         return f"{self.config.key_prefix}{category}:{identifier}"
 
+    async def _run_script(
+        self,
+        strategy: str,
+        key: str,
+        max_requests: int,
+        window_seconds: int,
+        *extra_args
+    ) -> Tuple[bool, int, int]:
+        """
+        Run a rate limit script (EVALSHA, reloaded automatically on NOSCRIPT)
+
+        Returns:
+            Tuple of (allowed, current, retry_after_seconds)
+        """
+        script = self._scripts.get(strategy)
+        if script is None:
+            script = self.redis_client.register_script(RATE_LIMIT_SCRIPTS[strategy])
+            self._scripts[strategy] = script
+
+        now_ms = int(time.time() * 1000)
+        allowed, current, retry_ms = await script(
+            keys=[key],
+            args=[max_requests, window_seconds * 1000, now_ms, *extra_args],
+        )
+        if int(allowed):
+            return (True, int(current), 0)
+        # Round up to whole seconds for Retry-After
+        return (False, int(current), max(1, -(-int(retry_ms) // 1000)))
+
     async def _check_sliding_window(
         self,
         key: str,
@@ -171,41 +326,9 @@ class RateLimiter:
             return (True, 0, 0)
 
         try:
-            now = time.time()
-            window_start = now - window_seconds
-
-            # Use Redis transaction
-            pipe = self.redis_client.pipeline()
-
-            # Remove old entries
-            pipe.zremrangebyscore(key, 0, window_start)
-
-            # Count current requests
-            pipe.zcard(key)
-
-            # Add current request with score = timestamp
-            pipe.zadd(key, {str(now): now})
-
-            # Set expiry
-            pipe.expire(key, window_seconds + 1)
-
-            results = await pipe.execute()
-            current_count = results[1]
-
-            # Check if limit exceeded
-            if current_count >= max_requests:
-                # Calculate retry after
-                oldest_scores = await self.redis_client.zrange(key, 0, 0, withscores=True)
-                if oldest_scores:
-                    oldest_timestamp = oldest_scores[0][1]
-                    retry_after = int(window_start + window_seconds - oldest_timestamp + 1)
-                else:
-                    retry_after = window_seconds
-
-                return (False, current_count, max(retry_after, 1))
-
-            return (True, current_count + 1, 0)
-
+            return await self._run_script(
+                "sliding_window", key, max_requests, window_seconds, uuid.uuid4().hex[:12]
+            )
         except Exception as e:
             logger.error(f"Error checking rate limit: {e}")
             if self.config.fail_open:
@@ -233,47 +356,41 @@ class RateLimiter:
             return (True, 0, 0)
 
         try:
-            now = time.time()
-
-            # Get current bucket state
-            bucket_data = await self.redis_client.hgetall(key)
-
-            if bucket_data:
-                tokens = float(bucket_data.get("tokens", max_requests))
-                last_refill = float(bucket_data.get("last_refill", now))
-            else:
-                tokens = max_requests
-                last_refill = now
-
-            # Calculate refill
-            time_passed = now - last_refill
-            refill_rate = max_requests / window_seconds
-            tokens_to_add = time_passed * refill_rate
-            tokens = min(max_requests, tokens + tokens_to_add)
-
-            # Try to consume a token
-            if tokens >= 1:
-                tokens -= 1
-
-                # Update bucket
-                pipe = self.redis_client.pipeline()
-                pipe.hset(key, mapping={"tokens": tokens, "last_refill": now})
-                pipe.expire(key, window_seconds * 2)
-                await pipe.execute()
-
-                return (True, int(tokens), 0)
-            else:
-                # Calculate retry after
-                tokens_needed = 1 - tokens
-                retry_after = int(tokens_needed / refill_rate) + 1
-                return (False, 0, retry_after)
-
+            return await self._run_script("token_bucket", key, max_requests, window_seconds)
         except Exception as e:
             logger.error(f"Error checking token bucket: {e}")
             if self.config.fail_open:
                 return (True, 0, 0)
             raise
 
+    async def _check_gcra(
+        self,
+        key: str,
+        max_requests: int,
+        window_seconds: int
+    ) -> Tuple[bool, int, int]:
+        """
+        Check rate limit using GCRA (one timestamp per key)
+
+        Args:
+            key: Redis key
+            max_requests: Maximum requests allowed per window (burst size)
+            window_seconds: Time window in seconds
+
+        Returns:
+            Tuple of (allowed, current_count, retry_after_seconds)
+        """
+        if not self.redis_client:
+            return (True, 0, 0)
+
+        try:
+            return await self._run_script("gcra", key, max_requests, window_seconds)
+        except Exception as e:
+            logger.error(f"Error checking GCRA rate limit: {e}")
+            if self.config.fail_open:
+                return (True, 0, 0)
+            raise
+
     async def check_rate_limit(
         self,
         identifier: str,
@@ -308,9 +425,27 @@ class RateLimiter:
         max_requests, window_seconds = limit_config
         key = self._get_key(identifier, category)
 
+        # Local pre-check: already rejected by Redis and still inside retry_after
+        retry_after = self.local_cache.retry_after(key) if self.local_cache else 0
+        if retry_after:
+            return (False, {
+                "limit": max_requests,
+                "window": window_seconds,
+                "current": max_requests,
+                "remaining": 0,
+                "reset": int(time.time() + window_seconds),
+                "retry_after": retry_after,
+            })
+
         # Check rate limit based on strategy
         if self.config.strategy == "token_bucket":
-            allowed, current, retry_after = await self._check_token_bucket(
+            allowed, tokens, retry_after = await self._check_token_bucket(
+                key, max_requests, window_seconds
+            )
+            # The bucket reports tokens left; express it as requests used
+            current = max_requests - tokens if allowed else max_requests
+        elif self.config.strategy == "gcra":
+            allowed, current, retry_after = await self._check_gcra(
                 key, max_requests, window_seconds
             )
         else:
@@ -328,6 +463,8 @@ class RateLimiter:
 
         if not allowed:
             metadata["retry_after"] = retry_after
+            if self.local_cache is not None:
+                self.local_cache.block(key, retry_after)
 
         return (allowed, metadata)
 
@@ -456,15 +593,39 @@ class RateLimitMiddleware:
         self.app = app
         self.limiter = limiter
 
-        # Endpoint category mapping (regex patterns)
+        # Endpoint category mapping (regex patterns, first match wins)
         self.category_patterns = [
             (r"^/api/v1/auth/", "auth"),
-            (r"^/api/v1/(users|sso|api-keys)/", "admin"),
-            (r"^/api/v1/(services|models|logs|storage|backup|extensions)/[^/]+", "write"),
+            (r"^/api/v1/(?:users|sso|api-keys)/", "admin"),
+            (r"^/api/v1/(?:services|models|logs|storage|backup|extensions)/[^/]+", "write"),
             (r"^/api/v1/", "read"),
             (r"^/health", "health"),
             (r"^/api/v1/system/status", "health"),
         ]
+        self._category_matcher, self._category_groups = self._compile_category_patterns(
+            self.category_patterns
+        )
+
+    @staticmethod
+    def _compile_category_patterns(patterns):
+        """
+        Combine the category patterns into one alternation. Alternatives are
+        tried in order, so the first matching pattern still wins; the named
+        group that matched identifies its category.
+        """
+        groups = {}
+        alternatives = []
+        for index, (pattern, category) in enumerate(patterns):
+            group = f"c{index}"
+            groups[group] = category
+            alternatives.append(f"(?P<{group}>{pattern})")
+        return re.compile("|".join(alternatives)), groups
+
+    def _get_category(self, path: str) -> str:
+        match = self._category_matcher.match(path)
+        if match is None:
+            return "read"  # default
+        return self._category_groups[match.lastgroup]
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
@@ -474,11 +635,7 @@ class RateLimitMiddleware:
         path = scope.get("path", "")
 
         # Determine category
-        category = "read"  # default
-        for pattern, cat in self.category_patterns:
-            if re.match(pattern, path):
-                category = cat
-                break
+        category = self._get_category(path)
 
         # Skip rate limiting for health checks
         if category == "health":
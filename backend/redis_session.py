@@ -1,11 +1,24 @@
 """
 Redis Session Manager for UC-Cloud
 Replaces in-memory session storage with Redis-backed persistence
+
+Two access paths share the same keys:
+- RedisSessionManager: synchronous, dict-style store used by the auth routes
+  (login / profile / logout) in server.py.
+- AsyncSessionStore: non-blocking read path for request middlewares (credit,
+  usage, tier). One shared connection pool per process plus a small TTL'd LRU
+  of decoded sessions, invalidated on set/delete (logout) in this process and,
+  via Redis pub/sub, in every other worker process.
 """
+import asyncio
 import json
 import logging
+import time
+from collections import OrderedDict
+
 import redis
-from typing import Optional, Dict, Any
+import redis.asyncio as aioredis
+from typing import Optional, Dict, Any, Tuple
 import os
 
 logger = logging.getLogger(__name__)
@@ -88,6 +101,14 @@ class RedisSessionManager:
         """Generate full Redis key for session"""
         return f"{self.key_prefix}{session_id}"
 
+    def _invalidate(self, session_id: str):
+        """Drop a changed/deleted session from every process's AsyncSessionStore cache"""
+        async_session_store.invalidate(session_id)
+        try:
+            self._client.publish(async_session_store.invalidation_channel, session_id)
+        except Exception as e:
+            logger.warning(f"Failed to publish session invalidation: {e}")
+
     def set(self, session_id: str, session_data: Dict[str, Any]) -> bool:
         """
         Store session data in Redis with TTL
@@ -103,6 +124,7 @@ class RedisSessionManager:
             key = self._get_key(session_id)
             value = json.dumps(session_data)
             self._client.setex(key, self.ttl, value)
+            self._invalidate(session_id)
             logger.debug(f"Session stored: {session_id[:10]}... (TTL: {self.ttl}s)")
             return True
         except Exception as e:
@@ -147,6 +169,7 @@ class RedisSessionManager:
         try:
             key = self._get_key(session_id)
             result = self._client.delete(key)
+            self._invalidate(session_id)
             if result:
                 logger.debug(f"Session deleted: {session_id[:10]}...")
                 return True
@@ -258,6 +281,151 @@ class RedisSessionManager:
             logger.info("Redis session manager connection closed")
 
 
+class AsyncSessionStore:
+    """
+    Non-blocking, read-mostly session access for request middlewares.
+
+    Replaces constructing a RedisSessionManager per request (blocking ping()
+    retry loop + blocking get() on the event loop). Sessions are read through a
+    single process-wide redis.asyncio connection pool and decoded sessions are
+    kept in a small LRU for `cache_ttl` seconds. Entries are invalidated when
+    RedisSessionManager sets or deletes a session (logout), locally and across
+    workers via the `<key_prefix>invalidate` pub/sub channel, so a logout never
+    outlives the cache in practice and at worst lasts `cache_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        host: str = "unicorn-redis",
+        port: int = 6379,
+        db: int = 0,
+        key_prefix: str = "session:",
+        password: Optional[str] = None,
+        cache_ttl: float = 30.0,
+        cache_size: int = 2048,
+        max_connections: int = 50
+    ):
+        self.key_prefix = key_prefix
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.invalidation_channel = f"{key_prefix}invalidate"
+        self._pool = aioredis.ConnectionPool(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            decode_responses=True,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            max_connections=max_connections
+        )
+        self._client = aioredis.Redis(connection_pool=self._pool)
+        # session_id -> (expires_at, session_data)
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._listener_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve session data (cached)
+
+        Args:
+            session_id: Unique session identifier
+
+        Returns:
+            A copy of the session data dictionary, or None if not found/expired
+        """
+        if not session_id:
+            return None
+        self._ensure_listener()
+
+        now = time.monotonic()
+        entry = self._cache.get(session_id)
+        if entry is not None:
+            expires_at, session_data = entry
+            if expires_at > now:
+                self._cache.move_to_end(session_id)
+                self.hits += 1
+                return dict(session_data)
+            self._cache.pop(session_id, None)
+
+        self.misses += 1
+        try:
+            value = await self._client.get(f"{self.key_prefix}{session_id}")
+        except Exception as e:
+            logger.error(f"Failed to retrieve session {session_id[:10]}...: {e}")
+            return None
+
+        if value is None:
+            return None
+
+        try:
+            session_data = json.loads(value)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Corrupt session payload for {session_id[:10]}...: {e}")
+            return None
+
+        if self.cache_ttl > 0:
+            self._cache[session_id] = (now + self.cache_ttl, session_data)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(session_data)
+
+    def invalidate(self, session_id: str):
+        """Drop a session from this process's cache"""
+        self._cache.pop(session_id, None)
+
+    def clear(self):
+        """Drop every cached session"""
+        self._cache.clear()
+
+    def _ensure_listener(self):
+        """Lazily start the cross-process invalidation listener (idempotent)"""
+        if self._listener_task is not None and not self._listener_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._listener_task = loop.create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        """Evict sessions changed/deleted by other worker processes"""
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(self.invalidation_channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.invalidate(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Listener lost: forget everything rather than serve stale sessions
+                self.clear()
+                logger.warning(f"Session invalidation listener error, retrying: {e}")
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    async def close(self):
+        """Stop the listener and release the connection pool"""
+        if self._listener_task is not None and not self._listener_task.done():
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+        self._listener_task = None
+        await self._pool.disconnect()
+        logger.info("Async session store connection pool closed")
+
+
 def _extract_redis_password():
     """Extract password from REDIS_URL if REDIS_PASSWORD not set."""
     url = os.getenv("REDIS_URL", "")
@@ -269,6 +437,18 @@ def _extract_redis_password():
     return None
 
 
+# Shared async read path for middlewares. Defined before redis_session_manager
+# because RedisSessionManager.set/delete invalidate its cache.
+async_session_store = AsyncSessionStore(
+    host=os.getenv("REDIS_HOST", "unicorn-redis"),
+    port=int(os.getenv("REDIS_PORT", "6379")),
+    db=int(os.getenv("REDIS_DB", "0")),
+    key_prefix=os.getenv("SESSION_KEY_PREFIX", "session:"),
+    password=os.getenv("REDIS_PASSWORD") or _extract_redis_password(),
+    cache_ttl=float(os.getenv("SESSION_CACHE_TTL", "30")),
+    cache_size=int(os.getenv("SESSION_CACHE_SIZE", "2048"))
+)
+
 # Create global instance with environment-based configuration
 redis_session_manager = RedisSessionManager(
     host=os.getenv("REDIS_HOST", "unicorn-redis"),
@@ -0,0 +1,307 @@
+"""
+Request Context Resolver
+========================
+
+Resolves "who is calling and what are they asking for" once per LLM request
+and attaches the result to request.state, so the middleware stack and the
+endpoint stop re-deriving it.
+
+Before this, CreditDeductionMiddleware, UsageTrackingMiddleware,
+TierEnforcementMiddleware and litellm_api.get_user_id each re-resolved the
+caller from cookies / `Bearer sk-` service keys / `Bearer uc_` keys /
+X-User-ID, and the credit middleware re-read and re-parsed the JSON body just
+to find `model`.
+
+The context is immutable. A stage that learns something new (the credit
+middleware's BYOK check or org resolution) stores an updated copy with
+`set_request_context(request, ctx.with_updates(...))`.
+
+Usage:
+    ctx = get_request_context(request)                  # None if not resolved
+    ctx = await resolve_request_context(request)        # resolve (memoized)
+"""
+
+import json
+import logging
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Any, FrozenSet, Mapping, Optional
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# Pre-configured trusted keys for internal services
+SERVICE_KEYS = {
+    'sk-bolt-diy-service-key-2025': 'bolt-diy-service',
+    'sk-presenton-service-key-2025': 'presenton-service',
+    'sk-brigade-service-key-2025': 'brigade-service',
+    'sk-centerdeep-service-key-REDACTED': 'centerdeep-service',
+    'sk-partnerpulse-service-key-2025': 'partnerpulse-service',
+    'sk-open-webui-service-key-2026': 'open-webui-service',
+    'sk-colonel-service-key-2026': 'colonel-service',
+    'sk-majiks-service-key-2025': 'majiks-service'
+}
+
+# Organization UUIDs that service accounts bill to when called without X-User-ID
+SERVICE_ORG_IDS = {
+    'bolt-diy-service': '3766e9ee-7cc1-472f-92ae-afec687f0d74',
+    'presenton-service': '13587747-66e6-43df-b21d-4411c7373465',
+    'brigade-service': 'e9b40f6b-b683-4bcf-b462-9fd526cfbb37',
+    'centerdeep-service': '91d3b68e-e4c4-457e-80ce-de6997243c34',
+    'partnerpulse-service': '8f5bf9a9-2e7c-4465-93d8-97f18bdac098',
+    'open-webui-service': 'f47ac10b-58cc-4372-a567-0e02b2c3d479',
+    'colonel-service': 'e9b40f6b-b683-4bcf-b462-9fd526cfbb37',  # Colonel uses brigade org for billing
+    'majiks-service': 'a1b2c3d4-e5f6-7890-abcd-ef1234567890'
+}
+
+# All platform-internal service accounts run on the org's own 'internal' tier
+# (credit-exempt) when called without an X-User-ID context.
+INTERNAL_SERVICES = frozenset({
+    'colonel-service',
+    'brigade-service',
+    'majiks-service',
+    'centerdeep-service',
+    'open-webui-service',
+    'bolt-diy-service',
+    'presenton-service',
+    'partnerpulse-service',
+})
+
+# Paths whose context is resolved up front by RequestContextMiddleware
+CONTEXT_PATH_PREFIXES = ("/api/v1/llm/",)
+
+_STATE_ATTR = "request_context"
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    """Caller identity and parsed request metadata, resolved once per request"""
+
+    # Billing identity. None = unauthenticated (or an unknown/invalid key).
+    user_id: Optional[str] = None
+    # "api_key" (uc_), "service_key" (sk-) or "session"
+    auth_method: Optional[str] = None
+    # Tier the credit middleware bills against
+    subscription_tier: Optional[str] = None
+    # Tier from CreditSystem.get_user_tier when that was the source (uc_ keys),
+    # so the endpoint can skip its own lookup
+    billing_tier: Optional[str] = None
+    # Calling UC app for service-key requests (per-(app, model) policy)
+    app: Optional[str] = None
+    is_service_account: bool = False
+    # Session payload when a session cookie is present, regardless of which
+    # method authenticated the request (tier enforcement keys off session email)
+    session: Optional[Mapping[str, Any]] = None
+    # Filled in by CreditDeductionMiddleware
+    org_id: Optional[str] = None
+    byok: Optional[bool] = None
+    byok_provider: Optional[str] = None
+    # Parsed JSON body (read-only view) and its `model`
+    body: Optional[Mapping[str, Any]] = None
+    model: Optional[str] = None
+
+    @property
+    def authenticated(self) -> bool:
+        return self.user_id is not None
+
+    @property
+    def session_user(self) -> Optional[Mapping[str, Any]]:
+        """The session's `user` block (Keycloak profile), if any"""
+        if self.session is None:
+            return None
+        return self.session.get("user")
+
+    def with_updates(self, **changes) -> "RequestContext":
+        return replace(self, **changes)
+
+    def as_user(self) -> Optional[dict]:
+        """User dict in the shape CreditDeductionMiddleware has always used"""
+        if not self.authenticated:
+            return None
+        if self.auth_method == "session":
+            user = dict(self.session)
+            user["user_id"] = self.user_id
+            return user
+        user = {"user_id": self.user_id, "subscription_tier": self.subscription_tier}
+        if self.app:
+            user["_app"] = self.app
+        if self.is_service_account:
+            user["is_service_account"] = True
+        return user
+
+
+def get_request_context(request) -> Optional[RequestContext]:
+    """Get the context already attached to this request, if any"""
+    state = getattr(request, "state", None)
+    ctx = getattr(state, _STATE_ATTR, None) if state is not None else None
+    return ctx if isinstance(ctx, RequestContext) else None
+
+
+def set_request_context(request, ctx: RequestContext):
+    """Attach (or replace) the request's context"""
+    state = getattr(request, "state", None)
+    if state is not None:
+        setattr(state, _STATE_ATTR, ctx)
+
+
+async def _owner_tier(credit_system, user_id: str) -> str:
+    """
+    Resolve a uc_ key OWNER's real tier. get_user_tier already fails safe to
+    "free" (exempt), and a lookup error here does the same, so a billing-side
+    failure never wrongly charges (fail-open).
+    """
+    try:
+        return await credit_system.get_user_tier(user_id)
+    except Exception as e:
+        logger.warning(f"uc_ key tier lookup failed for {user_id}; exempting (fail-open): {e}")
+        return "free"
+
+
+async def _load_session(request) -> Optional[dict]:
+    cookies = getattr(request, "cookies", None) or {}
+    session_token = cookies.get("session_token")
+    if not session_token:
+        return None
+    try:
+        from redis_session import async_session_store
+        return await async_session_store.get(session_token)
+    except Exception as e:
+        logger.error(f"Error reading session for request context: {e}")
+        return None
+
+
+async def _resolve_identity(request, session: Optional[dict]) -> dict:
+    """Identity fields for RequestContext: uc_ key, then sk- key, then session"""
+    auth_header = request.headers.get('Authorization', '')
+
+    if auth_header.startswith('Bearer uc_'):
+        token = auth_header[7:]
+        try:
+            from api_key_manager import get_api_key_manager
+            user_info = await get_api_key_manager().validate_api_key(token)
+        except Exception as e:
+            logger.error(f"API key validation error in request context: {e}")
+            return {}
+        if not user_info:
+            logger.warning("Invalid API key in request context")
+            return {}
+        return {"user_id": user_info['user_id'], "auth_method": "api_key"}
+
+    if auth_header.startswith('Bearer sk-'):
+        token = auth_header[7:]
+        service_name = SERVICE_KEYS.get(token)
+        if not service_name:
+            # Unknown service key - let the endpoint reject it
+            logger.warning(f"Unknown service key in request context: {token[:20]}...")
+            return {}
+
+        tier = "internal" if service_name in INTERNAL_SERVICES else "professional"
+        x_user_id = request.headers.get('X-User-ID')
+        if x_user_id:
+            # Service proxying on behalf of a user - bill the user
+            return {
+                "user_id": x_user_id,
+                "auth_method": "service_key",
+                "subscription_tier": tier,
+                "app": service_name,
+            }
+
+        service_org_id = SERVICE_ORG_IDS.get(service_name)
+        if not service_org_id:
+            logger.error(f"Service org ID not configured for: {service_name}")
+            return {}
+        # Prefix with 'org_' so the credit system bills the service org
+        return {
+            "user_id": f"org_{service_org_id}",
+            "auth_method": "service_key",
+            "subscription_tier": tier,
+            "app": service_name,
+            "is_service_account": True,
+        }
+
+    if session:
+        # Keycloak compatibility: older sessions carry `sub`/`id` only
+        user_id = session.get("user_id") or session.get("sub") or session.get("id", "unknown")
+        return {
+            "user_id": user_id,
+            "auth_method": "session",
+            "subscription_tier": session.get("subscription_tier", "trial"),
+        }
+
+    return {}
+
+
+async def _parse_body(request) -> tuple:
+    """Read and parse a POST JSON body once. Returns (body, model)."""
+    if getattr(request, "method", None) != "POST":
+        return None, None
+    try:
+        raw = await request.body()
+        # Re-set body for downstream processing
+        request._body = raw
+        data = json.loads(raw.decode())
+    except Exception:
+        return None, None
+    if not isinstance(data, dict):
+        return None, None
+    model = data.get("model")
+    return MappingProxyType(data), model if isinstance(model, str) else None
+
+
+async def resolve_request_context(request, credit_system=None) -> RequestContext:
+    """
+    Resolve the request's context, reusing one already attached.
+
+    Args:
+        request: Incoming request
+        credit_system: CreditSystem used to look up a uc_ key owner's tier.
+            Without one the tier is left unresolved and filled in by the first
+            caller that passes one.
+
+    Returns:
+        RequestContext (unauthenticated if no credentials resolved)
+    """
+    ctx = get_request_context(request)
+    if ctx is None:
+        session = await _load_session(request)
+        identity = await _resolve_identity(request, session)
+        body, model = await _parse_body(request)
+        ctx = RequestContext(
+            session=MappingProxyType(session) if session else None,
+            body=body,
+            model=model,
+            **identity
+        )
+
+    if (
+        credit_system is not None
+        and ctx.auth_method == "api_key"
+        and ctx.subscription_tier is None
+    ):
+        tier = await _owner_tier(credit_system, ctx.user_id)
+        ctx = ctx.with_updates(subscription_tier=tier, billing_tier=tier)
+        logger.info(f"API key authenticated user: {ctx.user_id} (tier={tier})")
+
+    set_request_context(request, ctx)
+    return ctx
+
+
+class RequestContextMiddleware(BaseHTTPMiddleware):
+    """
+    Resolves the RequestContext for LLM requests before any other middleware
+    runs. Must be registered last (outermost) so the credit, tier and usage
+    middlewares and the endpoint all see it.
+    """
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        if request.url.path.startswith(CONTEXT_PATH_PREFIXES):
+            try:
+                credit_system = getattr(request.app.state, "credit_system", None)
+                await resolve_request_context(request, credit_system)
+            except Exception as e:
+                # Consumers fall back to resolving on their own
+                logger.error(f"Request context resolution failed: {e}", exc_info=True)
+        return await call_next(request)
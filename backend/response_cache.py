@@ -0,0 +1,167 @@
+"""
+Response cache for deterministic chat completions.
+
+Presenton, PartnerPulse and Center-Deep send the same `temperature=0` /
+tool-schema requests over and over, and every one of them went upstream.
+When enabled, non-streaming completions that are deterministic (temperature
+0) are cached in-process and replayed on an exact match.
+
+- The key is a SHA-256 over a canonical JSON form of the resolved provider
+  and upstream base URL plus the model, messages, tools, tool_choice and
+  sampling parameters (so a re-routed model id never replays another
+  provider's answer), namespaced by the billing scope
+  (org, or user when there is no org). One org can never read another org's
+  entries, and an org's entries can be dropped together (invalidate_scope).
+- Entries are stored as serialized JSON, so every hit returns a fresh dict
+  and the cache can be bounded in bytes as well as in entries. Eviction is
+  LRU, with a TTL per entry.
+- Clients skip the cache with `X-Cache-Bypass: true` or
+  `Cache-Control: no-cache` / `no-store`.
+- Hits are still billed through CreditSystem, at LLM_RESPONSE_CACHE_CHARGE
+  times the cost of the original completion.
+
+Configuration (environment):
+    LLM_RESPONSE_CACHE_ENABLED     opt-in switch (default false)
+    LLM_RESPONSE_CACHE_TTL         seconds an entry is served (default 600)
+    LLM_RESPONSE_CACHE_SIZE        max entries (default 5000)
+    LLM_RESPONSE_CACHE_MAX_BYTES   max total size of cached bodies (default 64 MiB)
+    LLM_RESPONSE_CACHE_CHARGE      fraction of the original cost billed on a hit (default 0.1)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_RESPONSE_CACHE_ENABLED = os.getenv("LLM_RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+LLM_RESPONSE_CACHE_TTL = float(os.getenv("LLM_RESPONSE_CACHE_TTL", "600"))
+LLM_RESPONSE_CACHE_SIZE = int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "5000"))
+LLM_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_RESPONSE_CACHE_CHARGE = float(os.getenv("LLM_RESPONSE_CACHE_CHARGE", "0.1"))
+
+BYPASS_HEADER = "X-Cache-Bypass"
+
+# Request fields that change the completion; everything else (user, metadata,
+# stream) is ignored when building the key.
+_KEY_FIELDS = ("model", "messages", "tools", "tool_choice", "max_tokens", "temperature", "top_p", "seed")
+
+
+def wants_bypass(headers: Mapping[str, str]) -> bool:
+    """True when the client asked not to be served from (or stored in) the cache."""
+    if headers.get(BYPASS_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    cache_control = headers.get("Cache-Control", "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+def is_deterministic(payload: Dict[str, Any]) -> bool:
+    """Only greedy, non-streaming completions are safe to replay."""
+    return not payload.get("stream") and payload.get("temperature") == 0
+
+
+def cache_key(scope: str, payload: Dict[str, Any], provider: str, base_url: str) -> str:
+    """
+    Canonical hash of the completion-relevant request fields and the upstream
+    that serves them, namespaced by scope.
+    """
+    fields = {field: payload.get(field) for field in _KEY_FIELDS}
+    fields["_upstream"] = [provider or "", (base_url or "").rstrip("/")]
+    canonical = json.dumps(
+        fields,
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return f"{scope}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+class ChatResponseCache:
+    """Size-bounded LRU+TTL cache of serialized chat completion responses"""
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.ttl = LLM_RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or LLM_RESPONSE_CACHE_SIZE
+        self.max_bytes = max_bytes or LLM_RESPONSE_CACHE_MAX_BYTES
+        # key -> (expires_at_monotonic, serialized response)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of a cached response, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        expires_at, body = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return json.loads(body)
+
+    def put(self, key: str, response: Dict[str, Any]) -> bool:
+        """Store a response; oversized bodies are not cached."""
+        if self.ttl <= 0:
+            return False
+        body = json.dumps(response, separators=(",", ":"), default=str).encode()
+        if len(body) > self.max_bytes:
+            return False
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, body)
+        self._bytes += len(body)
+        self.stats["stores"] += 1
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+        return True
+
+    def invalidate_scope(self, scope: str) -> int:
+        """Drop every entry cached for one org/user."""
+        prefix = f"{scope}:"
+        stale = [key for key in self._entries if key.startswith(prefix)]
+        for key in stale:
+            self._drop(key)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+
+# Singleton instance
+_response_cache: Optional[ChatResponseCache] = None
+
+
+def get_response_cache() -> Optional[ChatResponseCache]:
+    """
+    Get the process-wide response cache
+
+    Returns:
+        ChatResponseCache, or None when LLM_RESPONSE_CACHE_ENABLED is off
+    """
+    global _response_cache
+    if not LLM_RESPONSE_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = ChatResponseCache()
+    return _response_cache
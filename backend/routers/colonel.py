@@ -181,6 +181,8 @@ async def delete_session(session_id: str, admin: dict = Depends(_require_admin))
         decode_responses=True,
     )
     try:
+        from colonel.memory.session_index import unindex_session
+        await unindex_session(r, session_id)
         deleted = await r.delete(f"colonel:session:{session_id}")
         if not deleted:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -30,6 +30,7 @@ if '/app' not in sys.path:
     sys.path.insert(0, '/app')
 
 from database.connection import get_db_pool
+from upstream_clients import get_upstream_client, upstream_timeout
 
 # Import billing event emitter for dispatch integration
 try:
@@ -923,20 +924,21 @@ async def dispatch_workload(request: DispatchRequest, current_user: dict = Depen
             "payload": request.payload,
         }
 
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            resp = await client.post(
-                f"{agent_url}/api/v1/node/execute",
-                json=execute_payload,
-            )
-            if resp.status_code == 200:
-                resp_data = resp.json()
-                status = resp_data.get("status", "completed")
-                result = resp_data.get("result")
-                error = resp_data.get("error")
-                target_gpu = resp_data.get("gpu_id", target_gpu)
-            else:
-                status = "failed"
-                error = f"Agent returned {resp.status_code}: {resp.text}"
+        client = get_upstream_client(agent_url)
+        resp = await client.post(
+            f"{agent_url}/api/v1/node/execute",
+            json=execute_payload,
+            timeout=upstream_timeout(agent_url, 300.0),
+        )
+        if resp.status_code == 200:
+            resp_data = resp.json()
+            status = resp_data.get("status", "completed")
+            result = resp_data.get("result")
+            error = resp_data.get("error")
+            target_gpu = resp_data.get("gpu_id", target_gpu)
+        else:
+            status = "failed"
+            error = f"Agent returned {resp.status_code}: {resp.text}"
 
     except httpx.ConnectError as e:
         status = "failed"
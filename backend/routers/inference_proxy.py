@@ -25,6 +25,7 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from auth_dependencies import require_authenticated_user
+from upstream_clients import get_upstream_client, upstream_timeout
 
 logger = logging.getLogger(__name__)
 
@@ -177,33 +178,34 @@ async def _proxy_request(
     start_time = time.time()
 
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(300.0)) as client:
-            if method.upper() == "GET":
-                downstream = await client.get(target_url, headers=headers)
-            elif is_multipart:
-                # Forward multipart file uploads
-                form = await request.form()
-                files = {}
-                data = {}
-                for key, value in form.items():
-                    if hasattr(value, "read"):
-                        # UploadFile
-                        content = await value.read()
-                        files[key] = (value.filename, content, value.content_type or "application/octet-stream")
-                    else:
-                        data[key] = value
-                downstream = await client.post(
-                    target_url, headers=headers, files=files, data=data
-                )
-            else:
-                # JSON body
-                try:
-                    body = await request.json()
-                except Exception:
-                    body = {}
-                downstream = await client.request(
-                    method.upper(), target_url, headers=headers, json=body
-                )
+        client = get_upstream_client(target_url)
+        timeout = upstream_timeout(target_url, 300.0)
+        if method.upper() == "GET":
+            downstream = await client.get(target_url, headers=headers, timeout=timeout)
+        elif is_multipart:
+            # Forward multipart file uploads
+            form = await request.form()
+            files = {}
+            data = {}
+            for key, value in form.items():
+                if hasattr(value, "read"):
+                    # UploadFile
+                    content = await value.read()
+                    files[key] = (value.filename, content, value.content_type or "application/octet-stream")
+                else:
+                    data[key] = value
+            downstream = await client.post(
+                target_url, headers=headers, files=files, data=data, timeout=timeout
+            )
+        else:
+            # JSON body
+            try:
+                body = await request.json()
+            except Exception:
+                body = {}
+            downstream = await client.request(
+                method.upper(), target_url, headers=headers, json=body, timeout=timeout
+            )
     except httpx.TimeoutException:
         logger.error(f"[inference-proxy] Timeout proxying to {target_url}")
         return JSONResponse(
@@ -70,6 +70,7 @@ from webhooks import router as stripe_webhooks_router
 from byok_api import router as byok_router
 from tier_enforcement_middleware import TierEnforcementMiddleware
 from credit_deduction_middleware import CreditDeductionMiddleware
+from request_context import RequestContextMiddleware
 from usage_api import router as usage_router
 from admin_subscriptions_api import router as admin_subscriptions_router
 from tier_check_middleware import router as tier_check_router
@@ -350,6 +351,9 @@ RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "tr
 AUDIT_ENABLED = os.environ.get("AUDIT_ENABLED", "true").lower() == "true"
 PASSWORD_POLICY_ENABLED = os.environ.get("PASSWORD_POLICY_ENABLED", "true").lower() == "true"
 TIER_ENFORCEMENT_ENABLED = os.environ.get("TIER_ENFORCEMENT_ENABLED", "true").lower() == "true"
+# Monthly per-user API-call accounting (usage_tracking). Off by default: tier
+# enforcement already applies the daily call limits to the same requests.
+USAGE_TRACKING_ENABLED = os.environ.get("USAGE_TRACKING_ENABLED", "false").lower() == "true"
 COOKIE_SECURE = EXTERNAL_PROTOCOL == "https"
 
 # Enhanced monitoring imports
@@ -847,11 +851,24 @@ if TIER_ENFORCEMENT_ENABLED:
 app.add_middleware(CreditDeductionMiddleware)
 logger.info("Credit Deduction Middleware enabled (automatic credit tracking)")
 
+# Usage Tracking Middleware (monthly API-call quota + X-RateLimit-* headers).
+# Only /api/v1/llm/* requests do any work; everything else passes straight through.
+if USAGE_TRACKING_ENABLED:
+    from usage_middleware import UsageTrackingMiddleware
+    app.add_middleware(UsageTrackingMiddleware)
+    logger.info("Usage Tracking Middleware enabled")
+
+# Request Context (added last = outermost): resolves the caller, tier, app and
+# parsed model for /api/v1/llm/* once, for the credit/tier middlewares and
+# the LLM endpoints to share
+app.add_middleware(RequestContextMiddleware)
+
 logger.info(f"CSRF Protection: {'Enabled' if CSRF_ENABLED else 'Disabled'}")
 logger.info(f"Rate Limiting: {'Enabled' if RATE_LIMIT_ENABLED else 'Disabled'}")
 logger.info(f"Audit Logging: {'Enabled' if AUDIT_ENABLED else 'Disabled'}")
 logger.info(f"Password Policy: {'Enabled' if PASSWORD_POLICY_ENABLED else 'Disabled'}")
 logger.info(f"Tier Enforcement: {'Enabled' if TIER_ENFORCEMENT_ENABLED else 'Disabled'}")
+logger.info(f"Usage Tracking: {'Enabled' if USAGE_TRACKING_ENABLED else 'Disabled'}")
 
 # Startup event handler
 @app.on_event("startup")
@@ -877,16 +894,13 @@ async def startup_event():
 
     # Initialize LiteLLM credit system (CRITICAL for Brigade integration)
     try:
-        # Create PostgreSQL connection pool
-        db_pool = await asyncpg.create_pool(
-            host=os.getenv('POSTGRES_HOST', 'unicorn-postgresql'),
-            port=int(os.getenv('POSTGRES_PORT', '5432')),
-            user=os.getenv('POSTGRES_USER', 'unicorn'),
-            password=os.getenv('POSTGRES_PASSWORD', 'unicorn'),
-            database=os.getenv('POSTGRES_DB', 'unicorn_db'),
-            min_size=2,
-            max_size=10
-        )
+        # Shared PostgreSQL pool; request handlers draw from the "request" budget
+        from database.pool_manager import get_budget_pool, get_pool_manager
+        await get_pool_manager().start()
+        db_pool = get_budget_pool("request")
+        # Flushers, sweepers and replay loops get their own budget so they can
+        # never starve request handlers of connections
+        background_pool = get_budget_pool("background")
         logger.info("PostgreSQL connection pool created")
 
         # Ensure feature tables exist (idempotent). Many handlers query tables that
@@ -976,12 +990,39 @@ async def startup_event():
         logger.info("Redis client connected")
 
         # Initialize credit system
-        credit_system = CreditSystem(db_pool, redis_client)
+        credit_system = CreditSystem(db_pool, redis_client, background_pool=background_pool)
         app.state.credit_system = credit_system
         app.state.db_pool = db_pool  # Store for cleanup
         app.state.redis_client = redis_client  # Store for cleanup
         logger.info("LiteLLM credit system initialized successfully")
 
+        # Load tier markups so request pricing never hits the database
+        try:
+            from pricing_snapshot import refresh_pricing_snapshot
+            await refresh_pricing_snapshot(db_pool)
+        except Exception as e:
+            logger.error(f"Failed to load pricing snapshot (non-fatal): {e}")
+
+        # Start the batched Lago metering queue (usage events leave the request
+        # path; the lago_usage_outbox table makes delivery durable/replayable)
+        try:
+            from lago_metering import init_lago_metering
+            await init_lago_metering(background_pool)
+        except Exception as e:
+            logger.error(f"Failed to start Lago metering queue (non-fatal): {e}")
+
+        # Service org debits settle against a Redis balance mirror and are
+        # coalesced into organization_credit_pools by a ledger flusher
+        try:
+            from org_credit_holds import init_org_credit_holds
+            await init_org_credit_holds(db_pool, redis_client, flush_pool=background_pool)
+        except Exception as e:
+            logger.error(f"Failed to start org credit holds (non-fatal): {e}")
+
+        # Org membership / allocation lookups on the LLM path share this pool
+        from org_credit_integration import init_org_credit_integration
+        init_org_credit_integration(db_pool)
+
         # Initialize BYOK manager (uses same db_pool)
         byok_manager = BYOKManager(db_pool)
         app.state.byok_manager = byok_manager
@@ -1057,6 +1098,16 @@ async def startup_event():
         logger.error(f"Failed to start alert checker: {e}")
         # Don't block startup if alert checking fails
 
+    # Tail container logs into the on-disk log store for /api/v1/logs/search/advanced
+    try:
+        from log_store import LOG_INGEST_ENABLED, get_log_ingestor
+        if LOG_INGEST_ENABLED:
+            await get_log_ingestor().start()
+            logger.info("Container log ingestion started")
+    except Exception as e:
+        logger.error(f"Failed to start container log ingestion: {e}")
+        # Don't block startup — log search falls back to reading docker logs directly
+
     # Scheduled pricing refresh — NEVER-LOSE-MONEY safeguard: keep the metered-inference
     # rate book's provider COSTS current from live OpenRouter pricing, so a provider price
     # hike can't sit unbilled between manual refreshes. Runs once ~30s after boot (every
@@ -1138,13 +1189,69 @@ async def shutdown_event():
     except Exception as e:
         logger.error(f"Error stopping federation agent: {e}")
 
-    # Close credit system connections
-    if hasattr(app.state, 'db_pool') and app.state.db_pool:
-        try:
-            await app.state.db_pool.close()
-            logger.info("PostgreSQL connection pool closed")
-        except Exception as e:
-            logger.error(f"Error closing database pool: {e}")
+    # Release the shared async session store pool (middleware read path)
+    try:
+        from redis_session import async_session_store
+        await async_session_store.close()
+    except Exception as e:
+        logger.error(f"Error closing async session store: {e}")
+
+    # Write pending tier usage counters back to Keycloak
+    try:
+        from tier_quota_cache import get_tier_quota_cache
+        await get_tier_quota_cache().close()
+    except Exception as e:
+        logger.error(f"Error closing tier quota cache: {e}")
+
+    # Apply pending org credit ledger rows before the pool goes away
+    try:
+        from org_credit_holds import shutdown_org_credit_holds
+        await shutdown_org_credit_holds()
+    except Exception as e:
+        logger.error(f"Error stopping org credit holds: {e}")
+
+    # Flush pending Lago usage events before the pool goes away
+    try:
+        from lago_metering import shutdown_lago_metering
+        await shutdown_lago_metering()
+    except Exception as e:
+        logger.error(f"Error stopping Lago metering queue: {e}")
+
+    # Write coalesced Colonel conversation saves still waiting to go out
+    try:
+        from colonel.persistence import flush_pending_saves
+        await flush_pending_saves()
+    except Exception as e:
+        logger.error(f"Error flushing Colonel conversation saves: {e}")
+
+    # Stop container log tails and close open log segments
+    try:
+        from log_store import get_log_ingestor
+        await get_log_ingestor().stop()
+    except Exception as e:
+        logger.error(f"Error stopping container log ingestion: {e}")
+
+    # Stop following Docker events for the Traefik live views
+    try:
+        from traefik_label_cache import get_traefik_label_cache
+        await get_traefik_label_cache().close()
+    except Exception as e:
+        logger.error(f"Error closing Traefik label cache: {e}")
+
+    # Close pooled upstream LLM/inference connections
+    try:
+        from upstream_clients import close_upstream_clients
+        await close_upstream_clients()
+    except Exception as e:
+        logger.error(f"Error closing upstream client pools: {e}")
+
+    # Close the shared PostgreSQL pools
+    try:
+        from database.pool_manager import close_all_pools
+        await close_all_pools()
+        logger.info("PostgreSQL connection pool closed")
+    except Exception as e:
+        logger.error(f"Error closing database pool: {e}")
 
     if hasattr(app.state, 'redis_client') and app.state.redis_client:
         try:
@@ -0,0 +1,54 @@
+"""
+Single-flight background refresh for stale-while-revalidate caches
+
+The in-process caches (model listing, model catalog, user directory, Traefik
+label cache) all serve their previous snapshot while ONE background task
+rebuilds it: concurrent callers share the in-progress task, the first load is
+awaited through asyncio.shield so a cancelled request can't abort it, and a
+failed refresh is logged instead of surfacing as "Task exception was never
+retrieved". This module holds that piece once.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """At most one in-progress refresh task, shared by every caller"""
+
+    def __init__(self, label: str, log: logging.Logger = logger, level: int = logging.WARNING):
+        """
+        Args:
+            label: What is being refreshed, used in the failure log line
+            log: Logger of the owning module
+            level: Level failures are logged at
+        """
+        self.label = label
+        self.log = log
+        self.level = level
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def schedule(self, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start factory() unless a refresh is already running; return the shared task."""
+        if not self.running:
+            self.task = asyncio.create_task(factory())
+            self.task.add_done_callback(self._log_failure)
+        return self.task
+
+    async def wait(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Join (or start) the refresh and wait for it; cancelling the caller doesn't cancel it."""
+        return await asyncio.shield(self.schedule(factory))
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.log.log(
+                self.level,
+                f"{self.label} refresh failed (serving previous data): {task.exception()}"
+            )
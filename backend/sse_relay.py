@@ -0,0 +1,197 @@
+"""
+Low-overhead SSE relay for streamed chat completions.
+
+The chat completions stream used to decode every upstream line, run
+json.loads on every chunk to look for usage, re-encode the frame and force an
+event-loop switch after each yield. Per-chunk JSON parsing was the largest
+CPU cost per concurrent stream.
+
+The relay forwards upstream bytes untouched. Billing data comes from a
+byte-level scanner that only looks at frame boundaries:
+
+- `[DONE]` ends the relay.
+- The model is read once, from the first frame, with a byte regex.
+- Only a frame that carries a `"usage": {...}` object is JSON-decoded,
+  which is normally the single final chunk.
+
+Frames that arrive within SSE_FLUSH_WINDOW_MS of each other are coalesced
+into one write (up to SSE_COALESCE_MAX_BYTES). The upstream reader hands
+chunks over through a bounded queue, so a slow client stops the reader
+instead of letting chunks pile up in memory, and TCP backpressure reaches
+the provider.
+
+Configuration (environment):
+    SSE_FLUSH_WINDOW_MS      coalescing window in milliseconds (default 5, 0 disables)
+    SSE_COALESCE_MAX_BYTES   largest coalesced write (default 16384)
+    SSE_RELAY_MAX_PENDING    upstream chunks buffered ahead of the client (default 64)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Any, AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SSE_FLUSH_WINDOW = float(os.getenv("SSE_FLUSH_WINDOW_MS", "5")) / 1000.0
+SSE_COALESCE_MAX_BYTES = int(os.getenv("SSE_COALESCE_MAX_BYTES", "16384"))
+SSE_RELAY_MAX_PENDING = int(os.getenv("SSE_RELAY_MAX_PENDING", "64"))
+
+# A partial frame larger than this is not SSE we can scan; stop buffering it.
+MAX_PARTIAL_FRAME = 1024 * 1024
+
+_FRAME_END = re.compile(rb"\r?\n\r?\n")
+_USAGE_OBJECT = re.compile(rb'"usage"\s*:\s*\{')
+_MODEL = re.compile(rb'"model"\s*:\s*"([^"\\]*)"')
+_DONE = re.compile(rb"^data:\s*\[DONE\]\s*$", re.MULTILINE)
+
+
+def sse_error_frame(message: str, error_type: str, code: Optional[int] = None) -> bytes:
+    """Encode an OpenAI-style error as one SSE frame."""
+    error: Dict[str, Any] = {"message": message, "type": error_type}
+    if code is not None:
+        error["code"] = code
+    return b"data: " + json.dumps({"error": error}).encode() + b"\n\n"
+
+
+class SSEUsageScanner:
+    """Incrementally scans an SSE byte stream for the fields billing needs"""
+
+    def __init__(self):
+        self.model: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.done = False
+        self.frames = 0
+        self.bytes = 0
+        self._partial = b""
+
+    @property
+    def total_tokens(self) -> int:
+        if not self.usage:
+            return 0
+        return int(self.usage.get("total_tokens") or 0)
+
+    def feed(self, chunk: bytes) -> None:
+        """Scan the frames a chunk completes; the chunk itself is not modified."""
+        self.bytes += len(chunk)
+        data = self._partial + chunk if self._partial else chunk
+
+        end = 0
+        for match in _FRAME_END.finditer(data):
+            end = match.end()
+        if not end:
+            self._partial = data if len(data) <= MAX_PARTIAL_FRAME else b""
+            return
+        complete, self._partial = data[:end], data[end:]
+
+        self.frames += complete.count(b"data:")
+        if self.model is None:
+            match = _MODEL.search(complete)
+            if match:
+                self.model = match.group(1).decode("utf-8", "replace")
+        if _USAGE_OBJECT.search(complete):
+            self._read_usage(complete)
+        if b"[DONE]" in complete and _DONE.search(complete):
+            self.done = True
+
+    def _read_usage(self, complete: bytes) -> None:
+        """Decode only the frame(s) that carry a usage object."""
+        for frame in _FRAME_END.split(complete):
+            if not _USAGE_OBJECT.search(frame):
+                continue
+            payload = b"".join(
+                line[5:].strip() for line in frame.splitlines() if line.startswith(b"data:")
+            )
+            try:
+                chunk = json.loads(payload)
+            except ValueError:
+                logger.warning(f"Unparseable usage frame in stream: {payload[:100]!r}")
+                continue
+            if isinstance(chunk.get("usage"), dict):
+                self.usage = chunk["usage"]
+            if chunk.get("model"):
+                self.model = chunk["model"]
+
+
+async def relay_sse(
+    chunks: AsyncIterator[bytes],
+    scanner: SSEUsageScanner,
+    flush_window: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Forward an upstream SSE byte stream, coalescing frames within the flush window.
+
+    Args:
+        chunks: Upstream byte iterator (e.g. `response.aiter_bytes()`)
+        scanner: Receives every chunk before it is forwarded
+        flush_window: Seconds to wait for more frames before writing
+        max_bytes: Write as soon as this much is buffered
+        max_pending: Chunks the reader may run ahead of the client
+
+    Yields:
+        Upstream bytes, unchanged, in order. Stops after `[DONE]`.
+    """
+    flush_window = SSE_FLUSH_WINDOW if flush_window is None else flush_window
+    max_bytes = max_bytes or SSE_COALESCE_MAX_BYTES
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending or SSE_RELAY_MAX_PENDING)
+    end_of_stream = object()
+
+    async def read_upstream():
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                scanner.feed(chunk)
+                await queue.put(chunk)
+                if scanner.done:
+                    break
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(end_of_stream)
+
+    reader = asyncio.create_task(read_upstream())
+    loop = asyncio.get_running_loop()
+    try:
+        carry = None
+        while True:
+            item = carry if carry is not None else await queue.get()
+            carry = None
+            if item is end_of_stream:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            parts = [item]
+            size = len(item)
+            deadline = loop.time() + flush_window
+            while size < max_bytes:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is end_of_stream or isinstance(item, Exception):
+                    # Write what we have, then finish (or raise) on the next pass
+                    carry = item
+                    break
+                parts.append(item)
+                size += len(item)
+
+            yield parts[0] if len(parts) == 1 else b"".join(parts)
+    finally:
+        if not reader.done():
+            reader.cancel()
+            try:
+                await reader
+            except (asyncio.CancelledError, Exception):
+                pass
@@ -10,7 +10,7 @@ import logging
 from datetime import datetime
 import os
 import stripe
-import asyncpg
+from database.pool_manager import pg_connect
 
 from stripe_integration import stripe_integration
 from keycloak_integration import get_user_by_email, get_user_tier_info
@@ -130,13 +130,7 @@ async def create_checkout_session(
         if request.billing_cycle not in ["monthly", "yearly"]:
             raise HTTPException(status_code=400, detail="Invalid billing cycle")
 
-        conn = await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db"),
-        )
+        conn = await pg_connect()
         try:
             plan = await conn.fetchrow(
                 """
@@ -4,7 +4,7 @@ import logging
 import os
 from typing import Any, Dict, Optional
 
-import asyncpg
+from database.pool_manager import pg_connect
 import stripe
 
 from keycloak_integration import get_user_by_email
@@ -13,13 +13,7 @@ logger = logging.getLogger(__name__)
 
 
 async def _connect():
-    return await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db"),
-    )
+    return await pg_connect()
 
 
 class StripeWebhookHandler:
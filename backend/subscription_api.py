@@ -115,15 +115,9 @@ async def get_authoritative_tier(user: dict) -> Optional[str]:
         return None
 
     try:
-        import asyncpg
-
-        conn = await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
+        from database.pool_manager import pg_connect
+
+        conn = await pg_connect()
         try:
             row = await conn.fetchrow(
                 "SELECT tier FROM user_credits WHERE user_id::text = $1",
@@ -149,15 +143,9 @@ async def _fetch_purchasable_tiers() -> List[Dict]:
     Excludes internal-assignment tiers (vip_founder, founder_friend, client);
     returns byok, managed, trial. Features are built from tier_features.
     """
-    import asyncpg
-
-    conn = await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db")
-    )
+    from database.pool_manager import pg_connect
+
+    conn = await pg_connect()
     try:
         rows = await conn.fetch(
             """
@@ -192,26 +192,18 @@ async def log_subscription_change(
     feedback: Optional[str] = None
 ):
     """Log subscription change to database"""
-    import asyncpg
+    from database.pool_manager import pg_connect
 
     try:
-        # Connect to PostgreSQL
-        conn = await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
-
-        # Insert subscription change record
-        await conn.execute("""
-            INSERT INTO subscription_changes
-            (user_id, change_type, from_plan, to_plan, reason, feedback, effective_date, created_at)
-            VALUES ($1, $2, $3, $4, $5, $6, NOW(), NOW())
-        """, user_id, change_type, from_plan, to_plan, reason, feedback)
+        # Borrow a pooled connection; always hand it back
+        async with await pg_connect() as conn:
+            # Insert subscription change record
+            await conn.execute("""
+                INSERT INTO subscription_changes
+                (user_id, change_type, from_plan, to_plan, reason, feedback, effective_date, created_at)
+                VALUES ($1, $2, $3, $4, $5, $6, NOW(), NOW())
+            """, user_id, change_type, from_plan, to_plan, reason, feedback)
 
-        await conn.close()
         logger.info(f"Logged subscription change: {change_type} for user {user_id}")
     except Exception as e:
         logger.error(f"Error logging subscription change: {str(e)}")
@@ -642,30 +634,21 @@ async def get_subscription_history(
 
     Returns all upgrades, downgrades, and cancellations with timestamps and reasons.
     """
-    import asyncpg
+    from database.pool_manager import pg_connect
 
     try:
         user_id = user.get("user_id") or user.get("sub")
 
-        # Connect to PostgreSQL
-        conn = await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", "5432")),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
-
-        # Fetch subscription history
-        rows = await conn.fetch("""
-            SELECT id, change_type, from_plan, to_plan, effective_date, reason, feedback, created_at
-            FROM subscription_changes
-            WHERE user_id = $1
-            ORDER BY created_at DESC
-            LIMIT $2 OFFSET $3
-        """, user_id, limit, offset)
-
-        await conn.close()
+        # Borrow a pooled connection; always hand it back
+        async with await pg_connect() as conn:
+            # Fetch subscription history
+            rows = await conn.fetch("""
+                SELECT id, change_type, from_plan, to_plan, effective_date, reason, feedback, created_at
+                FROM subscription_changes
+                WHERE user_id = $1
+                ORDER BY created_at DESC
+                LIMIT $2 OFFSET $3
+            """, user_id, limit, offset)
 
         history = []
         for row in rows:
@@ -9,7 +9,7 @@ from pydantic import BaseModel, Field, validator
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 import logging
-import asyncpg
+from database.pool_manager import pg_connect
 import json
 
 # Import Lago integration for plan synchronization
@@ -20,6 +20,8 @@ from lago_integration import (
     LagoIntegrationError
 )
 
+from pricing_snapshot import refresh_pricing_snapshot
+
 # Import Keycloak integration for user tier updates
 from keycloak_integration import (
     update_user_attributes,
@@ -147,13 +149,7 @@ async def get_db_connection():
     """Get PostgreSQL database connection"""
     import os
     try:
-        conn = await asyncpg.connect(
-            host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-            port=int(os.getenv("POSTGRES_PORT", 5432)),
-            user=os.getenv("POSTGRES_USER", "unicorn"),
-            password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-            database=os.getenv("POSTGRES_DB", "unicorn_db")
-        )
+        conn = await pg_connect()
         yield conn
     finally:
         if conn:
@@ -353,6 +349,9 @@ async def create_tier(
             # Note: Lago plans should be created in Lago dashboard first
             # This is just for reference/mapping
 
+        # Price requests on the new tier with its markup
+        await refresh_pricing_snapshot()
+
         # Return created tier
         created_tier = SubscriptionTierResponse(
             id=row['id'],
@@ -432,6 +431,8 @@ async def update_tier(
 
         logger.info(f"Updated tier {tier_id} by {admin}")
 
+        await refresh_pricing_snapshot()
+
         # Return updated tier
         return await get_tier(tier_id, conn)
 
@@ -588,6 +589,8 @@ async def clone_tier(
 
         logger.info(f"Cloned tier '{tier_code}' to '{new_tier_code}' with {app_count} apps by {admin}")
 
+        await refresh_pricing_snapshot()
+
         # Return created tier
         created_tier = SubscriptionTierResponse(
             id=new_tier_id,
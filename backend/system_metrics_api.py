@@ -13,6 +13,7 @@ import docker
 import asyncio
 import logging
 import redis
+import redis.asyncio as aioredis
 import os
 import json
 import re
@@ -20,6 +21,7 @@ from enum import Enum
 
 from health_score import HealthScoreCalculator
 from alert_manager import AlertManager
+from metrics_timeseries import MetricsTimeSeries
 
 logger = logging.getLogger(__name__)
 
@@ -39,66 +41,39 @@ class TimeFrame(str, Enum):
     THIRTY_DAYS = "30d"
 
 
+TIMEFRAME_SECONDS = {
+    TimeFrame.ONE_HOUR: 3600,
+    TimeFrame.SIX_HOURS: 6 * 3600,
+    TimeFrame.TWENTY_FOUR_HOURS: 86400,
+    TimeFrame.SEVEN_DAYS: 7 * 86400,
+    TimeFrame.THIRTY_DAYS: 30 * 86400,
+}
+
+
 class MetricsCache:
-    """Redis-backed metrics cache for historical data."""
+    """Redis-backed metrics cache for historical data (written by MetricsCollector)."""
 
     def __init__(self):
-        try:
-            self.redis = redis.Redis(
-                host='unicorn-redis',
-                port=6379,
-                db=1,
-                password=os.getenv("REDIS_PASSWORD"),
-                decode_responses=True,
-                socket_timeout=5
-            )
-            self.redis.ping()
-            logger.info("Connected to Redis for metrics storage")
-        except Exception as e:
-            logger.warning(f"Redis connection failed: {e}. Using in-memory fallback.")
-            self.redis = None
+        self.redis = aioredis.Redis(
+            host='unicorn-redis',
+            port=6379,
+            db=1,
+            password=os.getenv("REDIS_PASSWORD"),
+            decode_responses=True,
+            socket_timeout=5
+        )
+        self.series = MetricsTimeSeries(self.redis)
 
-    def get_historical_metrics(
+    async def get_historical_metrics(
         self,
-        timeframe: TimeFrame
+        timeframe: TimeFrame,
+        max_points: int = 200
     ) -> List[Dict]:
-        """Retrieve historical metrics from Redis."""
-        if not self.redis:
-            return []
-
+        """Retrieve historical metrics from Redis, oldest first."""
         try:
-            now = datetime.utcnow()
-
-            # Calculate time range
-            if timeframe == TimeFrame.ONE_HOUR:
-                start_time = now - timedelta(hours=1)
-            elif timeframe == TimeFrame.SIX_HOURS:
-                start_time = now - timedelta(hours=6)
-            elif timeframe == TimeFrame.TWENTY_FOUR_HOURS:
-                start_time = now - timedelta(hours=24)
-            elif timeframe == TimeFrame.SEVEN_DAYS:
-                start_time = now - timedelta(days=7)
-            else:  # 30 days
-                start_time = now - timedelta(days=30)
-
-            start_ts = int(start_time.timestamp())
-            end_ts = int(now.timestamp())
-
-            # Get all metric keys in range
-            keys = []
-            for ts in range(start_ts, end_ts, 5):  # 5 second intervals
-                key = f"metrics:{ts}"
-                if self.redis.exists(key):
-                    keys.append(key)
-
-            # Retrieve metrics
-            metrics = []
-            for key in keys[-200:]:  # Limit to last 200 data points
-                data = self.redis.get(key)
-                if data:
-                    metrics.append(json.loads(data))
-
-            return metrics
+            now = datetime.utcnow().timestamp()
+            start_ts = now - TIMEFRAME_SECONDS.get(timeframe, 30 * 86400)
+            return await self.series.range(start_ts, now, max_points, now=now)
         except Exception as e:
             logger.error(f"Error retrieving historical metrics: {e}")
             return []
@@ -305,8 +280,8 @@ async def get_system_metrics(
         network = get_network_metrics()
         gpu = get_gpu_metrics()
 
-        # Get historical data
-        historical = metrics_cache.get_historical_metrics(timeframe)
+        # Get historical data, spread over the whole timeframe
+        historical = await metrics_cache.get_historical_metrics(timeframe, max_points=50)
 
         # Process historical data for trends
         cpu_history = [m.get("cpu", 0) for m in historical]
@@ -0,0 +1,90 @@
+"""
+APIKeyManager.validate_api_key must not pay for bcrypt on every request: a
+verified key is served from the HMAC-keyed cache until its TTL, and revoking
+it evicts the cached verification immediately.
+"""
+
+import bcrypt
+import pytest
+
+from api_key_manager import APIKeyManager
+
+
+class FakeConn:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def fetch(self, query, *args):
+        self.pool.fetches += 1
+        return [row for row in self.pool.rows if row["is_active"]]
+
+    async def execute(self, query, *args):
+        if "is_active = FALSE" in query:
+            for row in self.pool.rows:
+                row["is_active"] = False
+            return "UPDATE 1"
+        return "UPDATE 1"
+
+
+class FakeAcquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        return FakeConn(self.pool)
+
+    async def __aexit__(self, *a):
+        return False
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = 0
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+
+API_KEY = "uc_" + "ab" * 32
+
+
+@pytest.fixture
+def manager():
+    row = {
+        "id": "key-1",
+        "user_id": "user@example.com",
+        "key_hash": bcrypt.hashpw(API_KEY.encode(), bcrypt.gensalt(rounds=4)).decode(),
+        "permissions": ["llm:inference"],
+        "expires_at": None,
+        "is_active": True,
+    }
+    return APIKeyManager(FakePool([row]))
+
+
+@pytest.mark.asyncio
+async def test_second_validation_is_served_from_cache(manager):
+    first = await manager.validate_api_key(API_KEY)
+    second = await manager.validate_api_key(API_KEY)
+    assert first["user_id"] == second["user_id"] == "user@example.com"
+    assert manager.db_pool.fetches == 1
+
+
+@pytest.mark.asyncio
+async def test_revoke_evicts_cached_key(manager):
+    assert await manager.validate_api_key(API_KEY)
+    assert await manager.revoke_key("user@example.com", "key-1")
+    assert await manager.validate_api_key(API_KEY) is None
+
+
+@pytest.mark.asyncio
+async def test_invalid_key_is_negatively_cached(manager):
+    bad = "uc_" + "cd" * 32
+    assert await manager.validate_api_key(bad) is None
+    assert await manager.validate_api_key(bad) is None
+    assert manager.db_pool.fetches == 1
+
+
+def test_cache_key_is_not_the_token(manager):
+    assert API_KEY not in manager._cache_digest(API_KEY)
+    assert len(manager._cache_digest(API_KEY)) == 64
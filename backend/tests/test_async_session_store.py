@@ -0,0 +1,122 @@
+"""
+AsyncSessionStore must serve repeat session reads from its in-process LRU,
+re-read Redis once an entry's TTL has passed, evict the least recently used
+session when full, and drop a session as soon as another worker updates or
+deletes it (pub/sub invalidation).
+"""
+
+import asyncio
+import importlib
+import json
+
+import pytest
+import pytest_asyncio
+import redis
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+    # RedisSessionManager connects (and pings) at construction, including the
+    # module-level instance created on import
+    monkeypatch.setattr(
+        redis, "Redis",
+        lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True)
+    )
+    return server
+
+
+@pytest.fixture
+def redis_session(server):
+    return importlib.import_module("redis_session")
+
+
+@pytest_asyncio.fixture
+async def store(server, redis_session):
+    s = redis_session.AsyncSessionStore(cache_ttl=30, cache_size=2)
+    s._client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    yield s
+    await s.close()
+
+
+def _write(server, session_id, data):
+    fakeredis.FakeRedis(server=server, decode_responses=True).set(f"session:{session_id}", json.dumps(data))
+
+
+async def _eventually(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if await predicate():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+@pytest.mark.asyncio
+async def test_repeat_reads_are_cache_hits(store, server):
+    _write(server, "s1", {"user": {"email": "a@example.com"}})
+
+    first = await store.get("s1")
+    _write(server, "s1", {"user": {"email": "changed@example.com"}})
+    second = await store.get("s1")
+
+    assert first == second == {"user": {"email": "a@example.com"}}
+    assert (store.hits, store.misses) == (1, 1)
+    second["user"] = None
+    assert (await store.get("s1"))["user"], "callers get a copy, not the cached dict"
+    assert await store.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_entry_is_reread_after_ttl(store, server):
+    store.cache_ttl = 0.05
+    _write(server, "s1", {"v": 1})
+    assert await store.get("s1") == {"v": 1}
+
+    _write(server, "s1", {"v": 2})
+    assert await store.get("s1") == {"v": 1}
+    await asyncio.sleep(0.1)
+    assert await store.get("s1") == {"v": 2}
+    assert store.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_session_is_evicted(store, server):
+    for session_id in ("a", "b", "c"):
+        _write(server, session_id, {"id": session_id})
+
+    await store.get("a")
+    await store.get("b")
+    await store.get("a")  # a is now the most recent
+    await store.get("c")
+
+    assert list(store._cache) == ["a", "c"]
+    await store.get("b")
+    assert store.misses == 4, "the evicted session is read from Redis again"
+
+
+@pytest.mark.asyncio
+async def test_other_workers_updates_and_deletes_invalidate(store, server, redis_session):
+    _write(server, "s1", {"role": "admin"})
+    assert await store.get("s1") == {"role": "admin"}
+    assert await _eventually(lambda: _subscribed(server, store.invalidation_channel))
+
+    # Another worker process: its own RedisSessionManager and local cache
+    other = redis_session.RedisSessionManager()
+    other.set("s1", {"role": "viewer"})
+    assert await _eventually(lambda: _read(store, "s1", {"role": "viewer"}))
+
+    other.delete("s1")
+    assert await _eventually(lambda: _read(store, "s1", None))
+
+
+async def _subscribed(server, channel):
+    client = fakeredis.aioredis.FakeRedis(server=server)
+    counts = await client.pubsub_numsub(channel)
+    return bool(counts and counts[0][1])
+
+
+async def _read(store, session_id, expected):
+    return await store.get(session_id) == expected
@@ -0,0 +1,149 @@
+"""
+A service org hold placed before the upstream call must be released on every
+path that doesn't debit against it: a request rejected after the hold, an
+upstream error on the non-streaming path, and a failed stream.
+"""
+
+import sys
+import types
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import litellm_api
+from litellm_api import ChatCompletionRequest, chat_completions
+
+ORG = "org_test_service"
+
+
+class FakeCredits:
+    db_pool = None
+
+    def __init__(self, within_cap=True):
+        self.within_cap = within_cap
+        self.released = []
+        self.debited = []
+
+    async def get_user_tier(self, user_id):
+        return "professional"
+
+    async def calculate_cost(self, **kwargs):
+        return 0.5
+
+    async def hold_credits(self, user_id, amount):
+        return "hold-1"
+
+    async def check_monthly_cap(self, user_id, amount):
+        return self.within_cap
+
+    async def release_hold(self, user_id, hold_id):
+        self.released.append((user_id, hold_id))
+
+    async def debit_credits(self, user_id, amount, metadata, hold_id=None):
+        self.debited.append(hold_id)
+        return 10.0, "tx-1"
+
+
+class FakeByok:
+    async def get_all_user_keys(self, user_id):
+        return {}
+
+
+class FakeOrgIntegration:
+    async def has_sufficient_org_credits(self, **kwargs):
+        return False, None, ""
+
+
+class FakeRoutes:
+    async def resolve(self, pool, model_name, encryption_key):
+        return SimpleNamespace(
+            is_local=False, base_url="http://upstream", provider_name="Upstream",
+            api_key="sk-test", headers={}
+        )
+
+
+class FakeResponse:
+    status_code = 503
+    text = "overloaded"
+
+    async def aread(self):
+        return b"overloaded"
+
+
+class FakeStream:
+    async def __aenter__(self):
+        return FakeResponse()
+
+    async def __aexit__(self, *a):
+        return False
+
+
+class FakeUpstream:
+    def stream(self, *args, **kwargs):
+        return FakeStream()
+
+    async def post(self, *args, **kwargs):
+        return FakeResponse()
+
+
+@pytest.fixture(autouse=True)
+def upstream(monkeypatch):
+    bridge = types.ModuleType("federation_llm_bridge")
+
+    async def no_node(model):
+        return None
+
+    bridge.federated_node_for_model = no_node
+    bridge.serve_llm_via_federation = None
+    monkeypatch.setitem(sys.modules, "federation_llm_bridge", bridge)
+    monkeypatch.setattr(litellm_api, "get_org_credit_integration", lambda: FakeOrgIntegration())
+    monkeypatch.setattr(litellm_api, "get_route_table", lambda: FakeRoutes())
+    monkeypatch.setattr(litellm_api, "get_upstream_client", lambda base_url: FakeUpstream())
+
+
+async def _complete(credits, stream=False):
+    return await chat_completions(
+        ChatCompletionRequest(
+            model="openai/gpt-4o-mini",
+            messages=[{"role": "user", "content": "hello there"}],
+            stream=stream
+        ),
+        SimpleNamespace(state=SimpleNamespace(), headers={}),
+        user_id=ORG,
+        credit_system=credits,
+        byok_manager=FakeByok(),
+        x_power_level=None
+    )
+
+
+@pytest.mark.asyncio
+async def test_hold_released_when_monthly_cap_rejects():
+    credits = FakeCredits(within_cap=False)
+    with pytest.raises(HTTPException) as exc:
+        await _complete(credits)
+    assert exc.value.status_code == 429
+    assert credits.released == [(ORG, "hold-1")]
+
+
+@pytest.mark.asyncio
+async def test_hold_released_on_upstream_error():
+    credits = FakeCredits()
+    with pytest.raises(HTTPException):
+        await _complete(credits)
+    assert credits.released == [(ORG, "hold-1")]
+    assert credits.debited == []
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_releases_hold_once():
+    credits = FakeCredits()
+    response = await _complete(credits, stream=True)
+    assert credits.released == [], "the stream generator owns the hold"
+
+    frames = [frame async for frame in response.body_iterator]
+    assert b"overloaded" in b"".join(
+        f if isinstance(f, bytes) else f.encode() for f in frames
+    )
+    assert credits.released == [(ORG, "hold-1")]
+    assert credits.debited == []
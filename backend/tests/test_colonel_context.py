@@ -0,0 +1,94 @@
+"""
+Colonel context pruning must count tokens once per message with a tokenizer
+chosen by model family, and slide its window by whole tool-call exchanges.
+"""
+
+from colonel import context
+from colonel.context import message_tokens, prune_context
+from colonel.models import ChatMessage
+from colonel.tokenizer import (
+    HeuristicTokenizer, Tokenizer, get_tokenizer, model_family, register_tokenizer,
+)
+
+
+class CountingTokenizer(Tokenizer):
+    """One token per character, counting calls."""
+
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def count(self, text: str) -> int:
+        self.calls += 1
+        return len(text)
+
+
+def _msg(role, size, **kwargs):
+    return ChatMessage(role=role, content="x" * size, **kwargs)
+
+
+def test_model_family_resolution():
+    assert model_family("gpt-4o") == "openai"
+    assert model_family("openai/gpt-4o-mini") == "openai"
+    assert model_family("openrouter/anthropic/claude-sonnet-4") == "anthropic"
+    assert model_family("claude-opus-4-6") == "anthropic"
+    assert model_family(None) == "default"
+
+
+def test_registered_tokenizer_is_used_and_counts_are_cached():
+    tokenizer = CountingTokenizer()
+    register_tokenizer("testfamily", lambda model: tokenizer)
+    assert get_tokenizer("testfamily/model") is tokenizer
+
+    msg = _msg("user", 10)
+    assert message_tokens(msg, tokenizer) == 14  # 10 chars + 4 overhead
+    assert message_tokens(msg, tokenizer) == 14
+    assert tokenizer.calls == 1
+    assert msg.token_counter == "counting"
+
+    # A different tokenizer recounts
+    assert message_tokens(msg, HeuristicTokenizer()) == 2 + 4
+
+
+def test_prune_never_splits_tool_exchange(monkeypatch):
+    tokenizer = CountingTokenizer()
+    monkeypatch.setattr(context, "get_tokenizer", lambda model: tokenizer)
+    monkeypatch.setattr(context, "context_budget", lambda *a: 1000)
+
+    messages = [
+        _msg("user", 300),
+        _msg("assistant", 100, tool_calls=[{"id": "call_1"}]),
+        _msg("tool", 400, tool_call_id="call_1"),
+        _msg("tool", 400, tool_call_id="call_1"),
+        _msg("assistant", 100),
+        _msg("user", 100),
+    ]
+    window = prune_context(messages, "", 0)
+    assert window == messages[4:], "the tool group cannot fit whole, so it is dropped whole"
+
+    # Everything fits once the tool results are small
+    for m in messages[2:4]:
+        m.content, m.token_count = "x", None
+    assert prune_context(messages, "", 0) is messages
+
+
+def test_window_slides_incrementally(monkeypatch):
+    tokenizer = CountingTokenizer()
+    monkeypatch.setattr(context, "get_tokenizer", lambda model: tokenizer)
+    monkeypatch.setattr(context, "context_budget", lambda *a: 250)
+
+    messages = [_msg("user" if i % 2 == 0 else "assistant", 96) for i in range(6)]
+    window = prune_context(messages, "", 0)
+    assert window == messages[4:]
+    start = len(messages) - len(window)
+    calls = tokenizer.calls
+
+    messages.append(_msg("user", 96))
+    window = prune_context(messages, "", 0, start=start)
+    assert window == messages[5:]
+    assert tokenizer.calls == calls + 1, "only the new message is tokenized"
+
+    # Tool results whose tool call is gone are never sent
+    orphaned = [_msg("tool", 1, tool_call_id="call_x"), _msg("user", 1)]
+    assert prune_context(orphaned, "", 0) == orphaned[1:]
@@ -0,0 +1,89 @@
+"""
+Colonel graph context must match message words against an in-memory name
+index and fetch all matched containers in one batched query, off the loop.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from colonel.memory import kuzu_client
+from colonel.memory.kuzu_client import ColonelGraphClient
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def has_next(self):
+        return bool(self.rows)
+
+    def get_next(self):
+        return self.rows.pop(0)
+
+
+class FakeConn:
+    def __init__(self, containers):
+        self.containers = containers
+        self.queries = []
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+        if "RETURN c.name, c.image" in query and params:
+            return FakeResult(
+                [n, img, "running"] for n, img in self.containers.items() if n in params["names"]
+            )
+        if "RETURN c.name" in query:
+            return FakeResult([n] for n in self.containers)
+        return FakeResult([])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ColonelGraphClient, "_initialize", lambda self: None)
+    c = ColonelGraphClient()
+    c._conn = FakeConn({"nginx-proxy": "nginx:1.25", "postgres": "postgres:16", "redis": "redis:7"})
+    c._available = True
+    c._refresh_name_index()
+    return c
+
+
+@pytest.mark.asyncio
+async def test_long_message_is_a_single_batched_query(client):
+    client._conn.queries.clear()
+    log = " ".join(["nginx-proxy: upstream timed out, retrying postgres connection"] * 40)
+
+    ctx = await client.aquery_context(log)
+    assert ctx == [
+        "Container 'nginx-proxy' runs image nginx:1.25, status: running",
+        "Container 'postgres' runs image postgres:16, status: running",
+    ]
+    assert len(client._conn.queries) == 1
+
+    # Repeated lookups are served from cache
+    assert await client.aquery_context(log) == ctx
+    assert len(client._conn.queries) == 1
+
+
+def test_unmatched_message_runs_no_query(client):
+    client._conn.queries.clear()
+    assert client.query_context("what is the load average today") == []
+    assert client._conn.queries == []
+
+
+def test_index_refresh_picks_up_new_containers(client):
+    assert client.match_names("check grafana") == []
+    client._conn.containers["grafana"] = "grafana/grafana"
+    client._refresh_name_index()
+    assert client.match_names("check grafana") == ["grafana"]
+
+
+def test_concurrent_lookups_share_the_cache_safely(client, monkeypatch):
+    monkeypatch.setattr(kuzu_client, "_CONTEXT_CACHE_SIZE", 2)
+    messages = ["check nginx-proxy", "check postgres", "check redis"] * 200
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(client.query_context, messages))
+
+    assert all(len(r) == 1 for r in results)
+    assert len(client._context_cache) <= 2
@@ -0,0 +1,104 @@
+"""
+Colonel persistence must be append-only: a save inserts only the messages past
+the last persisted message_index, and bursts of saves for one session are
+coalesced into a single write.
+"""
+
+import asyncio
+
+import pytest
+
+from colonel import persistence
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *a):
+        return False
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def transaction(self):
+        return FakeTransaction()
+
+    async def fetchrow(self, query, *args):
+        self.db.upserts += 1
+        return {"id": "conv-1"}
+
+    async def fetchval(self, query, *args):
+        return max((r[3] for r in self.db.rows), default=-1)
+
+    async def execute(self, query, conversation_id, keep):
+        self.db.rows = [r for r in self.db.rows if r[3] < keep]
+
+    async def executemany(self, query, records):
+        self.db.inserted.extend(records)
+        self.db.rows.extend(records)
+
+
+class FakeAcquire:
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return FakeConn(self.db)
+
+    async def __aexit__(self, *a):
+        return False
+
+
+class FakePool:
+    def __init__(self):
+        self.rows = []
+        self.inserted = []
+        self.upserts = 0
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    db = FakePool()
+
+    async def get_db_pool():
+        return db
+
+    monkeypatch.setattr(persistence, "get_db_pool", get_db_pool)
+    return db
+
+
+def _messages(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"} for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_save_appends_only_new_messages(pool):
+    assert await persistence.save_conversation("s1", "u1", "t", _messages(3))
+    assert [r[3] for r in pool.inserted] == [0, 1, 2]
+
+    pool.inserted.clear()
+    assert await persistence.save_conversation("s1", "u1", "t", _messages(5))
+    assert [(r[2], r[3]) for r in pool.inserted] == [("m3", 3), ("m4", 4)]
+
+    # A shorter transcript truncates what is stored
+    assert await persistence.save_conversation("s1", "u1", "t", _messages(2))
+    assert [r[3] for r in pool.rows] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_burst_of_saves_is_coalesced(pool, monkeypatch):
+    monkeypatch.setattr(persistence, "SAVE_COALESCE_SECONDS", 0.01)
+    messages = []
+    for i in range(4):
+        messages.append({"role": "user", "content": f"m{i}"})
+        persistence.schedule_save("s2", "u1", "t", messages)
+
+    await persistence.flush_pending_saves()
+    assert pool.upserts == 1, "four saves in one burst should be a single write"
+    assert [r[3] for r in pool.rows] == [0, 1, 2, 3]
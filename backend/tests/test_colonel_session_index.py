@@ -0,0 +1,133 @@
+"""
+Colonel session listing must read a per-user index instead of scanning and
+decoding every session in Redis.
+"""
+
+import json
+
+import pytest
+
+from colonel.memory import session_index
+from colonel.memory.session_index import (
+    build_summary, index_session, list_user_sessions, unindex_session,
+)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*a, **kw) for name, a, kw in self.ops]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.scans = 0
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    async def expire(self, key, ttl):
+        pass
+
+    async def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    async def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    async def zrem(self, key, *members):
+        for m in members:
+            self.data.get(key, {}).pop(m, None)
+
+    async def zrevrange(self, key, start, end):
+        zset = self.data.get(key, {})
+        return sorted(zset, key=zset.get, reverse=True)
+
+    async def scan_iter(self, match, count=None):
+        self.scans += 1
+        prefix = match.rstrip("*")
+        for key in list(self.data):
+            if key.startswith(prefix):
+                yield key
+
+
+@pytest.fixture(autouse=True)
+def reset_backfill(monkeypatch):
+    monkeypatch.setattr(session_index, "_backfilled", False)
+
+
+async def _save(r, sid, user_id, updated_at, messages):
+    pipe = r.pipeline()
+    index_session(pipe, build_summary({
+        "id": sid, "user_id": user_id, "updated_at": updated_at,
+        "created_at": updated_at, "messages": messages,
+    }))
+    await pipe.execute()
+
+
+@pytest.mark.asyncio
+async def test_list_reads_only_the_users_index():
+    r = FakeRedis()
+    await _save(r, "s1", "alice", "2026-01-01T10:00:00", [{"role": "user", "content": "check disk"}])
+    await _save(r, "s2", "alice", "2026-01-02T10:00:00", [])
+    await _save(r, "s3", "bob", "2026-01-03T10:00:00", [])
+
+    sessions = await list_user_sessions(r, "alice")
+    assert [s["id"] for s in sessions] == ["s2", "s1"], "most recently updated first"
+    assert sessions[1]["title"] == "check disk"
+    assert sessions[1]["message_count"] == 1
+    assert r.scans == 1, "only the one-time backfill scans"
+
+    await list_user_sessions(r, "alice")
+    assert r.scans == 1
+
+    await unindex_session(r, "s1")
+    assert [s["id"] for s in await list_user_sessions(r, "alice")] == ["s2"]
+
+
+@pytest.mark.asyncio
+async def test_backfill_indexes_legacy_sessions():
+    r = FakeRedis()
+    r.data["colonel:session:old"] = json.dumps({
+        "id": "old", "user_id": "alice", "updated_at": "2025-12-01T00:00:00",
+        "messages": [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}],
+    })
+    sessions = await list_user_sessions(r, "alice")
+    assert sessions[0]["id"] == "old" and sessions[0]["message_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_summaries_are_pruned():
+    r = FakeRedis()
+    await _save(r, "s1", "alice", "2026-01-01T10:00:00", [])
+    del r.data["colonel:session_summary:s1"]  # TTL expired
+
+    assert await list_user_sessions(r, "alice") == []
+    assert "s1" not in r.data["colonel:user_sessions:alice"]
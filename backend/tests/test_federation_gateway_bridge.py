@@ -18,6 +18,7 @@ from federation.gateway_bridge import (
     serve_federated_inference,
 )
 from federation.trust import TrustModeEnforcer
+import upstream_clients
 
 
 class FakeResponse:
@@ -34,7 +35,7 @@ class FakeHttpClient:
         self.response = response or FakeResponse()
         self.calls = []
 
-    async def post(self, url, json=None, headers=None):
+    async def post(self, url, json=None, headers=None, timeout=None):
         self.calls.append({"url": url, "json": json, "headers": headers})
         return self.response
 
@@ -207,12 +208,13 @@ async def test_proxy_to_node_sends_org_header(monkeypatch):
         async def __aexit__(self, *exc):
             return False
 
-        async def post(self, url, json=None, headers=None):
+        async def post(self, url, json=None, headers=None, timeout=None):
             captured.update({"url": url, "headers": headers})
             return _Resp()
 
     import federation.inference_router as ir_mod
     monkeypatch.setattr(ir_mod.httpx, "AsyncClient", _Client)
+    monkeypatch.setattr(upstream_clients, "_registry", None)
 
     router = InferenceRouter(registry, local_node_id="self-node")
     result = await router.proxy_to_node(
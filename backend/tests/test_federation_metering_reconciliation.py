@@ -15,6 +15,7 @@ Invariant under test: EXACTLY ONE billable Lago event per federated call.
 import pytest
 
 import federation.metering as metering_mod
+import upstream_clients
 from federation.metering import FederationMeter
 
 
@@ -37,7 +38,7 @@ class FakeLagoClient:
     async def __aexit__(self, *exc):
         return False
 
-    async def post(self, url, json=None, headers=None):
+    async def post(self, url, json=None, headers=None, timeout=None):
         FakeLagoClient.posts.append({"url": url, "json": json, "headers": headers})
         return _FakeLagoResponse()
 
@@ -159,11 +160,12 @@ async def test_proxy_with_org_marks_gateway_metered(monkeypatch, lago_capture):
             return self
         async def __aexit__(self, *exc):
             return False
-        async def post(self, url, json=None, headers=None):
+        async def post(self, url, json=None, headers=None, timeout=None):
             calls.append({"url": url, "json": json})
             return _Resp()
 
     monkeypatch.setattr(ir_mod.httpx, "AsyncClient", _Client)
+    monkeypatch.setattr(upstream_clients, "_registry", None)
 
     meter = make_meter()
     router = InferenceRouter(registry, local_node_id="consumer-node", meter=meter)
@@ -211,11 +213,12 @@ async def test_proxy_without_org_still_fires_legacy_visibility(monkeypatch, lago
             return self
         async def __aexit__(self, *exc):
             return False
-        async def post(self, url, json=None, headers=None):
+        async def post(self, url, json=None, headers=None, timeout=None):
             calls.append({"url": url, "json": json})
             return _Resp()
 
     monkeypatch.setattr(ir_mod.httpx, "AsyncClient", _Client)
+    monkeypatch.setattr(upstream_clients, "_registry", None)
 
     meter = make_meter()
     router = InferenceRouter(registry, local_node_id="consumer-node", meter=meter)
@@ -0,0 +1,178 @@
+"""
+LagoMeteringQueue must take Lago off the debit path: events are batched into
+one /api/v1/events/batch call over a pooled client, delivered outbox rows are
+deleted, and a failed batch leaves its rows in the outbox for replay. A
+rejected batch is retried event by event, rows past the attempt limit are
+dead-lettered, and nothing is staged without a Lago key.
+"""
+
+import asyncio
+
+import pytest
+
+import lago_integration
+import lago_metering
+from lago_metering import LagoMeteringQueue, build_usage_event
+
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.text = ""
+
+
+class FakeClient:
+    def __init__(self, status_code=200, bad_tx=None):
+        self.status_code = status_code
+        self.bad_tx = bad_tx
+        self.calls = []
+
+    async def post(self, path, headers=None, json=None):
+        self.calls.append((path, json))
+        if self.bad_tx and any(e["transaction_id"] == self.bad_tx for e in json["events"]):
+            return FakeResponse(422)
+        return FakeResponse(self.status_code)
+
+    async def aclose(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, sink, dead=0):
+        self.sink = sink
+        self.dead = dead
+
+    async def execute(self, query, *args):
+        self.sink.append((query.split()[0], args))
+
+    async def fetchval(self, query, *args):
+        self.sink.append((query.split()[0], args))
+        return self.dead
+
+    async def fetch(self, query, *args):
+        self.sink.append((query.split()[0], args))
+        return []
+
+
+class FakeAcquire:
+    def __init__(self, sink, dead=0):
+        self.sink = sink
+        self.dead = dead
+
+    async def __aenter__(self):
+        return FakeConn(self.sink, self.dead)
+
+    async def __aexit__(self, *a):
+        return False
+
+
+class FakePool:
+    def __init__(self, dead=0):
+        self.statements = []
+        self.dead = dead
+
+    def acquire(self):
+        return FakeAcquire(self.statements, self.dead)
+
+
+@pytest.fixture(autouse=True)
+def lago_key(monkeypatch):
+    monkeypatch.setattr(lago_integration, "LAGO_API_KEY", "test-key")
+
+
+def _event(tx):
+    return build_usage_event("user@example.com", tx, 1.5, {"model": "gpt-4o", "tokens_used": 100})
+
+
+def test_build_usage_event_shape():
+    event = _event("tx-1")
+    assert event["transaction_id"] == "tx-1"
+    assert event["code"] == "api_call"
+    assert event["properties"]["model"] == "gpt-4o"
+    assert event["properties"]["tokens"] == 100
+    assert event["properties"]["cost"] == 1.5
+    assert "external_customer_id" not in event  # attached at delivery
+
+
+@pytest.mark.asyncio
+async def test_events_are_batched_into_one_call():
+    pool = FakePool()
+    queue = LagoMeteringQueue(db_pool=pool, flush_interval=0.05)
+    queue._client = FakeClient()
+
+    for i in range(3):
+        queue.enqueue("org-1", _event(f"tx-{i}"), outbox_id=i + 1)
+    await asyncio.sleep(0.15)
+
+    assert len(queue._client.calls) == 1, "three events should ship as one batch"
+    path, body = queue._client.calls[0]
+    assert path == "/api/v1/events/batch"
+    assert [e["transaction_id"] for e in body["events"]] == ["tx-0", "tx-1", "tx-2"]
+    assert body["events"][0]["external_customer_id"] == "org-1"
+    assert body["events"][0]["properties"]["org_id"] == "org-1"
+    assert pool.statements == [("DELETE", ([1, 2, 3],))]
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_stays_in_outbox():
+    pool = FakePool()
+    queue = LagoMeteringQueue(db_pool=pool, flush_interval=0.01)
+    queue._client = FakeClient(status_code=503)
+
+    assert await queue._deliver([(7, "org-1", _event("tx-7"))]) is False
+    assert pool.statements[0][0] == "UPDATE", "failed rows must be kept, not deleted"
+    assert queue.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_batch_is_retried_event_by_event():
+    pool = FakePool()
+    queue = LagoMeteringQueue(db_pool=pool)
+    queue._client = FakeClient(bad_tx="tx-2")
+
+    batch = [(i, "org-1", _event(f"tx-{i}")) for i in range(1, 4)]
+    assert await queue._deliver(batch) is False
+    assert len(queue._client.calls) == 4, "one batch attempt, then one call per event"
+    assert ("DELETE", ([1],)) in pool.statements and ("DELETE", ([3],)) in pool.statements
+    assert ("UPDATE", ([2], "422 - ")) in pool.statements
+    assert queue.stats["delivered"] == 2 and queue.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unavailable_lago_is_not_split():
+    queue = LagoMeteringQueue(db_pool=FakePool())
+    queue._client = FakeClient(status_code=503)
+
+    await queue._deliver([(i, "org-1", _event(f"tx-{i}")) for i in range(3)])
+    assert len(queue._client.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_exhausted_rows_are_dead_lettered_before_claiming():
+    pool = FakePool(dead=2)
+    queue = LagoMeteringQueue(db_pool=pool, max_attempts=5)
+
+    assert await queue._claim_due() == []
+    (verb, args), (_, claim_args) = pool.statements
+    assert verb == "WITH" and args == (5,)
+    assert queue.stats["dead_lettered"] == 2
+
+
+@pytest.mark.asyncio
+async def test_nothing_is_staged_without_a_lago_key(monkeypatch):
+    monkeypatch.setattr(lago_integration, "LAGO_API_KEY", "")
+    queue = LagoMeteringQueue(db_pool=FakePool())
+
+    assert await queue.stage(object(), "user@example.com", "org-1", _event("tx-1")) is None
+
+
+def test_enqueue_never_blocks_when_full():
+    queue = LagoMeteringQueue(max_queue=1)
+    assert queue.enqueue("org-1", _event("tx-1"), outbox_id=1) is True
+    assert queue.enqueue("org-1", _event("tx-2"), outbox_id=2) is False
+    assert queue.stats["dropped"] == 1
+
+
+def test_singleton():
+    assert lago_metering.get_lago_metering_queue() is lago_metering.get_lago_metering_queue()
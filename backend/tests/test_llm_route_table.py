@@ -0,0 +1,88 @@
+"""
+System-key chat completions must resolve their provider from an in-memory
+routing table instead of querying and decrypting on every request.
+"""
+
+import pytest
+from cryptography.fernet import Fernet
+from fastapi import HTTPException
+
+from llm_route_table import RouteTable
+
+KEY = Fernet.generate_key().decode()
+
+
+def _provider(pid, name, ptype, base_url, api_key=None, config=None):
+    return {
+        "id": pid, "name": name, "type": ptype, "api_base_url": base_url,
+        "api_key_encrypted": Fernet(KEY.encode()).encrypt(api_key.encode()).decode() if api_key else None,
+        "config": config,
+    }
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    async def fetch(self, query):
+        self.db.queries += 1
+        return [dict(p, model_name=m) for m, p in self.db.models]
+
+    async def fetchrow(self, query):
+        self.db.queries += 1
+        return self.db.fallback
+
+
+class FakeAcquire:
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return FakeConn(self.db)
+
+    async def __aexit__(self, *a):
+        return False
+
+
+class FakePool:
+    def __init__(self):
+        openrouter = _provider("p1", "OpenRouter", "openrouter", None, "sk-or", '{"base_url": "https://or.test/v1"}')
+        local = _provider("p2", "Strix", "local", "http://unicorn-llm:8080/v1")
+        self.models = [("openai/gpt-4o", openrouter), ("qwen-local", local)]
+        self.fallback = openrouter
+        self.queries = 0
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+
+@pytest.mark.asyncio
+async def test_routes_resolve_from_memory_after_first_build():
+    pool = FakePool()
+    table = RouteTable(ttl=300)
+
+    route = await table.resolve(pool, "openai/gpt-4o", KEY)
+    assert route.base_url == "https://or.test/v1"
+    assert route.headers["Authorization"] == "Bearer sk-or"
+    assert not route.is_local
+
+    local = await table.resolve(pool, "qwen-local", KEY)
+    assert local.is_local and "Authorization" not in local.headers
+
+    fallback = await table.resolve(pool, "unknown/model", KEY)
+    assert fallback.provider_name == "OpenRouter"
+    assert pool.queries == 2, "one build, then in-memory lookups"
+
+    pool.models = pool.models[1:]
+    table.invalidate()
+    assert await table.lookup(pool, "openai/gpt-4o", KEY) is None
+    assert pool.queries == 4
+
+
+@pytest.mark.asyncio
+async def test_no_providers_is_503():
+    pool = FakePool()
+    pool.models, pool.fallback = [], None
+    with pytest.raises(HTTPException) as exc:
+        await RouteTable().resolve(pool, "anything", KEY)
+    assert exc.value.status_code == 503
@@ -0,0 +1,150 @@
+"""
+Log search must run against ingested, indexed segments: lines are appended
+to rolling per-service segments, searches merge services newest first in a
+single pass that stops at the page size, and pages continue by cursor even
+while new lines arrive.
+"""
+
+import json
+
+import pytest
+
+import log_store
+from log_store import LogQuery, LogSegmentStore, decode_cursor, parse_log_line, parse_timestamp_ns
+
+BASE = parse_timestamp_ns("2025-11-29T10:00:00Z")
+SECOND = 1_000_000_000
+
+
+def _entries(count, start=0, message="request handled {i}"):
+    return [
+        (BASE + (start + i) * SECOND, f"t{start + i}", message.format(i=start + i))
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = LogSegmentStore(root=str(tmp_path), segment_bytes=2000, retention_hours=24 * 365 * 100)
+    s.open()
+    yield s
+    s.close()
+
+
+def test_parse_docker_lines():
+    ns, ts, message = parse_log_line("2025-11-29T10:00:00.123456789Z ERROR boom")
+    assert ns == BASE + 123456789
+    assert ts.startswith("2025-11-29T10:00:00.123456")
+    assert message == "ERROR boom"
+    assert parse_timestamp_ns("2025-11-29T10:00:00Z") < parse_timestamp_ns("2025-11-29T10:00:00.1Z")
+    assert parse_timestamp_ns("not a time") is None
+
+
+def test_segments_roll_and_index_severity(store, tmp_path):
+    store.append("web", _entries(40))
+    store.append("web", [(BASE + 100 * SECOND, "t", "ERROR db down"), (BASE + 50 * SECOND, "t", "WARN slow")])
+
+    segments = store._segments["web"]
+    assert len(segments) > 1 and all(s.sealed for s in segments[:-1])
+    assert sum(s.count for s in segments) == 42
+    assert sum(s.severity_counts.get("ERROR", 0) for s in segments) == 1
+    assert list((tmp_path / "web").glob("*.idx.json"))
+
+    # Out-of-order lines keep a monotonic sort key
+    last = json.loads((segments[-1].path.read_text().splitlines())[-1])
+    assert last["t"] == BASE + 100 * SECOND and last["msg"] == "WARN slow"
+
+
+def test_search_merges_services_newest_first_and_stops_early(store, monkeypatch):
+    store.append("web", _entries(30))
+    store.append("api", _entries(30, start=100))
+
+    reads = []
+    original = LogSegmentStore._read_lines
+    monkeypatch.setattr(LogSegmentStore, "_read_lines", staticmethod(lambda s: reads.append(s) or original(s)))
+
+    page = store.search(LogQuery(), limit=5)
+    assert [log["service"] for log in page["logs"]] == ["api"] * 5
+    assert page["logs"][0]["message"] == "request handled 129"
+    assert page["total"] == 60, "exact from the index without text/date filters"
+    assert page["total_is_estimate"] is False
+    assert page["has_more"] and page["next_cursor"]
+    assert len(reads) < len(store._segments["web"]) + len(store._segments["api"])
+
+    page = store.search(LogQuery(services=["web"], severity=["warning"]), limit=5)
+    assert page["logs"] == [] and page["total"] == 0
+
+
+def test_cursor_pages_are_stable_while_appending(store):
+    store.append("web", _entries(25))
+    store.append("api", _entries(25, start=3))
+
+    seen = []
+    cursor = None
+    while True:
+        page = store.search(LogQuery(query="handled 1"), limit=4, cursor=cursor)
+        seen.extend((log["service"], log["message"]) for log in page["logs"])
+        if not page["next_cursor"]:
+            break
+        cursor = decode_cursor(page["next_cursor"])
+        store.append("web", _entries(1, start=1000 + len(seen)))  # newer lines mustn't shift pages
+    expected = {("web", f"request handled {i}") for i in range(25) if str(i).startswith("1")}
+    expected |= {("api", f"request handled {i}") for i in range(3, 28) if str(i).startswith("1")}
+    assert len(seen) == len(set(seen)) and set(seen) == expected
+
+
+def test_filters_regex_dates_and_offset(store):
+    store.append("web", _entries(10, message="user {i} login failed"))
+    store.append("web", [(BASE + 86400 * SECOND, "t", "ERROR next day")])
+
+    page = store.search(LogQuery(regex=r"user [2-4] login"), limit=10)
+    assert page["total"] == 3 and page["total_is_estimate"] is True
+    assert store.search(LogQuery(end_date="2025-11-29"), limit=100)["total"] == 10
+    assert [log["message"] for log in store.search(LogQuery(start_date="2025-11-30"))["logs"]] == ["ERROR next day"]
+    assert store.search(LogQuery(query="WEB"), limit=3, offset=9)["logs"][1]["message"] == "user 0 login failed"
+    with pytest.raises(ValueError):
+        decode_cursor("garbage")
+
+
+def test_reopen_recovers_index_and_torn_writes(tmp_path):
+    s = LogSegmentStore(root=str(tmp_path), segment_bytes=2000, retention_hours=24 * 365 * 100)
+    s.open()
+    s.append("web", _entries(30))
+    active = s._segments["web"][-1].path
+    s.close()
+    with open(active, "a") as f:
+        f.write('{"t": 1, "n"')  # crash mid-write
+
+    reopened = LogSegmentStore(root=str(tmp_path), segment_bytes=2000, retention_hours=24 * 365 * 100)
+    reopened.open()
+    assert reopened.summary()["lines"] == 30
+    assert reopened.last_timestamp("web") == BASE + 29 * SECOND
+    reopened.append("web", _entries(1, start=30))
+    assert reopened.search(LogQuery(), limit=1)["logs"][0]["message"] == "request handled 30"
+    reopened.close()
+
+
+def test_retention_drops_oldest_sealed_segments(tmp_path):
+    s = LogSegmentStore(root=str(tmp_path), segment_bytes=500, max_bytes=1500, retention_hours=24 * 365 * 100)
+    s.open()
+    s.append("web", _entries(20))
+    s.append("web", _entries(20, start=20))
+    total = sum(seg.size for seg in s._segments["web"])
+    assert total <= 1500 + 500
+    assert s.search(LogQuery(), limit=1)["logs"][0]["message"] == "request handled 39"
+    s.close()
+
+
+@pytest.mark.asyncio
+async def test_ingestor_tracks_running_containers(tmp_path, monkeypatch):
+    tailed = []
+
+    async def fake_tail(self, name):
+        tailed.append(name)
+
+    monkeypatch.setattr(log_store.LogIngestor, "_tail", fake_tail)
+    ingestor = log_store.LogIngestor(LogSegmentStore(root=str(tmp_path)))
+    ingestor.sync_tailers(["web", "api"])
+    ingestor.sync_tailers(["web"])
+    assert sorted(ingestor._tailers) == ["web"]
+    await ingestor.stop()
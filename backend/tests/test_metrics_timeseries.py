@@ -0,0 +1,84 @@
+"""
+Metrics history must come from per-family sorted sets read with one range
+call (plus incremental rollups for long ranges), not one GET per 5-second
+slot; without Redis, samples live in a numeric ring buffer.
+"""
+
+import pytest
+
+from metrics_timeseries import MetricsRing, MetricsTimeSeries, blend, downsample
+
+
+def _sample(ts, cpu=10.0):
+    return {
+        "timestamp_unix": ts,
+        "cpu": {"percent": cpu, "per_cpu": [cpu, cpu * 2], "load_avg": [1.0, 0.5, 0.25]},
+        "memory": {"percent": 40.0, "used_gb": 3.2},
+        "gpu": {"available": False},
+        "docker": {"running": 3, "total": 4, "stopped": 1},
+    }
+
+
+def test_blend_is_a_running_mean_over_nested_samples():
+    mean = {}
+    for n, cpu in enumerate([10.0, 20.0, 30.0], start=1):
+        mean = blend(mean, _sample(0, cpu), n)
+    assert mean["cpu"]["percent"] == pytest.approx(20.0)
+    assert mean["cpu"]["per_cpu"] == pytest.approx([20.0, 40.0])
+    assert mean["gpu"]["available"] is False
+    assert mean["docker"]["running"] == 3
+
+
+def test_downsample_keeps_endpoints():
+    points = list(range(1000))
+    picked = downsample(points, 50)
+    assert len(picked) == 50 and picked[0] == 0 and picked[-1] == 999
+    assert downsample(points[:10], 50) == points[:10]
+
+
+def test_ring_buffer_wraps_and_round_trips_samples():
+    ring = MetricsRing(capacity=4)
+    for ts in range(100, 160, 10):
+        ring.append(_sample(ts, cpu=float(ts)))
+
+    assert len(ring) == 4
+    rows = ring.range(0, 1000)
+    assert [r["timestamp_unix"] for r in rows] == [120, 130, 140, 150]
+    assert rows[0]["cpu"]["per_cpu"] == [120.0, 240.0]
+    assert rows[0]["gpu"]["available"] is False
+    assert rows[0]["docker"]["running"] == 3 and isinstance(rows[0]["docker"]["running"], int)
+    assert [r["timestamp_unix"] for r in ring.range(125, 140)] == [130, 140]
+    assert ring.latest()["timestamp_unix"] == 150
+
+
+def test_resolution_is_the_coarsest_with_enough_points():
+    series = MetricsTimeSeries(redis_client=None, interval=5, retention_seconds=86400)
+    now = 10_000_000
+    assert series.resolution_for(now - 3600, now, 200, now) == (None, 5)
+    assert series.resolution_for(now - 86400, now, 200, now) == ("5m", 300)
+    assert series.resolution_for(now - 30 * 86400, now, 200, now) == ("1h", 3600)
+
+
+@pytest.mark.asyncio
+async def test_redis_series_range_and_rollups():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    series = MetricsTimeSeries(redis, interval=5, retention_seconds=86400)
+
+    base = 1_700_000_000 - 1_700_000_000 % 3600
+    for i in range(36):  # three minutes of samples, off the 5s grid
+        await series.append(_sample(base + i * 5 + 2, cpu=float(i)))
+
+    raw = await series.range(base, base + 180, max_points=500, now=base + 180)
+    assert len(raw) == 36, "unaligned timestamps are still found"
+    assert raw[0]["timestamp_unix"] == base + 2
+    assert raw[-1]["cpu"]["percent"] == 35.0
+
+    minutes = await redis.zrange(series.key("cpu", "1m"), 0, -1)
+    assert len(minutes) == 2, "the open third minute is not rolled up yet"
+    rolled = await series._read("1m", base, base + 180)
+    assert rolled[0]["cpu"]["percent"] == pytest.approx(5.5)
+    assert rolled[1]["timestamp_unix"] == base + 60
+
+    assert (await series.latest())["timestamp_unix"] == base + 177
+    assert len(await series.range(base, base + 180, max_points=10, now=base + 180)) == 10
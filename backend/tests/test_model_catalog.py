@@ -0,0 +1,113 @@
+"""
+The model catalog must be served from an indexed, presorted snapshot that is
+revalidated in the background (one refresh at a time, stale data served
+meanwhile) instead of re-fetching providers and re-sorting per request.
+"""
+
+import asyncio
+
+import pytest
+
+import model_catalog_api
+from model_catalog_api import CatalogIndex, ModelCatalog
+
+MODELS = [
+    {'id': 'openrouter/a', 'provider': 'openrouter', 'name': 'Zeta', 'description': 'fast vision',
+     'context_length': 8000, 'pricing': {'input': 3.0}, 'capabilities': ['text', 'vision'], 'enabled': True},
+    {'id': 'openrouter/b', 'provider': 'openrouter', 'name': 'alpha', 'description': '',
+     'context_length': 128000, 'pricing': {'input': 1.0}, 'capabilities': ['text'], 'enabled': False},
+    {'id': 'anthropic/c', 'provider': 'anthropic', 'name': 'Claude', 'description': 'Vision model',
+     'context_length': 200000, 'pricing': {'input': 2.0}, 'capabilities': ['text', 'Vision'], 'enabled': True},
+]
+
+
+def _naive(models, provider=None, search=None, capability=None, enabled=None, sort='name'):
+    out = list(models)
+    if provider:
+        out = [m for m in out if m['provider'] == provider.lower()]
+    if search:
+        out = [m for m in out if search.lower() in m['name'].lower() or search.lower() in m['description'].lower()]
+    if capability:
+        out = [m for m in out if capability.lower() in [c.lower() for c in m['capabilities']]]
+    if enabled is not None:
+        out = [m for m in out if m['enabled'] == enabled]
+    if sort == 'price':
+        out.sort(key=lambda m: m['pricing'].get('input', 0))
+    elif sort == 'context_length':
+        out.sort(key=lambda m: m['context_length'], reverse=True)
+    else:
+        out.sort(key=lambda m: m['name'].lower())
+    return out
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {'sort': 'price'},
+    {'sort': 'context_length', 'capability': 'vision'},
+    {'provider': 'OpenRouter', 'enabled': True},
+    {'search': 'vision', 'sort': 'price'},
+    {'provider': 'google'},
+])
+def test_indexed_query_matches_linear_filter(filters):
+    assert CatalogIndex(MODELS).query(**filters) == _naive(MODELS, **filters)
+
+
+def test_index_lookups():
+    index = CatalogIndex(MODELS)
+    assert index.by_id['anthropic/c']['name'] == 'Claude'
+    assert index.providers == ['anthropic', 'openrouter']
+
+
+@pytest.mark.asyncio
+async def test_stale_catalog_is_served_while_one_refresh_runs(monkeypatch):
+    fetches = []
+    release = asyncio.Event()
+
+    async def fake_fetch(pool):
+        fetches.append(1)
+        if len(fetches) > 1:
+            await release.wait()
+        return [dict(m) for m in MODELS[:len(fetches) + 1]]
+
+    monkeypatch.setattr(model_catalog_api, "fetch_all_models", fake_fetch)
+    catalog = ModelCatalog(ttl=300)
+
+    first = await asyncio.gather(*(catalog.get(None) for _ in range(5)))
+    assert len(fetches) == 1, "concurrent cold requests share one fetch"
+    assert all(index is first[0] for index in first)
+
+    catalog.invalidate()
+    stale = await asyncio.gather(*(catalog.get(None) for _ in range(5)))
+    assert all(index is first[0] for index in stale), "stale snapshot is served immediately"
+    assert len(fetches) == 2, "only one background revalidation"
+
+    release.set()
+    await catalog._flight.task
+    assert len((await catalog.get(None)).models) == 3
+
+
+@pytest.mark.asyncio
+async def test_toggle_is_visible_before_revalidation_finishes(monkeypatch):
+    release = asyncio.Event()
+    fetches = []
+
+    async def fake_fetch(pool):
+        fetches.append(1)
+        if len(fetches) > 1:
+            await release.wait()  # fetched rows predate the toggle
+        return [dict(m) for m in MODELS]
+
+    monkeypatch.setattr(model_catalog_api, "fetch_all_models", fake_fetch)
+    catalog = ModelCatalog(ttl=300)
+    await catalog.get(None)
+    catalog.invalidate(pool=object())
+
+    assert catalog.set_enabled('b', True) == 1
+    index = await catalog.get(None)
+    assert index.by_id['openrouter/b']['enabled'] is True
+    assert 'openrouter/b' in [m['id'] for m in index.query(enabled=True)]
+    assert MODELS[1]['enabled'] is False, "the previous snapshot is not mutated"
+
+    release.set()
+    await catalog._flight.task
+    assert (await catalog.get(None)).by_id['openrouter/b']['enabled'] is True
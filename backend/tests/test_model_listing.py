@@ -0,0 +1,117 @@
+"""
+The categorized model listing must be served from a shared snapshot with
+pricing precomputed per tier markup, a short-lived per-user BYOK overlay, and
+an ETag so unchanged listings can be answered with 304.
+"""
+
+import asyncio
+
+import pytest
+
+import model_listing
+from model_listing import (
+    ModelListing,
+    ModelListingSnapshot,
+    get_user_overlay,
+    invalidate_user_overlay,
+    listing_etag,
+)
+
+PROVIDER_MODELS = {
+    'openai': [{'id': 'gpt-4o', 'cost_per_1m_input': 2.5, 'cost_per_1m_output': 10.0}],
+    'other': [{'id': 'local-model'}],
+}
+
+
+class FakePricing:
+    def __init__(self):
+        self.calls = 0
+
+    def price_catalog(self, models, tier_markup):
+        self.calls += 1
+        return {(provider, model_id): {'tier_markup': tier_markup} for provider, model_id, _ in models}
+
+
+class FakeCreditSystem:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_user_tier(self, user_id):
+        self.calls += 1
+        return 'professional'
+
+
+class FakeBYOKManager:
+    def __init__(self, providers):
+        self.providers = providers
+
+    async def list_user_providers(self, user_id):
+        return self.providers
+
+
+def test_tier_pricing_is_computed_once_per_markup():
+    snapshot = ModelListingSnapshot(PROVIDER_MODELS)
+    pricing = FakePricing()
+
+    first = snapshot.priced(pricing, 60.0)
+    assert snapshot.priced(pricing, 60.0) is first
+    assert pricing.calls == 1
+
+    assert snapshot.priced(pricing, 0.0)['openai'][0]['tier_pricing'] == {'tier_markup': 0.0}
+    assert pricing.calls == 2
+    assert 'tier_pricing' not in first['other'][0], "unpriced models are left as-is"
+    assert 'tier_pricing' not in PROVIDER_MODELS['openai'][0], "base snapshot is never mutated"
+
+
+@pytest.mark.asyncio
+async def test_user_overlay_is_cached_until_invalidated():
+    invalidate_user_overlay()
+    credits = FakeCreditSystem()
+    byok = FakeBYOKManager([{'provider': 'OpenRouter', 'enabled': True}, {'provider': 'groq', 'enabled': False}])
+
+    assert await get_user_overlay('u1', credits, byok) == ('professional', frozenset({'openrouter'}))
+    await get_user_overlay('u1', credits, byok)
+    assert credits.calls == 1
+
+    byok.providers = []
+    invalidate_user_overlay('u1')
+    assert await get_user_overlay('u1', credits, byok) == ('professional', frozenset())
+    assert credits.calls == 2
+
+
+def test_etag_changes_only_with_listing_inputs():
+    snapshot = ModelListingSnapshot(PROVIDER_MODELS)
+    etag = listing_etag(snapshot, 60.0, {'openrouter', 'groq'}, {'m': 'node-a'})
+
+    assert etag.startswith('W/"')
+    assert listing_etag(ModelListingSnapshot(dict(PROVIDER_MODELS)), 60.0, ['groq', 'openrouter'], {'m': 'node-a'}) == etag
+    assert listing_etag(snapshot, 0.0, {'openrouter', 'groq'}, {'m': 'node-a'}) != etag
+    assert listing_etag(snapshot, 60.0, {'openrouter'}, {'m': 'node-a'}) != etag
+    assert listing_etag(snapshot, 60.0, {'openrouter', 'groq'}, {}) != etag
+
+
+@pytest.mark.asyncio
+async def test_stale_listing_is_served_while_one_refresh_runs(monkeypatch):
+    fetches = []
+    release = asyncio.Event()
+
+    async def fake_fetch():
+        fetches.append(1)
+        if len(fetches) > 1:
+            await release.wait()
+        return ModelListingSnapshot({'other': [{'id': f'm{len(fetches)}'}]})
+
+    monkeypatch.setattr(model_listing, "fetch_listing_snapshot", fake_fetch)
+    listing = ModelListing(ttl=300)
+
+    first = await asyncio.gather(*(listing.get() for _ in range(5)))
+    assert len(fetches) == 1, "concurrent cold requests share one fetch"
+
+    listing.invalidate()
+    stale = await asyncio.gather(*(listing.get() for _ in range(5)))
+    assert all(snapshot is first[0] for snapshot in stale), "stale snapshot is served immediately"
+    assert len(fetches) == 2, "only one background revalidation"
+
+    release.set()
+    await listing._flight.task
+    assert (await listing.get()).provider_models['other'][0]['id'] == 'm2'
@@ -0,0 +1,92 @@
+"""
+OrgCreditIntegration must borrow connections from the shared pool (and give
+them back), and cache user->org resolution and the allocation pre-check
+snapshot until a membership/allocation change invalidates them.
+"""
+
+from contextlib import asynccontextmanager
+
+import pytest
+
+import org_credit_integration
+from org_credit_integration import OrgCreditIntegration
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    async def fetchval(self, sql, *args):
+        self.db.queries.append(sql)
+        return self.db.memberships.get(args[0])
+
+    async def fetchrow(self, sql, *args):
+        self.db.queries.append(sql)
+        return self.db.allocations.get((args[0], args[1]))
+
+
+class FakePool:
+    def __init__(self):
+        self.queries = []
+        self.memberships = {}
+        self.allocations = {}
+        self.in_use = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.in_use += 1
+        try:
+            yield FakeConn(self)
+        finally:
+            self.in_use -= 1
+
+
+@pytest.fixture
+def integration(monkeypatch):
+    pool = FakePool()
+    instance = OrgCreditIntegration(pool)
+    monkeypatch.setattr(org_credit_integration, "_org_credit_integration", instance)
+    return instance, pool
+
+
+@pytest.mark.asyncio
+async def test_org_resolution_is_cached_until_membership_changes(integration):
+    instance, pool = integration
+    pool.memberships["alice"] = "org-1"
+
+    assert await instance.get_user_org_id("alice") == "org-1"
+    assert await instance.get_user_org_id("alice") == "org-1"
+    assert await instance.get_user_org_id("bob") is None
+    assert await instance.get_user_org_id("bob") is None
+    assert len(pool.queries) == 2, "one query per user, negative results cached too"
+    assert pool.in_use == 0, "pooled connections are released"
+
+    pool.memberships["bob"] = "org-2"
+    org_credit_integration.invalidate_user_org("bob")
+    assert await instance.get_user_org_id("bob") == "org-2"
+
+
+@pytest.mark.asyncio
+async def test_balance_precheck_uses_allocation_snapshot(integration):
+    instance, pool = integration
+    pool.memberships["alice"] = "org-1"
+    pool.allocations[("org-1", "alice")] = {"is_active": True, "remaining_credits": 5000, "remaining": 5000}
+
+    assert await instance.has_sufficient_org_credits("alice", 2.0) == (True, "org-1", "Sufficient credits available")
+    ok, org_id, message = await instance.has_sufficient_org_credits("alice", 6.0)
+    assert not ok and org_id == "org-1" and "Available: 5.000" in message
+    assert len(pool.queries) == 2, "membership + one allocation snapshot"
+
+    pool.allocations[("org-1", "alice")] = {"is_active": False, "remaining_credits": 5000, "remaining": 5000}
+    org_credit_integration.invalidate_org_allocation("org-1", "alice")
+    ok, _, _ = await instance.has_sufficient_org_credits("alice", 2.0)
+    assert not ok, "inactive allocations never pass"
+
+
+@pytest.mark.asyncio
+async def test_missing_allocation(integration):
+    instance, pool = integration
+    pool.memberships["carol"] = "org-1"
+    assert await instance.has_sufficient_org_credits("carol", 1.0) == (
+        False, "org-1", "No credit allocation found for user in organization"
+    )
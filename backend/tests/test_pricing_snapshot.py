@@ -0,0 +1,92 @@
+"""
+LLM pricing must come from an immutable in-memory snapshot: no database
+round trip per cost calculation, and whole catalogs priced in one call.
+"""
+
+import pytest
+
+import pricing_snapshot
+from litellm_credit_system import CreditSystem
+from pricing_snapshot import PricingSnapshot, get_pricing_snapshot, refresh_pricing_snapshot
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    async def fetch(self, query):
+        self.db.queries += 1
+        return self.db.rows
+
+
+class FakeAcquire:
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return FakeConn(self.db)
+
+    async def __aexit__(self, *a):
+        return False
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+
+@pytest.fixture(autouse=True)
+def reset_snapshot(monkeypatch):
+    monkeypatch.setattr(pricing_snapshot, "_snapshot", None)
+    monkeypatch.setattr(pricing_snapshot, "_db_pool", None)
+    monkeypatch.setattr(pricing_snapshot, "_refresh_task", None)
+
+
+@pytest.mark.asyncio
+async def test_calculate_cost_uses_snapshot_without_queries():
+    pool = FakePool([
+        {"tier_code": "starter", "llm_markup_percentage": 50},
+        {"tier_code": "legacy", "llm_markup_percentage": None},
+    ])
+    await refresh_pricing_snapshot(pool)
+    system = CreditSystem(pool, redis_client=None, metering=object())
+
+    cost = await system.calculate_cost(1000, "gpt-4o", "balanced", "starter")
+    assert cost == round(0.015 * 0.25 * 1.5, 6)
+    # Unknown and NULL-markup tiers use the hardcoded fallback
+    assert await system.calculate_cost(1000, "gpt-4o", "balanced", "professional") == round(0.015 * 0.25 * 1.6, 6)
+    assert await system.calculate_cost(1000, "gpt-4o", "balanced", "legacy") == round(0.015 * 0.25, 6)
+    assert await system.calculate_cost(1000, "qwen3.6-35b", "balanced", "starter", is_local=True) == 0.0
+    assert pool.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_swaps_snapshot_atomically():
+    pool = FakePool([{"tier_code": "starter", "llm_markup_percentage": 50}])
+    old = await refresh_pricing_snapshot(pool)
+    pool.rows = [{"tier_code": "starter", "llm_markup_percentage": 10}]
+    new = await refresh_pricing_snapshot()
+
+    assert old.tier_markup_pct("starter") == 50, "published snapshots never change"
+    assert new.tier_markup_pct("starter") == 10
+    assert get_pricing_snapshot() is new
+
+
+def test_price_catalog_matches_per_model_pricing():
+    snapshot = PricingSnapshot.from_defaults()
+    priced = snapshot.price_catalog([
+        ("openrouter", "anthropic/claude", {"pricing": {"prompt": "0.000003", "completion": "0.000015"}}),
+        ("openai", "openai/gpt", {"cost_per_1m_input": 2.5, "cost_per_1m_output": 10.0}),
+        ("openrouter", "openai/gpt", {"pricing": {"prompt": "0.000005", "completion": "0.000015"}}),
+        ("openrouter", "broken", {"pricing": {"prompt": "n/a"}}),
+    ], tier_markup=20)
+
+    assert priced[("openrouter", "anthropic/claude")]["credits_per_1k_input"] == 3.6
+    assert priced[("openrouter", "anthropic/claude")]["credits_per_1k_output"] == 18.0
+    assert priced[("openai", "openai/gpt")]["credits_per_1k_input"] == 3.0
+    assert priced[("openrouter", "openai/gpt")]["credits_per_1k_input"] == 6.0, "same id, other provider"
+    assert priced[("openrouter", "broken")]["display"] == "Pricing unavailable"
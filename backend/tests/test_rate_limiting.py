@@ -20,6 +20,7 @@ from rate_limiter import (
     rate_limit,
     check_rate_limit_manual,
     RateLimitMiddleware,
+    LocalRateLimitCache,
 )
 
 
@@ -419,6 +420,52 @@ class TestFailureScenarios:
             await limiter.initialize()
 
 
+class TestLocalPrecheck:
+    """Test the in-process pre-check in front of Redis"""
+
+    @pytest.mark.asyncio
+    async def test_rejected_key_short_circuits_redis(self, test_config):
+        """A key Redis rejected is turned away locally until retry_after"""
+        test_config.local_precheck = True
+        limiter = RateLimiter(test_config)
+        limiter.redis_client = Mock()
+        limiter._check_sliding_window = AsyncMock(return_value=(False, 5, 30))
+
+        allowed, metadata = await limiter.check_rate_limit("client1", "auth")
+        assert allowed is False
+        assert metadata["retry_after"] == 30
+
+        allowed, metadata = await limiter.check_rate_limit("client1", "auth")
+        assert allowed is False
+        assert 0 < metadata["retry_after"] <= 30
+        assert limiter._check_sliding_window.await_count == 1
+
+    def test_block_expires(self):
+        """Blocked keys are released once retry_after has passed"""
+        cache = LocalRateLimitCache(max_size=2)
+        cache.block("a", 0)
+        assert cache.retry_after("a") == 0
+
+        cache.block("b", 60)
+        cache.block("c", 60)
+        cache.block("d", 60)
+        assert cache.retry_after("b") == 0, "oldest entry evicted past max_size"
+        assert cache.retry_after("d") > 0
+
+
+class TestCategoryMatcher:
+    """Test the precompiled endpoint category matcher"""
+
+    def test_first_matching_pattern_wins(self, test_config):
+        middleware = RateLimitMiddleware(None, RateLimiter(test_config))
+        assert middleware._get_category("/api/v1/auth/login") == "auth"
+        assert middleware._get_category("/api/v1/users/123") == "admin"
+        assert middleware._get_category("/api/v1/models/foo") == "write"
+        assert middleware._get_category("/api/v1/system/status") == "read"
+        assert middleware._get_category("/health") == "health"
+        assert middleware._get_category("/static/app.js") == "read"
+
+
 # Run tests
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,103 @@
+"""
+Deterministic chat completions may be replayed from an opt-in, per-org,
+size-bounded LRU+TTL cache keyed by a canonical request hash.
+"""
+
+import response_cache
+from response_cache import ChatResponseCache, cache_key, is_deterministic, wants_bypass
+
+
+def _payload(**overrides):
+    payload = {
+        "model": "openai/gpt-4o",
+        "messages": [{"role": "user", "content": "Summarize"}],
+        "tools": [{"type": "function", "function": {"name": "f", "parameters": {"a": 1, "b": 2}}}],
+        "temperature": 0,
+        "max_tokens": 100,
+        "stream": False,
+        "user": "alice@example.com",
+        "metadata": {"power_level": "balanced"},
+    }
+    payload.update(overrides)
+    return payload
+
+
+UPSTREAM = ("OpenRouter", "https://openrouter.ai/api/v1")
+
+
+def test_key_is_canonical_and_scoped():
+    a = _payload()
+    b = _payload(user="bob@example.com", metadata={"power_level": "eco"})
+    b["tools"] = [{"function": {"parameters": {"b": 2, "a": 1}, "name": "f"}, "type": "function"}]
+
+    assert cache_key("org-1", a, *UPSTREAM) == cache_key("org-1", b, *UPSTREAM), "dict order and non-sampling fields don't matter"
+    assert cache_key("org-1", a, *UPSTREAM) != cache_key("org-2", a, *UPSTREAM), "orgs never share entries"
+    assert cache_key("org-1", a, *UPSTREAM) != cache_key("org-1", _payload(max_tokens=200), *UPSTREAM)
+
+
+
+def test_key_includes_provider_and_base_url():
+    key = cache_key("org-1", _payload(), *UPSTREAM)
+    assert key == cache_key("org-1", _payload(), "OpenRouter", "https://openrouter.ai/api/v1/")
+    assert key != cache_key("org-1", _payload(), "OpenAI", "https://openrouter.ai/api/v1")
+    assert key != cache_key("org-1", _payload(), "OpenRouter", "http://localhost:4000/v1")
+
+
+def test_only_greedy_non_streaming_requests_are_cacheable():
+    assert is_deterministic(_payload())
+    assert not is_deterministic(_payload(temperature=0.7))
+    assert not is_deterministic(_payload(stream=True))
+
+
+def test_bypass_headers():
+    assert wants_bypass({"X-Cache-Bypass": "true"})
+    assert wants_bypass({"Cache-Control": "no-cache"})
+    assert not wants_bypass({})
+
+
+def test_hits_return_fresh_copies():
+    cache = ChatResponseCache(ttl=60, max_entries=10)
+    cache.put("org-1:k", {"choices": [{"message": {"content": "hi"}}]})
+
+    first = cache.get("org-1:k")
+    first["_metadata"] = {"mutated": True}
+    assert "_metadata" not in cache.get("org-1:k")
+    assert cache.stats["hits"] == 2
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = ChatResponseCache(ttl=60, max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    cache.get("a")
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None, "least recently used entry is evicted"
+    assert cache.get("a") == {"n": 1}
+
+    small = ChatResponseCache(ttl=60, max_entries=10, max_bytes=40)
+    small.put("x", {"text": "x" * 20})
+    small.put("y", {"text": "y" * 20})
+    assert len(small) == 1 and small.get("y") is not None
+
+
+def test_expired_entries_are_not_served(monkeypatch):
+    cache = ChatResponseCache(ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache.put("k", {"n": 1})
+    now[0] += 11
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_invalidate_scope():
+    cache = ChatResponseCache(ttl=60)
+    cache.put(cache_key("org-1", _payload(), *UPSTREAM), {"n": 1})
+    cache.put(cache_key("org-2", _payload(), *UPSTREAM), {"n": 2})
+    assert cache.invalidate_scope("org-1") == 1
+    assert len(cache) == 1
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(response_cache, "LLM_RESPONSE_CACHE_ENABLED", False)
+    assert response_cache.get_response_cache() is None
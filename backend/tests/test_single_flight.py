@@ -0,0 +1,46 @@
+"""
+SingleFlight must run one refresh at a time for every caller, keep it running
+when a waiting caller is cancelled, and log (not raise) a failed refresh.
+"""
+
+import asyncio
+import logging
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_refresh():
+    calls = []
+    release = asyncio.Event()
+
+    async def refresh():
+        calls.append(1)
+        await release.wait()
+        return "fresh"
+
+    flight = SingleFlight("Test cache")
+    waiters = [asyncio.create_task(flight.wait(refresh)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flight.schedule(refresh) is flight.task and flight.running
+
+    waiters[0].cancel()
+    release.set()
+    assert await asyncio.gather(*waiters[1:]) == ["fresh", "fresh"]
+    assert calls == [1], "one refresh, and cancelling a waiter didn't cancel it"
+    assert not flight.running
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_is_logged(caplog):
+    async def broken():
+        raise RuntimeError("upstream down")
+
+    flight = SingleFlight("Test cache")
+    with caplog.at_level(logging.WARNING):
+        with pytest.raises(RuntimeError):
+            await flight.wait(broken)
+        await asyncio.sleep(0)
+    assert "Test cache refresh failed (serving previous data): upstream down" in caplog.text
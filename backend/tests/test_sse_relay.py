@@ -0,0 +1,90 @@
+"""
+Streamed completions must be relayed byte-for-byte: usage comes from a
+byte-level scan of the stream, not from json.loads on every chunk.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import sse_relay
+from sse_relay import SSEUsageScanner, relay_sse, sse_error_frame
+
+FRAMES = [
+    b'data: {"id":"1","model":"openai/gpt-4o","choices":[{"delta":{"content":"Hel"}}]}\n\n',
+    b'data: {"id":"1","model":"openai/gpt-4o","choices":[{"delta":{"content":"lo"}}],"usage":null}\n\n',
+    b'data: {"id":"1","model":"openai/gpt-4o","choices":[],"usage":{"prompt_tokens":5,"completion_tokens":2,"total_tokens":7}}\n\n',
+    b'data: [DONE]\n\n',
+]
+
+
+async def _upstream(chunks, delay=0.0):
+    for chunk in chunks:
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+async def _collect(chunks, **kwargs):
+    scanner = SSEUsageScanner()
+    out = [data async for data in relay_sse(_upstream(chunks), scanner, **kwargs)]
+    return out, scanner
+
+
+@pytest.mark.asyncio
+async def test_bytes_are_forwarded_unchanged():
+    stream = b"".join(FRAMES)
+    # Split mid-frame and mid-JSON to exercise the partial-frame buffer
+    chunks = [stream[i:i + 37] for i in range(0, len(stream), 37)]
+    out, scanner = await _collect(chunks, flush_window=0)
+
+    assert b"".join(out) == stream
+    assert scanner.total_tokens == 7
+    assert scanner.model == "openai/gpt-4o"
+    assert scanner.frames == 4
+    assert scanner.done
+
+
+def test_only_usage_frames_are_decoded(monkeypatch):
+    decoded = []
+    real_loads = json.loads
+    monkeypatch.setattr(sse_relay.json, "loads", lambda s: decoded.append(s) or real_loads(s))
+
+    scanner = SSEUsageScanner()
+    for frame in FRAMES:
+        scanner.feed(frame)
+
+    assert len(decoded) == 1, "null usage and content deltas must not be parsed"
+    assert scanner.usage["completion_tokens"] == 2
+
+
+@pytest.mark.asyncio
+async def test_small_frames_are_coalesced_within_window():
+    out, _ = await _collect(FRAMES, flush_window=0.05)
+    assert len(out) == 1
+    assert out[0] == b"".join(FRAMES)
+
+
+@pytest.mark.asyncio
+async def test_relay_stops_at_done():
+    out, scanner = await _collect(FRAMES + [b"data: {\"late\": true}\n\n"], flush_window=0)
+    assert b"late" not in b"".join(out)
+    assert scanner.done
+
+
+@pytest.mark.asyncio
+async def test_upstream_errors_propagate():
+    async def broken():
+        yield FRAMES[0]
+        raise RuntimeError("connection reset")
+
+    with pytest.raises(RuntimeError):
+        async for _ in relay_sse(broken(), SSEUsageScanner(), flush_window=0):
+            pass
+
+
+def test_error_frame_shape():
+    frame = sse_error_frame("boom", "api_error", 502)
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    assert json.loads(frame[6:]) == {"error": {"message": "boom", "type": "api_error", "code": 502}}
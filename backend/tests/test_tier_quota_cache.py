@@ -0,0 +1,166 @@
+"""
+TierQuotaCache must serve tier info without a Keycloak lookup per request and
+count API calls atomically (no lost increments under concurrency).
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import keycloak_integration
+from tier_quota_cache import TierQuotaCache
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def set(self, key, value, nx=False, ex=None):
+        self.ops.append(("set", key, value, nx))
+
+    def incr(self, key):
+        self.ops.append(("incr", key))
+
+    def sadd(self, key, member):
+        self.ops.append(("sadd", key, member))
+
+    async def execute(self):
+        results = []
+        for op in self.ops:
+            if op[0] == "set":
+                results.append(await self.redis.set(op[1], op[2], nx=op[3]))
+            elif op[0] == "incr":
+                results.append(await self.redis.incr(op[1]))
+            else:
+                results.append(await self.redis.sadd(op[1], op[2]))
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.sets = {}
+
+    async def mget(self, *keys):
+        if len(keys) == 1 and isinstance(keys[0], list):
+            keys = keys[0]
+        return [self.data.get(k) for k in keys]
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    async def decr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) - 1)
+        return int(self.data[key])
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def sadd(self, key, member):
+        self.sets.setdefault(key, set()).add(member)
+        return 1
+
+    async def spop(self, key, count):
+        members = list(self.sets.pop(key, set()))
+        return members[:count]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    lookups = []
+    today = datetime.utcnow().date().isoformat()
+
+    async def fake_tier_info(email):
+        lookups.append(email)
+        return {
+            "email": email,
+            "subscription_tier": "professional",
+            "subscription_status": "active",
+            "api_calls_used": 5,
+            "api_calls_reset_date": today,
+        }
+
+    monkeypatch.setattr(keycloak_integration, "get_user_tier_info", fake_tier_info)
+    c = TierQuotaCache(ttl=60, flush_interval=0)
+    c.redis = FakeRedis()
+    return c, lookups
+
+
+@pytest.mark.asyncio
+async def test_tier_info_cached_after_first_lookup(cache):
+    c, lookups = cache
+    first = await c.get_tier_info("a@example.com")
+    second = await c.get_tier_info("a@example.com")
+    assert first["subscription_tier"] == second["subscription_tier"] == "professional"
+    assert lookups == ["a@example.com"], "second read must come from cache"
+
+    await c.invalidate("a@example.com")
+    await c.get_tier_info("a@example.com")
+    assert len(lookups) == 2, "invalidation must force a fresh Keycloak read"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_all_counted(cache):
+    c, _ = cache
+    info = await c.get_tier_info("b@example.com")
+    counts = await asyncio.gather(*(c.record_call("b@example.com", info) for _ in range(10)))
+    # Seeded from Keycloak's 5 calls today, every concurrent increment survives
+    assert sorted(counts) == list(range(6, 16))
+    assert (await c.get_tier_info("b@example.com"))["api_calls_used"] == 15
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_counters_back(cache, monkeypatch):
+    c, _ = cache
+    writes = []
+
+    async def fake_update(email, attributes):
+        writes.append((email, attributes))
+        return True
+
+    monkeypatch.setattr(keycloak_integration, "update_user_attributes", fake_update)
+    info = await c.get_tier_info("c@example.com")
+    await c.record_call("c@example.com", info)
+
+    assert await c.flush_usage() == 1
+    assert writes[0][1]["api_calls_used"] == ["6"]
+
+
+@pytest.mark.asyncio
+async def test_flush_after_midnight_keeps_the_previous_day(cache, monkeypatch):
+    c, _ = cache
+    writes = []
+
+    async def fake_update(email, attributes):
+        writes.append((email, attributes))
+        return True
+
+    monkeypatch.setattr(keycloak_integration, "update_user_attributes", fake_update)
+    yesterday = (datetime.utcnow().date() - timedelta(days=1)).isoformat()
+    # Counted at 23:59 yesterday, flushed after UTC midnight
+    await c.redis.set(c._counter_key("d@example.com", yesterday), 42)
+    await c.redis.sadd(c._dirty_key(), c._dirty_member("d@example.com", yesterday))
+
+    assert await c.flush_usage() == 1
+    assert writes == [("d@example.com", {"api_calls_used": ["42"], "api_calls_reset_date": [yesterday]})]
+
+    # Once today's counter exists the stale day must not overwrite it
+    await c.redis.set(c._counter_key("d@example.com", yesterday), 43)
+    await c.redis.sadd(c._dirty_key(), c._dirty_member("d@example.com", yesterday))
+    info = await c.get_tier_info("d@example.com")
+    await c.record_call("d@example.com", info)
+    writes.clear()
+    await c.flush_usage()
+    assert [w[1]["api_calls_reset_date"] for w in writes] == [[datetime.utcnow().date().isoformat()]]
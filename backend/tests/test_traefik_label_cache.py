@@ -0,0 +1,159 @@
+"""
+The Traefik live views must be served from a shared container cache: one
+Docker listing fills it, container events update only the affected entry,
+and without the SDK the CLI fallback is batched and cached.
+"""
+
+import queue
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import traefik_label_cache
+from traefik_label_cache import TraefikLabelCache, build_entry
+
+
+def _labels(router, host, port="8080"):
+    return {
+        "traefik.enable": "true",
+        f"traefik.http.routers.{router}.rule": f"Host(`{host}`)",
+        f"traefik.http.routers.{router}.tls.certresolver": "letsencrypt",
+        f"traefik.http.services.{router}.loadbalancer.server.port": port,
+    }
+
+
+class FakeStream:
+    def __init__(self):
+        self.events = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self.events.put(None)
+
+
+class FakeContainers:
+    def __init__(self, containers):
+        self.containers = containers
+        self.list_calls = 0
+        self.get_calls = []
+
+    def list(self, sparse=False):
+        assert sparse
+        self.list_calls += 1
+        return [
+            SimpleNamespace(id=cid, attrs={"Names": [f"/{c['name']}"], "Labels": c["labels"]})
+            for cid, c in self.containers.items()
+        ]
+
+    def get(self, cid):
+        self.get_calls.append(cid)
+        if cid not in self.containers:
+            raise type("NotFound", (Exception,), {"status_code": 404})("gone")
+        c = self.containers[cid]
+        return SimpleNamespace(id=cid, name=c["name"], labels=c["labels"], status=c.get("status", "running"))
+
+
+class FakeClient:
+    def __init__(self, containers):
+        self.containers = FakeContainers(containers)
+        self.stream = FakeStream()
+        self.events_kwargs = None
+
+    def events(self, **kwargs):
+        self.events_kwargs = kwargs
+        return self.stream
+
+    def close(self):
+        pass
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_build_entry_requires_enable_and_definitions():
+    entry = build_entry("web", _labels("web", "web.example.com"))
+    assert entry["parsed"]["routers"]["web"]["tls"] == {"certResolver": "letsencrypt"}
+    assert entry["parsed"]["services"]["web"]["url"] == "http://web:8080"
+    assert build_entry("web", {**_labels("web", "x"), "traefik.enable": "false"}) is None
+    assert build_entry("plain", {"traefik.enable": "true"}) is None
+    assert build_entry("bad", _labels("bad", "x", port="eighty")) is None
+
+
+@pytest.mark.asyncio
+async def test_events_update_only_the_affected_container():
+    client = FakeClient({
+        "a1": {"name": "web", "labels": _labels("web", "web.example.com")},
+        "b2": {"name": "db", "labels": {"com.example": "x"}},
+    })
+    cache = TraefikLabelCache(client_factory=lambda: client)
+    try:
+        assert [c["container"] for c in await cache.containers()] == ["web"]
+        await cache.containers()
+        assert client.containers.list_calls == 1
+        assert cache.mode == "events"
+        assert _wait_for(lambda: client.events_kwargs is not None)
+        assert client.events_kwargs["filters"]["event"] == traefik_label_cache.CONTAINER_EVENTS
+
+        client.containers.containers["c3"] = {"name": "api", "labels": _labels("api", "api.example.com")}
+        client.stream.events.put({"Action": "start", "Actor": {"ID": "c3"}})
+        assert _wait_for(lambda: cache.events_applied == 1)
+        assert [c["container"] for c in await cache.containers()] == ["api", "web"]
+        assert client.containers.get_calls == ["c3"]
+
+        client.stream.events.put({"Action": "die", "Actor": {"ID": "a1"}})
+        assert _wait_for(lambda: cache.events_applied == 2)
+        assert [c["container"] for c in await cache.containers()] == ["api"]
+        assert client.containers.list_calls == 1, "events never trigger a full listing"
+        assert cache.stats()["watching"]
+    finally:
+        await cache.close()
+    assert not cache.stats()["watching"]
+
+
+def test_apply_event_drops_missing_and_stopped_containers():
+    client = FakeClient({"a1": {"name": "web", "labels": _labels("web", "w"), "status": "exited"}})
+    cache = TraefikLabelCache(client_factory=lambda: client)
+    cache._client = client
+    cache._entries = {"a1": {"container": "web"}, "z9": {"container": "old"}}
+
+    cache.apply_event({"Action": "update", "Actor": {"ID": "a1"}})
+    cache.apply_event({"status": "rename", "id": "z9"})
+    assert cache._entries == {}
+
+
+@pytest.mark.asyncio
+async def test_cli_fallback_is_batched_and_cached(monkeypatch):
+    calls = []
+
+    async def fake_run_docker(*args, check=True):
+        calls.append(args[0])
+        if args[0] == "ps":
+            return "aaa\nbbb\n"
+        return (
+            'aaa\t/web\t{"traefik.enable":"true","traefik.http.routers.web.rule":"Host(`w`)"}\n'
+            'bbb\t/db\tnull\n'
+        )
+
+    def no_sdk():
+        raise ImportError("No module named 'docker'")
+
+    monkeypatch.setattr(traefik_label_cache, "_run_docker", fake_run_docker)
+    cache = TraefikLabelCache(client_factory=no_sdk, cli_ttl=60)
+
+    assert [c["container"] for c in await cache.containers()] == ["web"]
+    await cache.containers()
+    assert calls == ["ps", "inspect"]
+    assert cache.mode == "cli"
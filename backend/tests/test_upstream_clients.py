@@ -0,0 +1,57 @@
+"""
+Upstream LLM/inference calls must share one keep-alive pool per origin and
+report how close each pool is to its connection limit.
+"""
+
+import httpx
+import pytest
+
+from upstream_clients import (
+    UpstreamClientRegistry, _MeteredTransport, _PoolStats, origin_of, upstream_timeout,
+)
+
+
+def test_one_client_per_origin():
+    registry = UpstreamClientRegistry()
+    a = registry.get("https://openrouter.ai/api/v1/chat/completions")
+    b = registry.get("https://OpenRouter.ai:443/api/v1/models")
+    c = registry.get("http://unicorn-litellm:4000/v1/chat/completions")
+    assert a is b
+    assert a is not c
+    assert origin_of("http://unicorn-litellm:4000/v1") == "http://unicorn-litellm:4000"
+
+
+def test_per_host_timeout_override(monkeypatch):
+    import upstream_clients
+    monkeypatch.setattr(upstream_clients, "UPSTREAM_TIMEOUTS", {"openrouter.ai": 90.0, "litellm:4000": 300.0})
+    assert upstream_timeout("https://openrouter.ai/api/v1", 120.0) == 90.0
+    assert upstream_timeout("http://litellm:4000/v1", 120.0) == 300.0
+    assert upstream_timeout("http://litellm:8000/v1", 120.0) == 120.0
+
+
+class SSEStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield b"data: {}\n\n"
+
+
+@pytest.mark.asyncio
+async def test_in_flight_is_released_when_body_closes():
+    stats = _PoolStats(max_connections=1)
+    transport = _MeteredTransport(
+        httpx.MockTransport(lambda request: httpx.Response(200, stream=SSEStream())),
+        "https://openrouter.ai:443", stats,
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        async with client.stream("POST", "https://openrouter.ai/api/v1/chat/completions") as response:
+            assert stats.in_flight == 1
+            await client.get("https://openrouter.ai/api/v1/models")  # pool already full
+            async for _ in response.aiter_lines():
+                pass
+        assert stats.in_flight == 0
+        assert stats.peak_in_flight == 2
+        assert stats.saturated == 1
+
+    registry = UpstreamClientRegistry()
+    registry.get("https://openrouter.ai/api/v1")
+    await registry.aclose()
+    assert registry.stats()["https://openrouter.ai:443"]["in_flight"] == 0
@@ -330,6 +330,18 @@ class TestUsageMiddleware:
         assert asyncio.run(middleware._should_track_endpoint("/api/v1/llm/models")) is False
         assert asyncio.run(middleware._should_track_endpoint("/api/v1/usage/current")) is False
         assert asyncio.run(middleware._should_track_endpoint("/api/v1/admin/users")) is False
+        assert asyncio.run(middleware._should_track_endpoint("/v1/llm/chat/completions")) is False
+
+    def test_untracked_paths_pass_straight_through(self):
+        """Requests outside /api/v1/llm/ never touch the session or the tracker"""
+        middleware = UsageTrackingMiddleware(None)
+        request = type("FakeRequest", (), {"url": type("FakeURL", (), {"path": "/api/v1/services"})()})()
+
+        async def call_next(req):
+            return "downstream"
+
+        assert asyncio.run(middleware.dispatch(request, call_next)) == "downstream"
+        assert middleware.initialized is False
 
 
 @pytest.fixture(scope="session")
@@ -0,0 +1,125 @@
+"""
+The admin user listing must come from an indexed local mirror: filters use
+the tier/role/org/date indexes, pages continue by keyset cursor, and the
+mirror syncs incrementally instead of refetching every user per page view.
+"""
+
+import pytest
+
+import user_directory
+from user_directory import UserDirectory, decode_cursor, encode_cursor, to_millis
+
+
+def _user(n, tier="trial", roles=(), org=None, enabled=True, email=None):
+    attrs = {"subscription_tier": [tier]}
+    if org:
+        attrs["org_id"] = [org]
+    return {
+        "id": f"u{n:03d}",
+        "username": f"user{n}",
+        "email": email or f"user{n}@example.com",
+        "enabled": enabled,
+        "emailVerified": n % 2 == 0,
+        "createdTimestamp": 1_700_000_000_000 + n * 1000,
+        "attributes": attrs,
+        "realmRoles": list(roles),
+    }
+
+
+@pytest.fixture
+def directory():
+    d = UserDirectory()
+    d.replace_all(
+        [_user(n, tier="professional" if n % 3 == 0 else "trial",
+               roles=("admin",) if n % 10 == 0 else (),
+               org="org-1" if n < 20 else None,
+               enabled=n != 7)
+         for n in range(50)]
+    )
+    return d
+
+
+def test_filters_use_indexes_newest_first(directory):
+    page = directory.query(tier="professional", role="admin")
+    assert [u["id"] for u in page["users"]] == ["u030", "u000"]
+    assert page["total"] == 2 and page["next_cursor"] is None
+
+    assert directory.query(org_id="org-1", status="disabled")["total"] == 1
+    assert directory.query(search="USER4")["total"] == 11  # user4, user40..49
+    assert directory.query(email_verified=True)["total"] == 25
+    assert directory.query(tier="enterprise")["total"] == 0
+
+
+def test_created_range_is_inclusive(directory):
+    base = 1_700_000_000_000
+    page = directory.query(created_from=base + 10_000, created_to=base + 12_000)
+    assert [u["id"] for u in page["users"]] == ["u012", "u011", "u010"]
+
+
+def test_keyset_pagination_walks_every_match_once(directory):
+    seen = []
+    cursor = None
+    while True:
+        page = directory.query(tier="trial", limit=7, cursor=cursor)
+        seen.extend(u["id"] for u in page["users"])
+        if not page["next_cursor"]:
+            break
+        cursor = decode_cursor(page["next_cursor"])
+    assert len(seen) == len(set(seen)) == directory.query(tier="trial")["total"]
+
+    # Offset paging still works for the existing UI
+    assert directory.query(limit=5, offset=5)["users"][0]["id"] == "u044"
+
+
+def test_cursor_round_trip_and_dates():
+    key = (-1_700_000_123_000, "abc-123")
+    assert decode_cursor(encode_cursor(key)) == key
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+    assert to_millis("2024-01-01") == 1_704_067_200_000
+    assert to_millis("2024-01-01", end_of_day=True) == 1_704_153_599_999
+
+
+def test_writes_reindex_users(directory):
+    directory.apply_attributes("u001", {"subscription_tier": ["enterprise"], "org_id": ["org-2"]})
+    assert [u["id"] for u in directory.query(tier="enterprise")["users"]] == ["u001"]
+    assert directory.query(org_id="org-2")["total"] == 1
+    assert "u001" not in {u["id"] for u in directory.query(org_id="org-1", limit=100)["users"]}
+
+    directory.remove("u030")
+    assert directory.query(role="admin")["total"] == 4
+    assert len(directory) == 49
+    assert directory.summary()["roles"]["admin"] == 4
+
+
+@pytest.mark.asyncio
+async def test_first_load_then_pending_users_are_refetched(monkeypatch):
+    loads = []
+    fetched = []
+
+    async def fake_load():
+        loads.append(1)
+        return [_user(1), _user(2)]
+
+    async def fake_token():
+        return "token"
+
+    async def fake_fetch(client, token, user_id):
+        fetched.append(user_id)
+        return None if user_id == "u002" else _user(1, roles=("admin",))
+
+    monkeypatch.setattr(user_directory, "load_users_rest", fake_load)
+    monkeypatch.setattr(user_directory, "get_admin_token", fake_token)
+    monkeypatch.setattr(user_directory, "fetch_user", fake_fetch)
+
+    d = UserDirectory(sync_interval=3600)
+    await d.ensure_fresh()
+    await d.ensure_fresh()
+    assert loads == [1] and len(d) == 2
+
+    d.mark_changed("u001")
+    d.mark_changed("u002")
+    await d.ensure_fresh()
+    assert sorted(fetched) == ["u001", "u002"]
+    assert d.query(role="admin")["total"] == 1
+    assert d.get("u002") is None
@@ -0,0 +1,135 @@
+"""
+Website checks must run concurrently over one pooled client, reuse cached TLS
+certificate results, follow jittered per-site schedules and store results in
+one batched insert.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+import website_check_engine
+from website_check_engine import (
+    CertificateCache,
+    SiteSchedule,
+    WebsiteCheckEngine,
+    insert_check_results,
+)
+
+
+def _engine(handler, **kwargs):
+    return WebsiteCheckEngine(transport=httpx.MockTransport(handler), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_checks_run_concurrently_within_limit():
+    in_flight = []
+    peak = []
+
+    async def handler(request):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        return httpx.Response(503 if request.url.host == "down.test" else 200)
+
+    engine = _engine(handler, concurrency=3, per_host=10)
+    sites = [{'id': i, 'url': f"http://site{i}.test/"} for i in range(9)]
+    sites.append({'id': 9, 'url': "http://down.test/"})
+
+    checked = await engine.check_many(sites)
+    await engine.close()
+
+    assert [w['id'] for w, _ in checked] == list(range(10)), "results keep input order"
+    assert max(peak) == 3
+    assert checked[0][1]['status'] == 'up' and checked[0][1]['status_code'] == 200
+    assert checked[9][1]['status'] == 'down'
+    assert checked[9][1]['error'] == "Unexpected status code: 503"
+
+
+@pytest.mark.asyncio
+async def test_connection_errors_mark_site_down():
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    engine = _engine(handler)
+    result = await engine.check("http://gone.test/")
+    await engine.close()
+    assert result['status'] == 'down'
+    assert result['error'].startswith("Connection failed")
+
+
+@pytest.mark.asyncio
+async def test_certificates_are_cached_per_host(monkeypatch):
+    fetches = []
+    expiry = (datetime.utcnow() + timedelta(days=60)).replace(microsecond=0)
+
+    async def fake_fetch(hostname, port=443):
+        fetches.append(hostname)
+        await asyncio.sleep(0)
+        return {"valid": True, "expiry": expiry.isoformat()}
+
+    monkeypatch.setattr(website_check_engine, "fetch_certificate", fake_fetch)
+    engine = _engine(lambda request: httpx.Response(200), certificates=CertificateCache(recheck_days=7))
+
+    results = await engine.check_many([
+        {'id': 1, 'url': "https://a.test/"},
+        {'id': 2, 'url': "https://a.test/status"},
+        {'id': 3, 'url': "https://b.test/"},
+    ])
+    await engine.check("https://a.test/")
+    await engine.close()
+
+    assert sorted(fetches) == ["a.test", "b.test"], "one inspection per host"
+    assert all(r['ssl_valid'] and r['ssl_expiry'] == expiry.isoformat() for _, r in results)
+
+
+def test_certificate_cache_expires_before_recheck_window():
+    cache = CertificateCache(recheck_days=7, max_age=10 * 86400)
+    soon = (datetime.utcnow() + timedelta(days=9)).isoformat()
+    far = (datetime.utcnow() + timedelta(days=365)).isoformat()
+    expiring = (datetime.utcnow() + timedelta(days=2)).isoformat()
+
+    assert cache._ttl_for(soon) == pytest.approx(2 * 86400, rel=0.01)
+    assert cache._ttl_for(far) == 10 * 86400
+    assert cache._ttl_for(expiring) == website_check_engine.CERT_MIN_CACHE_SECONDS
+
+
+def test_schedule_spreads_sites_and_jitters_intervals():
+    schedule = SiteSchedule(jitter=0.1)
+    sites = [{'id': i} for i in range(50)]
+    interval = lambda site: 300
+
+    assert schedule.due(sites, interval, now=0.0) == [], "first checks are spread over the jitter window"
+    due = schedule.due(sites, interval, now=30.0)
+    assert len(due) == 50
+
+    next_times = sorted(schedule._next_due.values())
+    assert 30 + 270 <= next_times[0] and next_times[-1] <= 30 + 330
+    assert len(set(next_times)) > 1
+    assert schedule.due(sites, interval, now=200.0) == []
+
+    schedule.due(sites[:10], interval, now=200.0)
+    assert len(schedule._next_due) == 10, "removed sites are forgotten"
+
+
+@pytest.mark.asyncio
+async def test_results_are_inserted_in_one_batch():
+    class FakeConn:
+        def __init__(self):
+            self.batches = []
+
+        async def executemany(self, sql, records):
+            self.batches.append(list(records))
+
+    conn = FakeConn()
+    result = {"status": "up", "status_code": 200, "response_time_ms": 12,
+              "ssl_valid": True, "ssl_expiry": "2030-01-01T00:00:00", "error": None}
+    stored = await insert_check_results(conn, [("site-1", result), ("site-2", dict(result, ssl_expiry=None))])
+
+    assert stored == 2
+    assert len(conn.batches) == 1
+    assert conn.batches[0][0] == ("site-1", "up", 200, 12, True, datetime(2030, 1, 1), None)
+    assert conn.batches[0][1][5] is None
@@ -3,8 +3,9 @@ FastAPI Tier Enforcement Middleware
 
 Enforces subscription tier limits on API endpoints by:
 1. Reading user's subscription tier from Keycloak user attributes
+   (cached in Redis, see tier_quota_cache)
 2. Checking API call limits based on tier
-3. Incrementing usage counters
+3. Incrementing usage counters (atomic Redis counters, flushed to Keycloak)
 4. Returning appropriate error responses when limits exceeded
 
 Integrates with Keycloak for user data and session management.
@@ -21,7 +22,9 @@ import json
 import asyncio
 
 # Import Keycloak integration
-from keycloak_integration import get_user_tier_info, increment_usage
+from keycloak_integration import increment_usage
+from tier_quota_cache import get_tier_quota_cache
+from request_context import get_request_context
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +73,7 @@ class TierEnforcementMiddleware(BaseHTTPMiddleware):
 
     def __init__(self, app):
         super().__init__(app)
+        self.tier_cache = get_tier_quota_cache()
         logger.info("TierEnforcementMiddleware initialized with Keycloak backend")
 
     async def dispatch(self, request: Request, call_next):
@@ -80,7 +84,7 @@ class TierEnforcementMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
 
         # Get user from session
-        user_info = self._get_user_from_request(request)
+        user_info = await self._get_user_from_request(request)
 
         if not user_info:
             # Not authenticated - let auth middleware handle it
@@ -91,9 +95,9 @@ class TierEnforcementMiddleware(BaseHTTPMiddleware):
             logger.warning("User session exists but no email found")
             return await call_next(request)
 
-        # Get user's subscription tier from Keycloak
+        # Get user's subscription tier (cached; Keycloak only on a miss)
         try:
-            tier_info = await get_user_tier_info(user_email)
+            tier_info = await self.tier_cache.get_tier_info(user_email)
         except Exception as e:
             logger.error(f"Error fetching tier info from Keycloak: {e}")
             # Allow request to proceed on error
@@ -121,10 +125,20 @@ class TierEnforcementMiddleware(BaseHTTPMiddleware):
                 }
             )
 
-        # Check API call limits
+        # Check API call limits. Count the call first with an atomic INCR so
+        # concurrent requests can't both slip under the limit or lose increments.
         tier_limit = self.TIER_LIMITS.get(tier, 100)
 
-        if tier_limit > 0 and api_calls_used >= tier_limit:
+        calls_now = await self.tier_cache.record_call(user_email, tier_info)
+        if calls_now is not None:
+            over_limit = tier_limit > 0 and calls_now > tier_limit
+            if over_limit:
+                await self.tier_cache.release_call(user_email)
+            api_calls_used = calls_now - 1
+        else:
+            over_limit = tier_limit > 0 and api_calls_used >= tier_limit
+
+        if over_limit:
             return self._create_error_response(
                 status_code=429,
                 error="rate_limit_exceeded",
@@ -137,8 +151,9 @@ class TierEnforcementMiddleware(BaseHTTPMiddleware):
                 }
             )
 
-        # Increment usage counter (fire and forget)
-        asyncio.create_task(increment_usage(user_email, api_calls_used))
+        if calls_now is None:
+            # Counter store unavailable - fall back to a direct Keycloak increment
+            asyncio.create_task(increment_usage(user_email, api_calls_used))
 
         # Add tier info to request state for use in endpoints
         request.state.tier = tier
@@ -166,19 +181,27 @@ class TierEnforcementMiddleware(BaseHTTPMiddleware):
         """Check if path is exempt from tier checking"""
         return any(path.startswith(exempt) for exempt in self.EXEMPT_PATHS)
 
-    def _get_user_from_request(self, request: Request) -> Optional[Dict]:
+    async def _get_user_from_request(self, request: Request) -> Optional[Dict]:
         """Extract user info from request session or headers"""
 
-        # Try to get from session cookie
-        session_token = request.cookies.get("session_token")
+        # LLM requests arrive with the session already resolved
+        ctx = get_request_context(request)
+        if ctx is not None:
+            if ctx.session is not None:
+                user = ctx.session_user
+                return dict(user) if user is not None else None
+        else:
+            # Try to get from session cookie
+            session_token = request.cookies.get("session_token")
 
-        if session_token:
-            # Get sessions from app state (set by main app)
-            sessions = getattr(request.app.state, "sessions", {})
-            session_data = sessions.get(session_token)
+            if session_token:
+                # Non-blocking, cached read (the sync app.state.sessions store would
+                # block the event loop on every request)
+                from redis_session import async_session_store
+                session_data = await async_session_store.get(session_token)
 
-            if session_data:
-                return session_data.get("user")
+                if session_data:
+                    return session_data.get("user")
 
         # Try to get from X-User-Email header (for API key auth)
         user_email = request.headers.get("X-User-Email")
@@ -0,0 +1,288 @@
+"""
+Tier & Quota Cache for TierEnforcementMiddleware
+
+TierEnforcementMiddleware used to call keycloak_integration.get_user_tier_info
+(an admin REST lookup by email) on every request, then fire increment_usage,
+which did a second lookup plus an attribute PUT. Throughput was bounded by
+Keycloak admin API latency, and concurrent requests lost increments because
+the counter was read-modify-write.
+
+This module keeps that state out of Keycloak's request path:
+
+- Tier info is cached in Redis for a short TTL (shared by all workers) and is
+  push-invalidated by keycloak_integration.update_user_attributes whenever a
+  subscription attribute changes (Stripe/Lago webhooks, admin edits, upgrades).
+- The daily API-call counter lives in an atomic Redis INCR key per user per
+  day, seeded from the Keycloak attribute on first use. Unflushed counters are
+  tracked in a dirty set as `email|day` members and a background task
+  periodically writes each one back for the day it was counted on (so calls
+  made just before UTC midnight are not lost when the flush runs after it) to the `api_calls_used` / `api_calls_reset_date`
+  Keycloak attributes, so the Keycloak view stays current without a PUT per call.
+
+If Redis is unavailable every method degrades to the direct Keycloak path.
+
+Configuration (env):
+    TIER_CACHE_TTL             seconds tier info is cached (default 60)
+    TIER_USAGE_FLUSH_SECONDS   counter write-back interval (default 60)
+"""
+
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "tier:"
+
+# Keycloak attributes owned by the usage counter. Writes touching ONLY these
+# (the counter write-back itself) don't invalidate cached tier info.
+COUNTER_ATTRIBUTES = {"api_calls_used", "api_calls_reset_date"}
+
+# Counter keys outlive their day by this long so a late flush can still read them
+COUNTER_KEY_TTL = 2 * 86400
+
+# Max users written back to Keycloak per flush cycle
+FLUSH_BATCH = 200
+
+
+class TierQuotaCache:
+    """Redis-backed tier info cache and atomic daily API-call counters"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.redis_url = redis_url or os.getenv(
+            "REDIS_URL",
+            f"redis://{os.getenv('REDIS_HOST', 'unicorn-redis')}:{os.getenv('REDIS_PORT', '6379')}"
+        )
+        self.ttl = ttl if ttl is not None else int(os.getenv("TIER_CACHE_TTL", "60"))
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else float(os.getenv("TIER_USAGE_FLUSH_SECONDS", "60"))
+        )
+        self.redis: Optional[aioredis.Redis] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _get_redis(self) -> aioredis.Redis:
+        if self.redis is None:
+            self.redis = aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                socket_timeout=5
+            )
+        return self.redis
+
+    @staticmethod
+    def _info_key(email: str) -> str:
+        return f"{KEY_PREFIX}info:{email.lower()}"
+
+    @staticmethod
+    def _counter_key(email: str, day: str) -> str:
+        return f"{KEY_PREFIX}calls:{email.lower()}:{day}"
+
+    @staticmethod
+    def _dirty_key() -> str:
+        return f"{KEY_PREFIX}calls:dirty"
+
+    @staticmethod
+    def _dirty_member(email: str, day: str) -> str:
+        return f"{email.lower()}|{day}"
+
+    # ------------------------------------------------------------------
+    # Tier info
+    # ------------------------------------------------------------------
+
+    async def get_tier_info(self, email: str) -> Dict[str, Any]:
+        """
+        Get tier info (same shape as keycloak_integration.get_user_tier_info),
+        served from cache when possible. `api_calls_used` reflects today's
+        Redis counter when one exists.
+        """
+        from keycloak_integration import get_user_tier_info
+
+        try:
+            redis = self._get_redis()
+            today = datetime.utcnow().date().isoformat()
+            cached, count = await redis.mget(self._info_key(email), self._counter_key(email, today))
+        except Exception as e:
+            logger.warning(f"Tier cache unavailable, reading Keycloak directly: {e}")
+            return await get_user_tier_info(email)
+
+        if cached:
+            tier_info = json.loads(cached)
+        else:
+            tier_info = await get_user_tier_info(email)
+            try:
+                await redis.set(self._info_key(email), json.dumps(tier_info), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Failed to cache tier info for {email}: {e}")
+
+        if count is not None:
+            tier_info["api_calls_used"] = int(count)
+            tier_info["api_calls_reset_date"] = today
+        elif tier_info.get("api_calls_reset_date") != today:
+            # Keycloak still holds yesterday's counter
+            tier_info["api_calls_used"] = 0
+        return tier_info
+
+    async def invalidate(self, email: str):
+        """Drop cached tier info (called on subscription attribute changes)"""
+        if not email:
+            return
+        try:
+            await self._get_redis().delete(self._info_key(email))
+        except Exception as e:
+            logger.warning(f"Failed to invalidate tier cache for {email}: {e}")
+
+    # ------------------------------------------------------------------
+    # Usage counters
+    # ------------------------------------------------------------------
+
+    async def record_call(self, email: str, tier_info: Dict[str, Any]) -> Optional[int]:
+        """
+        Atomically count one API call for today.
+
+        Returns:
+            The new daily count, or None if Redis is unavailable (caller should
+            fall back to keycloak_integration.increment_usage).
+        """
+        today = datetime.utcnow().date().isoformat()
+        seed = 0
+        if tier_info.get("api_calls_reset_date") == today:
+            seed = int(tier_info.get("api_calls_used") or 0)
+
+        key = self._counter_key(email, today)
+        try:
+            pipe = self._get_redis().pipeline(transaction=True)
+            pipe.set(key, seed, nx=True, ex=COUNTER_KEY_TTL)
+            pipe.incr(key)
+            pipe.sadd(self._dirty_key(), self._dirty_member(email, today))
+            _, count, _ = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Tier usage counter unavailable: {e}")
+            return None
+
+        self._ensure_flusher()
+        return int(count)
+
+    async def release_call(self, email: str):
+        """Undo record_call for a request that was rejected over its limit"""
+        today = datetime.utcnow().date().isoformat()
+        try:
+            await self._get_redis().decr(self._counter_key(email, today))
+        except Exception as e:
+            logger.warning(f"Failed to release tier usage for {email}: {e}")
+
+    async def reset_usage(self, email: str):
+        """Forget today's counter (keycloak_integration.reset_usage)"""
+        today = datetime.utcnow().date().isoformat()
+        try:
+            await self._get_redis().delete(self._counter_key(email, today))
+        except Exception as e:
+            logger.warning(f"Failed to reset tier usage for {email}: {e}")
+
+    def _ensure_flusher(self):
+        """Lazily start the periodic counter write-back loop (idempotent)"""
+        if self.flush_interval <= 0:
+            return
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_task = loop.create_task(self._periodic_flush())
+
+    async def _periodic_flush(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_usage()
+            except Exception as e:
+                logger.error(f"Tier usage flush failed: {e}")
+
+    async def flush_usage(self) -> int:
+        """
+        Write dirty counters back to Keycloak attributes.
+
+        Returns:
+            Number of users flushed
+        """
+        from keycloak_integration import update_user_attributes
+
+        redis = self._get_redis()
+        members = await redis.spop(self._dirty_key(), FLUSH_BATCH)
+        if not members:
+            return 0
+
+        today = datetime.utcnow().date().isoformat()
+        pending = []
+        for member in members:
+            email, _, day = member.partition("|")
+            pending.append((member, email, day or today))
+
+        # Keycloak holds a single day's counter: an earlier day's value must
+        # not overwrite a counter that has already moved on to today.
+        keys = [self._counter_key(email, day) for _, email, day in pending]
+        keys += [self._counter_key(email, today) for _, email, _ in pending]
+        values = await redis.mget(keys)
+        counts, todays = values[:len(pending)], values[len(pending):]
+
+        flushed = 0
+        for (member, email, day), count, today_count in zip(pending, counts, todays):
+            if count is None or (day != today and today_count is not None):
+                continue
+            ok = await update_user_attributes(email, {
+                "api_calls_used": [str(count)],
+                "api_calls_reset_date": [day],
+            })
+            if ok:
+                flushed += 1
+            else:
+                # Keep it dirty so the next cycle retries
+                await redis.sadd(self._dirty_key(), member)
+        logger.debug(f"Flushed tier usage counters for {flushed}/{len(members)} users")
+        return flushed
+
+    async def close(self):
+        """Flush pending counters and release the Redis connection"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        if self.redis is not None:
+            try:
+                await self.flush_usage()
+            except Exception as e:
+                logger.warning(f"Final tier usage flush failed: {e}")
+            await self.redis.close()
+            self.redis = None
+
+
+# Singleton instance
+_tier_quota_cache: Optional[TierQuotaCache] = None
+
+
+def get_tier_quota_cache() -> TierQuotaCache:
+    """
+    Get singleton instance of TierQuotaCache
+
+    Returns:
+        TierQuotaCache instance
+    """
+    global _tier_quota_cache
+    if _tier_quota_cache is None:
+        _tier_quota_cache = TierQuotaCache()
+    return _tier_quota_cache
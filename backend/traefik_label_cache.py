@@ -0,0 +1,449 @@
+"""
+Shared Docker container metadata cache for the Traefik live views.
+
+The /api/v1/traefik/live endpoints (overview, routes, services, middlewares,
+route detail, website status) each ran `docker ps` and then one
+`docker inspect` subprocess per container, synchronously inside the async
+handlers, and re-parsed every container's Traefik labels on every request.
+A dashboard refresh blocked the event loop for a few dozen process spawns.
+
+TraefikLabelCache keeps the labels and parsed routers/services/middlewares of
+every running Traefik-enabled container in memory, keyed by container ID,
+and the endpoints read from it:
+
+- With the Docker SDK, the cache is filled by one containers.list() call and
+  then kept current by a daemon thread following the Docker events stream
+  (start, stop, die, update, destroy, rename). Only the container named in
+  an event is re-read. If the stream drops, the thread reconnects with
+  backoff and resyncs fully, since events may have been missed.
+- Without the SDK (or when the socket can't be reached through it), the
+  docker CLI is used instead: `docker ps -q` plus one batched
+  `docker inspect`, run as async subprocesses. That snapshot is served for
+  TRAEFIK_LABEL_CACHE_TTL seconds and then revalidated in the background
+  while the previous one keeps being served.
+
+Environment:
+- TRAEFIK_LABEL_CACHE_TTL: snapshot lifetime in CLI fallback mode (default 15)
+- TRAEFIK_LABEL_RESYNC_SECONDS: safety full resync while following events
+  (default 900)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+TRAEFIK_LABEL_CACHE_TTL = float(os.getenv("TRAEFIK_LABEL_CACHE_TTL", "15"))
+TRAEFIK_LABEL_RESYNC_SECONDS = float(os.getenv("TRAEFIK_LABEL_RESYNC_SECONDS", "900"))
+
+CONTAINER_EVENTS = ["start", "stop", "die", "update", "destroy", "rename"]
+REMOVAL_EVENTS = {"stop", "die", "destroy"}
+LISTED_STATES = {"running", "paused", "restarting"}  # what `docker ps` shows
+MAX_RECONNECT_BACKOFF = 60.0
+
+
+def parse_traefik_labels(container_name: str, labels: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Parse Traefik labels from a container.
+
+    Args:
+        container_name: Name of the container
+        labels: Docker labels dictionary
+
+    Returns:
+        Dictionary with parsed routers, services, and middlewares
+    """
+    routers = {}
+    services = {}
+    middlewares = {}
+
+    # Parse router labels
+    router_names = set()
+    for key in labels.keys():
+        if key.startswith("traefik.http.routers."):
+            parts = key.split(".")
+            if len(parts) >= 4:
+                router_name = parts[3]
+                router_names.add(router_name)
+
+    # Extract router configurations
+    for router_name in router_names:
+        router_config = {
+            "name": router_name,
+            "container": container_name,
+            "entrypoints": [],
+            "middlewares": []
+        }
+
+        # Get all properties for this router
+        for key, value in labels.items():
+            if key.startswith(f"traefik.http.routers.{router_name}."):
+                prop = key.split(".")[-1]
+
+                if prop == "rule":
+                    router_config["rule"] = value
+                elif prop == "service":
+                    router_config["service"] = value
+                elif prop == "entrypoints":
+                    router_config["entrypoints"] = value.split(",")
+                elif prop == "middlewares":
+                    router_config["middlewares"] = value.split(",")
+                elif prop == "priority":
+                    router_config["priority"] = int(value)
+                elif prop == "tls":
+                    if value.lower() in ("true", "1"):
+                        router_config["tls"] = {"enabled": True}
+                elif prop == "certresolver":
+                    if "tls" not in router_config:
+                        router_config["tls"] = {}
+                    router_config["tls"]["certResolver"] = value
+
+        # Only include routers with at least a rule
+        if "rule" in router_config:
+            routers[router_name] = router_config
+
+    # Parse service labels
+    service_names = set()
+    for key in labels.keys():
+        if key.startswith("traefik.http.services."):
+            parts = key.split(".")
+            if len(parts) >= 4:
+                service_name = parts[3]
+                service_names.add(service_name)
+
+    # Extract service configurations
+    for service_name in service_names:
+        service_config = {
+            "name": service_name,
+            "container": container_name
+        }
+
+        for key, value in labels.items():
+            if key.startswith(f"traefik.http.services.{service_name}."):
+                if "loadbalancer.server.port" in key:
+                    service_config["port"] = int(value)
+                    service_config["url"] = f"http://{container_name}:{value}"
+                elif "loadbalancer" in key:
+                    if "loadBalancer" not in service_config:
+                        service_config["loadBalancer"] = {}
+                    # Parse loadbalancer config
+                    prop = key.split(".")[-1]
+                    service_config["loadBalancer"][prop] = value
+
+        if "url" in service_config:
+            services[service_name] = service_config
+
+    # Parse middleware labels
+    middleware_names = set()
+    for key in labels.keys():
+        if key.startswith("traefik.http.middlewares."):
+            parts = key.split(".")
+            if len(parts) >= 4:
+                middleware_name = parts[3]
+                middleware_names.add(middleware_name)
+
+    # Extract middleware configurations
+    for middleware_name in middleware_names:
+        middleware_config = {
+            "name": middleware_name,
+            "config": {}
+        }
+
+        # Determine middleware type
+        middleware_type = None
+        for key in labels.keys():
+            if key.startswith(f"traefik.http.middlewares.{middleware_name}."):
+                parts = key.split(".")
+                if len(parts) >= 5:
+                    middleware_type = parts[4]
+                    break
+
+        if middleware_type:
+            middleware_config["type"] = middleware_type
+
+            # Get all config for this middleware
+            for key, value in labels.items():
+                if key.startswith(f"traefik.http.middlewares.{middleware_name}.{middleware_type}."):
+                    prop = key.split(".")[-1]
+                    middleware_config["config"][prop] = value
+
+            middlewares[middleware_name] = middleware_config
+
+    return {
+        "routers": routers,
+        "services": services,
+        "middlewares": middlewares
+    }
+
+
+def build_entry(container_name: str, labels: Optional[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+    """Parse one container; None unless it is Traefik-enabled and defines something."""
+    labels = labels or {}
+    if labels.get("traefik.enable") not in ("true", "True", "1"):
+        return None
+    try:
+        parsed = parse_traefik_labels(container_name, labels)
+    except ValueError as e:
+        logger.warning(f"Failed to parse Traefik labels for {container_name}: {e}")
+        return None
+    if not (parsed["routers"] or parsed["services"] or parsed["middlewares"]):
+        return None
+    return {"container": container_name, "labels": labels, "parsed": parsed}
+
+
+def docker_client():
+    """Connect to the local Docker daemon through the SDK (raises if unavailable)."""
+    import docker
+
+    try:
+        client = docker.from_env()
+    except Exception:
+        client = docker.DockerClient(base_url="unix://var/run/docker.sock")
+    client.ping()
+    return client
+
+
+async def _run_docker(*args: str, check: bool = True) -> str:
+    process = await asyncio.create_subprocess_exec(
+        "docker", *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if check and process.returncode != 0:
+        raise RuntimeError(f"docker {args[0]} failed: {stderr.decode(errors='replace').strip()}")
+    return stdout.decode(errors="replace")
+
+
+async def load_containers_cli() -> Dict[str, Dict[str, Any]]:
+    """CLI fallback: one `docker ps` and one batched `docker inspect`, off the event loop."""
+    ids = (await _run_docker("ps", "-q", "--no-trunc")).split()
+    if not ids:
+        return {}
+
+    # A container can go away between ps and inspect; inspect then exits
+    # non-zero but still prints the others.
+    output = await _run_docker(
+        "inspect", "--format", "{{.Id}}\t{{.Name}}\t{{json .Config.Labels}}", *ids, check=False
+    )
+    entries = {}
+    for line in output.splitlines():
+        parts = line.split("\t", 2)
+        if len(parts) != 3:
+            continue
+        container_id, name, raw_labels = parts
+        try:
+            labels = json.loads(raw_labels)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to parse labels for {name}: {e}")
+            continue
+        entry = build_entry(name.lstrip("/"), labels)
+        if entry:
+            entries[container_id] = entry
+    return entries
+
+
+class TraefikLabelCache:
+    """In-memory Traefik view of the running containers, fed by Docker events"""
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = docker_client,
+        cli_ttl: float = TRAEFIK_LABEL_CACHE_TTL,
+        resync_seconds: float = TRAEFIK_LABEL_RESYNC_SECONDS,
+    ):
+        self.client_factory = client_factory
+        self.cli_ttl = cli_ttl
+        self.resync_seconds = resync_seconds
+        self.mode: Optional[str] = None  # "events" or "cli" once loaded
+        self.loaded_at = 0.0
+        self.events_applied = 0
+        self.reconnects = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._client = None
+        self._stream = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._flight = SingleFlight("Traefik label cache", logger)
+        self._sdk_warned = False
+
+    async def containers(self) -> List[Dict[str, Any]]:
+        """Traefik-enabled containers sorted by name; only the first load waits on Docker."""
+        if self.mode is None:
+            await self._flight.wait(self._load)
+        elif self._is_stale():
+            self._flight.schedule(self._load)
+        with self._lock:
+            entries = list(self._entries.values())
+        return sorted(entries, key=lambda entry: entry["container"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = len(self._entries)
+        return {
+            "mode": self.mode,
+            "containers": count,
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "watching": self._watching(),
+            "events_applied": self.events_applied,
+            "reconnects": self.reconnects,
+        }
+
+    async def close(self) -> None:
+        self._stopping.set()
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        if self._watcher is not None:
+            await asyncio.to_thread(self._watcher.join, 5)
+            self._watcher = None
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _watching(self) -> bool:
+        return self._watcher is not None and self._watcher.is_alive()
+
+    def _is_stale(self) -> bool:
+        age = time.time() - self.loaded_at
+        if self.mode == "events" and self._watching():
+            return age >= self.resync_seconds
+        return age >= self.cli_ttl
+
+    async def _load(self) -> None:
+        started = time.time()
+        if self._client is None:
+            try:
+                self._client = await asyncio.to_thread(self.client_factory)
+            except Exception as e:
+                if not self._sdk_warned:
+                    logger.info(f"Docker SDK unavailable, reading Traefik labels through the docker CLI: {e}")
+                    self._sdk_warned = True
+
+        if self._client is None:
+            entries = await load_containers_cli()
+            self._replace(entries, started)
+            self.mode = "cli"
+            return
+
+        entries = await asyncio.to_thread(self._list_sdk)
+        self._replace(entries, started)
+        self.mode = "events"
+        if not self._watching() and not self._stopping.is_set():
+            self._watcher = threading.Thread(
+                target=self._watch, args=(int(started),), name="traefik-label-events", daemon=True
+            )
+            self._watcher.start()
+
+    def _list_sdk(self) -> Dict[str, Dict[str, Any]]:
+        # sparse=True: one /containers/json call, whose rows already carry labels
+        entries = {}
+        for container in self._client.containers.list(sparse=True):
+            attrs = container.attrs
+            names = attrs.get("Names") or [container.id[:12]]
+            entry = build_entry(names[0].lstrip("/"), attrs.get("Labels"))
+            if entry:
+                entries[container.id] = entry
+        return entries
+
+    def _replace(self, entries: Dict[str, Dict[str, Any]], loaded_at: float) -> None:
+        with self._lock:
+            self._entries = entries
+        self.loaded_at = loaded_at
+
+    # ------------------------------------------------------------------
+    # Events feed (runs in the watcher thread)
+    # ------------------------------------------------------------------
+
+    def _watch(self, since: int) -> None:
+        backoff = 1.0
+        while not self._stopping.is_set():
+            try:
+                # `since` replays anything that happened after the last full list
+                self._stream = self._client.events(
+                    decode=True,
+                    since=since,
+                    filters={"type": "container", "event": CONTAINER_EVENTS},
+                )
+                backoff = 1.0
+                for event in self._stream:
+                    self.apply_event(event)
+                if self._stopping.is_set():
+                    break
+                logger.warning("Docker events stream ended, reconnecting")
+            except Exception as e:
+                if self._stopping.is_set():
+                    break
+                logger.warning(f"Docker events stream failed, reconnecting in {backoff:.0f}s: {e}")
+
+            if self._stopping.wait(backoff):
+                break
+            backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF)
+            self.reconnects += 1
+            try:
+                started = time.time()
+                self._replace(self._list_sdk(), started)
+                since = int(started)
+            except Exception as e:
+                logger.warning(f"Traefik label resync failed: {e}")
+
+    def apply_event(self, event: Dict[str, Any]) -> None:
+        """Apply one Docker container event to the cache."""
+        action = event.get("Action") or event.get("status") or ""
+        container_id = (event.get("Actor") or {}).get("ID") or event.get("id")
+        if not container_id:
+            return
+        self.events_applied += 1
+
+        if action in REMOVAL_EVENTS:
+            self._drop(container_id)
+            return
+
+        # start / update / rename: re-read just this container
+        try:
+            container = self._client.containers.get(container_id)
+        except Exception as e:
+            if getattr(e, "status_code", None) == 404:
+                self._drop(container_id)
+            else:
+                logger.warning(f"Failed to inspect container {container_id[:12]}: {e}")
+            return
+
+        entry = None
+        if container.status in LISTED_STATES:
+            entry = build_entry(container.name, container.labels)
+        if entry is None:
+            self._drop(container_id)
+        else:
+            with self._lock:
+                self._entries[container_id] = entry
+
+    def _drop(self, container_id: str) -> None:
+        with self._lock:
+            self._entries.pop(container_id, None)
+
+
+_traefik_label_cache = TraefikLabelCache()
+
+
+def get_traefik_label_cache() -> TraefikLabelCache:
+    """Get the process-wide Traefik label cache"""
+    return _traefik_label_cache
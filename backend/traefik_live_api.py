@@ -13,11 +13,11 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import subprocess
-import json
 import logging
 import re
 
+from traefik_label_cache import get_traefik_label_cache
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/traefik/live", tags=["Traefik Live Data"])
@@ -63,197 +63,6 @@ class TraefikOverview(BaseModel):
     timestamp: str
 
 
-def parse_traefik_labels(container_name: str, labels: Dict[str, str]) -> Dict[str, Any]:
-    """
-    Parse Traefik labels from a container.
-
-    Args:
-        container_name: Name of the container
-        labels: Docker labels dictionary
-
-    Returns:
-        Dictionary with parsed routers, services, and middlewares
-    """
-    routers = {}
-    services = {}
-    middlewares = {}
-
-    # Parse router labels
-    router_names = set()
-    for key in labels.keys():
-        if key.startswith("traefik.http.routers."):
-            parts = key.split(".")
-            if len(parts) >= 4:
-                router_name = parts[3]
-                router_names.add(router_name)
-
-    # Extract router configurations
-    for router_name in router_names:
-        router_config = {
-            "name": router_name,
-            "container": container_name,
-            "entrypoints": [],
-            "middlewares": []
-        }
-
-        # Get all properties for this router
-        for key, value in labels.items():
-            if key.startswith(f"traefik.http.routers.{router_name}."):
-                prop = key.split(".")[-1]
-
-                if prop == "rule":
-                    router_config["rule"] = value
-                elif prop == "service":
-                    router_config["service"] = value
-                elif prop == "entrypoints":
-                    router_config["entrypoints"] = value.split(",")
-                elif prop == "middlewares":
-                    router_config["middlewares"] = value.split(",")
-                elif prop == "priority":
-                    router_config["priority"] = int(value)
-                elif prop == "tls":
-                    if value.lower() in ("true", "1"):
-                        router_config["tls"] = {"enabled": True}
-                elif prop == "certresolver":
-                    if "tls" not in router_config:
-                        router_config["tls"] = {}
-                    router_config["tls"]["certResolver"] = value
-
-        # Only include routers with at least a rule
-        if "rule" in router_config:
-            routers[router_name] = router_config
-
-    # Parse service labels
-    service_names = set()
-    for key in labels.keys():
-        if key.startswith("traefik.http.services."):
-            parts = key.split(".")
-            if len(parts) >= 4:
-                service_name = parts[3]
-                service_names.add(service_name)
-
-    # Extract service configurations
-    for service_name in service_names:
-        service_config = {
-            "name": service_name,
-            "container": container_name
-        }
-
-        for key, value in labels.items():
-            if key.startswith(f"traefik.http.services.{service_name}."):
-                if "loadbalancer.server.port" in key:
-                    service_config["port"] = int(value)
-                    service_config["url"] = f"http://{container_name}:{value}"
-                elif "loadbalancer" in key:
-                    if "loadBalancer" not in service_config:
-                        service_config["loadBalancer"] = {}
-                    # Parse loadbalancer config
-                    prop = key.split(".")[-1]
-                    service_config["loadBalancer"][prop] = value
-
-        if "url" in service_config:
-            services[service_name] = service_config
-
-    # Parse middleware labels
-    middleware_names = set()
-    for key in labels.keys():
-        if key.startswith("traefik.http.middlewares."):
-            parts = key.split(".")
-            if len(parts) >= 4:
-                middleware_name = parts[3]
-                middleware_names.add(middleware_name)
-
-    # Extract middleware configurations
-    for middleware_name in middleware_names:
-        middleware_config = {
-            "name": middleware_name,
-            "config": {}
-        }
-
-        # Determine middleware type
-        middleware_type = None
-        for key in labels.keys():
-            if key.startswith(f"traefik.http.middlewares.{middleware_name}."):
-                parts = key.split(".")
-                if len(parts) >= 5:
-                    middleware_type = parts[4]
-                    break
-
-        if middleware_type:
-            middleware_config["type"] = middleware_type
-
-            # Get all config for this middleware
-            for key, value in labels.items():
-                if key.startswith(f"traefik.http.middlewares.{middleware_name}.{middleware_type}."):
-                    prop = key.split(".")[-1]
-                    middleware_config["config"][prop] = value
-
-            middlewares[middleware_name] = middleware_config
-
-    return {
-        "routers": routers,
-        "services": services,
-        "middlewares": middlewares
-    }
-
-
-def get_docker_containers_with_traefik() -> List[Dict[str, Any]]:
-    """
-    Get all Docker containers with Traefik labels.
-
-    Returns:
-        List of containers with their Traefik configurations
-    """
-    try:
-        # Get all running containers
-        result = subprocess.run(
-            ["docker", "ps", "--format", "{{.Names}}"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-
-        container_names = [name.strip() for name in result.stdout.split("\n") if name.strip()]
-
-        containers_data = []
-
-        for container_name in container_names:
-            try:
-                # Get container labels
-                result = subprocess.run(
-                    ["docker", "inspect", container_name, "--format", "{{json .Config.Labels}}"],
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-
-                labels = json.loads(result.stdout.strip())
-
-                # Check if container has Traefik labels
-                has_traefik = any(key.startswith("traefik") for key in labels.keys())
-
-                if has_traefik and labels.get("traefik.enable") in ("true", "True", "1"):
-                    parsed = parse_traefik_labels(container_name, labels)
-                    if parsed["routers"] or parsed["services"] or parsed["middlewares"]:
-                        containers_data.append({
-                            "container": container_name,
-                            "labels": labels,
-                            "parsed": parsed
-                        })
-            except subprocess.CalledProcessError as e:
-                logger.warning(f"Failed to inspect container {container_name}: {e}")
-                continue
-            except json.JSONDecodeError as e:
-                logger.warning(f"Failed to parse labels for {container_name}: {e}")
-                continue
-
-        return containers_data
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to list Docker containers: {e}")
-        raise HTTPException(status_code=500, detail="Failed to query Docker containers")
-
-
 @router.get("/overview", response_model=TraefikOverview)
 async def get_live_overview():
     """
@@ -263,7 +72,7 @@ async def get_live_overview():
         Overview with route, service, and middleware counts
     """
     try:
-        containers_data = get_docker_containers_with_traefik()
+        containers_data = await get_traefik_label_cache().containers()
 
         total_routes = 0
         total_services = 0
@@ -308,7 +117,7 @@ async def get_live_routes():
         List of active routes with full configuration
     """
     try:
-        containers_data = get_docker_containers_with_traefik()
+        containers_data = await get_traefik_label_cache().containers()
 
         routes = []
 
@@ -347,7 +156,7 @@ async def get_live_services():
         List of active services
     """
     try:
-        containers_data = get_docker_containers_with_traefik()
+        containers_data = await get_traefik_label_cache().containers()
 
         services = []
 
@@ -382,7 +191,7 @@ async def get_live_middlewares():
         List of active middlewares
     """
     try:
-        containers_data = get_docker_containers_with_traefik()
+        containers_data = await get_traefik_label_cache().containers()
 
         middlewares = []
 
@@ -418,7 +227,7 @@ async def get_live_route_detail(route_name: str):
         Detailed route information
     """
     try:
-        containers_data = get_docker_containers_with_traefik()
+        containers_data = await get_traefik_label_cache().containers()
 
         for container in containers_data:
             parsed = container["parsed"]
@@ -456,6 +265,7 @@ async def health_check():
         "status": "healthy",
         "service": "traefik-live-data-api",
         "version": "1.0.0",
+        "label_cache": get_traefik_label_cache().stats(),
         "timestamp": datetime.utcnow().isoformat()
     }
 
@@ -481,7 +291,7 @@ async def get_website_status():
     import httpx
     import asyncio
 
-    containers_data = get_docker_containers_with_traefik()
+    containers_data = await get_traefik_label_cache().containers()
 
     # Extract unique domains from routes
     domains = set()
@@ -18,6 +18,7 @@ Author: Backend API Developer
 Date: November 3, 2025
 """
 
+import asyncio
 import logging
 import secrets
 import bcrypt
@@ -152,6 +153,15 @@ def verify_api_key(api_key: str, key_hash: str) -> bool:
         return False
 
 
+def _invalidate_cached_key(key_id: str) -> None:
+    """Drop the validator's cached verification for a revoked/rotated key"""
+    try:
+        from api_key_manager import get_api_key_manager
+        get_api_key_manager().invalidate_key_cache(key_id=str(key_id))
+    except RuntimeError:
+        pass  # validator not initialized in this process - nothing cached
+
+
 def mask_api_key(full_key: str) -> str:
     """
     Mask API key for display
@@ -213,7 +223,7 @@ async def create_uc_api_key(
 
         # Generate API key
         api_key, prefix = generate_uc_api_key()
-        key_hash = hash_api_key(api_key)
+        key_hash = await asyncio.to_thread(hash_api_key, api_key)
 
         # Calculate expiration
         expires_at = datetime.utcnow() + timedelta(days=key_request.expires_in_days)
@@ -334,6 +344,7 @@ async def revoke_uc_api_key(
         if result == "UPDATE 0":
             raise HTTPException(status_code=404, detail="API key not found")
 
+        _invalidate_cached_key(key_id)
         logger.info(f"Revoked UC API key {key_id} for user {user_id}")
 
         return {
@@ -390,7 +401,7 @@ async def regenerate_uc_api_key(
 
         # Same creation pathway as the create endpoint: random secret + bcrypt
         api_key, prefix = generate_uc_api_key()
-        key_hash = hash_api_key(api_key)
+        key_hash = await asyncio.to_thread(hash_api_key, api_key)
         expires_at = datetime.utcnow() + timedelta(days=key_request.expires_in_days)
 
         async with db_pool.acquire() as conn:
@@ -421,6 +432,7 @@ async def regenerate_uc_api_key(
         if not result:
             raise HTTPException(status_code=404, detail="API key not found")
 
+        _invalidate_cached_key(key_id)
         permissions = result["permissions"]
         if isinstance(permissions, str):
             permissions = json.loads(permissions)
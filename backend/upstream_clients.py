@@ -0,0 +1,257 @@
+"""
+Shared HTTP client pools for upstream LLM, inference and federation calls.
+
+Opening an httpx.AsyncClient per request costs a fresh TCP + TLS handshake to
+OpenRouter, LiteLLM or the peer node every time, which is a large share of
+time-to-first-token for short completions. The registry keeps one pooled,
+keep-alive client per upstream origin (scheme://host:port) for the life of
+the process and closes them on shutdown.
+
+Usage:
+    client = get_upstream_client(base_url)
+    response = await client.post(url, json=body, timeout=upstream_timeout(url, 120.0))
+
+Configuration (environment):
+    UPSTREAM_MAX_CONNECTIONS    connections per origin (default 100)
+    UPSTREAM_MAX_KEEPALIVE      idle keep-alive connections per origin (default 20)
+    UPSTREAM_KEEPALIVE_EXPIRY   seconds an idle connection is kept (default 30)
+    UPSTREAM_HTTP2              negotiate HTTP/2 on https origins when the
+                                h2 package is installed (default true)
+    UPSTREAM_TIMEOUTS           per-host timeout overrides in seconds,
+                                e.g. "openrouter.ai=90,litellm:4000=300"
+
+Pool saturation (requests in flight vs. the connection limit, peaks and how
+often a request had to queue for a connection) is reported by
+`get_upstream_registry().stats()` and, when prometheus_client is installed,
+the ops_center_upstream_* metrics.
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+DEFAULT_TIMEOUT = 120.0
+
+try:
+    import h2  # noqa: F401 - httpx needs it for http2=True
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    from prometheus_client import Counter, Gauge
+    _IN_FLIGHT = Gauge(
+        'ops_center_upstream_requests_in_flight',
+        'Upstream HTTP requests holding a pooled connection',
+        ['origin']
+    )
+    _SATURATED = Counter(
+        'ops_center_upstream_pool_saturated_total',
+        'Upstream requests started with every pooled connection in use',
+        ['origin']
+    )
+except Exception:  # not installed, or already registered on reload
+    _IN_FLIGHT = None
+    _SATURATED = None
+
+
+def _parse_timeouts(raw: str) -> Dict[str, float]:
+    timeouts = {}
+    for item in raw.split(","):
+        host, _, seconds = item.strip().partition("=")
+        if not host or not seconds:
+            continue
+        try:
+            timeouts[host.strip().lower()] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid UPSTREAM_TIMEOUTS entry: {item}")
+    return timeouts
+
+
+UPSTREAM_TIMEOUTS = _parse_timeouts(os.getenv("UPSTREAM_TIMEOUTS", ""))
+
+
+def origin_of(url: str) -> str:
+    """scheme://host:port for a URL (the pooling key)"""
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{(parts.hostname or '').lower()}:{port}"
+
+
+def upstream_timeout(url: str, default: float) -> float:
+    """Configured timeout for the URL's host (or host:port), else *default*"""
+    if not UPSTREAM_TIMEOUTS:
+        return default
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.port and f"{host}:{parts.port}" in UPSTREAM_TIMEOUTS:
+        return UPSTREAM_TIMEOUTS[f"{host}:{parts.port}"]
+    return UPSTREAM_TIMEOUTS.get(host, default)
+
+
+class _PoolStats:
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated = 0
+
+
+class _MeteredStream(httpx.AsyncByteStream):
+    """Response body wrapper that releases the in-flight slot when closed"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _MeteredTransport(httpx.AsyncBaseTransport):
+    """Counts requests holding a connection, from send until the body is closed"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, origin: str, stats: _PoolStats):
+        self._transport = transport
+        self._origin = origin
+        self._stats = stats
+
+    def _acquire(self):
+        stats = self._stats
+        if stats.in_flight >= stats.max_connections:
+            stats.saturated += 1
+            if _SATURATED is not None:
+                _SATURATED.labels(origin=self._origin).inc()
+        stats.in_flight += 1
+        stats.requests += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        if _IN_FLIGHT is not None:
+            _IN_FLIGHT.labels(origin=self._origin).set(stats.in_flight)
+
+    def _release(self):
+        self._stats.in_flight -= 1
+        if _IN_FLIGHT is not None:
+            _IN_FLIGHT.labels(origin=self._origin).set(self._stats.in_flight)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._release()
+            raise
+
+        released = False
+
+        def release_once():
+            nonlocal released
+            if not released:
+                released = True
+                self._release()
+
+        response.stream = _MeteredStream(response.stream, release_once)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class UpstreamClientRegistry:
+    """One pooled keep-alive AsyncClient per upstream origin"""
+
+    def __init__(
+        self,
+        max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive: int = UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry: float = UPSTREAM_KEEPALIVE_EXPIRY,
+        http2: bool = UPSTREAM_HTTP2,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _PoolStats] = {}
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        """Shared client for the URL's origin; pass per-request timeouts"""
+        origin = origin_of(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            # HTTP/2 is only negotiated over TLS (ALPN)
+            http2 = self.http2 and origin.startswith("https://")
+            stats = self._stats.setdefault(origin, _PoolStats(self.limits.max_connections))
+            transport = httpx.AsyncHTTPTransport(limits=self.limits, http2=http2)
+            client = httpx.AsyncClient(
+                transport=_MeteredTransport(transport, origin, stats),
+                timeout=upstream_timeout(url, DEFAULT_TIMEOUT),
+            )
+            self._clients[origin] = client
+            logger.info(f"Upstream pool opened for {origin} (http2={http2}, max={self.limits.max_connections})")
+        return client
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-origin pool usage for health and metrics endpoints"""
+        return {
+            origin: {
+                "in_flight": s.in_flight,
+                "peak_in_flight": s.peak_in_flight,
+                "max_connections": s.max_connections,
+                "requests": s.requests,
+                "saturated": s.saturated,
+            }
+            for origin, s in self._stats.items()
+        }
+
+    async def aclose(self):
+        """Close every pooled client (application shutdown)"""
+        clients, self._clients = self._clients, {}
+        for origin, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing upstream pool for {origin}: {e}")
+        if clients:
+            logger.info(f"Closed {len(clients)} upstream connection pools")
+
+
+_registry: Optional[UpstreamClientRegistry] = None
+
+
+def get_upstream_registry() -> UpstreamClientRegistry:
+    """Get the process-wide upstream client registry"""
+    global _registry
+    if _registry is None:
+        _registry = UpstreamClientRegistry()
+    return _registry
+
+
+def get_upstream_client(url: str) -> httpx.AsyncClient:
+    """Shared pooled client for *url*'s origin"""
+    return get_upstream_registry().get(url)
+
+
+async def close_upstream_clients():
+    """Close all upstream pools; safe to call when none were opened"""
+    if _registry is not None:
+        await _registry.aclose()
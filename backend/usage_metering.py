@@ -10,6 +10,7 @@ Date: October 23, 2025
 """
 
 import asyncpg
+from database.pool_manager import get_budget_pool
 import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
@@ -74,15 +75,7 @@ class UsageMeter:
             return
 
         try:
-            self.db_pool = await asyncpg.create_pool(
-                host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-                port=int(os.getenv("POSTGRES_PORT", 5432)),
-                user=os.getenv("POSTGRES_USER", "unicorn"),
-                password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-                database=os.getenv("POSTGRES_DB", "unicorn_db"),
-                min_size=5,
-                max_size=20
-            )
+            self.db_pool = get_budget_pool("background")
             logger.info("UsageMeter database pool initialized")
         except Exception as e:
             logger.error(f"Failed to initialize database pool: {e}")
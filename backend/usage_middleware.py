@@ -43,6 +43,10 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
     - /api/v1/llm/* (any other LLM endpoints)
     """
 
+    # Cheap first check; only these paths reach the regexes, the session read
+    # and the usage tracker
+    PATH_PREFIXES = ("/api/v1/llm/",)
+
     # Endpoints to track (regex patterns)
     TRACKED_ENDPOINTS = [
         r"^/api/v1/llm/chat/completions",
@@ -72,6 +76,9 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
 
     async def _should_track_endpoint(self, path: str) -> bool:
         """Check if endpoint should be tracked"""
+        if not path.startswith(self.PATH_PREFIXES):
+            return False
+
         # Check exclusions first
         for pattern in self.EXCLUDED_ENDPOINTS:
             if re.match(pattern, path):
@@ -89,24 +96,18 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
         try:
             # Add /app to path for imports
             import sys
-            import os
             if '/app' not in sys.path:
                 sys.path.insert(0, '/app')
 
-            from redis_session import RedisSessionManager
+            from request_context import resolve_request_context
 
-            session_token = request.cookies.get("session_token")
-            if not session_token:
+            # Shared per-request context: the session is read once for the
+            # whole middleware stack
+            ctx = await resolve_request_context(request)
+            if ctx.session is None:
                 return None
 
-            redis_host = os.getenv("REDIS_HOST", "unicorn-redis")
-            redis_port = int(os.getenv("REDIS_PORT", "6379"))
-
-            sessions = RedisSessionManager(host=redis_host, port=redis_port, password=os.getenv("REDIS_PASSWORD"))
-            user_data = sessions.get(session_token)
-
-            if not user_data:
-                return None
+            user_data = dict(ctx.session)
 
             # Ensure user_id field exists
             if "user_id" not in user_data:
@@ -156,6 +157,8 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
         7. Add rate limit headers to response
         """
         path = request.url.path
+        if not path.startswith(self.PATH_PREFIXES):
+            return await call_next(request)
 
         # Check if we should track this endpoint
         should_track = await self._should_track_endpoint(path)
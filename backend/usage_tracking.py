@@ -17,6 +17,7 @@ Date: November 12, 2025
 """
 
 import asyncpg
+from database.pool_manager import get_budget_pool
 import redis.asyncio as aioredis
 import logging
 from typing import Dict, List, Optional, Any
@@ -89,15 +90,7 @@ class UsageTracker:
 
         try:
             # PostgreSQL connection pool
-            self.db_pool = await asyncpg.create_pool(
-                host=os.getenv("POSTGRES_HOST", "uchub-postgres"),
-                port=int(os.getenv("POSTGRES_PORT", 5432)),
-                user=os.getenv("POSTGRES_USER", "unicorn"),
-                password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-                database=os.getenv("POSTGRES_DB", "unicorn_db"),
-                min_size=5,
-                max_size=20
-            )
+            self.db_pool = get_budget_pool("analytics")
 
             # Redis connection
             self.redis = await aioredis.from_url(
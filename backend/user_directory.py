@@ -0,0 +1,471 @@
+"""
+Local, indexed mirror of the Keycloak user directory for the admin user pages.
+
+GET /api/v1/admin/users used to fetch up to 1000 users over the Keycloak admin
+REST API on every page view, silently dropping the rest. It then filtered
+them in Python and, when a role filter was set, fetched realm roles one user
+at a time. The analytics summary and the CSV export repeated the full fetch.
+
+UserDirectory keeps every realm user in memory, including attributes and
+realm roles, with these indexes:
+
+- sets of user ids by subscription tier, realm role and org_id
+- keys sorted by creation time (newest first), used for date ranges and
+  keyset pagination
+- a lowercased email/username string per user, used for search
+
+Sync:
+- Full load. Users are read page by page over the REST API. Role membership
+  is read per realm role, which is one call per role instead of one per user.
+  If REST is unavailable, one read-only query on Keycloak's database is used
+  instead. The full load repeats every USER_DIRECTORY_FULL_SYNC_SECONDS as a
+  safety net.
+- Delta. Every USER_DIRECTORY_SYNC_SECONDS, the admin events (USER,
+  REALM_ROLE_MAPPING) and user events (REGISTER, UPDATE_PROFILE, ...) since
+  the last sync name the users to re-fetch or drop. Realms without event
+  storage fall back to the full sync. Syncs run in the background, so a page
+  load never waits for one except the very first.
+- Write-through. Ops-center's own user mutations call mark_changed() or
+  remove(). Pending users are re-fetched before the next query, so an admin
+  sees their change on the next page load.
+
+Pages are ordered newest first. A `cursor` (keyset) continues after the last
+row of the previous page.
+
+Configuration (environment):
+    USER_DIRECTORY_SYNC_SECONDS        delta sync interval (default 30)
+    USER_DIRECTORY_FULL_SYNC_SECONDS   full reload interval (default 900)
+"""
+
+import asyncio
+import base64
+import bisect
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from keycloak_integration import (
+    KEYCLOAK_REALM,
+    KEYCLOAK_URL,
+    _get_attr_value,
+    fetch_admin_pages,
+    get_admin_token,
+    get_all_users_from_db,
+)
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+USER_DIRECTORY_SYNC_SECONDS = float(os.getenv("USER_DIRECTORY_SYNC_SECONDS", "30"))
+USER_DIRECTORY_FULL_SYNC_SECONDS = float(os.getenv("USER_DIRECTORY_FULL_SYNC_SECONDS", "900"))
+
+# Concurrent per-user fetches when applying deltas
+REFRESH_CONCURRENCY = 8
+# Events are read from slightly before the previous sync to absorb clock skew
+EVENT_OVERLAP_MS = 5000
+# User (login-flow) events that change what the directory shows
+USER_EVENT_TYPES = ("REGISTER", "UPDATE_PROFILE", "UPDATE_EMAIL", "VERIFY_EMAIL")
+
+SortKey = Tuple[int, str]
+
+
+def sort_key(user: Dict[str, Any]) -> SortKey:
+    """Newest first, ties broken by id."""
+    return (-int(user.get("createdTimestamp") or 0), user["id"])
+
+
+def encode_cursor(key: SortKey) -> str:
+    raw = f"{-key[0]}:{key[1]}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created, _, user_id = raw.partition(":")
+        return (-int(created), user_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def to_millis(value: Optional[str], end_of_day: bool = False) -> Optional[int]:
+    """ISO date/datetime (or epoch millis) to epoch millis; date-only `to` bounds cover the whole day."""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1, milliseconds=-1)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+class UserDirectory:
+    """In-memory, indexed user directory with incremental sync"""
+
+    def __init__(
+        self,
+        sync_interval: float = USER_DIRECTORY_SYNC_SECONDS,
+        full_sync_interval: float = USER_DIRECTORY_FULL_SYNC_SECONDS,
+    ):
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, SortKey] = {}
+        self._order: List[SortKey] = []
+        self._search: Dict[str, str] = {}
+        self._by_tier: Dict[str, Set[str]] = {}
+        self._by_role: Dict[str, Set[str]] = {}
+        self._by_org: Dict[str, Set[str]] = {}
+        self._pending: Set[str] = set()
+        self.source: Optional[str] = None   # "rest" or "db"
+        self.loaded_at = 0.0                # monotonic time of the last full load
+        self.synced_at = 0.0                # monotonic time of the last sync of any kind
+        self._events_since_ms = 0
+        self._flight = SingleFlight("User directory sync", logger)
+        self._sync_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def _postings(self, user: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Set[str]], str]]:
+        attrs = user.get("attributes") or {}
+        yield self._by_tier, _get_attr_value(attrs, "subscription_tier", "trial")
+        org_id = _get_attr_value(attrs, "org_id")
+        if org_id:
+            yield self._by_org, org_id
+        for role in user.get("realmRoles") or ():
+            yield self._by_role, role
+
+    def _index(self, user: Dict[str, Any], keep_order: bool = True) -> None:
+        user_id = user["id"]
+        key = sort_key(user)
+        self._users[user_id] = user
+        self._keys[user_id] = key
+        if keep_order:
+            bisect.insort(self._order, key)
+        self._search[user_id] = f"{(user.get('email') or '').lower()}\n{(user.get('username') or '').lower()}"
+        for index, value in self._postings(user):
+            index.setdefault(value, set()).add(user_id)
+
+    def _unindex(self, user_id: str) -> None:
+        user = self._users.pop(user_id, None)
+        if user is None:
+            return
+        key = self._keys.pop(user_id)
+        del self._order[bisect.bisect_left(self._order, key)]
+        del self._search[user_id]
+        for index, value in self._postings(user):
+            ids = index.get(value)
+            if ids is not None:
+                ids.discard(user_id)
+                if not ids:
+                    del index[value]
+
+    def upsert(self, user: Dict[str, Any]) -> None:
+        """Insert or replace one user (Keycloak representation plus `realmRoles`)."""
+        user = dict(user)
+        user.setdefault("realmRoles", [])
+        self._unindex(user["id"])
+        self._index(user)
+
+    def remove(self, user_id: str) -> None:
+        self._pending.discard(user_id)
+        self._unindex(user_id)
+
+    def replace_all(self, users: List[Dict[str, Any]]) -> None:
+        self._users, self._keys, self._search = {}, {}, {}
+        self._by_tier, self._by_role, self._by_org = {}, {}, {}
+        for user in users:
+            user = dict(user)
+            user.setdefault("realmRoles", [])
+            self._index(user, keep_order=False)
+        self._order = sorted(self._keys.values())
+
+    def apply_attributes(self, user_id: str, attributes: Dict[str, Any]) -> None:
+        """Reflect an attribute write made through ops-center."""
+        user = self._users.get(user_id)
+        if user is not None:
+            self.upsert({**user, "attributes": attributes})
+
+    def mark_changed(self, user_id: str) -> None:
+        """Re-fetch this user before the next query."""
+        self._pending.add(user_id)
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._users.get(user_id)
+
+    def iter_users(self) -> Iterator[Dict[str, Any]]:
+        """All users, newest first."""
+        for key in self._order:
+            yield self._users[key[1]]
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(
+        self,
+        search: Optional[str] = None,
+        tier: Optional[str] = None,
+        role: Optional[str] = None,
+        status: Optional[str] = None,
+        org_id: Optional[str] = None,
+        created_from: Optional[int] = None,
+        created_to: Optional[int] = None,
+        email_verified: Optional[bool] = None,
+        byok_enabled: Optional[bool] = None,
+        limit: int = 50,
+        offset: int = 0,
+        cursor: Optional[SortKey] = None,
+    ) -> Dict[str, Any]:
+        """
+        Filtered page of users, newest first.
+
+        Returns {"users", "total", "next_cursor"}; `cursor` (a decoded keyset
+        position) takes precedence over `offset`.
+        """
+        candidates: Optional[Set[str]] = None
+        for index, value in ((self._by_tier, tier), (self._by_role, role), (self._by_org, org_id)):
+            if value:
+                ids = index.get(value, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+
+        keys = self._order if candidates is None else sorted(self._keys[i] for i in candidates)
+        # Keys sort newest first: created_to bounds the start, created_from the end
+        lo = 0 if created_to is None else bisect.bisect_left(keys, (-created_to, ""))
+        hi = len(keys) if created_from is None else bisect.bisect_left(keys, (-created_from + 1, ""))
+
+        needle = search.lower() if search else None
+        matched: List[SortKey] = []
+        for key in keys[lo:hi]:
+            user_id = key[1]
+            user = self._users[user_id]
+            if needle and needle not in self._search[user_id]:
+                continue
+            if status == "enabled" and not user.get("enabled", True):
+                continue
+            if status == "disabled" and user.get("enabled", True):
+                continue
+            if email_verified is not None and bool(user.get("emailVerified", False)) != email_verified:
+                continue
+            if byok_enabled is not None:
+                has_byok = _get_attr_value(user.get("attributes") or {}, "byok_enabled", "false") == "true"
+                if has_byok != byok_enabled:
+                    continue
+            matched.append(key)
+
+        start = bisect.bisect_right(matched, cursor) if cursor is not None else offset
+        page = matched[start:start + limit]
+        return {
+            "users": [self._users[key[1]] for key in page],
+            "total": len(matched),
+            "next_cursor": encode_cursor(page[-1]) if page and start + limit < len(matched) else None,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        users = self._users.values()
+        enabled = sum(1 for u in users if u.get("enabled", True))
+        return {
+            "total": len(self._users),
+            "enabled": enabled,
+            "disabled": len(self._users) - enabled,
+            "email_verified": sum(1 for u in users if u.get("emailVerified", False)),
+            "tiers": {tier: len(ids) for tier, ids in self._by_tier.items()},
+            "roles": {role: len(ids) for role, ids in self._by_role.items()},
+        }
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    async def ensure_fresh(self) -> None:
+        """
+        Make the directory usable for a query.
+
+        The first call waits for the full load; later calls only wait for
+        pending write-through refreshes and revalidate in the background.
+        """
+        if not self.loaded_at:
+            await self._flight.wait(self.sync)
+            return
+        if self._pending:
+            if self.source == "db":
+                # No REST access for per-user reads; reloading from the DB is cheap
+                self._pending.clear()
+                await self._flight.wait(self.sync)
+            else:
+                await self._refresh_pending()
+        if time.monotonic() - self.synced_at >= self.sync_interval:
+            self._flight.schedule(self.sync)
+
+    async def sync(self, full: bool = False) -> None:
+        async with self._sync_lock:
+            due_full = time.monotonic() - self.loaded_at >= self.full_sync_interval
+            if full or not self.loaded_at or due_full or self.source == "db":
+                await self._full_sync()
+            else:
+                await self._delta_sync()
+
+    async def _full_sync(self) -> None:
+        started_ms = int(time.time() * 1000)
+        try:
+            users, self.source = await load_users_rest(), "rest"
+        except Exception as e:
+            logger.warning(f"User directory REST load failed, reading Keycloak DB: {e}")
+            users, self.source = await get_all_users_from_db(), "db"
+        self.replace_all(users)
+        self._events_since_ms = started_ms - EVENT_OVERLAP_MS
+        self.loaded_at = self.synced_at = time.monotonic()
+        logger.info(f"User directory loaded {len(users)} users from {self.source}")
+
+    async def _delta_sync(self) -> None:
+        started_ms = int(time.time() * 1000)
+        changed, deleted = await fetch_user_changes(self._events_since_ms)
+        for user_id in deleted:
+            self.remove(user_id)
+        self._pending.update(changed - deleted)
+        await self._refresh_pending()
+        self._events_since_ms = started_ms - EVENT_OVERLAP_MS
+        self.synced_at = time.monotonic()
+
+    async def _refresh_pending(self) -> None:
+        user_ids, self._pending = self._pending, set()
+        if not user_ids:
+            return
+        slots = asyncio.Semaphore(REFRESH_CONCURRENCY)
+        try:
+            token = await get_admin_token()
+        except Exception as e:
+            logger.warning(f"User directory refresh skipped: {e}")
+            self._pending |= user_ids
+            return
+        async with httpx.AsyncClient(verify=False) as client:
+            async def refresh(user_id: str) -> None:
+                async with slots:
+                    try:
+                        user = await fetch_user(client, token, user_id)
+                    except Exception as e:
+                        logger.warning(f"User directory refresh of {user_id} failed: {e}")
+                        self._pending.add(user_id)
+                        return
+                if user is None:
+                    self.remove(user_id)
+                else:
+                    self.upsert(user)
+
+            await asyncio.gather(*(refresh(user_id) for user_id in user_ids))
+
+
+# ============================================================================
+# Keycloak readers
+# ============================================================================
+
+def _realm_url(path: str) -> str:
+    return f"{KEYCLOAK_URL}/admin/realms/{KEYCLOAK_REALM}{path}"
+
+
+async def load_users_rest() -> List[Dict[str, Any]]:
+    """Every realm user with `realmRoles`, via a few paged admin REST calls."""
+    token = await get_admin_token()
+    async with httpx.AsyncClient(verify=False) as client:
+        users = await fetch_admin_pages(client, token, "/users", {"briefRepresentation": "false"})
+        response = await client.get(_realm_url("/roles"), headers={"Authorization": f"Bearer {token}"}, timeout=30.0)
+        response.raise_for_status()
+        roles = [r["name"] for r in response.json() if r.get("name")]
+        members = await asyncio.gather(*(
+            fetch_admin_pages(client, token, f"/roles/{quote(role, safe='')}/users", {"briefRepresentation": "true"})
+            for role in roles
+        ))
+
+    by_id = {user["id"]: user for user in users}
+    for user in users:
+        user["realmRoles"] = []
+    for role, role_users in zip(roles, members):
+        for member in role_users:
+            user = by_id.get(member.get("id"))
+            if user is not None:
+                user["realmRoles"].append(role)
+    return users
+
+
+async def fetch_user(client: httpx.AsyncClient, token: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """One user with `realmRoles`, or None if it no longer exists."""
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await client.get(_realm_url(f"/users/{user_id}"), headers=headers, timeout=10.0)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    user = response.json()
+    roles = await client.get(_realm_url(f"/users/{user_id}/role-mappings/realm"), headers=headers, timeout=10.0)
+    roles.raise_for_status()
+    user["realmRoles"] = [r.get("name") for r in roles.json() if r.get("name")]
+    return user
+
+
+def _user_id_from_path(resource_path: str) -> Optional[str]:
+    parts = (resource_path or "").split("/")
+    return parts[1] if len(parts) >= 2 and parts[0] == "users" else None
+
+
+async def fetch_user_changes(since_ms: int) -> Tuple[Set[str], Set[str]]:
+    """
+    Users changed or deleted since `since_ms`, from Keycloak's admin and user events.
+
+    Returns (changed ids, deleted ids); both are empty when the realm does
+    not store events.
+    """
+    date_from = datetime.fromtimestamp(since_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+    token = await get_admin_token()
+    changed: Set[str] = set()
+    deleted: Set[str] = set()
+
+    async with httpx.AsyncClient(verify=False) as client:
+        admin_events, user_events = await asyncio.gather(
+            fetch_admin_pages(client, token, "/admin-events", {
+                "dateFrom": date_from,
+                "resourceTypes": ["USER", "REALM_ROLE_MAPPING"],
+            }),
+            fetch_admin_pages(client, token, "/events", {
+                "dateFrom": date_from,
+                "type": list(USER_EVENT_TYPES),
+            }),
+        )
+
+    # Oldest first, so a delete followed by a re-create ends up "changed"
+    for event in sorted(admin_events, key=lambda e: e.get("time", 0)):
+        if event.get("time", 0) < since_ms:
+            continue
+        user_id = _user_id_from_path(event.get("resourcePath", ""))
+        if not user_id:
+            continue
+        if event.get("operationType") == "DELETE" and event.get("resourcePath", "").count("/") == 1:
+            deleted.add(user_id)
+            changed.discard(user_id)
+        else:
+            changed.add(user_id)
+            deleted.discard(user_id)
+    for event in user_events:
+        if event.get("time", 0) >= since_ms and event.get("userId"):
+            changed.add(event["userId"])
+    return changed, deleted
+
+
+_user_directory = UserDirectory()
+
+
+def get_user_directory() -> UserDirectory:
+    """Get the process-wide user directory mirror"""
+    return _user_directory
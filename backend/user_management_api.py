@@ -31,7 +31,6 @@ import string
 # Import Keycloak integration functions
 import httpx
 from keycloak_integration import (
-    get_all_users,
     get_user_by_id,
     get_user_by_email,
     get_user_by_username,
@@ -47,6 +46,7 @@ from keycloak_integration import (
     KEYCLOAK_REALM,
 )
 
+from user_directory import decode_cursor, get_user_directory, to_millis
 from audit_logger import audit_logger
 from audit_helpers import get_client_ip, get_user_agent
 
@@ -203,30 +203,6 @@ async def require_admin(request: Request):
 # ROLE HELPERS
 # ============================================================================
 
-async def _fetch_realm_roles(user_id: str) -> List[str]:
-    """
-    Fetch a user's realm role names via the Keycloak admin REST API.
-
-    The /users list endpoint does not include role mappings, so the REST path
-    must fetch them per-user from /users/{id}/role-mappings/realm. Returns an
-    empty list on any failure (best-effort enrichment, never blocks the list).
-    """
-    try:
-        token = await get_admin_token()
-        async with httpx.AsyncClient(verify=False) as client:
-            response = await client.get(
-                f"{KEYCLOAK_URL}/admin/realms/{KEYCLOAK_REALM}/users/{user_id}/role-mappings/realm",
-                headers={"Authorization": f"Bearer {token}"},
-                timeout=10.0,
-            )
-            if response.status_code == 200:
-                return [r.get("name") for r in response.json() if r.get("name")]
-            logger.warning(f"Failed to fetch realm roles for {user_id}: {response.status_code}")
-    except Exception as e:
-        logger.warning(f"Error fetching realm roles for {user_id}: {e}")
-    return []
-
-
 async def _set_user_enabled(user_id: str, enabled: bool) -> bool:
     """Set the Keycloak `enabled` flag on a user (admin REST PUT /users/{id})."""
     try:
@@ -242,6 +218,7 @@ async def _set_user_enabled(user_id: str, enabled: bool) -> bool:
                 timeout=10.0,
             )
             if response.status_code == 204:
+                get_user_directory().mark_changed(user_id)
                 return True
             logger.error(f"Failed to set enabled={enabled} for {user_id}: {response.status_code} - {response.text}")
     except Exception as e:
@@ -317,6 +294,7 @@ async def _assign_realm_roles(user_id: str, role_names: List[str]) -> Dict[str,
             )
             if response.status_code == 204:
                 results["assigned"] = [r.get("name") for r in role_reps]
+                get_user_directory().mark_changed(user_id)
             else:
                 logger.error(f"Failed to assign roles to {user_id}: {response.status_code} - {response.text}")
                 for r in role_reps:
@@ -348,7 +326,10 @@ async def _remove_realm_role(user_id: str, role_name: str) -> bool:
                 json=[rep],
                 timeout=10.0,
             )
-            return response.status_code == 204
+            if response.status_code == 204:
+                get_user_directory().mark_changed(user_id)
+                return True
+            return False
     except Exception as e:
         logger.error(f"Error removing role '{role_name}' from {user_id}: {e}")
         return False
@@ -360,15 +341,9 @@ async def _add_user_to_organization(user_id: str, org_id: str, role: str = "memb
     used by org_api.add_organization_member). Returns org info on success;
     raises ValueError with a human-readable reason on failure.
     """
-    import asyncpg  # lazy import: only needed on the org path
-
-    conn = await asyncpg.connect(
-        host=os.getenv("POSTGRES_HOST", "unicorn-postgresql"),
-        port=int(os.getenv("POSTGRES_PORT", "5432")),
-        user=os.getenv("POSTGRES_USER", "unicorn"),
-        password=os.getenv("POSTGRES_PASSWORD", "unicorn"),
-        database=os.getenv("POSTGRES_DB", "unicorn_db"),
-    )
+    from database.pool_manager import pg_connect  # lazy import: only needed on the org path
+
+    conn = await pg_connect()
     try:
         org = await conn.fetchrow(
             "SELECT id::text AS id, name FROM organizations WHERE id::text = $1",
@@ -392,6 +367,8 @@ async def _add_user_to_organization(user_id: str, org_id: str, role: str = "memb
                 user_id,
                 role,
             )
+            from org_credit_integration import invalidate_user_org
+            invalidate_user_org(user_id)
         return {"id": org["id"], "name": org["name"], "role": role}
     finally:
         await conn.close()
@@ -454,13 +431,16 @@ async def list_users(
     last_login_to: Optional[str] = None,
     email_verified: Optional[bool] = None,
     byok_enabled: Optional[bool] = None,
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     admin: bool = Depends(require_admin)
 ):
     """
     List users with advanced filtering and pagination
 
+    Served from the local user directory mirror (see user_directory.py).
+
     Query Parameters:
     - search: Search by email/username
     - tier: Filter by subscription tier
@@ -472,112 +452,50 @@ async def list_users(
     - email_verified: Filter by email verification status
     - byok_enabled: Filter by BYOK status
     - limit/offset: Pagination
+    - cursor: Keyset pagination; pass the previous page's next_cursor
     """
     try:
-        # Get all users from Keycloak
-        all_users = await get_all_users()
-
-        # Apply filters
-        filtered_users = []
-        for user in all_users:
-            # Search filter
-            if search:
-                email = user.get("email", "").lower()
-                username = user.get("username", "").lower()
-                if search.lower() not in email and search.lower() not in username:
-                    continue
-
-            # Get user attributes
-            attrs = user.get("attributes", {})
-
-            # Tier filter
-            if tier:
-                user_tier = _get_attr_value(attrs, "subscription_tier", "trial")
-                if user_tier != tier:
-                    continue
-
-            # Status filter
-            if status:
-                if status == "enabled" and not user.get("enabled", True):
-                    continue
-                if status == "disabled" and user.get("enabled", True):
-                    continue
-
-            # Email verified filter
-            if email_verified is not None:
-                if user.get("emailVerified", False) != email_verified:
-                    continue
-
-            # BYOK filter
-            if byok_enabled is not None:
-                has_byok = bool(_get_attr_value(attrs, "byok_enabled"))
-                if has_byok != byok_enabled:
-                    continue
-
-            # Organization filter
-            if org_id:
-                user_org = _get_attr_value(attrs, "org_id")
-                if user_org != org_id:
-                    continue
-
-            # Realm roles. The DB-fallback path already provides these as
-            # `realmRoles`; the REST path omits them (backfilled post-pagination
-            # for the page slice below, to avoid an N+1 over every user).
-            user_roles = user.get("realmRoles")
-
-            # Role filter. When a role filter is active we must know the user's
-            # roles to decide inclusion; on the REST path (no `realmRoles`) fetch
-            # them now so filtering is correct rather than silently empty.
-            if role:
-                if user_roles is None:
-                    user_roles = await _fetch_realm_roles(user.get("id"))
-                if role not in user_roles:
-                    continue
-
-            user_roles = user_roles or []
-
-            # Add to filtered list
-            filtered_users.append({
-                "id": user.get("id"),
-                "username": user.get("username"),
-                "email": user.get("email"),
-                "firstName": user.get("firstName", ""),
-                "lastName": user.get("lastName", ""),
-                "enabled": user.get("enabled", True),
-                "emailVerified": user.get("emailVerified", False),
-                "createdTimestamp": user.get("createdTimestamp"),
-                "roles": user_roles,
-                "subscription_tier": _get_attr_value(attrs, "subscription_tier", "trial"),
-                "subscription_status": _get_attr_value(attrs, "subscription_status", "active"),
-                "api_calls_limit": _get_attr_value(attrs, "api_calls_limit", "1000"),
-                "api_calls_used": _get_attr_value(attrs, "api_calls_used", "0"),
-                "org_id": _get_attr_value(attrs, "org_id"),
-                "org_name": _get_attr_value(attrs, "org_name"),
-                "byok_enabled": _get_attr_value(attrs, "byok_enabled", "false") == "true"
-            })
-
-        # Apply pagination
-        total = len(filtered_users)
-        paginated_users = filtered_users[offset:offset+limit]
-
-        # Backfill realm roles for the paginated slice when the REST path was
-        # used (no `realmRoles` present). Bounded to the page size, not all users.
-        for u in paginated_users:
-            if not u["roles"] and u.get("id"):
-                u["roles"] = await _fetch_realm_roles(u["id"])
+        try:
+            created_from_ms = to_millis(created_from)
+            created_to_ms = to_millis(created_to, end_of_day=True)
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        directory = get_user_directory()
+        await directory.ensure_fresh()
+        page = directory.query(
+            search=search,
+            tier=tier,
+            role=role,
+            status=status,
+            org_id=org_id,
+            created_from=created_from_ms,
+            created_to=created_to_ms,
+            email_verified=email_verified,
+            byok_enabled=byok_enabled,
+            limit=limit,
+            offset=offset,
+            cursor=after,
+        )
+        total = page["total"]
 
         return {
-            "users": paginated_users,
+            "users": [_shape_user_response(user) for user in page["users"]],
             "total": total,
             "pagination": {
                 "total": total,
                 "limit": limit,
                 "offset": offset,
+                "next_cursor": page["next_cursor"],
             },
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": page["next_cursor"],
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing users: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -820,29 +738,19 @@ async def create_user_comprehensive(
 async def get_user_analytics_summary(admin: bool = Depends(require_admin)):
     """Get user analytics summary (total users, active, tiers, roles)"""
     try:
-        users = await get_all_users()
-
-        total_users = len(users)
-        active_users = sum(1 for u in users if u.get("enabled", True))
-        # Suspended = accounts that are disabled (cannot sign in).
-        suspended_users = sum(1 for u in users if not u.get("enabled", True))
+        directory = get_user_directory()
+        await directory.ensure_fresh()
+        summary = directory.summary()
 
         # Tier distribution
-        tiers = {"trial": 0, "starter": 0, "professional": 0, "enterprise": 0}
-        for user in users:
-            attrs = user.get("attributes", {})
-            tier = _get_attr_value(attrs, "subscription_tier", "trial")
-            if tier in tiers:
-                tiers[tier] += 1
-
-        # Count email verified users
-        email_verified = sum(1 for u in users if u.get("emailVerified", False))
+        tiers = {tier: summary["tiers"].get(tier, 0) for tier in ("trial", "starter", "professional", "enterprise")}
 
         return {
-            "total_users": total_users,
-            "active_users": active_users,
-            "suspended_users": suspended_users,
-            "email_verified": email_verified,
+            "total_users": summary["total"],
+            "active_users": summary["enabled"],
+            # Suspended = accounts that are disabled (cannot sign in).
+            "suspended_users": summary["disabled"],
+            "email_verified": summary["email_verified"],
             "tier_distribution": tiers,
             "growth_this_month": 0,  # TODO: Calculate from creation timestamps
             "churn_rate": 0.0  # TODO: Calculate from subscription status changes
@@ -1183,7 +1091,9 @@ async def bulk_set_tier(
 async def export_users_csv(admin: bool = Depends(require_admin)):
     """Export all users to CSV"""
     try:
-        users = await get_all_users()
+        directory = get_user_directory()
+        await directory.ensure_fresh()
+        users = list(directory.iter_users())
 
         # Create CSV in memory
         output = io.StringIO()
@@ -0,0 +1,308 @@
+"""
+Concurrent check engine for the website uptime monitor.
+
+The scheduler in routers/website_monitor used to check every active site one
+after another. Each check opened a new httpx client and then ran a blocking
+TLS socket check (wrapped in `asyncio.run` inside an executor), so with a few
+hundred sites one cycle took longer than the check interval.
+
+This engine provides:
+
+- One keep-alive httpx client shared by all checks. Sites on the same host
+  reuse pooled connections, and a per-host semaphore keeps a burst of checks
+  from hammering a single server.
+- Bounded concurrency across the whole batch (WEBSITE_CHECK_CONCURRENCY).
+- Async TLS certificate inspection. A certificate is cached until it gets
+  close to expiry (WEBSITE_CERT_RECHECK_DAYS), and never for longer than
+  WEBSITE_CERT_CACHE_SECONDS. Failures are cached briefly.
+- Jittered per-site schedules (SiteSchedule), so sites added together do not
+  stay in lockstep.
+- Batched `website_checks` inserts (insert_check_results).
+
+Configuration (environment):
+    WEBSITE_CHECK_CONCURRENCY     checks in flight at once (default 20)
+    WEBSITE_CHECK_PER_HOST        checks in flight per host (default 4)
+    WEBSITE_CHECK_JITTER          +/- fraction applied to each interval (default 0.1)
+    WEBSITE_CERT_RECHECK_DAYS     re-inspect certificates this close to expiry (default 7)
+    WEBSITE_CERT_CACHE_SECONDS    max age of a cached certificate (default 43200)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import ssl
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+WEBSITE_CHECK_CONCURRENCY = int(os.getenv("WEBSITE_CHECK_CONCURRENCY", "20"))
+WEBSITE_CHECK_PER_HOST = int(os.getenv("WEBSITE_CHECK_PER_HOST", "4"))
+WEBSITE_CHECK_JITTER = float(os.getenv("WEBSITE_CHECK_JITTER", "0.1"))
+WEBSITE_CERT_RECHECK_DAYS = float(os.getenv("WEBSITE_CERT_RECHECK_DAYS", "7"))
+WEBSITE_CERT_CACHE_SECONDS = float(os.getenv("WEBSITE_CERT_CACHE_SECONDS", "43200"))
+
+# Lower bound for re-inspecting a certificate that is already inside the
+# recheck window, and how long a failed inspection is remembered.
+CERT_MIN_CACHE_SECONDS = 3600.0
+CERT_ERROR_CACHE_SECONDS = 300.0
+TLS_CONNECT_TIMEOUT = 5.0
+
+
+async def fetch_certificate(hostname: str, port: int = 443) -> Dict[str, Any]:
+    """Open a verified TLS connection and read the peer certificate's expiry."""
+    context = ssl.create_default_context()
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(hostname, port, ssl=context, server_hostname=hostname),
+        timeout=TLS_CONNECT_TIMEOUT,
+    )
+    try:
+        cert = writer.get_extra_info("peercert") or {}
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+    expiry_str = cert.get("notAfter", "")
+    if not expiry_str:
+        return {"valid": True, "expiry": None}
+    expiry = datetime.fromtimestamp(ssl.cert_time_to_seconds(expiry_str), timezone.utc).replace(tzinfo=None)
+    return {
+        "valid": True,
+        "expiry": expiry.isoformat(),
+        "days_until_expiry": (expiry - datetime.utcnow()).days,
+        "issuer": dict(x[0] for x in cert.get("issuer", [])),
+    }
+
+
+class CertificateCache:
+    """Per-host TLS certificate results, cached until close to expiry"""
+
+    def __init__(
+        self,
+        recheck_days: float = WEBSITE_CERT_RECHECK_DAYS,
+        max_age: float = WEBSITE_CERT_CACHE_SECONDS,
+    ):
+        self.recheck_seconds = recheck_days * 86400
+        self.max_age = max_age
+        # (hostname, port) -> (expires_at_monotonic, result)
+        self._entries: Dict[Tuple[str, int], Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[Tuple[str, int], asyncio.Task] = {}
+
+    async def get(self, hostname: str, port: int = 443) -> Dict[str, Any]:
+        key = (hostname, port)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        # Sites sharing a host share one inspection
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._inspect(hostname, port))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _inspect(self, hostname: str, port: int) -> Dict[str, Any]:
+        try:
+            result = await fetch_certificate(hostname, port)
+            ttl = self._ttl_for(result.get("expiry"))
+        except Exception as e:
+            logger.warning(f"SSL check failed for {hostname}: {e}")
+            result = {"valid": False, "error": str(e)}
+            ttl = CERT_ERROR_CACHE_SECONDS
+        self._entries[(hostname, port)] = (time.monotonic() + ttl, result)
+        return result
+
+    def _ttl_for(self, expiry: Optional[str]) -> float:
+        if not expiry:
+            return self.max_age
+        seconds_left = (datetime.fromisoformat(expiry) - datetime.utcnow()).total_seconds()
+        return max(CERT_MIN_CACHE_SECONDS, min(self.max_age, seconds_left - self.recheck_seconds))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class WebsiteCheckEngine:
+    """Bounded-concurrency HTTP + TLS checker over one pooled client"""
+
+    def __init__(
+        self,
+        concurrency: int = WEBSITE_CHECK_CONCURRENCY,
+        per_host: int = WEBSITE_CHECK_PER_HOST,
+        certificates: Optional[CertificateCache] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.certificates = certificates or CertificateCache()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def check(self, url: str, timeout: int = 10, expected_status: int = 200) -> Dict[str, Any]:
+        """Check one website's availability and, for https, its certificate."""
+        result = {
+            "status": "unknown",
+            "status_code": None,
+            "response_time_ms": None,
+            "ssl_valid": None,
+            "ssl_expiry": None,
+            "error": None,
+            "checked_at": datetime.now().isoformat()
+        }
+        parts = urlsplit(url)
+        hostname = parts.hostname or ""
+
+        try:
+            async with self._host_slot(hostname):
+                start = time.perf_counter()
+                response = await self.client.get(url, timeout=timeout)
+                result["response_time_ms"] = int((time.perf_counter() - start) * 1000)
+            result["status_code"] = response.status_code
+
+            if response.status_code == expected_status or (200 <= response.status_code < 400):
+                result["status"] = "up"
+            else:
+                result["status"] = "down"
+                result["error"] = f"Unexpected status code: {response.status_code}"
+
+            if parts.scheme == "https" and hostname:
+                cert = await self.certificates.get(hostname, parts.port or 443)
+                result["ssl_valid"] = cert.get("valid")
+                result["ssl_expiry"] = cert.get("expiry")
+
+        except httpx.TimeoutException:
+            result["status"] = "down"
+            result["error"] = "Connection timed out"
+        except httpx.ConnectError as e:
+            result["status"] = "down"
+            result["error"] = f"Connection failed: {str(e)}"
+        except Exception as e:
+            result["status"] = "down"
+            result["error"] = str(e)
+
+        return result
+
+    async def check_many(self, websites: Iterable[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Check websites concurrently; returns (website, result) pairs in input order."""
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def run(website):
+            async with limit:
+                return website, await self.check(
+                    website['url'],
+                    timeout=website.get('timeout') or 10,
+                    expected_status=website.get('expected_status') or 200,
+                )
+
+        return list(await asyncio.gather(*(run(w) for w in websites)))
+
+    def _host_slot(self, hostname: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(hostname)
+        if slot is None:
+            slot = self._host_slots[hostname] = asyncio.Semaphore(self.per_host)
+        return slot
+
+
+class SiteSchedule:
+    """Next-due times per site, with jittered intervals"""
+
+    def __init__(self, jitter: float = WEBSITE_CHECK_JITTER):
+        self.jitter = jitter
+        self._next_due: Dict[str, float] = {}
+
+    def due(self, websites: Iterable[Dict[str, Any]], interval_for, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Return the sites that are due and schedule their next check.
+
+        Sites seen for the first time are checked within the jitter fraction
+        of one interval, so a batch of new sites (or a restart) is spread out
+        instead of checked together. Sites no longer in `websites` are
+        forgotten.
+        """
+        now = time.monotonic() if now is None else now
+        due = []
+        seen = set()
+        for website in websites:
+            site_id = str(website['id'])
+            seen.add(site_id)
+            interval = interval_for(website)
+            next_due = self._next_due.get(site_id)
+            if next_due is None:
+                next_due = self._next_due[site_id] = now + random.uniform(0, interval * self.jitter)
+            if next_due <= now:
+                due.append(website)
+                self._next_due[site_id] = now + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        for site_id in set(self._next_due) - seen:
+            del self._next_due[site_id]
+        return due
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        if not self._next_due:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(self._next_due.values()) - now)
+
+
+INSERT_CHECK_SQL = """
+    INSERT INTO website_checks
+    (website_id, status, status_code, response_time_ms, ssl_valid, ssl_expiry, error)
+    VALUES ($1, $2, $3, $4, $5, $6, $7)
+"""
+
+
+def check_record(website_id, result: Dict[str, Any]) -> tuple:
+    """One website_checks row for a check result."""
+    return (
+        website_id, result['status'], result['status_code'],
+        result['response_time_ms'], result['ssl_valid'],
+        datetime.fromisoformat(result['ssl_expiry']) if result['ssl_expiry'] else None,
+        result['error'],
+    )
+
+
+async def insert_check_results(conn, results: Iterable[Tuple[Any, Dict[str, Any]]]) -> int:
+    """Store (website_id, result) pairs with one batched statement."""
+    records = [check_record(website_id, result) for website_id, result in results]
+    if records:
+        await conn.executemany(INSERT_CHECK_SQL, records)
+    return len(records)
+
+
+# Singleton instance
+_check_engine: Optional[WebsiteCheckEngine] = None
+
+
+def get_check_engine() -> WebsiteCheckEngine:
+    """Get the process-wide website check engine"""
+    global _check_engine
+    if _check_engine is None:
+        _check_engine = WebsiteCheckEngine()
+    return _check_engine
@@ -31,6 +31,7 @@ from pathlib import Path
 from datetime import datetime
 import logging
 import asyncpg
+from database.pool_manager import pg_connect
 import hashlib
 import io
 
@@ -233,13 +234,7 @@ async def require_admin(request: Request):
 async def get_db_connection():
     """Get PostgreSQL database connection"""
     try:
-        conn = await asyncpg.connect(
-            host=os.getenv('POSTGRES_HOST', 'unicorn-postgresql'),
-            port=int(os.getenv('POSTGRES_PORT', '5432')),
-            user=os.getenv('POSTGRES_USER', 'unicorn'),
-            password=os.getenv('POSTGRES_PASSWORD', 'unicorn'),
-            database=os.getenv('POSTGRES_DB', 'unicorn_db')
-        )
+        conn = await pg_connect()
         return conn
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")